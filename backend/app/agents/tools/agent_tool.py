@@ -1,3 +1,6 @@
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from typing import Any, Callable, Generic, Literal, TypedDict, TypeVar
 
 from app.repositories.models.conversation import (
@@ -14,8 +17,16 @@ from mypy_boto3_bedrock_runtime.type_defs import (
     ToolSpecificationTypeDef,
 )
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
 T = TypeVar("T", bound=BaseModel)
 
+# Tool calls requested in the same turn run in parallel on a bounded thread pool.
+TOOL_MAX_WORKERS = int(os.environ.get("TOOL_MAX_WORKERS", 4))
+# Seconds a tool call may take from being requested until it is reported as an error.
+TOOL_TIMEOUT_SECONDS = float(os.environ.get("TOOL_TIMEOUT_SECONDS", 300))
+
 
 ToolFunctionResult = str | dict | ToolResultModel
 
@@ -120,6 +131,83 @@ class AgentTool(Generic[T]):
             )
 
 
+def run_tools(
+    tool_calls: list[tuple[AgentTool, str, dict[str, JsonValue]]],
+    model: type_model_name,
+    bot: BotModel | None = None,
+    on_tool_result: Callable[[ToolRunResult], None] | None = None,
+    max_workers: int = TOOL_MAX_WORKERS,
+    timeout: float = TOOL_TIMEOUT_SECONDS,
+) -> list[ToolRunResult]:
+    """Run independent tool calls concurrently.
+
+    Args:
+        tool_calls: List of (tool, tool_use_id, input).
+        on_tool_result: Called in the caller thread as soon as each tool finishes.
+        max_workers: Maximum number of tools running at the same time.
+        timeout: Seconds each tool call may take from being requested.
+            A tool call which does not finish in time is reported as an error result.
+
+    Returns:
+        list[ToolRunResult]: Results in the same order as `tool_calls`.
+    """
+    results: list[ToolRunResult | None] = [None] * len(tool_calls)
+    if len(tool_calls) == 0:
+        return []
+
+    executor = ThreadPoolExecutor(
+        max_workers=min(max_workers, len(tool_calls)),
+        thread_name_prefix="agent-tool",
+    )
+    try:
+        futures: dict[Future[ToolRunResult], int] = {
+            executor.submit(
+                tool.run,
+                tool_use_id=tool_use_id,
+                input=input,
+                model=model,
+                bot=bot,
+            ): index
+            for index, (tool, tool_use_id, input) in enumerate(tool_calls)
+        }
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                index = futures[future]
+                results[index] = future.result()
+                if on_tool_result:
+                    on_tool_result(results[index])  # type: ignore[arg-type]
+
+        except TimeoutError:
+            for future, index in futures.items():
+                if results[index] is not None:
+                    continue
+
+                future.cancel()
+                tool, tool_use_id, _ = tool_calls[index]
+                logger.warning(
+                    f"Tool {tool.name} ({tool_use_id}) timed out after {timeout} seconds"
+                )
+                results[index] = ToolRunResult(
+                    tool_use_id=tool_use_id,
+                    status="error",
+                    related_documents=[
+                        _function_result_to_related_document(
+                            tool_name=tool.name,
+                            res=f"Tool {tool.name} timed out after {timeout} seconds.",
+                            source_id_base=tool_use_id,
+                        )
+                    ],
+                )
+                if on_tool_result:
+                    on_tool_result(results[index])  # type: ignore[arg-type]
+
+    finally:
+        # Do not wait for timed out tools
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results  # type: ignore[return-value]
+
+
 def _function_result_to_related_document(
     tool_name: str,
     res: ToolFunctionResult,
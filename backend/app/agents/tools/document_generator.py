@@ -8,11 +8,10 @@ import uuid
 from typing import Any, Dict, List, Optional
 from datetime import datetime
 
-import boto3
 from app.agents.tools.agent_tool import AgentTool
 from app.repositories.models.custom_bot import BotModel
 from app.routes.schemas.conversation import type_model_name
-from app.utils import generate_presigned_url, BEDROCK_REGION
+from app.utils import generate_presigned_url, get_client, BEDROCK_REGION
 from pydantic import BaseModel, Field
 
 # Document generation libraries
@@ -58,7 +57,7 @@ def _upload_document_to_s3(document_data: bytes, filename: str, content_type: st
         s3_key = f"generated_documents/{timestamp}_{unique_id}_{filename}"
         
         # Create S3 client
-        s3_client = boto3.client("s3", region_name=BEDROCK_REGION)
+        s3_client = get_client("s3", region_name=BEDROCK_REGION)
         
         # First, try to check if bucket exists and is accessible
         try:
@@ -1,8 +1,16 @@
+import hashlib
 import logging
 import json
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 from app.agents.tools.agent_tool import AgentTool
+from app.bedrock import calculate_price
 from app.repositories.models.custom_bot import BotModel, InternetToolModel
+from app.repositories.models.summary_cache import SummaryCacheEntryModel
+from app.repositories.summary_cache import SummaryCacheStore, get_summary_cache_store
 from app.routes.schemas.conversation import type_model_name
 from app.utils import get_bedrock_runtime_client
 from duckduckgo_search import DDGS
@@ -12,6 +20,21 @@ from pydantic import BaseModel, Field, root_validator
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Search results are summarized concurrently with at most this many requests in flight.
+SUMMARY_MAX_WORKERS = int(os.environ.get("INTERNET_SEARCH_SUMMARY_MAX_WORKERS", 8))
+# Seconds to wait for summaries. Results not summarized in time fall back to truncated content.
+SUMMARY_TIMEOUT_SECONDS = float(
+    os.environ.get("INTERNET_SEARCH_SUMMARY_TIMEOUT_SECONDS", 20)
+)
+# Only the top N results are summarized, the rest are truncated.
+SUMMARY_TOP_N = int(os.environ.get("INTERNET_SEARCH_SUMMARY_TOP_N", 20))
+# Contents shorter than this are summarized together in a single prompt.
+SHORT_CONTENT_LENGTH = 1000
+SHORT_CONTENT_BATCH_SIZE = 5
+
+SUMMARY_MODEL_NAME: type_model_name = "claude-v3-haiku"
+SUMMARY_MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
+
 
 class InternetSearchInput(BaseModel):
     query: str = Field(description="The query to search for on the internet.")
@@ -41,20 +64,43 @@ class InternetSearchInput(BaseModel):
         return values
 
 
-def _summarize_content(content: str, title: str, url: str, query: str) -> str:
-    """
-    Summarize content using Claude 3 Haiku to prevent context window bloat.
-    Returns a concise summary (500-800 tokens max) preserving key information.
-    """
-    try:
-        client = get_bedrock_runtime_client()
+def _truncate_content(content: str) -> str:
+    return content[:1000] + "..." if len(content) > 1000 else content
 
-        # Truncate content if it's too long to avoid token limits
-        max_input_length = 8000  # Conservative limit for input
-        if len(content) > max_input_length:
-            content = content[:max_input_length] + "..."
 
-        prompt = f"""Please provide a concise summary of the following web content in 500-800 tokens maximum. Focus on information that directly answers or relates to the user's query: "{query}"
+def _invoke_summary_model(prompt: str, max_tokens: int) -> tuple[str, int, int]:
+    """Returns (text, input_tokens, output_tokens)."""
+    client = get_bedrock_runtime_client()
+    response = client.invoke_model(
+        modelId=SUMMARY_MODEL_ID,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(
+            {
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": max_tokens,
+                "messages": [{"role": "user", "content": prompt}],
+            }
+        ),
+    )
+    response_body = json.loads(response["body"].read())
+    usage = response_body.get("usage", {})
+    return (
+        response_body["content"][0]["text"].strip(),
+        usage.get("input_tokens", 0),
+        usage.get("output_tokens", 0),
+    )
+
+
+def _request_summary(
+    content: str, title: str, url: str, query: str
+) -> SummaryCacheEntryModel:
+    # Truncate content if it's too long to avoid token limits
+    max_input_length = 8000  # Conservative limit for input
+    if len(content) > max_input_length:
+        content = content[:max_input_length] + "..."
+
+    prompt = f"""Please provide a concise summary of the following web content in 500-800 tokens maximum. Focus on information that directly answers or relates to the user's query: "{query}"
 
 Title: {title}
 URL: {url}
@@ -62,33 +108,274 @@ Content: {content}
 
 Summary:"""
 
-        response = client.invoke_model(
-            modelId="anthropic.claude-3-haiku-20240307-v1:0",
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(
-                {
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 800,
-                    "messages": [{"role": "user", "content": prompt}],
-                }
-            ),
-        )
+    summary, input_tokens, output_tokens = _invoke_summary_model(prompt, max_tokens=800)
 
-        response_body = json.loads(response["body"].read())
-        summary = response_body["content"][0]["text"].strip()
+    logger.info(f"Summarized content from {len(content)} chars to {len(summary)} chars")
+    return SummaryCacheEntryModel(
+        summary=summary, input_tokens=input_tokens, output_tokens=output_tokens
+    )
+
+
+def _request_batch_summaries(
+    contents: list[dict], query: str
+) -> list[SummaryCacheEntryModel]:
+    """
+    Summarize several short contents with a single prompt.
+    Each item of `contents` has `title`, `url` and `content`.
+    Returns the summaries in the same order as `contents`.
+    """
+    documents = "\n".join(
+        f"""<document index="{i}">
+Title: {item["title"]}
+URL: {item["url"]}
+Content: {item["content"]}
+</document>"""
+        for i, item in enumerate(contents)
+    )
+    prompt = f"""Please provide a concise summary of each of the following web contents in 100-200 tokens maximum. Focus on information that directly answers or relates to the user's query: "{query}"
 
-        logger.info(
-            f"Summarized content from {len(content)} chars to {len(summary)} chars"
+{documents}
+
+Return ONLY a JSON array of {len(contents)} strings, where the i-th string is the summary of the document with index i."""
+
+    response_text, input_tokens, output_tokens = _invoke_summary_model(
+        prompt, max_tokens=min(300 * len(contents), 4096)
+    )
+    summaries = json.loads(response_text[response_text.index("[") :])
+    if not isinstance(summaries, list) or len(summaries) != len(contents):
+        raise ValueError(
+            f"Expected {len(contents)} summaries, got: {response_text[:100]}"
         )
-        return summary
 
+    logger.info(f"Summarized {len(contents)} contents in a single request")
+    # Attribute the tokens of the request evenly to each summary
+    return [
+        SummaryCacheEntryModel(
+            summary=str(summary),
+            input_tokens=input_tokens // len(contents),
+            output_tokens=output_tokens // len(contents),
+        )
+        for summary in summaries
+    ]
+
+
+def _query_intent_bucket(query: str) -> str:
+    """Normalize the query so that the same question phrased differently shares summaries."""
+    return " ".join(sorted(set(re.findall(r"\w+", query.lower()))))
+
+
+def _compose_summary_cache_key(item: dict, query: str) -> str:
+    content_hash = hashlib.sha256(item["content"].encode("utf-8")).hexdigest()
+    return hashlib.sha256(
+        f"{item['url']}\n{content_hash}\n{_query_intent_bucket(query)}".encode("utf-8")
+    ).hexdigest()
+
+
+class _SummaryCacheStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.input_tokens_saved = 0
+        self.output_tokens_saved = 0
+
+    def record_hit(self, entry: SummaryCacheEntryModel, deduplicated: bool = False):
+        with self._lock:
+            self.hits += 1
+            if deduplicated:
+                self.deduplicated += 1
+            self.input_tokens_saved += entry.input_tokens
+            self.output_tokens_saved += entry.output_tokens
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def to_dict(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "deduplicated": self.deduplicated,
+                "input_tokens_saved": self.input_tokens_saved,
+                "output_tokens_saved": self.output_tokens_saved,
+                "price_saved": calculate_price(
+                    model=SUMMARY_MODEL_NAME,
+                    input_tokens=self.input_tokens_saved,
+                    output_tokens=self.output_tokens_saved,
+                    cache_read_input_tokens=0,
+                    cache_write_input_tokens=0,
+                ),
+            }
+
+
+_summary_cache_stats = _SummaryCacheStats()
+
+# Summaries being generated, keyed by cache key, so that identical concurrent requests share one call
+_inflight_summaries: dict[str, Future[SummaryCacheEntryModel]] = {}
+_inflight_summaries_lock = threading.Lock()
+
+
+def get_summary_cache_stats() -> dict[str, float]:
+    """Get hit / miss counters and tokens (and price) saved by the summary cache."""
+    return _summary_cache_stats.to_dict()
+
+
+def _fail_inflight_summaries(keys: list[str], error: BaseException):
+    with _inflight_summaries_lock:
+        futures = [_inflight_summaries.pop(key, None) for key in keys]
+    for future in futures:
+        if future is not None:
+            future.set_exception(error)
+
+
+def _run_summary_job(
+    store: SummaryCacheStore, keys: list[str], contents: list[dict], query: str
+):
+    """Summarize `contents`, store the summaries and resolve the in-flight futures of `keys`."""
+    try:
+        if len(contents) == 1:
+            item = contents[0]
+            entries = [
+                _request_summary(item["content"], item["title"], item["url"], query)
+            ]
+        else:
+            entries = _request_batch_summaries(contents, query)
     except Exception as e:
         logger.error(f"Error summarizing content: {e}")
-        # Fallback: return truncated content if summarization fails
-        fallback_content = content[:1000] + "..." if len(content) > 1000 else content
-        logger.info(f"Using fallback content: {len(fallback_content)} chars")
-        return fallback_content
+        _fail_inflight_summaries(keys, e)
+        return
+
+    for key, entry in zip(keys, entries):
+        try:
+            store.put(key, entry)
+        except Exception as e:
+            logger.error(f"Failed to store summary to cache: {e}")
+
+        with _inflight_summaries_lock:
+            future = _inflight_summaries.pop(key, None)
+        if future is not None:
+            future.set_result(entry)
+
+
+def _summarize_results(
+    contents: list[dict],
+    query: str,
+    top_n: int = SUMMARY_TOP_N,
+    max_workers: int = SUMMARY_MAX_WORKERS,
+    timeout: float = SUMMARY_TIMEOUT_SECONDS,
+) -> list[str]:
+    """
+    Summarize search results concurrently.
+    Each item of `contents` has `title`, `url` and `content`.
+    Only the top `top_n` results are summarized, and short contents are summarized in batches.
+    Summaries are cached by (url, content, query intent), and identical requests in flight are shared.
+    Any result not summarized within `timeout` seconds falls back to its truncated content.
+    Returns the summaries in the same order as `contents`.
+    """
+    summaries = [_truncate_content(item["content"]) for item in contents]
+
+    targets = list(range(min(top_n, len(contents))))
+    if not targets:
+        return summaries
+
+    keys = {i: _compose_summary_cache_key(contents[i], query) for i in targets}
+    store = get_summary_cache_store()
+    try:
+        cached = store.get_many(list(set(keys.values())))
+    except Exception as e:
+        logger.error(f"Failed to read summary cache: {e}")
+        cached = {}
+
+    # Indices waiting for each future, and whether this call generates the summary
+    futures: dict[Future[SummaryCacheEntryModel], list[int]] = {}
+    owned: dict[str, int] = {}
+    deduplicated: set[Future[SummaryCacheEntryModel]] = set()
+    with _inflight_summaries_lock:
+        for i in targets:
+            key = keys[i]
+            if key in cached:
+                summaries[i] = cached[key].summary
+                _summary_cache_stats.record_hit(cached[key])
+                continue
+
+            future = _inflight_summaries.get(key)
+            if future is None:
+                future = Future()
+                _inflight_summaries[key] = future
+                owned[key] = i
+                _summary_cache_stats.record_miss()
+            elif key not in owned:
+                deduplicated.add(future)
+
+            futures.setdefault(future, []).append(i)
+
+    if not futures:
+        return summaries
+
+    long_keys = [
+        key
+        for key, i in owned.items()
+        if len(contents[i]["content"]) > SHORT_CONTENT_LENGTH
+    ]
+    short_keys = [
+        key
+        for key, i in owned.items()
+        if len(contents[i]["content"]) <= SHORT_CONTENT_LENGTH
+    ]
+    jobs = [[key] for key in long_keys] + [
+        short_keys[i : i + SHORT_CONTENT_BATCH_SIZE]
+        for i in range(0, len(short_keys), SHORT_CONTENT_BATCH_SIZE)
+    ]
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(jobs))),
+        thread_name_prefix="internet-search-summary",
+    )
+    try:
+        job_futures = {
+            executor.submit(
+                _run_summary_job,
+                store,
+                job_keys,
+                [contents[owned[key]] for key in job_keys],
+                query,
+            ): job_keys
+            for job_keys in jobs
+        }
+
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                try:
+                    entry = future.result()
+                except Exception:
+                    # Keep the truncated content
+                    continue
+
+                if future in deduplicated:
+                    _summary_cache_stats.record_hit(entry, deduplicated=True)
+                for i in futures[future]:
+                    summaries[i] = entry.summary
+
+        except TimeoutError:
+            pending = sum(
+                len(indices) for future, indices in futures.items() if not future.done()
+            )
+            logger.warning(
+                f"Summarization timed out after {timeout} seconds. Using truncated content for {pending} results"
+            )
+            # Jobs not started yet will never resolve their futures, so fail them here
+            for job_future, job_keys in job_futures.items():
+                if job_future.cancel():
+                    _fail_inflight_summaries(job_keys, TimeoutError())
+
+    finally:
+        # Running jobs continue in background and populate the cache
+        executor.shutdown(wait=False)
+
+    logger.info(f"Summary cache stats: {get_summary_cache_stats()}")
+    return summaries
 
 
 def _search_with_duckduckgo(query: str, time_limit: str, country: str) -> list:
@@ -112,25 +399,25 @@ def _search_with_duckduckgo(query: str, time_limit: str, country: str) -> list:
         )
         logger.info(f"DuckDuckGo search completed. Found {len(results)} results")
 
-        # Summarize each result to prevent context bloat
-        summarized_results = []
-        for result in results:
-            title = result["title"]
-            url = result["href"]
-            content = result["body"]
-
-            # Summarize the content
-            summary = _summarize_content(content, title, url, query)
-
-            summarized_results.append(
-                {
-                    "content": summary,
-                    "source_name": title,
-                    "source_link": url,
-                }
-            )
-
-        return summarized_results
+        # Summarize results to prevent context bloat
+        contents = [
+            {
+                "title": result["title"],
+                "url": result["href"],
+                "content": result["body"],
+            }
+            for result in results
+        ]
+        summaries = _summarize_results(contents, query)
+
+        return [
+            {
+                "content": summary,
+                "source_name": item["title"],
+                "source_link": item["url"],
+            }
+            for item, summary in zip(contents, summaries)
+        ]
 
 
 def _search_with_firecrawl(
@@ -158,23 +445,24 @@ def _search_with_firecrawl(
         logger.info(f"results of firecrawl: {results}")
 
         # Format and summarize search results
-        search_results = []
-        for data in results.get("data", []):
-            if isinstance(data, dict):
-                title = data.get("title", "")
-                url = data.get("metadata", {}).get("sourceURL", "")
-                content = data.get("markdown", {})
-
-                # Summarize the content
-                summary = _summarize_content(content, title, url, query)
-
-                search_results.append(
-                    {
-                        "content": summary,
-                        "source_name": title,
-                        "source_link": url,
-                    }
-                )
+        contents = [
+            {
+                "title": data.get("title", ""),
+                "url": data.get("metadata", {}).get("sourceURL", ""),
+                "content": data.get("markdown") or "",
+            }
+            for data in results.get("data", [])
+            if isinstance(data, dict)
+        ]
+        summaries = _summarize_results(contents, query)
+        search_results = [
+            {
+                "content": summary,
+                "source_name": item["title"],
+                "source_link": item["url"],
+            }
+            for item, summary in zip(contents, summaries)
+        ]
 
         logger.info(f"Found {len(search_results)} results from Firecrawl")
         return search_results
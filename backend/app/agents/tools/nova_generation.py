@@ -8,11 +8,15 @@ import time
 from typing import Any, Dict, List, Optional
 from datetime import datetime
 
-import boto3
 from app.agents.tools.agent_tool import AgentTool
 from app.repositories.models.custom_bot import BotModel
 from app.routes.schemas.conversation import type_model_name
-from app.utils import generate_presigned_url, BEDROCK_REGION
+from app.utils import (
+    generate_presigned_url,
+    get_bedrock_runtime_client,
+    get_client,
+    BEDROCK_REGION,
+)
 from pydantic import BaseModel, Field
 
 logger = logging.getLogger(__name__)
@@ -48,7 +52,7 @@ def _upload_media_to_s3(media_data: bytes, filename: str, content_type: str, med
         s3_key = f"generated_{media_type}s/{timestamp}_{unique_id}_{filename}"
         
         # Create S3 client
-        s3_client = boto3.client("s3", region_name=BEDROCK_REGION)
+        s3_client = get_client("s3", region_name=BEDROCK_REGION)
         
         # Upload to S3
         s3_client.put_object(
@@ -99,7 +103,7 @@ def _generate_image_with_nova_canvas(tool_input: NovaCanvasInput, bot: BotModel
         logger.info(f"Generating image with Nova Canvas: {tool_input.prompt[:100]}...")
         
         # Create Bedrock Runtime client
-        bedrock_client = boto3.client('bedrock-runtime', region_name=BEDROCK_REGION)
+        bedrock_client = get_bedrock_runtime_client()
         
         # Prepare request body
         request_body = {
@@ -167,7 +171,7 @@ def _generate_video_with_nova_reel(tool_input: NovaReelInput, bot: BotModel | No
         logger.info(f"Generating video with Nova Reel: {tool_input.prompt[:100]}...")
         
         # Create Bedrock Runtime client
-        bedrock_client = boto3.client('bedrock-runtime', region_name=BEDROCK_REGION)
+        bedrock_client = get_bedrock_runtime_client()
         
         # Prepare model input
         model_input = {
@@ -223,7 +227,7 @@ def _generate_video_with_nova_reel(tool_input: NovaReelInput, bot: BotModel | No
             raise Exception("Nova Reel job timed out after 5 minutes")
         
         # Download the generated video from S3
-        s3_client = boto3.client("s3", region_name=BEDROCK_REGION)
+        s3_client = get_client("s3", region_name=BEDROCK_REGION)
         
         # List objects with the invocation ID prefix
         response = s3_client.list_objects_v2(
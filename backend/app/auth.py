@@ -1,20 +1,154 @@
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
+from collections import OrderedDict
 
 import requests
 from jose import jwt
+from jose.exceptions import JWTError
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 REGION = os.environ.get("REGION", "ap-northeast-1")
 USER_POOL_ID = os.environ.get("USER_POOL_ID", "")
 CLIENT_ID = os.environ.get("CLIENT_ID", "")
 
+# Cognito rotates signing keys rarely, so keys are cached for the lifetime of the container
+# and re-fetched only after the TTL or when a token carries an unknown `kid`.
+JWKS_CACHE_TTL_SECONDS = int(os.environ.get("JWKS_CACHE_TTL_SECONDS", 60 * 60))
+# Minimum interval between refreshes triggered by an unknown `kid`,
+# to avoid hammering the endpoint with forged tokens.
+JWKS_MIN_REFRESH_INTERVAL_SECONDS = int(
+    os.environ.get("JWKS_MIN_REFRESH_INTERVAL_SECONDS", 30)
+)
+JWKS_REQUEST_TIMEOUT_SECONDS = 5
+# Offline mode: when set, keys are loaded from this local JWKS file instead of Cognito.
+JWKS_FILE_PATH = os.environ.get("JWKS_FILE_PATH")
+
+VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get("VERIFIED_TOKEN_CACHE_SIZE", 1024))
+
+
+class _JwksCache:
+    """Process-wide cache of the user pool signing keys, keyed by `kid`."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._keys: dict[str, dict] = {}
+        self._fetched_at: float | None = None
+
+    def _load_keys(self) -> list[dict]:
+        if JWKS_FILE_PATH:
+            with open(JWKS_FILE_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)["keys"]
+
+        url = f"https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
+        response = requests.get(url, timeout=JWKS_REQUEST_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        return response.json()["keys"]
+
+    def _refresh(self, fetched_at: float | None) -> None:
+        # Single flight: only one caller fetches, the others wait for the lock and
+        # reuse the result if the cache was refreshed while they were waiting.
+        with self._lock:
+            if self._fetched_at != fetched_at:
+                return
+
+            keys = self._load_keys()
+            self._keys = {k["kid"]: k for k in keys}
+            self._fetched_at = time.monotonic()
+            logger.info(f"Refreshed JWKS: {len(self._keys)} keys")
+
+    def get_key(self, kid: str) -> dict:
+        fetched_at = self._fetched_at
+        if fetched_at is None or time.monotonic() - fetched_at > JWKS_CACHE_TTL_SECONDS:
+            self._refresh(fetched_at)
+
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+
+        # Unknown `kid`: the keys may have been rotated since the last fetch.
+        fetched_at = self._fetched_at
+        if (
+            fetched_at is None
+            or time.monotonic() - fetched_at > JWKS_MIN_REFRESH_INTERVAL_SECONDS
+        ):
+            self._refresh(fetched_at)
+            key = self._keys.get(kid)
+
+        if key is None:
+            raise JWTError(f"Unknown key id: {kid}")
+        return key
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys = {}
+            self._fetched_at = None
+
+
+class _VerifiedTokenCache:
+    """LRU cache of decoded tokens keyed by token hash, valid until the token's `exp`."""
+
+    def __init__(self, max_size: int) -> None:
+        self._lock = threading.Lock()
+        self._items: OrderedDict[str, dict] = OrderedDict()
+        self.max_size = max_size
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> dict | None:
+        key = self._key(token)
+        with self._lock:
+            decoded = self._items.get(key)
+            if decoded is None:
+                return None
+            if decoded["exp"] <= time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return decoded
+
+    def put(self, token: str, decoded: dict) -> None:
+        if "exp" not in decoded or self.max_size <= 0:
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._items[key] = decoded
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+_jwks_cache = _JwksCache()
+_verified_token_cache = _VerifiedTokenCache(max_size=VERIFIED_TOKEN_CACHE_SIZE)
+
+
+def clear_auth_cache():
+    """Clear the cached signing keys and verified tokens."""
+    _jwks_cache.clear()
+    _verified_token_cache.clear()
+
 
 def verify_token(token: str) -> dict:
+    # Return the decoded claims of a token verified before, as long as it is not expired
+    cached = _verified_token_cache.get(token)
+    if cached is not None:
+        return dict(cached)
+
     # Verify JWT token
-    url = f"https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
-    response = requests.get(url)
-    keys = response.json()["keys"]
     header = jwt.get_unverified_header(token)
-    key = [k for k in keys if k["kid"] == header["kid"]][0]
+    key = _jwks_cache.get_key(header["kid"])
     # The JWT returned from the Identity Provider may contain an at_hash
     # jose jwt.decode verifies id_token with access_token by default if it contains at_hash
     # See : https://github.com/mpdavis/python-jose/blob/4b0701b46a8d00988afcc5168c2b3a1fd60d15d8/jose/jwt.py#L59
@@ -27,4 +161,5 @@ def verify_token(token: str) -> dict:
         options={"verify_at_hash": False},
         audience=CLIENT_ID,
     )
-    return decoded
+    _verified_token_cache.put(token, decoded)
+    return dict(decoded)
@@ -0,0 +1,263 @@
+"""Aggregation buffer of bot usage.
+
+Chats record the usage of bots in a per-container buffer instead of writing the bot items directly.
+The buffer is flushed in the background, summing the usage counts and taking the latest last used
+time per bot, so the number of writes per bot is bounded by the flush interval, not the traffic.
+If `BOT_STATS_QUEUE_URL` is set, flushed usages are sent to the queue and written by `handler`,
+which aggregates them across containers once more.
+Usage counts are incremented, so only the usages whose write failed are retried, not to count
+the others twice.
+
+The counters are best effort: usages buffered in a container which is shut down before
+the next flush are lost.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+from app.repositories.common import RecordNotFoundError
+from app.repositories.custom_bot import update_alias_usage, update_bot_usage
+from app.repositories.models.custom_bot import BotUsageDeltaModel
+from app.utils import get_client
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Queue to aggregate the usages of all the containers. Written directly if not set.
+BOT_STATS_QUEUE_URL = os.environ.get("BOT_STATS_QUEUE_URL")
+BOT_STATS_FLUSH_INTERVAL_SECONDS = float(
+    os.environ.get("BOT_STATS_FLUSH_INTERVAL_SECONDS", 10)
+)
+# Number of buffered bots which triggers a flush before the interval
+BOT_STATS_MAX_PENDING = int(os.environ.get("BOT_STATS_MAX_PENDING", 500))
+SQS_SEND_MESSAGE_BATCH_SIZE = 10
+# Usages per queue message, well within the message size limit
+USAGES_PER_MESSAGE = 100
+# Delay of the usages sent to the queue again after their write failed
+BOT_STATS_RETRY_DELAY_SECONDS = 30
+
+
+def _usage_key(usage: BotUsageDeltaModel) -> tuple[str, str, str]:
+    return usage.item_type, usage.user_id, usage.bot_id
+
+
+def aggregate_usages(
+    usages: list[BotUsageDeltaModel],
+) -> dict[tuple[str, str, str], BotUsageDeltaModel]:
+    aggregated: dict[tuple[str, str, str], BotUsageDeltaModel] = {}
+    for usage in usages:
+        key = _usage_key(usage)
+        if key in aggregated:
+            aggregated[key].merge(usage)
+        else:
+            aggregated[key] = usage.model_copy()
+    return aggregated
+
+
+def apply_usages(usages: list[BotUsageDeltaModel]) -> list[BotUsageDeltaModel]:
+    """Write the aggregated usages to the bot table, one update per bot or alias.
+    Returns the usages whose write failed, which are not applied.
+    """
+    failed = []
+    for usage in usages:
+        try:
+            if usage.item_type == "bot":
+                update_bot_usage(
+                    usage.user_id, usage.bot_id, usage.increment, usage.last_used_time
+                )
+            elif usage.last_used_time is not None:
+                update_alias_usage(usage.user_id, usage.bot_id, usage.last_used_time)
+        except RecordNotFoundError:
+            # Deleted after the chat
+            logger.info(f"Skipping usage of deleted bot: {usage.bot_id}")
+        except Exception as e:
+            logger.error(f"Failed to write usage of bot {usage.bot_id}: {e}")
+            failed.append(usage)
+    return failed
+
+
+def send_usages(
+    queue_url: str, usages: list[BotUsageDeltaModel], delay_seconds: int = 0
+):
+    """Send the aggregated usages to the queue."""
+    sqs_client = get_client("sqs")
+    bodies = [
+        json.dumps([usage.model_dump() for usage in usages[i : i + USAGES_PER_MESSAGE]])
+        for i in range(0, len(usages), USAGES_PER_MESSAGE)
+    ]
+    for i in range(0, len(bodies), SQS_SEND_MESSAGE_BATCH_SIZE):
+        entries = [
+            {"Id": str(j), "MessageBody": body, "DelaySeconds": delay_seconds}
+            for j, body in enumerate(bodies[i : i + SQS_SEND_MESSAGE_BATCH_SIZE])
+        ]
+        response = sqs_client.send_message_batch(QueueUrl=queue_url, Entries=entries)
+        if response.get("Failed"):
+            raise RuntimeError(f"Failed to send bot usages: {response['Failed']}")
+
+
+class BotStatsBuffer:
+    """Buffer of bot usages living in the process, flushed by a background thread."""
+
+    def __init__(
+        self,
+        flush_interval_seconds: float = BOT_STATS_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = BOT_STATS_MAX_PENDING,
+        queue_url: str | None = BOT_STATS_QUEUE_URL,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending: dict[tuple[str, str, str], BotUsageDeltaModel] = {}
+        self._thread: threading.Thread | None = None
+        self._last_flush = time.monotonic()
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        self.queue_url = queue_url
+        self.recorded = 0
+        self.flushed = 0
+        self.failures = 0
+
+    def record(self, usage: BotUsageDeltaModel) -> None:
+        key = _usage_key(usage)
+        with self._lock:
+            if key in self._pending:
+                self._pending[key].merge(usage)
+            else:
+                self._pending[key] = usage.model_copy()
+            self.recorded += 1
+            due = (
+                len(self._pending) >= self.max_pending
+                or time.monotonic() - self._last_flush >= self.flush_interval_seconds
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+        if due:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval_seconds)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush bot usages: {e}")
+
+    def flush(self) -> None:
+        """Write the buffered usages. On failure, they are kept for the next flush."""
+        with self._flush_lock:
+            with self._lock:
+                usages = list(self._pending.values())
+                self._pending = {}
+                self._last_flush = time.monotonic()
+            if not usages:
+                return
+
+            try:
+                if self.queue_url:
+                    send_usages(self.queue_url, usages)
+                    failed = []
+                else:
+                    failed = apply_usages(usages)
+            except Exception:
+                self._restore(usages)
+                raise
+
+            if failed:
+                self._restore(failed)
+                raise RuntimeError(f"Failed to write usages of {len(failed)} bots")
+
+            with self._lock:
+                self.flushed += len(usages)
+            logger.info(f"Flushed usages of {len(usages)} bots")
+
+    def _restore(self, usages: list[BotUsageDeltaModel]):
+        """Keep the usages not written for the next flush."""
+        with self._lock:
+            self.failures += 1
+            for usage in usages:
+                key = _usage_key(usage)
+                if key in self._pending:
+                    usage.merge(self._pending[key])
+                self._pending[key] = usage
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "recorded": self.recorded,
+                "flushed": self.flushed,
+                "failures": self.failures,
+                "pending": len(self._pending),
+            }
+
+
+_buffer = BotStatsBuffer()
+_buffer_lock = threading.Lock()
+
+
+def get_bot_stats_buffer() -> BotStatsBuffer:
+    with _buffer_lock:
+        return _buffer
+
+
+def set_bot_stats_buffer(buffer: BotStatsBuffer | None):
+    """Replace the bot stats buffer. Pass None to restore the default."""
+    global _buffer
+    with _buffer_lock:
+        _buffer = buffer if buffer is not None else BotStatsBuffer()
+
+
+def _flush_on_exit():
+    try:
+        get_bot_stats_buffer().flush()
+    except Exception as e:
+        logger.error(f"Failed to flush bot usages on exit: {e}")
+
+
+atexit.register(_flush_on_exit)
+
+
+def handler(event: dict, context: Any) -> dict:
+    """Bot stats queue consumer.
+    Usages in the batch of messages are aggregated again before writing.
+    Usages whose write failed are sent to the queue again. Only if that fails, the messages
+    they come from are reported as failed to be delivered again, counting their other usages twice.
+    """
+    message_usages = {
+        record["messageId"]: [
+            BotUsageDeltaModel.model_validate(usage)
+            for usage in json.loads(record["body"])
+        ]
+        for record in event["Records"]
+    }
+    usages = [usage for usages in message_usages.values() for usage in usages]
+    aggregated = aggregate_usages(usages)
+    logger.info(f"Applying {len(usages)} usages of {len(aggregated)} bots")
+    failed = apply_usages(list(aggregated.values()))
+    if not failed:
+        return {"batchItemFailures": []}
+
+    try:
+        if not BOT_STATS_QUEUE_URL:
+            raise RuntimeError("BOT_STATS_QUEUE_URL is not set")
+        send_usages(BOT_STATS_QUEUE_URL, failed, BOT_STATS_RETRY_DELAY_SECONDS)
+        logger.info(f"Sent usages of {len(failed)} bots to the queue again")
+        return {"batchItemFailures": []}
+    except Exception as e:
+        logger.error(f"Failed to send usages to the queue again: {e}")
+
+    failed_keys = {_usage_key(usage) for usage in failed}
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": message_id}
+            for message_id, usages in message_usages.items()
+            if any(_usage_key(usage) in failed_keys for usage in usages)
+        ]
+    }
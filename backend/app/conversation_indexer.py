@@ -0,0 +1,287 @@
+"""Incremental indexing of conversations for search, fed from the DynamoDB stream.
+
+Each conversation is indexed as one document holding its title, and one document per message
+holding the text of the message, so that a turn only indexes the messages it has written:
+- A delta item indexes its messages and deletes its deleted messages.
+- A snapshot indexes the messages changed since the previous snapshot, which includes
+  the messages compacted from the deltas. Large snapshots stored in S3 are indexed in full,
+  because the previous one is not in the stream record.
+- Removing a conversation item deletes all the documents of the conversation.
+  Deltas removed by the compaction are not indexed again.
+
+Binary contents (images, attachments, tool results) and system messages are not indexed.
+Document ids are derived from the conversation and message ids, so that retried records
+overwrite the same documents. All the records of a batch are written in one bulk request.
+"""
+
+import json
+import logging
+import os
+from typing import Any
+
+from app.repositories.common import get_opensearch_client
+from app.repositories.conversation_codec import decompress
+from app.repositories.conversation_search import INDEX_NAME, ensure_conversation_index
+from app.utils import get_client
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+from opensearchpy import OpenSearch, helpers
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+LARGE_MESSAGE_BUCKET = os.environ.get("LARGE_MESSAGE_BUCKET", "")
+BULK_CHUNK_SIZE = 500
+# Roles of the messages indexed
+INDEXED_ROLES = {"user", "assistant"}
+
+_deserializer = TypeDeserializer()
+_index_ensured = False
+
+
+def compose_message_document_id(conversation_id: str, message_id: str) -> str:
+    return f"{conversation_id}#{message_id}"
+
+
+def _deserialize(image: dict | None) -> dict:
+    if not image:
+        return {}
+    return {k: _deserializer.deserialize(v) for k, v in image.items()}
+
+
+def _extract_text(message: dict) -> str:
+    """Text of the stored message, skipping binary and other non-text contents."""
+    return "\n".join(
+        content["body"]
+        for content in message.get("content") or []
+        if content.get("content_type") == "text" and content.get("body")
+    )
+
+
+def _compose_message_actions(
+    user_id: str, conversation_id: str, message_map: dict[str, Any]
+) -> list[dict]:
+    actions: list[dict[str, Any]] = []
+    for message_id, message in message_map.items():
+        document_id = compose_message_document_id(conversation_id, message_id)
+        body = _extract_text(message)
+        if message.get("role") not in INDEXED_ROLES or not body:
+            # The message may have had a text before
+            actions.append({"_op_type": "delete", "_id": document_id})
+            continue
+
+        actions.append(
+            {
+                "_op_type": "index",
+                "_id": document_id,
+                "_source": {
+                    "DocType": "message",
+                    "PK": user_id,
+                    "ConversationId": conversation_id,
+                    "MessageId": message_id,
+                    "Role": message["role"],
+                    "Body": body,
+                    "CreateTime": float(message.get("create_time", 0)),
+                },
+            }
+        )
+    return actions
+
+
+def _compose_conversation_action(
+    user_id: str, conversation_id: str, fields: dict[str, Any]
+) -> dict:
+    """Partial update of the conversation document, created if not indexed yet."""
+    return {
+        "_op_type": "update",
+        "_id": conversation_id,
+        "doc": {
+            "DocType": "conversation",
+            "PK": user_id,
+            "ConversationId": conversation_id,
+            # Sorted next to the conversation id to page the search results
+            "MessageId": "",
+            **fields,
+        },
+        "doc_as_upsert": True,
+    }
+
+
+def _last_update_time(message_map: dict[str, Any]) -> dict[str, float]:
+    times = [float(message.get("create_time", 0)) for message in message_map.values()]
+    return {"LastUpdateTime": max(times)} if times else {}
+
+
+def _load_large_message_map(item: dict) -> dict[str, Any] | None:
+    """Load the large snapshot of the item, or None if it has been replaced since.
+    The stream record of the snapshot replacing it indexes the messages in full.
+    """
+    large_message_path = item["LargeMessagePath"]
+    try:
+        response = get_client("s3").get_object(
+            Bucket=LARGE_MESSAGE_BUCKET, Key=large_message_path
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchKey":
+            raise
+        logger.info(f"Skipping replaced large message map: {large_message_path}")
+        return None
+    body = response["Body"].read()
+    return json.loads(
+        decompress(body) if large_message_path.endswith(".gz") else body.decode("utf-8")
+    )
+
+
+def _is_snapshot_written(new_item: dict, old_item: dict) -> bool:
+    if not old_item:
+        return True
+
+    if new_item.get("IsLargeMessage", False):
+        # Only the system message is kept in the item. A large snapshot is written
+        # whenever the version is incremented without a new delta.
+        return new_item.get("Version") != old_item.get("Version") and int(
+            new_item.get("DeltaSeq", 0)
+        ) == int(new_item.get("SnapshotSeq", 0))
+
+    return new_item.get("MessageMap") != old_item.get("MessageMap")
+
+
+def _compose_conversation_actions(
+    user_id: str, conversation_id: str, new_item: dict, old_item: dict
+) -> list[dict]:
+    fields: dict[str, Any] = {
+        "Title": new_item.get("Title", ""),
+        "CreateTime": float(new_item.get("CreateTime", 0)),
+    }
+    if "BotId" in new_item:
+        fields["BotId"] = new_item["BotId"]
+
+    actions: list[dict] = []
+    if _is_snapshot_written(new_item, old_item):
+        if new_item.get("IsLargeMessage", False):
+            message_map = _load_large_message_map(new_item) or {}
+            changed = message_map
+            deleted_message_ids = []
+        else:
+            message_map = json.loads(new_item["MessageMap"])
+            old_message_map = (
+                json.loads(old_item["MessageMap"])
+                if old_item and not old_item.get("IsLargeMessage", False)
+                else {}
+            )
+            changed = {
+                k: message
+                for k, message in message_map.items()
+                if old_message_map.get(k) != message
+            }
+            deleted_message_ids = [k for k in old_message_map if k not in message_map]
+
+        actions.extend(_compose_message_actions(user_id, conversation_id, changed))
+        actions.extend(
+            {
+                "_op_type": "delete",
+                "_id": compose_message_document_id(conversation_id, message_id),
+            }
+            for message_id in deleted_message_ids
+        )
+        fields.update(_last_update_time(message_map))
+
+    actions.append(_compose_conversation_action(user_id, conversation_id, fields))
+    return actions
+
+
+def _compose_delta_actions(
+    user_id: str, conversation_id: str, item: dict
+) -> list[dict]:
+    message_map = json.loads(item["MessageMap"])
+    actions = _compose_message_actions(user_id, conversation_id, message_map)
+    actions.extend(
+        {
+            "_op_type": "delete",
+            "_id": compose_message_document_id(conversation_id, message_id),
+        }
+        for message_id in item.get("DeletedMessageIds") or []
+    )
+    if message_map:
+        actions.append(
+            _compose_conversation_action(
+                user_id, conversation_id, _last_update_time(message_map)
+            )
+        )
+    return actions
+
+
+def index_records(records: list[dict], client: OpenSearch) -> dict[str, int]:
+    """Index the changes of the conversation items in the DynamoDB stream records."""
+    actions: list[dict] = []
+    removed_conversation_ids: list[str] = []
+    for record in records:
+        event_name = record["eventName"]
+        keys = _deserialize(record["dynamodb"]["Keys"])
+        # SK: "{user_id}#CONV#{conversation_id}" or "{user_id}#CONV_DELTA#{conversation_id}#{seq}"
+        user_id = keys["PK"]
+        parts = keys["SK"].split("#")
+        if len(parts) < 3:
+            continue
+
+        item_type, conversation_id = parts[1], parts[2]
+        if item_type == "CONV":
+            if event_name == "REMOVE":
+                removed_conversation_ids.append(conversation_id)
+            else:
+                actions.extend(
+                    _compose_conversation_actions(
+                        user_id,
+                        conversation_id,
+                        _deserialize(record["dynamodb"].get("NewImage")),
+                        _deserialize(record["dynamodb"].get("OldImage")),
+                    )
+                )
+        elif item_type == "CONV_DELTA" and event_name != "REMOVE":
+            actions.extend(
+                _compose_delta_actions(
+                    user_id,
+                    conversation_id,
+                    _deserialize(record["dynamodb"].get("NewImage")),
+                )
+            )
+
+    indexed = 0
+    if actions:
+        # Deleting documents which were never indexed is not an error
+        indexed, _ = helpers.bulk(
+            client,
+            ({"_index": INDEX_NAME, **action} for action in actions),
+            chunk_size=BULK_CHUNK_SIZE,
+            ignore_status=(404,),
+        )
+
+    if removed_conversation_ids:
+        client.delete_by_query(
+            index=INDEX_NAME,
+            body={
+                "query": {"terms": {"ConversationId": removed_conversation_ids}},
+            },
+        )
+
+    return {
+        "records": len(records),
+        "actions": len(actions),
+        "indexed": indexed,
+        "removed_conversations": len(removed_conversation_ids),
+    }
+
+
+def handler(event: dict, context: Any) -> None:
+    """Conversation table stream consumer.
+    Failed batches are retried as a whole, which writes the same documents again.
+    """
+    global _index_ensured
+
+    client = get_opensearch_client(collection_type="conversation")
+    if not _index_ensured:
+        ensure_conversation_index(client)
+        _index_ensured = True
+
+    stats = index_records(event["Records"], client)
+    logger.info(f"Indexed conversation changes: {stats}")
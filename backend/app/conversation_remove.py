@@ -0,0 +1,84 @@
+import json
+import logging
+import os
+import time
+from typing import Any
+
+from app.repositories.conversation import (
+    delete_conversation_by_user_id,
+    find_conversation_deletion_job,
+    start_conversation_deletion_job,
+    update_conversation_deletion_job,
+)
+from app.repositories.models.conversation import ConversationDeletionJobModel
+from app.utils import get_client
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Function running the deletion jobs asynchronously. Jobs run in the request if not set.
+CONVERSATION_DELETION_FUNCTION_NAME = os.environ.get(
+    "CONVERSATION_DELETION_FUNCTION_NAME"
+)
+# Minimum interval of writing the progress of a job
+PROGRESS_UPDATE_INTERVAL_SECONDS = 1.0
+
+
+def run_deletion_job(user_id: str, job: ConversationDeletionJobModel):
+    """Delete all the conversations of the user, recording the progress on the job."""
+    last_update = time.monotonic()
+
+    def on_progress(deleted_items: int, deleted_objects: int):
+        nonlocal last_update
+        job.deleted_items += deleted_items
+        job.deleted_objects += deleted_objects
+        if time.monotonic() - last_update >= PROGRESS_UPDATE_INTERVAL_SECONDS:
+            last_update = time.monotonic()
+            update_conversation_deletion_job(user_id, job)
+
+    try:
+        delete_conversation_by_user_id(user_id, on_progress=on_progress)
+    except Exception:
+        job.status = "FAILED"
+        update_conversation_deletion_job(user_id, job)
+        raise
+
+    job.status = "SUCCEEDED"
+    update_conversation_deletion_job(user_id, job)
+    logger.info(
+        f"Deleted {job.deleted_items} items and {job.deleted_objects} objects of user: {user_id}"
+    )
+
+
+def request_deletion(user_id: str) -> ConversationDeletionJobModel:
+    """Start deleting all the conversations of the user.
+    The job is handed to the deletion function if configured, otherwise runs to the end before returning.
+    """
+    job = start_conversation_deletion_job(user_id)
+    if not CONVERSATION_DELETION_FUNCTION_NAME:
+        run_deletion_job(user_id, job)
+        return job
+
+    lambda_client = get_client("lambda")
+    lambda_client.invoke(
+        FunctionName=CONVERSATION_DELETION_FUNCTION_NAME,
+        InvocationType="Event",
+        Payload=json.dumps({"user_id": user_id, "job_id": job.id}),
+    )
+    return job
+
+
+def handler(event: dict, context: Any) -> None:
+    """Conversation deletion handler.
+    This function is invoked asynchronously by the API to delete all the conversations of a user.
+    """
+    logger.info(f"Received event: {event}")
+
+    user_id = event["user_id"]
+    job = find_conversation_deletion_job(user_id)
+    if job.id != event["job_id"] or job.status != "RUNNING":
+        # Retried invocation of a finished job
+        logger.info(f"Skipping job {event['job_id']}: {job}")
+        return
+
+    run_deletion_job(user_id, job)
@@ -17,7 +17,7 @@ from app.routes.conversation import router as conversation_router
 from app.routes.published_api import router as published_api_router
 from app.routes.user import router as user_router
 from app.user import User
-from app.utils import is_running_on_lambda
+from app.utils import is_running_on_lambda, warm_up_clients
 from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -35,6 +35,9 @@ is_published_api = PUBLISHED_API_ID is not None
 logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+if is_running_on_lambda():
+    warm_up_clients()
+
 if not is_published_api:
     openapi_tags = [
         {"name": "conversation", "description": "Conversation API"},
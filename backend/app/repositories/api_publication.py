@@ -1,6 +1,5 @@
 import logging
 
-import boto3
 from app.repositories.common import RecordNotFoundError
 from app.repositories.models.api_publication import (
     ApiKeyModel,
@@ -9,13 +8,14 @@ from app.repositories.models.api_publication import (
     ApiUsagePlanThrottleModel,
     PublishedApiStackModel,
 )
+from app.utils import get_client
 from ulid import ULID
 
 logger = logging.getLogger(__name__)
 
 
 def find_usage_plan_by_id(usage_plan_id: str) -> ApiUsagePlanModel:
-    client = boto3.client("apigateway")
+    client = get_client("apigateway")
     try:
         plan_response = client.get_usage_plan(usagePlanId=usage_plan_id)
     except client.exceptions.NotFoundException:
@@ -40,7 +40,7 @@ def find_usage_plan_by_id(usage_plan_id: str) -> ApiUsagePlanModel:
 
 
 def find_api_key_by_id(key_id: str, include_value: bool = False) -> ApiKeyModel:
-    client = boto3.client("apigateway")
+    client = get_client("apigateway")
     response = client.get_api_key(apiKey=key_id, includeValue=include_value)
     return ApiKeyModel(
         id=response["id"],
@@ -52,7 +52,7 @@ def find_api_key_by_id(key_id: str, include_value: bool = False) -> ApiKeyModel:
 
 
 def create_api_key(usage_plan_id: str, description: str) -> ApiKeyModel:
-    client = boto3.client("apigateway")
+    client = get_client("apigateway")
     response = client.create_api_key(
         name=str(ULID()),
         description=description,
@@ -73,13 +73,13 @@ def create_api_key(usage_plan_id: str, description: str) -> ApiKeyModel:
 
 
 def delete_api_key(api_key_id: str):
-    client = boto3.client("apigateway")
+    client = get_client("apigateway")
     response = client.delete_api_key(apiKey=api_key_id)
     return response
 
 
 def find_stack_by_bot_id(bot_id: str) -> PublishedApiStackModel:
-    client = boto3.client("cloudformation")
+    client = get_client("cloudformation")
     # DO NOT change the stack naming rule
     stack_name = f"ApiPublishmentStack{bot_id}"
 
@@ -137,14 +137,14 @@ def find_stack_by_bot_id(bot_id: str) -> PublishedApiStackModel:
 
 
 def delete_stack_by_bot_id(bot_id: str):
-    client = boto3.client("cloudformation")
+    client = get_client("cloudformation")
     stack_name = f"ApiPublishmentStack{bot_id}"
     response = client.delete_stack(StackName=stack_name)
     return response
 
 
 def find_build_status_by_build_id(build_id: str) -> str:
-    client = boto3.client("codebuild")
+    client = get_client("codebuild")
     response = client.batch_get_builds(ids=[build_id])
     if len(response["builds"]) == 0:
         raise RecordNotFoundError("Build not found.")
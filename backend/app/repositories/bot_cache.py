@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.repositories.models.bot_cache import BotCacheEntryModel
+from app.repositories.models.custom_bot import BotModel
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Number of bots cached in the process
+BOT_CACHE_SIZE = int(os.environ.get("BOT_CACHE_SIZE", 1024))
+# Time to serve a cached bot before checking its `UpdateTime` again
+BOT_CACHE_TTL_SECONDS = float(os.environ.get("BOT_CACHE_TTL_SECONDS", 60))
+# Shared bots are checked again sooner, as their access is decided on the cached attributes
+# and updates by the owner only invalidate the cache of the process serving them
+BOT_CACHE_SHARED_TTL_SECONDS = float(os.environ.get("BOT_CACHE_SHARED_TTL_SECONDS", 5))
+# Bots being synchronized are updated by the embedding state machine soon
+BOT_CACHE_SYNCING_TTL_SECONDS = float(
+    os.environ.get("BOT_CACHE_SYNCING_TTL_SECONDS", 5)
+)
+# Time to remember that a bot does not exist
+BOT_CACHE_NEGATIVE_TTL_SECONDS = float(
+    os.environ.get("BOT_CACHE_NEGATIVE_TTL_SECONDS", 10)
+)
+
+_SYNCING_STATUSES = {"QUEUED", "KNOWLEDGE_BASE_STACK_CREATED", "RUNNING"}
+
+
+def ttl_seconds(bot: BotModel | None) -> float:
+    """Time to live of the cache entry of the bot, or of a missing bot if None."""
+    if bot is None:
+        return BOT_CACHE_NEGATIVE_TTL_SECONDS
+    elif bot.sync_status in _SYNCING_STATUSES:
+        return BOT_CACHE_SYNCING_TTL_SECONDS
+    elif bot.shared_scope != "private":
+        return BOT_CACHE_SHARED_TTL_SECONDS
+    return BOT_CACHE_TTL_SECONDS
+
+
+def compose_entry(
+    bot: BotModel | None, update_time: int | None = None
+) -> BotCacheEntryModel:
+    return BotCacheEntryModel(
+        bot=bot,
+        update_time=update_time,
+        expire_time=time.monotonic() + ttl_seconds(bot),
+    )
+
+
+class BotCache:
+    """LRU of validated bots living in the process, keyed by bot id and bounded by their number.
+    Expired entries are still returned, so that callers can revalidate them cheaply.
+    """
+
+    def __init__(self, max_size: int = BOT_CACHE_SIZE) -> None:
+        self._lock = threading.Lock()
+        self._items: OrderedDict[str, BotCacheEntryModel] = OrderedDict()
+        self.max_size = max_size
+        self.hits = 0
+        self.negative_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, bot_id: str) -> BotCacheEntryModel | None:
+        with self._lock:
+            entry = self._items.get(bot_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(bot_id)
+            if entry.expire_time <= time.monotonic():
+                self.stale_hits += 1
+            elif entry.bot is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, bot_id: str, entry: BotCacheEntryModel) -> None:
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._items[bot_id] = entry
+            self._items.move_to_end(bot_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def patch(self, bot_id: str, update: dict) -> None:
+        """Update the attributes of the cached bot, if any, keeping the expiry."""
+        with self._lock:
+            entry = self._items.get(bot_id)
+            if entry is None or entry.bot is None:
+                return
+            self._items[bot_id] = entry.model_copy(
+                update={"bot": entry.bot.model_copy(update=update)}
+            )
+
+    def delete(self, bot_id: str) -> None:
+        with self._lock:
+            if self._items.pop(bot_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.negative_hits = 0
+            self.stale_hits = 0
+            self.misses = 0
+            self.invalidations = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "size": len(self._items),
+            }
+
+
+bot_cache = BotCache()
@@ -1,7 +1,12 @@
+import hashlib
+import json
 import logging
 import os
-import random
+import threading
 import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Literal
 
 from app.repositories.common import get_opensearch_client
 from app.repositories.models.custom_bot import BotMeta
@@ -14,6 +19,329 @@ INDEX_NAME = f"{env_prefix}bot"
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# Number of search responses cached in the process
+BOT_STORE_CACHE_SIZE = int(os.environ.get("BOT_STORE_CACHE_SIZE", 1024))
+# Time to serve a cached response, per endpoint. Bots are indexed with some delay anyway.
+BOT_STORE_SEARCH_CACHE_TTL_SECONDS = float(
+    os.environ.get("BOT_STORE_SEARCH_CACHE_TTL_SECONDS", 30)
+)
+BOT_STORE_POPULAR_CACHE_TTL_SECONDS = float(
+    os.environ.get("BOT_STORE_POPULAR_CACHE_TTL_SECONDS", 60)
+)
+# Pickup bots are fixed for the day, so they are only refreshed to follow the index
+BOT_STORE_PICKUP_CACHE_TTL_SECONDS = float(
+    os.environ.get("BOT_STORE_PICKUP_CACHE_TTL_SECONDS", 300)
+)
+# Number of pickup bots a user can page through in a day
+BOT_STORE_PICKUP_WINDOW = int(os.environ.get("BOT_STORE_PICKUP_WINDOW", 100))
+
+type_endpoint = Literal["search", "popular", "pickup"]
+
+# Fields of the hits read by `BotMeta.from_opensearch_response`
+_SOURCE_FIELDS = [
+    "BotId",
+    "Title",
+    "Description",
+    "CreateTime",
+    "LastUsedTime",
+    "IsStarred",
+    "SyncStatus",
+    "BedrockKnowledgeBase",
+    "PK",
+    "SharedScope",
+    "SharedStatus",
+]
+
+
+def _compose_user_principals(user: User) -> list[str]:
+    """Principals of the user, matched with `AccessPrincipals` of the bots."""
+    return sorted(
+        {"all", f"user:{user.id}", *(f"group:{group}" for group in user.groups)}
+    )
+
+
+def _compose_shared_principals(user: User) -> list[str]:
+    """Principals of the user shared with other users, i.e. all but `user:<id>`."""
+    return sorted({"all", *(f"group:{group}" for group in user.groups)})
+
+
+def _compose_access_filter(principals: list[str] | str) -> dict:
+    """Filter of the bots accessible by any of the principals."""
+    return {
+        "bool": {
+            "filter": [
+                # Include only BOT items
+                {"prefix": {"SK.keyword": "BOT"}},
+                {"terms": {"AccessPrincipals.keyword": principals}},
+            ]
+        }
+    }
+
+
+def _compose_template(body: dict, params: dict[str, str]) -> str:
+    """Compose a mustache template of the search body.
+    `params` maps the placeholder values in the body to the mustache tags replacing them.
+    """
+    source = json.dumps(body)
+    for placeholder, tag in params.items():
+        source = source.replace(json.dumps(placeholder), tag)
+    return source
+
+
+# Mustache templates of the search bodies, stored in OpenSearch so that a search sends only the params
+_PRINCIPALS = "{{#toJson}}principals{{/toJson}}"
+_SEARCH_TEMPLATES: dict[type_endpoint, str] = {
+    "search": _compose_template(
+        {
+            "query": {
+                "bool": {
+                    "must": [
+                        {
+                            "multi_match": {
+                                "query": "__QUERY__",
+                                "fields": ["Description", "Title", "Instruction"],
+                                "type": "best_fields",
+                                "operator": "or",
+                                "minimum_should_match": "30%",
+                                "fuzziness": "AUTO",
+                            }
+                        }
+                    ],
+                    "filter": _compose_access_filter("__PRINCIPALS__"),
+                }
+            },
+            "_source": _SOURCE_FIELDS,
+            "size": "__LIMIT__",
+        },
+        {
+            "__QUERY__": "{{#toJson}}query{{/toJson}}",
+            "__PRINCIPALS__": _PRINCIPALS,
+            "__LIMIT__": "{{limit}}",
+        },
+    ),
+    "popular": _compose_template(
+        {
+            "query": {"bool": {"filter": _compose_access_filter("__PRINCIPALS__")}},
+            "sort": [{"UsageStats.usage_count": {"order": "desc"}}],
+            "_source": _SOURCE_FIELDS,
+            "size": "__LIMIT__",
+        },
+        {"__PRINCIPALS__": _PRINCIPALS, "__LIMIT__": "{{limit}}"},
+    ),
+    "pickup": _compose_template(
+        {
+            "query": {
+                "function_score": {
+                    "query": {
+                        "bool": {"filter": _compose_access_filter("__PRINCIPALS__")}
+                    },
+                    # Hash of the bot id, so the order does not change with updates of the bots
+                    "random_score": {"seed": "__SEED__", "field": "BotId.keyword"},
+                    "boost_mode": "replace",
+                }
+            },
+            "_source": _SOURCE_FIELDS,
+            "from": "__OFFSET__",
+            "size": "__LIMIT__",
+            "track_total_hits": False,
+        },
+        {
+            "__PRINCIPALS__": _PRINCIPALS,
+            "__SEED__": "{{seed}}",
+            "__OFFSET__": "{{offset}}",
+            "__LIMIT__": "{{limit}}",
+        },
+    ),
+}
+
+
+def _template_id(endpoint: type_endpoint) -> str:
+    # Versioned by the source, so that deployments of a changed template do not share the id
+    digest = hashlib.sha256(_SEARCH_TEMPLATES[endpoint].encode("utf-8")).hexdigest()
+    return f"{env_prefix}bot-store-{endpoint}-{digest[:12]}"
+
+
+# Templates stored in OpenSearch by this process, or None if stored scripts are not supported
+_stored_templates: set[str] | None = set()
+_stored_templates_lock = threading.Lock()
+
+
+def _search_with_template(
+    client: OpenSearch, endpoint: type_endpoint, params: dict
+) -> list[dict]:
+    """Run the search template of the endpoint, storing it on first use.
+    If the template cannot be stored, it is sent inline with the params.
+    """
+    global _stored_templates
+
+    template_id = _template_id(endpoint)
+    with _stored_templates_lock:
+        if _stored_templates is not None and template_id not in _stored_templates:
+            try:
+                client.put_script(
+                    id=template_id,
+                    body={
+                        "script": {
+                            "lang": "mustache",
+                            "source": _SEARCH_TEMPLATES[endpoint],
+                        }
+                    },
+                )
+                _stored_templates.add(template_id)
+            except Exception as e:
+                logger.warning(f"Sending search templates inline: {e}")
+                _stored_templates = None
+
+        stored = _stored_templates is not None
+
+    body = (
+        {"id": template_id, "params": params}
+        if stored
+        else {"source": _SEARCH_TEMPLATES[endpoint], "params": params}
+    )
+    logger.debug(f"Search template body: {body}")
+    response = client.search_template(index=INDEX_NAME, body=body)
+    logger.debug(f"Search response: {response}")
+    return response["hits"]["hits"]
+
+
+class _SearchResponseCache:
+    """LRU cache of search hits, keyed by (endpoint, normalized params, principal set hash).
+    Hits are cached instead of bots because the ownership of the bots depends on the user.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self._lock = threading.Lock()
+        self._items: OrderedDict[tuple[str, str, str], tuple[list[dict], float]] = (
+            OrderedDict()
+        )
+        self.max_size = max_size
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+
+    def get(self, key: tuple[str, str, str]) -> list[dict] | None:
+        endpoint = key[0]
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self._items.pop(key, None)
+                self.misses[endpoint] = self.misses.get(endpoint, 0) + 1
+                return None
+
+            self._items.move_to_end(key)
+            self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+            return entry[0]
+
+    def put(
+        self, key: tuple[str, str, str], hits: list[dict], ttl_seconds: float
+    ) -> None:
+        if ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._items[key] = (hits, time.monotonic() + ttl_seconds)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats: dict[str, Any] = {"size": len(self._items)}
+            for endpoint in sorted({*self.hits, *self.misses}):
+                hits = self.hits.get(endpoint, 0)
+                misses = self.misses.get(endpoint, 0)
+                stats[endpoint] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses),
+                }
+            return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = {}
+            self.misses = {}
+
+
+_response_cache = _SearchResponseCache(max_size=BOT_STORE_CACHE_SIZE)
+
+
+def get_bot_store_cache_stats() -> dict[str, Any]:
+    """Get hit / miss counters and hit rates of the bot store response cache per endpoint."""
+    return _response_cache.stats()
+
+
+def clear_bot_store_cache():
+    """Clear the cached responses and forget the stored templates."""
+    global _stored_templates
+
+    _response_cache.clear()
+    with _stored_templates_lock:
+        _stored_templates = set()
+
+
+# Order of the hits of the endpoints whose hits are merged from the searches per principals
+_MERGE_SORT_KEYS: dict[type_endpoint, Callable[[dict], Any]] = {
+    "search": lambda hit: hit["_score"],
+    "popular": lambda hit: hit["sort"][0],
+}
+
+
+def _find_hits_with_cache(
+    endpoint: type_endpoint,
+    principals: list[str],
+    params: dict,
+    ttl_seconds: float,
+    client: OpenSearch | None,
+) -> list[dict]:
+    """Find the hits of the bots accessible by the principals, caching them."""
+    key = (
+        endpoint,
+        json.dumps(params, sort_keys=True),
+        hashlib.sha256("\n".join(principals).encode("utf-8")).hexdigest(),
+    )
+    hits = _response_cache.get(key)
+    if hits is None:
+        client = client or get_opensearch_client()
+        hits = _search_with_template(
+            client,
+            endpoint,
+            {**params, "principals": principals},
+        )
+        _response_cache.put(key, hits, ttl_seconds)
+        logger.info(f"Bot store cache stats: {get_bot_store_cache_stats()}")
+    return hits
+
+
+def _find_bots_with_cache(
+    endpoint: type_endpoint,
+    user: User,
+    params: dict,
+    ttl_seconds: float,
+    client: OpenSearch | None,
+) -> list[BotMeta]:
+    """Find the bots with the search template of the endpoint, caching the hits.
+    Except for the pickup bots, which are shuffled per user, the hits of the principals shared by
+    users (`all` and groups) are cached apart from those of the user, so that they are shared by
+    all the users with the same groups, and both are merged per request.
+    """
+    sort_key = _MERGE_SORT_KEYS.get(endpoint)
+    if sort_key is None:
+        hits = _find_hits_with_cache(
+            endpoint, _compose_user_principals(user), params, ttl_seconds, client
+        )
+    else:
+        merged = {
+            hit["_id"]: hit
+            for principals in [_compose_shared_principals(user), [f"user:{user.id}"]]
+            for hit in _find_hits_with_cache(
+                endpoint, principals, params, ttl_seconds, client
+            )
+        }
+        hits = sorted(merged.values(), key=sort_key, reverse=True)[: params["limit"]]
+
+    return [BotMeta.from_opensearch_response(hit, user.id) for hit in hits]
+
 
 def find_bots_by_query(
     query: str,
@@ -33,122 +361,31 @@ def find_bots_by_query(
     - Requires 30% of search terms to match
 
     2. Access Control (filter clause):
-    The filter implements three access levels:
-    a) Public Bots (`SharedScope = "all"`):
-        - Available to all users
+    Bots are indexed with `AccessPrincipals`, the principals who can access them
+    (see `compose_access_principals`), matched with the principals of the user by
+    a single `terms` filter which OpenSearch can cache:
+    a) Public Bots (`SharedScope = "all"`): `all`, available to all users
 
     b) Partial Shared Bots (`SharedScope = "partial"`):
-        - Admins can see all of them
-        - Non-admins can see them if they are listed in `AllowedCognitoUsers`
-          or belong to `AllowedCognitoGroups`
+        - `user:<id>` of the owner and the users in `AllowedCognitoUsers`
+        - `group:<name>` of the groups in `AllowedCognitoGroups`
+        - `group:Admin`, so admins can see all of them
+
+    c) Private Bots (no `SharedScope` field): `user:<id>` of the owner only
 
-    c) Private Bots (no `SharedScope` field):
-        - Only accessible to the owner (`PK.keyword = user.id`)
-        - Admins can see their own private bots (`PK.keyword = admin-user`)
+    The responses are cached for `BOT_STORE_SEARCH_CACHE_TTL_SECONDS` by the normalized query.
     """
-    client = client or get_opensearch_client()
     logger.info(f"Searching bots with query: {query}")
 
-    # Include only BOT items
-    filter_must = [{"prefix": {"SK.keyword": "BOT"}}]
-    # Condition for bots that can be acquired
-    filter_should = [
-        {"term": {"SharedScope.keyword": "all"}},  # Everyone can get
-        # Owner AND (no SharedScope i.e. private OR SharedScope = "partial")
-        {
-            "bool": {
-                "must": [
-                    {"term": {"PK.keyword": user.id}},
-                    {
-                        "bool": {
-                            "should": [
-                                {
-                                    "bool": {
-                                        "must_not": {"exists": {"field": "SharedScope"}}
-                                    }
-                                },
-                                {"term": {"SharedScope.keyword": "partial"}},
-                            ],
-                            "minimum_should_match": 1,
-                        }
-                    },
-                ]
-            }
-        },
-    ]
-
-    if user.is_admin():
-        # Administrator can get all partial shared bots
-        filter_should.append({"term": {"SharedScope.keyword": "partial"}})
-    else:
-        # For non-admin users, check the permissions of partial shared bots
-        filter_should.append(
-            {
-                "bool": {
-                    "must": [
-                        {"term": {"SharedScope.keyword": "partial"}},
-                        {
-                            "bool": {
-                                "should": [
-                                    {"term": {"AllowedCognitoUsers.keyword": user.id}},
-                                    {
-                                        "script": {
-                                            "script": {
-                                                "source": (
-                                                    "for (group in doc['AllowedCognitoGroups.keyword']) { "
-                                                    "if (params.user_groups.contains(group)) { return true; } } "
-                                                    "return false;"
-                                                ),
-                                                "params": {"user_groups": user.groups},
-                                                "lang": "painless",
-                                            }
-                                        }
-                                    },
-                                ],
-                                "minimum_should_match": 1,
-                            }
-                        },
-                    ]
-                }
-            }
-        )
-
-    search_body = {
-        "query": {
-            "bool": {
-                "must": [
-                    {
-                        "multi_match": {
-                            "query": query,
-                            "fields": ["Description", "Title", "Instruction"],
-                            "type": "best_fields",
-                            "operator": "or",
-                            "minimum_should_match": "30%",
-                            "fuzziness": "AUTO",
-                        }
-                    }
-                ],
-                "filter": {
-                    "bool": {
-                        "must": filter_must,
-                        "should": filter_should,
-                        "minimum_should_match": 1,
-                    }
-                },
-            }
-        },
-        "size": limit,
-    }
-    logger.debug(f"Entire search body: {search_body}")
-
     try:
-        response = client.search(index=INDEX_NAME, body=search_body)
-        logger.debug(f"Search response: {response}")
-
-        bots = [
-            BotMeta.from_opensearch_response(hit, user.id)
-            for hit in response["hits"]["hits"]
-        ]
+        bots = _find_bots_with_cache(
+            "search",
+            user,
+            # Case and spacing do not change the matches of the analyzed fields
+            {"query": " ".join(query.lower().split()), "limit": limit},
+            BOT_STORE_SEARCH_CACHE_TTL_SECONDS,
+            client,
+        )
         logger.info(f"Found {len(bots)} bots matching query: {query}")
         return bots
 
@@ -162,91 +399,19 @@ def find_bots_sorted_by_usage_count(
     limit: int = 20,
     client: OpenSearch | None = None,
 ) -> list[BotMeta]:
-    """Search bots sorted by usage count while considering access control."""
-    client = client or get_opensearch_client()
+    """Search bots sorted by usage count while considering access control.
+    The responses are cached for `BOT_STORE_POPULAR_CACHE_TTL_SECONDS`.
+    """
     logger.info(f"Searching bots sorted by usage count")
 
-    filter_must = [{"prefix": {"SK.keyword": "BOT"}}]
-    filter_should = [
-        {"term": {"SharedScope.keyword": "all"}},  # Public bots
-        # Owner's bots (private or partial)
-        {
-            "bool": {
-                "must": [
-                    {"term": {"PK.keyword": user.id}},
-                    {
-                        "bool": {
-                            "should": [
-                                {
-                                    "bool": {
-                                        "must_not": {"exists": {"field": "SharedScope"}}
-                                    }
-                                },
-                                {"term": {"SharedScope.keyword": "partial"}},
-                            ],
-                            "minimum_should_match": 1,
-                        }
-                    },
-                ]
-            }
-        },
-        # Partial shared bots with access permission
-        {
-            "bool": {
-                "must": [
-                    {"term": {"SharedScope.keyword": "partial"}},
-                    {
-                        "bool": {
-                            "should": [
-                                {"term": {"AllowedCognitoUsers.keyword": user.id}},
-                                {
-                                    "script": {
-                                        "script": {
-                                            "source": (
-                                                "for (group in doc['AllowedCognitoGroups.keyword']) { "
-                                                "if (params.user_groups.contains(group)) { return true; } } "
-                                                "return false;"
-                                            ),
-                                            "params": {"user_groups": user.groups},
-                                            "lang": "painless",
-                                        }
-                                    }
-                                },
-                            ],
-                            "minimum_should_match": 1,
-                        }
-                    },
-                ]
-            }
-        },
-    ]
-
-    search_body = {
-        "query": {
-            "bool": {
-                "filter": {
-                    "bool": {
-                        "must": filter_must,
-                        "should": filter_should,
-                        "minimum_should_match": 1,
-                    }
-                }
-            }
-        },
-        "sort": [{"UsageStats.usage_count": {"order": "desc"}}],
-        "size": limit,
-    }
-
-    logger.debug(f"Search body: {search_body}")
-
     try:
-        response = client.search(index=INDEX_NAME, body=search_body)
-        logger.debug(f"Search response: {response}")
-
-        bots = [
-            BotMeta.from_opensearch_response(hit, user.id)
-            for hit in response["hits"]["hits"]
-        ]
+        bots = _find_bots_with_cache(
+            "popular",
+            user,
+            {"limit": limit},
+            BOT_STORE_POPULAR_CACHE_TTL_SECONDS,
+            client,
+        )
         logger.info(f"Found {len(bots)} bots sorted by usage count")
         return bots
 
@@ -255,101 +420,38 @@ def find_bots_sorted_by_usage_count(
         raise
 
 
+def compose_pickup_seed(user_id: str, day: date) -> int:
+    """Seed of the pickup bots of the user for the day."""
+    digest = hashlib.sha256(f"{user_id}#{day.isoformat()}".encode("utf-8")).digest()
+    # Seeds are integers of OpenSearch
+    return int.from_bytes(digest[:4], "big") >> 1
+
+
 def find_random_bots(
     user: User,
     limit: int = 20,
+    offset: int = 0,
     client: OpenSearch | None = None,
 ) -> list[BotMeta]:
-    """Find random bots while considering access control."""
-    client = client or get_opensearch_client()
+    """Find random bots while considering access control.
+    The bots are shuffled by a seed of the user and the day (UTC), so the feed is the same
+    for the day and can be paged through with `offset`, up to `BOT_STORE_PICKUP_WINDOW` bots.
+    """
+    if offset < 0 or offset + limit > BOT_STORE_PICKUP_WINDOW:
+        raise ValueError(
+            f"offset + limit must be at most {BOT_STORE_PICKUP_WINDOW}, got {offset + limit}"
+        )
     logger.info(f"Searching random bots")
 
-    filter_must = [{"prefix": {"SK.keyword": "BOT"}}]
-    filter_should = [
-        {"term": {"SharedScope.keyword": "all"}},  # Public bots
-        # Owner's bots (private or partial)
-        {
-            "bool": {
-                "must": [
-                    {"term": {"PK.keyword": user.id}},
-                    {
-                        "bool": {
-                            "should": [
-                                {
-                                    "bool": {
-                                        "must_not": {"exists": {"field": "SharedScope"}}
-                                    }
-                                },
-                                {"term": {"SharedScope.keyword": "partial"}},
-                            ],
-                            "minimum_should_match": 1,
-                        }
-                    },
-                ]
-            }
-        },
-        # Partial shared bots with access permission
-        {
-            "bool": {
-                "must": [
-                    {"term": {"SharedScope.keyword": "partial"}},
-                    {
-                        "bool": {
-                            "should": [
-                                {"term": {"AllowedCognitoUsers.keyword": user.id}},
-                                {
-                                    "script": {
-                                        "script": {
-                                            "source": (
-                                                "for (group in doc['AllowedCognitoGroups.keyword']) { "
-                                                "if (params.user_groups.contains(group)) { return true; } } "
-                                                "return false;"
-                                            ),
-                                            "params": {"user_groups": user.groups},
-                                            "lang": "painless",
-                                        }
-                                    }
-                                },
-                            ],
-                            "minimum_should_match": 1,
-                        }
-                    },
-                ]
-            }
-        },
-    ]
-
-    seed = int(time.time()) + random.randint(0, 10000)
-    search_body = {
-        "query": {
-            "function_score": {
-                "query": {
-                    "bool": {
-                        "filter": {
-                            "bool": {
-                                "must": filter_must,
-                                "should": filter_should,
-                                "minimum_should_match": 1,
-                            }
-                        }
-                    }
-                },
-                "random_score": {"seed": seed},
-            }
-        },
-        "size": limit,
-    }
-
-    logger.debug(f"Search body: {search_body}")
-
     try:
-        response = client.search(index=INDEX_NAME, body=search_body)
-        logger.debug(f"Search response: {response}")
-
-        bots = [
-            BotMeta.from_opensearch_response(hit, user.id)
-            for hit in response["hits"]["hits"]
-        ]
+        seed = compose_pickup_seed(user.id, datetime.now(timezone.utc).date())
+        bots = _find_bots_with_cache(
+            "pickup",
+            user,
+            {"limit": limit, "offset": offset, "seed": seed},
+            BOT_STORE_PICKUP_CACHE_TTL_SECONDS,
+            client,
+        )
         logger.info(f"Found {len(bots)} random bots")
         return bots
 
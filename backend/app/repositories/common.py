@@ -1,8 +1,13 @@
 import json
+import logging
 import os
-from typing import Literal
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Literal
 
 import boto3
+from app.utils import get_client
 from opensearchpy import OpenSearch, RequestsHttpConnection
 from requests_aws4auth import AWS4Auth
 
@@ -22,6 +27,13 @@ OPENSEARCH_DOMAIN_ENDPOINT = os.environ.get(
 TRANSACTION_BATCH_WRITE_SIZE = 25
 TRANSACTION_BATCH_READ_SIZE = 100
 
+# Resources built from STS-assumed credentials are reused until shortly before the credentials expire.
+ASSUMED_RESOURCE_CACHE_SIZE = int(os.environ.get("ASSUMED_RESOURCE_CACHE_SIZE", 256))
+ASSUMED_CREDENTIALS_REFRESH_MARGIN = timedelta(minutes=5)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
 type_table = Literal["conversation", "bot"]
 _table_name_map = {"conversation": CONVERSATION_TABLE_NAME, "bot": BOT_TABLE_NAME}
 
@@ -47,6 +59,18 @@ def decompose_conv_id(conv_id: str):
     return conv_id.split("#")[-1]
 
 
+def compose_conv_delta_id(user_id: str, conversation_id: str, seq: int | None = None):
+    # Add user_id prefix for row level security to match with `LeadingKeys` condition.
+    # Zero-padded so that deltas are sorted by sequence number.
+    prefix = f"{user_id}#CONV_DELTA#{conversation_id}#"
+    return prefix if seq is None else f"{prefix}{seq:010d}"
+
+
+def compose_conv_deletion_job_id(user_id: str):
+    # Add user_id prefix for row level security to match with `LeadingKeys` condition
+    return f"{user_id}#CONV_DELETION_JOB"
+
+
 def compose_related_document_source_id(
     user_id: str,
     conversation_id: str,
@@ -79,6 +103,90 @@ def decompose_sk(sk: str):
     return sk.split("#")[-1]
 
 
+def compose_access_principals(
+    owner_user_id: str,
+    shared_scope: str,
+    allowed_user_ids: list[str],
+    allowed_group_ids: list[str],
+) -> list[str]:
+    """Compose the principals who can access the bot, indexed for the bot store filter.
+    Users match the bots with any of `all`, `user:<id>` and `group:<name>` of their groups.
+    """
+    principals = [f"user:{owner_user_id}"]
+    if shared_scope == "all":
+        principals.append("all")
+    elif shared_scope == "partial":
+        principals.extend(f"user:{user_id}" for user_id in allowed_user_ids)
+        principals.extend(f"group:{group_id}" for group_id in allowed_group_ids)
+        # Administrators can access all partial shared bots
+        principals.append("group:Admin")
+    return sorted(set(principals))
+
+
+class _AssumedResourceCache:
+    """LRU cache of resources built from STS-assumed credentials.
+    Keyed by (service_name, table_name, user_id), each entry lives until its credentials are
+    about to expire so that a repository call does not cost an STS round trip and a client build.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self._lock = threading.Lock()
+        self._items: OrderedDict[tuple[str, str, str | None], tuple[Any, datetime]] = (
+            OrderedDict()
+        )
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple[str, str, str | None]) -> Any | None:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            resource, expiration = entry
+            if (
+                datetime.now(timezone.utc) + ASSUMED_CREDENTIALS_REFRESH_MARGIN
+                >= expiration
+            ):
+                # Refresh early so that a request never runs with expiring credentials
+                del self._items[key]
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return resource
+
+    def put(
+        self, key: tuple[str, str, str | None], resource: Any, expiration: datetime
+    ) -> None:
+        with self._lock:
+            self._items[key] = (resource, expiration)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._items)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_assumed_resource_cache = _AssumedResourceCache(max_size=ASSUMED_RESOURCE_CACHE_SIZE)
+
+
+def get_assumed_resource_cache_stats() -> dict[str, int]:
+    """Get hit / miss counters of the STS-assumed resource cache."""
+    return _assumed_resource_cache.stats()
+
+
 def _get_aws_resource(service_name, table_name: str, user_id: str | None = None):
     """Get AWS resource with optional row-level access control for DynamoDB.
     Ref: https://docs.aws.amazon.com/IAM/latest/UserGuide/reference_policies_examples_dynamodb_items.html
@@ -95,6 +203,11 @@ def _get_aws_resource(service_name, table_name: str, user_id: str | None = None)
         else:
             return boto3.resource(service_name, region_name=REGION)  # type: ignore[call-overload]
 
+    cache_key = (service_name, table_name, user_id)
+    resource = _assumed_resource_cache.get(cache_key)
+    if resource is not None:
+        return resource
+
     policy_document: dict[str, list[dict]] = {
         "Statement": [
             {
@@ -126,7 +239,7 @@ def _get_aws_resource(service_name, table_name: str, user_id: str | None = None)
             "ForAllValues:StringLike": {"dynamodb:LeadingKeys": [f"{user_id}*"]}
         }
 
-    sts_client = boto3.client("sts")
+    sts_client = get_client("sts")
     assumed_role_object = sts_client.assume_role(
         RoleArn=TABLE_ACCESS_ROLE_ARN,
         RoleSessionName="DynamoDBSession",
@@ -138,7 +251,12 @@ def _get_aws_resource(service_name, table_name: str, user_id: str | None = None)
         aws_secret_access_key=credentials["SecretAccessKey"],
         aws_session_token=credentials["SessionToken"],
     )
-    return session.resource(service_name, region_name=REGION)  # type: ignore[call-overload]
+    resource = session.resource(service_name, region_name=REGION)  # type: ignore[call-overload]
+    _assumed_resource_cache.put(cache_key, resource, credentials["Expiration"])
+    logger.info(
+        f"Assumed table access role for {table_name}: {_assumed_resource_cache.stats()}"
+    )
+    return resource
 
 
 def get_dynamodb_client(user_id=None, table_type: type_table = "conversation"):
@@ -173,38 +291,47 @@ def get_bot_table_client():
     )
 
 
+_opensearch_client: OpenSearch | None = None
+_opensearch_client_lock = threading.Lock()
+
+
 def get_opensearch_client(collection_type: str = "bot") -> OpenSearch:
     """Get OpenSearch client with AWS authentication.
+    The client is shared in the process, signing each request with refreshed credentials,
+    so that it keeps its connection pool instead of reconnecting for each search.
 
     Args:
         collection_type: Type of collection to connect to ("bot" or "conversation")
         Note: This method now uses a single shared endpoint for both bot and conversation collections
     """
+    global _opensearch_client
+
     endpoint = OPENSEARCH_DOMAIN_ENDPOINT
     if not endpoint:
         raise ValueError("OPENSEARCH_DOMAIN_ENDPOINT is not set")
 
-    # Get credentials from boto3
-    credentials = boto3.Session().get_credentials()
-    assert credentials is not None, "Credentials are not available"
-    aws_auth = AWS4Auth(
-        credentials.access_key,
-        credentials.secret_key,
-        REGION,
-        "aoss",
-        session_token=credentials.token,
-    )
-
-    # Omit https
-    host = endpoint.replace("https://", "")
-
-    client = OpenSearch(
-        hosts=[{"host": host, "port": 443}],
-        http_auth=aws_auth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=30,
-    )
-
-    return client
+    with _opensearch_client_lock:
+        if _opensearch_client is not None:
+            return _opensearch_client
+
+        # Get credentials from boto3, refreshed by botocore before they expire
+        credentials = boto3.Session().get_credentials()
+        assert credentials is not None, "Credentials are not available"
+        aws_auth = AWS4Auth(
+            region=REGION,
+            service="aoss",
+            refreshable_credentials=credentials,
+        )
+
+        # Omit https
+        host = endpoint.replace("https://", "")
+
+        _opensearch_client = OpenSearch(
+            hosts=[{"host": host, "port": 443}],
+            http_auth=aws_auth,
+            use_ssl=True,
+            verify_certs=True,
+            connection_class=RequestsHttpConnection,
+            timeout=30,
+        )
+        return _opensearch_client
@@ -1,95 +1,514 @@
+import base64
 import json
 import logging
 import os
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from decimal import Decimal as decimal
+from threading import Lock
 
 import boto3
-from typing import Dict
+from typing import TYPE_CHECKING, Any, Dict
 from app.repositories.common import (
+    TRANSACTION_BATCH_READ_SIZE,
     TRANSACTION_BATCH_WRITE_SIZE,
     RecordNotFoundError,
+    ResourceConflictError,
+    compose_conv_deletion_job_id,
+    compose_conv_delta_id,
     compose_conv_id,
     compose_related_document_source_id,
     decompose_conv_id,
     decompose_related_document_source_id,
     get_conversation_table_client,
 )
+from app.repositories.conversation_codec import (
+    MESSAGE_MAP_VERSION,
+    EncodedMessageMap,
+    compress,
+    decompress,
+    digest_message_text,
+    encode_message_map,
+    find_blob_references,
+    join_message_texts,
+    resolve_blob_references,
+)
+from app.repositories.conversation_cache import conversation_cache
+from app.repositories.models.conversation_cache import ConversationCacheEntryModel
 from app.repositories.models.conversation import (
+    ConversationDeletionJobModel,
     ConversationMeta,
     ConversationModel,
     FeedbackModel,
+    LazyMessageMap,
     MessageModel,
     RelatedDocumentModel,
     ToolResultModel,
 )
 from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
+from app.utils import get_current_time
 from pydantic import TypeAdapter
+from ulid import ULID
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3.type_defs import ObjectIdentifierTypeDef
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 THRESHOLD_LARGE_MESSAGE = 300 * 1024  # 300KB
-LARGE_MESSAGE_BUCKET = os.environ.get("LARGE_MESSAGE_BUCKET")
+LARGE_MESSAGE_BUCKET = os.environ.get("LARGE_MESSAGE_BUCKET", "")
+
+# Deltas of a conversation are compacted into its snapshot after this many turns
+CONVERSATION_COMPACTION_INTERVAL = int(
+    os.environ.get("CONVERSATION_COMPACTION_INTERVAL", 16)
+)
+# Reads of a conversation whose deltas are compacted meanwhile, before giving up
+LOAD_MESSAGE_MAP_MAX_ATTEMPTS = 3
+
+# Number of concurrent BatchWriteItem and DeleteObjects calls of a bulk deletion
+BULK_DELETION_MAX_WORKERS = int(os.environ.get("BULK_DELETION_MAX_WORKERS", 8))
+BATCH_WRITE_MAX_ATTEMPTS = 8
+BATCH_WRITE_BACKOFF_SECONDS = 0.05
+# Max keys of a DeleteObjects call
+S3_DELETE_OBJECTS_BATCH_SIZE = 1000
+# Running deletion jobs not updated for this period are considered dead
+CONVERSATION_DELETION_JOB_TIMEOUT_SECONDS = 15 * 60
 
 BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
 s3_client = boto3.client("s3", BEDROCK_REGION)
 
+# Number of blobs transferred concurrently
+BLOB_TRANSFER_MAX_WORKERS = 8
+# Keys of the blobs known to exist in S3, to skip uploading them again on every turn
+KNOWN_BLOB_KEYS_MAX_SIZE = 4096
+_known_blob_keys: dict[str, None] = {}
+_known_blob_keys_lock = Lock()
 
-def store_conversation(
-    user_id: str, conversation: ConversationModel, threshold=THRESHOLD_LARGE_MESSAGE
-):
-    logger.info(f"Storing conversation: {conversation.model_dump_json()}")
-    table = get_conversation_table_client(user_id)
 
+def _remember_blob_keys(keys: list[str]):
+    with _known_blob_keys_lock:
+        for key in keys:
+            _known_blob_keys.pop(key, None)
+            _known_blob_keys[key] = None
+
+        while len(_known_blob_keys) > KNOWN_BLOB_KEYS_MAX_SIZE:
+            del _known_blob_keys[next(iter(_known_blob_keys))]
+
+
+def _compose_blob_key(user_id: str, conversation_id: str, digest: str) -> str:
+    return f"{user_id}/{conversation_id}/blobs/{digest}"
+
+
+def _store_blobs(user_id: str, conversation_id: str, blobs: dict[str, bytes]):
+    """Upload the blobs which are not stored yet."""
+    with _known_blob_keys_lock:
+        uploads = {
+            key: data
+            for key, data in (
+                (_compose_blob_key(user_id, conversation_id, digest), data)
+                for digest, data in blobs.items()
+            )
+            if key not in _known_blob_keys
+        }
+    if not uploads:
+        return
+
+    logger.info(f"Uploading {len(uploads)} blobs")
+    with ThreadPoolExecutor(max_workers=BLOB_TRANSFER_MAX_WORKERS) as executor:
+        list(
+            executor.map(
+                lambda item: s3_client.put_object(
+                    Bucket=LARGE_MESSAGE_BUCKET, Key=item[0], Body=item[1]
+                ),
+                uploads.items(),
+            )
+        )
+
+    _remember_blob_keys(list(uploads.keys()))
+
+
+def _load_blobs(
+    user_id: str, conversation_id: str, digests: set[str]
+) -> dict[str, bytes]:
+    def load_blob(digest: str) -> tuple[str, bytes]:
+        response = s3_client.get_object(
+            Bucket=LARGE_MESSAGE_BUCKET,
+            Key=_compose_blob_key(user_id, conversation_id, digest),
+        )
+        return digest, response["Body"].read()
+
+    with ThreadPoolExecutor(max_workers=BLOB_TRANSFER_MAX_WORKERS) as executor:
+        blobs = dict(executor.map(load_blob, digests))
+
+    _remember_blob_keys(
+        [_compose_blob_key(user_id, conversation_id, digest) for digest in digests]
+    )
+    return blobs
+
+
+def _delete_conversation_objects(user_id: str, conversation_id: str):
+    """Delete all the S3 objects of the conversation, including blobs."""
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(
+        Bucket=LARGE_MESSAGE_BUCKET, Prefix=f"{user_id}/{conversation_id}/"
+    ):
+        objects: list["ObjectIdentifierTypeDef"] = [
+            {"Key": content["Key"]} for content in page.get("Contents", [])
+        ]
+        if objects:
+            s3_client.delete_objects(
+                Bucket=LARGE_MESSAGE_BUCKET, Delete={"Objects": objects}
+            )
+
+
+def _compose_large_message_path(user_id: str, conversation_id: str) -> str:
+    # Unique per write, so that a writer losing the race does not overwrite the snapshot
+    # of the winner. The previous object is deleted once the item points to the new one.
+    return f"{user_id}/{conversation_id}/message_map/{ULID()}.json.gz"
+
+
+def _delete_large_message(large_message_path: str):
+    try:
+        s3_client.delete_object(Bucket=LARGE_MESSAGE_BUCKET, Key=large_message_path)
+    except ClientError as e:
+        logger.warning(f"Error deleting large message {large_message_path}: {e}")
+
+
+def _has_blobs(item: dict) -> bool:
+    return int(item.get("MessageMapVersion", 1)) >= 2
+
+
+def _model_name(message_map: dict[str, Any]) -> str:
+    # NOTE: all message has the same model
+    return message_map.get("system", {}).get("model", "")
+
+
+def _compose_update(
+    values: dict[str, Any], remove: list[str] | None = None
+) -> dict[str, Any]:
+    """Compose the parameters of update_item setting (and removing) the attributes."""
+    names = {f"#{name}": name for name in [*values, *(remove or [])]}
+    expression = "SET " + ", ".join(f"#{name} = :{name}" for name in values)
+    if remove:
+        expression += " REMOVE " + ", ".join(f"#{name}" for name in remove)
+    return {
+        "UpdateExpression": expression,
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": {
+            f":{name}": value for name, value in values.items()
+        },
+    }
+
+
+def _version_condition(expected_version: int) -> tuple[str, dict[str, Any]]:
+    """Condition that the message map has not been written since it was loaded."""
+    if expected_version == 0:
+        # Conversations stored before versioning
+        return "attribute_exists(PK) AND attribute_not_exists(#Version)", {}
+    return "#Version = :expected_version", {":expected_version": expected_version}
+
+
+def _store_snapshot(
+    table,
+    user_id: str,
+    conversation: ConversationModel,
+    encoded: EncodedMessageMap,
+    threshold: int,
+):
+    """Write the whole conversation as a snapshot, compacting all the deltas into it.
+    Raises ResourceConflictError if the conversation was written since it was loaded.
+    """
     item_params = {
-        "PK": user_id,
-        "SK": compose_conv_id(user_id, conversation.id),
-        "Title": conversation.title,
         "CreateTime": decimal(conversation.create_time),
         # Convert to decimal via str to avoid error
         # Ref: https://stackoverflow.com/questions/63026648/errormessage-class-decimal-inexact-class-decimal-rounded-while
         "TotalPrice": decimal(str(conversation.total_price)),
         "LastMessageId": conversation.last_message_id,
         "ShouldContinue": conversation.should_continue,
+        # Stored apart from the message map, to list conversations without reading it
+        "Model": _model_name(encoded.message_map),
+        "MessageMapVersion": MESSAGE_MAP_VERSION,
+        "DeltaSeq": conversation._delta_seq,
+        "SnapshotSeq": conversation._delta_seq,
+        "Version": conversation._version + 1,
     }
 
     if conversation.bot_id:
         item_params["BotId"] = conversation.bot_id
 
-    message_map = {
-        k: v.model_dump(by_alias=True) for k, v in conversation.message_map.items()
-    }
-    message_map_size = len(json.dumps(message_map).encode("utf-8"))
+    message_map_size = encoded.size
     logger.info(f"Message map size: {message_map_size}")
+    large_message_path = None
     if message_map_size > threshold:
         logger.info(
             f"Message map size {message_map_size} exceeds threshold {threshold}"
         )
         item_params["IsLargeMessage"] = True
-        large_message_path = f"{user_id}/{conversation.id}/message_map.json"
+        large_message_path = _compose_large_message_path(user_id, conversation.id)
         item_params["LargeMessagePath"] = large_message_path
         # Store all message in S3
         s3_client.put_object(
             Bucket=LARGE_MESSAGE_BUCKET,
             Key=large_message_path,
-            Body=json.dumps(message_map),
+            Body=compress(encoded.text),
+            ContentType="application/json",
+            ContentEncoding="gzip",
         )
         # Store only `system` attribute in DynamoDB
         item_params["MessageMap"] = json.dumps(
-            {k: v for k, v in message_map.items() if k == "system"}
+            {k: v for k, v in encoded.message_map.items() if k == "system"}
         )
     else:
         item_params["IsLargeMessage"] = False
-        item_params["MessageMap"] = json.dumps(message_map)
+        item_params["MessageMap"] = encoded.text
+
+    key = {"PK": user_id, "SK": compose_conv_id(user_id, conversation.id)}
+    try:
+        if conversation._stored_message_digests is None:
+            # New conversation
+            response = table.put_item(
+                Item={**key, "Title": conversation.title, **item_params},
+                ConditionExpression="attribute_not_exists(PK)",
+            )
+        else:
+            # Title is not written, not to overwrite the title changed concurrently
+            condition, condition_values = _version_condition(conversation._version)
+            update = _compose_update(
+                item_params,
+                remove=(
+                    ["LargeMessagePath"] if not item_params["IsLargeMessage"] else None
+                ),
+            )
+            update["ExpressionAttributeNames"]["#Version"] = "Version"
+            update["ExpressionAttributeValues"].update(condition_values)
+            response = table.update_item(
+                Key=key,
+                ConditionExpression=condition,
+                **update,
+            )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        if large_message_path is not None:
+            _delete_large_message(large_message_path)
+        raise ResourceConflictError(
+            f"Conversation {conversation.id} was updated concurrently"
+        )
+
+    if conversation._large_message_path is not None:
+        _delete_large_message(conversation._large_message_path)
+    conversation._large_message_path = large_message_path
+
+    # Deltas compacted into the snapshot are no longer read
+    if conversation._delta_seq > conversation._snapshot_seq:
+        with table.batch_writer() as writer:
+            for seq in range(
+                conversation._snapshot_seq + 1, conversation._delta_seq + 1
+            ):
+                writer.delete_item(
+                    Key={
+                        "PK": user_id,
+                        "SK": compose_conv_delta_id(user_id, conversation.id, seq),
+                    }
+                )
+    conversation._snapshot_seq = conversation._delta_seq
+    return response
+
+
+def _store_delta(
+    table,
+    user_id: str,
+    conversation: ConversationModel,
+    message_texts: dict[str, str],
+    deleted_message_ids: list[str],
+    model: str,
+):
+    """Write only the changed messages of the conversation as a delta.
+    Raises ResourceConflictError if the conversation was written since it was loaded.
+    """
+    seq = conversation._delta_seq
+    if message_texts or deleted_message_ids:
+        seq += 1
 
-    response = table.put_item(
-        Item=item_params,
+    # Deltas are read up to `DeltaSeq`, so the delta becomes visible with this update
+    condition, condition_values = _version_condition(conversation._version)
+    update = _compose_update(
+        {
+            "TotalPrice": decimal(str(conversation.total_price)),
+            "LastMessageId": conversation.last_message_id,
+            "ShouldContinue": conversation.should_continue,
+            "Model": model,
+            "MessageMapVersion": MESSAGE_MAP_VERSION,
+            "DeltaSeq": seq,
+            "Version": conversation._version + 1,
+        }
     )
+    update["ExpressionAttributeValues"].update(condition_values)
+    key = {"PK": user_id, "SK": compose_conv_id(user_id, conversation.id)}
+
+    try:
+        if seq == conversation._delta_seq:
+            # Only the metadata has changed
+            response = table.update_item(
+                Key=key,
+                ConditionExpression=condition,
+                **update,
+            )
+        else:
+            # Write the delta and the metadata atomically
+            client = table.meta.client
+            response = client.transact_write_items(
+                TransactItems=[
+                    {
+                        "Put": {
+                            "TableName": table.name,
+                            "Item": {
+                                "PK": user_id,
+                                "SK": compose_conv_delta_id(
+                                    user_id, conversation.id, seq
+                                ),
+                                "MessageMap": join_message_texts(message_texts),
+                                "MessageMapVersion": MESSAGE_MAP_VERSION,
+                                "DeletedMessageIds": deleted_message_ids,
+                            },
+                            "ConditionExpression": "attribute_not_exists(SK)",
+                        }
+                    },
+                    {
+                        "Update": {
+                            "TableName": table.name,
+                            "Key": key,
+                            "ConditionExpression": condition,
+                            "UpdateExpression": update["UpdateExpression"],
+                            "ExpressionAttributeNames": update[
+                                "ExpressionAttributeNames"
+                            ],
+                            "ExpressionAttributeValues": update[
+                                "ExpressionAttributeValues"
+                            ],
+                        }
+                    },
+                ]
+            )
+    except (
+        table.meta.client.exceptions.ConditionalCheckFailedException,
+        table.meta.client.exceptions.TransactionCanceledException,
+    ):
+        raise ResourceConflictError(
+            f"Conversation {conversation.id} was updated concurrently"
+        )
+
+    conversation._delta_seq = seq
     return response
 
 
-def find_conversation_by_user_id(user_id: str) -> list[ConversationMeta]:
+def store_conversation(
+    user_id: str, conversation: ConversationModel, threshold=THRESHOLD_LARGE_MESSAGE
+):
+    """Store the conversation.
+    For a stored conversation, only the messages changed since it was loaded are written as a delta,
+    and all the deltas are compacted into a snapshot every `CONVERSATION_COMPACTION_INTERVAL` turns.
+    Writes are conditional on the version of the loaded message map, so a conversation written
+    concurrently raises ResourceConflictError instead of losing the other update.
+    """
+    logger.info(f"Storing conversation: {conversation.id}")
+    table = get_conversation_table_client(user_id)
+
+    encoded = encode_message_map(conversation.message_map)
+    if encoded.blobs:
+        _store_blobs(user_id, conversation.id, encoded.blobs)
+
+    message_digests = {
+        k: digest_message_text(text) for k, text in encoded.message_texts.items()
+    }
+    stored_message_digests = conversation._stored_message_digests
+
+    try:
+        response = None
+        if (
+            stored_message_digests is not None
+            and conversation._delta_seq - conversation._snapshot_seq
+            < CONVERSATION_COMPACTION_INTERVAL
+        ):
+            changed_message_texts = {
+                k: encoded.message_texts[k]
+                for k, digest in message_digests.items()
+                if stored_message_digests.get(k) != digest
+            }
+            deleted_message_ids = [
+                k for k in stored_message_digests if k not in message_digests
+            ]
+            delta_size = sum(len(text) for text in changed_message_texts.values())
+            if delta_size <= threshold:
+                logger.info(
+                    f"Storing {len(changed_message_texts)} changed messages as a delta"
+                )
+                response = _store_delta(
+                    table,
+                    user_id,
+                    conversation,
+                    changed_message_texts,
+                    deleted_message_ids,
+                    _model_name(encoded.message_map),
+                )
+
+        if response is None:
+            response = _store_snapshot(table, user_id, conversation, encoded, threshold)
+
+    except ResourceConflictError:
+        conversation_cache.delete(user_id, conversation.id)
+        raise
+
+    conversation._version += 1
+    conversation._stored_message_digests = message_digests
+
+    # Write through, so that the next turn does not read the messages again
+    conversation_cache.put(
+        user_id,
+        conversation.id,
+        ConversationCacheEntryModel(
+            version=conversation._version,
+            message_map=encoded.text,
+            message_digests=message_digests,
+        ),
+    )
+    return response
+
+
+# Attributes of the conversation item needed for listing
+_CONVERSATION_LIST_ATTRIBUTES = ["SK", "Title", "CreateTime", "BotId", "Model"]
+CONVERSATION_LIST_PAGE_SIZE = 100
+
+
+def _encode_next_token(last_evaluated_key: dict) -> str:
+    return base64.b64encode(json.dumps(last_evaluated_key).encode("utf-8")).decode(
+        "utf-8"
+    )
+
+
+def _decode_next_token(user_id: str, next_token: str) -> dict:
+    try:
+        last_evaluated_key = json.loads(base64.b64decode(next_token).decode("utf-8"))
+    except ValueError:
+        raise ValueError("Invalid next token")
+
+    if (
+        not isinstance(last_evaluated_key, dict)
+        or last_evaluated_key.get("PK") != user_id
+    ):
+        raise ValueError("Invalid next token")
+    return last_evaluated_key
+
+
+def find_conversations_page_by_user_id(
+    user_id: str,
+    limit: int = CONVERSATION_LIST_PAGE_SIZE,
+    next_token: str | None = None,
+) -> tuple[list[ConversationMeta], str | None]:
+    """Find a page of the conversations of the user, newest first.
+    Only the attributes for listing are read. Pass the returned token to get the next page.
+    """
     logger.info(f"Finding conversations for user: {user_id}")
     table = get_conversation_table_client(user_id)
 
@@ -98,104 +517,447 @@ def find_conversation_by_user_id(user_id: str) -> list[ConversationMeta]:
         # NOTE: Need SK to fetch only conversations
         & Key("SK").begins_with(f"{user_id}#CONV#"),
         "ScanIndexForward": False,
+        "Limit": limit,
+        **_compose_projection(_CONVERSATION_LIST_ATTRIBUTES),
     }
+    if next_token:
+        query_params["ExclusiveStartKey"] = _decode_next_token(user_id, next_token)
 
     response = table.query(**query_params)
+    items = response["Items"]
+
+    # Conversations stored before `Model` was added read it from the message map
+    legacy_items = [item for item in items if "Model" not in item]
+    if legacy_items:
+        logger.info(f"Reading model from message map of {len(legacy_items)} items")
+        models = {
+            item["SK"]: _model_name(json.loads(item["MessageMap"]))
+            for item in _batch_get_conversation_items(
+                table,
+                user_id,
+                [decompose_conv_id(item["SK"]) for item in legacy_items],
+                ["SK", "MessageMap"],
+            ).values()
+        }
+        for item in legacy_items:
+            item["Model"] = models.get(item["SK"], "")
+
     conversations = [
         ConversationMeta(
             id=decompose_conv_id(item["SK"]),
             create_time=float(item["CreateTime"]),
             title=item["Title"],
-            # NOTE: all message has the same model
-            model=json.loads(item["MessageMap"]).get("system", {}).get("model", ""),
+            model=item["Model"],
             bot_id=item["BotId"] if "BotId" in item else None,
         )
-        for item in response["Items"]
+        for item in items
     ]
 
-    query_count = 1
-    MAX_QUERY_COUNT = 5
-    while "LastEvaluatedKey" in response:
-        model = (
-            json.loads(response["Items"][0]["MessageMap"])
-            .get("system", {})
-            .get("model", "")
+    next_token = None
+    if "LastEvaluatedKey" in response:
+        next_token = _encode_next_token(response["LastEvaluatedKey"])
+
+    logger.info(f"Found {len(conversations)} conversations")
+    return conversations, next_token
+
+
+def find_conversation_by_user_id(user_id: str) -> list[ConversationMeta]:
+    """Find all the conversations of the user, newest first."""
+    conversations, next_token = find_conversations_page_by_user_id(user_id)
+    while next_token is not None:
+        page, next_token = find_conversations_page_by_user_id(
+            user_id, next_token=next_token
         )
-        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
-        # NOTE: max page size is 1MB
-        # See: https://docs.aws.amazon.com/amazondynamodb/latest/developerguide/Query.Pagination.html
+        conversations.extend(page)
+    return conversations
+
+
+def _find_deltas(
+    table, user_id: str, conversation_id: str, seq_from: int, seq_to: int
+) -> list[dict]:
+    """Find the deltas of the conversation in order of their sequence numbers."""
+    deltas: list[dict] = []
+    last_evaluated_key = None
+    while True:
         response = table.query(
-            **query_params,
-        )
-        conversations.extend(
-            [
-                ConversationMeta(
-                    id=decompose_conv_id(item["SK"]),
-                    create_time=float(item["CreateTime"]),
-                    title=item["Title"],
-                    model=model,
-                    bot_id=item["BotId"] if "BotId" in item else None,
-                )
-                for item in response["Items"]
-            ]
+            KeyConditionExpression=Key("PK").eq(user_id)
+            & Key("SK").between(
+                compose_conv_delta_id(user_id, conversation_id, seq_from),
+                compose_conv_delta_id(user_id, conversation_id, seq_to),
+            ),
+            ConsistentRead=True,
+            **(
+                {
+                    "ExclusiveStartKey": last_evaluated_key,
+                }
+                if last_evaluated_key is not None
+                else {}
+            ),
         )
-        query_count += 1
-        if query_count > MAX_QUERY_COUNT:
-            logger.warning(f"Query count exceeded {MAX_QUERY_COUNT}")
+        deltas.extend(response.get("Items") or [])
+
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if last_evaluated_key is None:
             break
 
-    logger.info(f"Found conversations: {conversations}")
-    return conversations
+    logger.info(f"Found {len(deltas)} deltas")
+    return deltas
 
 
-def find_conversation_by_id(user_id: str, conversation_id: str) -> ConversationModel:
-    logger.info(f"Finding conversation: {conversation_id}")
-    table = get_conversation_table_client(user_id)
-    response = table.query(
-        IndexName="SKIndex",
-        KeyConditionExpression=Key("SK").eq(compose_conv_id(user_id, conversation_id)),
+def _delete_deltas(table, user_id: str, conversation_id: str | None = None):
+    """Delete the deltas of the conversation, or of all the conversations of the user."""
+    prefix = (
+        compose_conv_delta_id(user_id, conversation_id)
+        if conversation_id
+        else f"{user_id}#CONV_DELTA#"
     )
-    if len(response["Items"]) == 0:
-        raise RecordNotFoundError(f"No conversation found with id: {conversation_id}")
+    sort_keys: list[str] = []
+    last_evaluated_key = None
+    while True:
+        response = table.query(
+            KeyConditionExpression=Key("PK").eq(user_id)
+            & Key("SK").begins_with(prefix),
+            ProjectionExpression="SK",
+            **(
+                {
+                    "ExclusiveStartKey": last_evaluated_key,
+                }
+                if last_evaluated_key is not None
+                else {}
+            ),
+        )
+        sort_keys.extend(item["SK"] for item in response.get("Items") or [])
 
-    # NOTE: conversation is unique
-    item = response["Items"][0]
-    if item.get("IsLargeMessage", False):
-        large_message_path = item["LargeMessagePath"]
-        response = s3_client.get_object(
-            Bucket=LARGE_MESSAGE_BUCKET, Key=large_message_path
+        last_evaluated_key = response.get("LastEvaluatedKey")
+        if last_evaluated_key is None:
+            break
+
+    with table.batch_writer() as writer:
+        for sort_key in sort_keys:
+            writer.delete_item(Key={"PK": user_id, "SK": sort_key})
+
+
+# Attributes of the conversation item other than its message map
+_CONVERSATION_META_ATTRIBUTES = [
+    "PK",
+    "SK",
+    "Title",
+    "CreateTime",
+    "TotalPrice",
+    "LastMessageId",
+    "BotId",
+    "ShouldContinue",
+    "MessageMapVersion",
+    "DeltaSeq",
+    "SnapshotSeq",
+    "Version",
+    "LargeMessagePath",
+]
+
+
+def _load_message_map(
+    table, user_id: str, conversation_id: str, item: dict
+) -> tuple[dict[str, Any], dict]:
+    """Load the stored message map of the conversation item, applying its deltas.
+    The deltas may be compacted into a new snapshot after the item was read, in which case
+    the item is read again. Returns the message map and the item it was loaded from.
+    """
+
+    def read_again() -> dict:
+        logger.info(
+            f"Conversation {conversation_id} was compacted while loading. Reading it again"
         )
-        message_map = json.loads(response["Body"].read().decode("utf-8"))
+        item = _get_conversation_item(table, user_id, conversation_id)
+        if item is None:
+            raise RecordNotFoundError(
+                f"No conversation found with id: {conversation_id}"
+            )
+        return item
+
+    for _ in range(LOAD_MESSAGE_MAP_MAX_ATTEMPTS):
+        if item.get("IsLargeMessage", False):
+            large_message_path = item["LargeMessagePath"]
+            try:
+                response = s3_client.get_object(
+                    Bucket=LARGE_MESSAGE_BUCKET, Key=large_message_path
+                )
+            except ClientError as e:
+                # Snapshot replaced by a compaction after the item was read
+                if e.response["Error"]["Code"] != "NoSuchKey":
+                    raise
+                item = read_again()
+                continue
+            body = response["Body"].read()
+            message_map = json.loads(
+                decompress(body)
+                if large_message_path.endswith(".gz")
+                else body.decode("utf-8")
+            )
+        else:
+            message_map = json.loads(item["MessageMap"])
+
+        # Apply the deltas stored after the snapshot
+        snapshot_seq = int(item.get("SnapshotSeq", 0))
+        delta_seq = int(item.get("DeltaSeq", 0))
+        if delta_seq > snapshot_seq:
+            deltas = _find_deltas(
+                table, user_id, conversation_id, snapshot_seq + 1, delta_seq
+            )
+            if len(deltas) != delta_seq - snapshot_seq:
+                item = read_again()
+                continue
+
+            for delta in deltas:
+                for message_id in delta.get("DeletedMessageIds", []):
+                    message_map.pop(message_id, None)
+                message_map.update(json.loads(delta["MessageMap"]))
+
+        return message_map, item
+
+    raise ResourceConflictError(
+        f"Conversation {conversation_id} is being compacted. Please retry."
+    )
+
+
+def _compose_projection(attributes: list[str]) -> dict[str, Any]:
+    return {
+        "ProjectionExpression": ", ".join(f"#{name}" for name in attributes),
+        "ExpressionAttributeNames": {f"#{name}": name for name in attributes},
+    }
+
+
+def _get_conversation_item(
+    table, user_id: str, conversation_id: str, attributes: list[str] | None = None
+) -> dict | None:
+    """Read the conversation item by its primary key with a strongly consistent GetItem."""
+    return table.get_item(
+        Key={"PK": user_id, "SK": compose_conv_id(user_id, conversation_id)},
+        ConsistentRead=True,
+        **(_compose_projection(attributes) if attributes is not None else {}),
+    ).get("Item")
+
+
+def _batch_get_conversation_items(
+    table,
+    user_id: str,
+    conversation_ids: list[str],
+    attributes: list[str] | None = None,
+) -> dict[str, dict]:
+    """Read the conversation items by their primary keys with strongly consistent BatchGetItem.
+    Conversations not found are omitted.
+    """
+    client = table.meta.client
+    items: dict[str, dict] = {}
+    for i in range(0, len(conversation_ids), TRANSACTION_BATCH_READ_SIZE):
+        batch = conversation_ids[i : i + TRANSACTION_BATCH_READ_SIZE]
+        request_items = {
+            table.name: {
+                "Keys": [
+                    {"PK": user_id, "SK": compose_conv_id(user_id, conversation_id)}
+                    for conversation_id in batch
+                ],
+                "ConsistentRead": True,
+                **(_compose_projection(attributes) if attributes is not None else {}),
+            }
+        }
+        while request_items:
+            response = client.batch_get_item(RequestItems=request_items)
+            for item in response["Responses"].get(table.name, []):
+                items[decompose_conv_id(item["SK"])] = item
+            request_items = response.get("UnprocessedKeys")
+
+    return items
+
+
+def _is_stale(item: dict, cached: ConversationCacheEntryModel) -> bool:
+    return int(item.get("Version", 0)) != cached.version
+
+
+def _build_conversation(
+    table,
+    user_id: str,
+    item: dict,
+    cached: ConversationCacheEntryModel | None,
+) -> ConversationModel:
+    """Build the conversation from its item, and from the cached message map if any."""
+    conversation_id = decompose_conv_id(item["SK"])
+    if cached is not None:
+        message_map = json.loads(cached.message_map)
+        message_digests = cached.message_digests
     else:
-        message_map = json.loads(item["MessageMap"])
+        message_map, item = _load_message_map(table, user_id, conversation_id, item)
+        message_texts = {k: json.dumps(v) for k, v in message_map.items()}
+        message_digests = {
+            k: digest_message_text(text) for k, text in message_texts.items()
+        }
+        version = int(item.get("Version", 0))
+        if version > 0:
+            conversation_cache.put(
+                user_id,
+                conversation_id,
+                ConversationCacheEntryModel(
+                    version=version,
+                    message_map=join_message_texts(message_texts),
+                    message_digests=message_digests,
+                ),
+            )
+
+    def resolve_blobs(message: dict):
+        # Fetch only the blobs of the messages actually accessed
+        digests = find_blob_references(message)
+        if digests:
+            resolve_blob_references(
+                message,
+                _load_blobs(user_id, conversation_id, digests),
+            )
 
     conv = ConversationModel(
-        id=decompose_conv_id(item["SK"]),
+        id=conversation_id,
         create_time=float(item["CreateTime"]),
         title=item["Title"],
         total_price=item.get("TotalPrice", 0),
-        message_map={k: MessageModel.model_validate(v) for k, v in message_map.items()},
+        message_map={},
         last_message_id=item["LastMessageId"],
         bot_id=item["BotId"] if "BotId" in item else None,
         should_continue=item.get("ShouldContinue", False),
     )
+    # Messages are validated on first access, e.g. only on the branch of a chat turn
+    conv.message_map = LazyMessageMap(  # type: ignore[assignment]
+        message_map,
+        resolve=resolve_blobs if _has_blobs(item) else None,
+    )
+    conv._stored_message_digests = message_digests
+    conv._delta_seq = int(item.get("DeltaSeq", 0))
+    conv._snapshot_seq = int(item.get("SnapshotSeq", 0))
+    conv._version = int(item.get("Version", 0))
+    conv._large_message_path = item.get("LargeMessagePath")
+    return conv
+
+
+def find_conversation_by_id(user_id: str, conversation_id: str) -> ConversationModel:
+    """Find the conversation.
+    The message map is served from the conversation cache while its version matches the stored one,
+    so that only the metadata is read from the table on each turn.
+    """
+    logger.info(f"Finding conversation: {conversation_id}")
+    table = get_conversation_table_client(user_id)
+
+    cached = conversation_cache.get(user_id, conversation_id)
+    if cached is not None:
+        item = _get_conversation_item(
+            table, user_id, conversation_id, _CONVERSATION_META_ATTRIBUTES
+        )
+        if item is not None and _is_stale(item, cached):
+            logger.info(f"Cached conversation is stale: {conversation_id}")
+            conversation_cache.delete(user_id, conversation_id)
+            cached = None
+            item = _get_conversation_item(table, user_id, conversation_id)
+    else:
+        item = _get_conversation_item(table, user_id, conversation_id)
+
+    if item is None:
+        raise RecordNotFoundError(f"No conversation found with id: {conversation_id}")
+
+    conv = _build_conversation(table, user_id, item, cached)
     logger.info(f"Found conversation: {conv}")
     return conv
 
 
+def find_conversations_by_ids(
+    user_id: str, conversation_ids: list[str]
+) -> list[ConversationModel]:
+    """Find the conversations in the given order with BatchGetItem.
+    Conversations not found are omitted.
+    """
+    logger.info(f"Finding {len(conversation_ids)} conversations")
+    table = get_conversation_table_client(user_id)
+    conversation_ids = list(dict.fromkeys(conversation_ids))
+
+    cached_entries = {
+        conversation_id: entry
+        for conversation_id in conversation_ids
+        if (entry := conversation_cache.get(user_id, conversation_id)) is not None
+    }
+    # Only the metadata is read for the cached conversations
+    items = _batch_get_conversation_items(
+        table, user_id, list(cached_entries), _CONVERSATION_META_ATTRIBUTES
+    )
+    for conversation_id in list(cached_entries):
+        item = items.get(conversation_id)
+        if item is None or _is_stale(item, cached_entries[conversation_id]):
+            conversation_cache.delete(user_id, conversation_id)
+            del cached_entries[conversation_id]
+            items.pop(conversation_id, None)
+
+    items.update(
+        _batch_get_conversation_items(
+            table,
+            user_id,
+            [
+                conversation_id
+                for conversation_id in conversation_ids
+                if conversation_id not in cached_entries
+            ],
+        )
+    )
+
+    # Large message maps are loaded from S3 concurrently
+    with ThreadPoolExecutor(max_workers=BLOB_TRANSFER_MAX_WORKERS) as executor:
+        return list(
+            executor.map(
+                lambda conversation_id: _build_conversation(
+                    table,
+                    user_id,
+                    items[conversation_id],
+                    cached_entries.get(conversation_id),
+                ),
+                [
+                    conversation_id
+                    for conversation_id in conversation_ids
+                    if conversation_id in items
+                ],
+            )
+        )
+
+
+def find_message_branch(
+    user_id: str, conversation_id: str, message_id: str | None = None
+) -> dict[str, MessageModel]:
+    """Find the messages on the path from the message to the root.
+    If message_id is None, the last message of the conversation is used.
+    Messages and blobs of the other branches are neither parsed nor fetched.
+    """
+    conversation = find_conversation_by_id(user_id, conversation_id)
+    message_map = conversation.message_map
+
+    branch: dict[str, MessageModel] = {}
+    node_id: str | None = message_id or conversation.last_message_id
+    while node_id is not None and node_id in message_map and node_id not in branch:
+        message = message_map[node_id]
+        branch[node_id] = message
+        node_id = message.parent
+
+    logger.info(f"Found {len(branch)} messages on the branch of {message_id}")
+    return branch
+
+
 def delete_conversation_by_id(user_id: str, conversation_id: str):
     logger.info(f"Deleting conversation: {conversation_id}")
     table = get_conversation_table_client(user_id)
+    conversation_cache.delete(user_id, conversation_id)
 
     try:
         # Check if the conversation has a large message map
         response = table.get_item(
             Key={"PK": user_id, "SK": compose_conv_id(user_id, conversation_id)},
-            ProjectionExpression="IsLargeMessage, LargeMessagePath",
+            ProjectionExpression="IsLargeMessage, LargeMessagePath, MessageMapVersion",
         )
 
         item = response.get("Item")
-        if item and item.get("IsLargeMessage", False):
+        if item and _has_blobs(item):
+            # Delete the large message map and the blobs from S3
+            _delete_conversation_objects(user_id, conversation_id)
+        elif item and item.get("IsLargeMessage", False):
             # Delete the large message map from S3
             s3_client.delete_object(
                 Bucket=LARGE_MESSAGE_BUCKET, Key=item["LargeMessagePath"]
@@ -206,6 +968,7 @@ def delete_conversation_by_id(user_id: str, conversation_id: str):
             Key={"PK": user_id, "SK": compose_conv_id(user_id, conversation_id)},
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
         )
+        _delete_deltas(table, user_id, conversation_id)
         delete_related_documents(
             user_id=user_id,
             conversation_id=conversation_id,
@@ -222,57 +985,200 @@ def delete_conversation_by_id(user_id: str, conversation_id: str):
     return response
 
 
-def delete_conversation_by_user_id(user_id: str):
+def _query_sort_keys(table, user_id: str, prefix: str) -> Iterator[list[str]]:
+    """Yield the sort keys of the items of the user with the prefix, page by page."""
+    query_params = {
+        "KeyConditionExpression": Key("PK").eq(user_id) & Key("SK").begins_with(prefix),
+        "ProjectionExpression": "SK",
+    }
+    while True:
+        response = table.query(**query_params)
+        sort_keys = [item["SK"] for item in response.get("Items") or []]
+        if sort_keys:
+            yield sort_keys
+
+        if "LastEvaluatedKey" not in response:
+            break
+        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _batch_delete_items(table, user_id: str, sort_keys: list[str]) -> int:
+    """Delete up to `TRANSACTION_BATCH_WRITE_SIZE` items with BatchWriteItem,
+    retrying the unprocessed items with exponential backoff.
+    """
+    request_items = {
+        table.name: [
+            {"DeleteRequest": {"Key": {"PK": user_id, "SK": sort_key}}}
+            for sort_key in sort_keys
+        ]
+    }
+    for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+        if attempt > 0:
+            time.sleep(min(BATCH_WRITE_BACKOFF_SECONDS * 2**attempt, 5))
+        response = table.meta.client.batch_write_item(RequestItems=request_items)
+        request_items = response.get("UnprocessedItems")
+        if not request_items:
+            return len(sort_keys)
+
+    raise RuntimeError(
+        f"Failed to delete {len(request_items[table.name])} items after {BATCH_WRITE_MAX_ATTEMPTS} attempts"
+    )
+
+
+def _delete_objects(keys: list[str]) -> int:
+    """Delete up to `S3_DELETE_OBJECTS_BATCH_SIZE` objects with DeleteObjects."""
+    response = s3_client.delete_objects(
+        Bucket=LARGE_MESSAGE_BUCKET,
+        Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+    )
+    errors = response.get("Errors") or []
+    if errors:
+        raise RuntimeError(f"Failed to delete {len(errors)} objects: {errors[0]}")
+    return len(keys)
+
+
+def delete_conversation_by_user_id(
+    user_id: str, on_progress: Callable[[int, int], None] | None = None
+):
+    """Delete all the conversations of the user, with their deltas, related documents and S3 objects.
+    The key prefixes of the items are queried in parallel, and each page is deleted with parallel
+    BatchWriteItem calls. S3 objects are deleted after the items, so that a failed deletion
+    never leaves conversations whose message maps are gone.
+    `on_progress` is called with the numbers of items and objects deleted since the last call.
+    """
     logger.info(f"Deleting ALL conversations for user: {user_id}")
     table = get_conversation_table_client(user_id)
+    conversation_cache.delete(user_id)
 
-    query_params = {
-        "KeyConditionExpression": Key("PK").eq(user_id)
-        # NOTE: Need SK to fetch only conversations
-        & Key("SK").begins_with(f"{user_id}#CONV#"),
-        "ProjectionExpression": "SK, IsLargeMessage, LargeMessagePath",
-    }
+    progress_lock = Lock()
 
-    def delete_batch(batch):
-        with table.batch_writer() as writer:
-            for item in batch:
-                writer.delete_item(Key={"PK": user_id, "SK": item["SK"]})
-
-    def delete_large_messages(items):
-        for item in items:
-            if item.get("IsLargeMessage", False):
-                s3_client.delete_object(
-                    Bucket=LARGE_MESSAGE_BUCKET, Key=item["LargeMessagePath"]
-                )
+    def report(deleted_items: int, deleted_objects: int):
+        if on_progress is not None:
+            with progress_lock:
+                on_progress(deleted_items, deleted_objects)
 
-    try:
-        response = table.query(
-            **query_params,
-        )
+    def delete_items(sort_keys: list[str]):
+        report(_batch_delete_items(table, user_id, sort_keys), 0)
+
+    def delete_objects(keys: list[str]):
+        report(0, _delete_objects(keys))
 
-        while True:
-            items = response.get("Items", [])
-            delete_large_messages(items)
+    with ThreadPoolExecutor(max_workers=BULK_DELETION_MAX_WORKERS) as executor:
 
-            for i in range(0, len(items), TRANSACTION_BATCH_WRITE_SIZE):
-                batch = items[i : i + TRANSACTION_BATCH_WRITE_SIZE]
-                delete_batch(batch)
+        def delete_segment(prefix: str) -> list[Future]:
+            futures = []
+            for sort_keys in _query_sort_keys(table, user_id, prefix):
+                for i in range(0, len(sort_keys), TRANSACTION_BATCH_WRITE_SIZE):
+                    futures.append(
+                        executor.submit(
+                            delete_items,
+                            sort_keys[i : i + TRANSACTION_BATCH_WRITE_SIZE],
+                        )
+                    )
+            return futures
 
-            # Check if next page exists
-            if "LastEvaluatedKey" not in response:
-                break
+        # NOTE: Need SK prefixes to delete only conversation data
+        prefixes = [
+            f"{user_id}#CONV#",
+            f"{user_id}#CONV_DELTA#",
+            f"{user_id}#RELATED_DOCUMENT#",
+        ]
+        with ThreadPoolExecutor(max_workers=len(prefixes)) as segment_executor:
+            segments = list(segment_executor.map(delete_segment, prefixes))
+        for future in [future for futures in segments for future in futures]:
+            future.result()
 
-            # Load next page
-            query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
-            response = table.query(
-                **query_params,
+        # Large message maps and blobs of all the conversations are under the user prefix
+        paginator = s3_client.get_paginator("list_objects_v2")
+        futures = [
+            executor.submit(
+                delete_objects, [content["Key"] for content in page["Contents"]]
             )
+            for page in paginator.paginate(
+                Bucket=LARGE_MESSAGE_BUCKET,
+                Prefix=f"{user_id}/",
+                PaginationConfig={"PageSize": S3_DELETE_OBJECTS_BATCH_SIZE},
+            )
+            if page.get("Contents")
+        ]
+        for future in futures:
+            future.result()
 
-        delete_related_documents(user_id=user_id)
 
-    except ClientError as e:
-        logger.error(f"An error occurred: {e.response['Error']['Message']}")
-        raise e
+def start_conversation_deletion_job(user_id: str) -> ConversationDeletionJobModel:
+    """Record a new deletion job of all the conversations of the user.
+    Raises ResourceConflictError if a job is already running.
+    """
+    table = get_conversation_table_client(user_id)
+    now = get_current_time()
+    job = ConversationDeletionJobModel(
+        id=str(ULID()),
+        status="RUNNING",
+        deleted_items=0,
+        deleted_objects=0,
+        create_time=now,
+        update_time=now,
+    )
+    try:
+        table.put_item(
+            Item={
+                "PK": user_id,
+                "SK": compose_conv_deletion_job_id(user_id),
+                "JobId": job.id,
+                "Status": job.status,
+                "DeletedItems": job.deleted_items,
+                "DeletedObjects": job.deleted_objects,
+                "CreateTime": now,
+                "UpdateTime": now,
+            },
+            # A job which stopped updating is considered dead, e.g. by the Lambda timeout
+            ConditionExpression="attribute_not_exists(PK) OR #Status <> :running OR UpdateTime < :stale",
+            ExpressionAttributeNames={"#Status": "Status"},
+            ExpressionAttributeValues={
+                ":running": "RUNNING",
+                ":stale": now - CONVERSATION_DELETION_JOB_TIMEOUT_SECONDS * 1000,
+            },
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        raise ResourceConflictError("Conversations are already being deleted")
+    return job
+
+
+def update_conversation_deletion_job(user_id: str, job: ConversationDeletionJobModel):
+    table = get_conversation_table_client(user_id)
+    job.update_time = get_current_time()
+    table.update_item(
+        Key={"PK": user_id, "SK": compose_conv_deletion_job_id(user_id)},
+        UpdateExpression="SET #Status = :status, DeletedItems = :deleted_items, DeletedObjects = :deleted_objects, UpdateTime = :update_time",
+        ConditionExpression="JobId = :job_id",
+        ExpressionAttributeNames={"#Status": "Status"},
+        ExpressionAttributeValues={
+            ":status": job.status,
+            ":deleted_items": job.deleted_items,
+            ":deleted_objects": job.deleted_objects,
+            ":update_time": int(job.update_time),
+            ":job_id": job.id,
+        },
+    )
+
+
+def find_conversation_deletion_job(user_id: str) -> ConversationDeletionJobModel:
+    table = get_conversation_table_client(user_id)
+    item = table.get_item(
+        Key={"PK": user_id, "SK": compose_conv_deletion_job_id(user_id)},
+        ConsistentRead=True,
+    ).get("Item")
+    if item is None:
+        raise RecordNotFoundError(f"No deletion job found for user: {user_id}")
+
+    return ConversationDeletionJobModel(
+        id=item["JobId"],
+        status=item["Status"],
+        deleted_items=int(item["DeletedItems"]),
+        deleted_objects=int(item["DeletedObjects"]),
+        create_time=float(item["CreateTime"]),
+        update_time=float(item["UpdateTime"]),
+    )
 
 
 def change_conversation_title(user_id: str, conversation_id: str, new_title: str):
@@ -307,25 +1213,11 @@ def update_feedback(
     user_id: str, conversation_id: str, message_id: str, feedback: FeedbackModel
 ):
     logger.info(f"Updating feedback for conversation: {conversation_id}")
-    table = get_conversation_table_client(user_id)
     conv = find_conversation_by_id(user_id, conversation_id)
-    message_map = conv.message_map
-    message_map[message_id].feedback = feedback
+    conv.message_map[message_id].feedback = feedback
 
-    response = table.update_item(
-        Key={
-            "PK": user_id,
-            "SK": compose_conv_id(user_id, conversation_id),
-        },
-        UpdateExpression="set MessageMap = :m",
-        ExpressionAttributeValues={
-            ":m": json.dumps(
-                {k: v.model_dump(by_alias=True) for k, v in message_map.items()}
-            )
-        },
-        ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
-        ReturnValues="UPDATED_NEW",
-    )
+    # Only the message with the feedback is written as a delta
+    response = store_conversation(user_id, conv)
     logger.info(f"Updated feedback response: {response}")
     return response
 
@@ -0,0 +1,92 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from app.repositories.models.conversation_cache import ConversationCacheEntryModel
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Total size of the message maps cached in the process
+CONVERSATION_CACHE_MAX_BYTES = int(
+    os.environ.get("CONVERSATION_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+)
+
+
+class ConversationCache:
+    """LRU of conversation message maps living in the process, keyed by (user_id, conversation_id)
+    and bounded by their total size.
+    Callers compare the version of the entry with the stored conversation before using it.
+    """
+
+    def __init__(self, max_bytes: int = CONVERSATION_CACHE_MAX_BYTES) -> None:
+        self._lock = threading.Lock()
+        self._items: OrderedDict[tuple[str, str], ConversationCacheEntryModel] = (
+            OrderedDict()
+        )
+        self._size = 0
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, user_id: str, conversation_id: str
+    ) -> ConversationCacheEntryModel | None:
+        with self._lock:
+            entry = self._items.get((user_id, conversation_id))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end((user_id, conversation_id))
+            self.hits += 1
+            return entry
+
+    def put(
+        self, user_id: str, conversation_id: str, entry: ConversationCacheEntryModel
+    ) -> None:
+        size = len(entry.message_map)
+        with self._lock:
+            self._pop((user_id, conversation_id))
+            if size > self.max_bytes:
+                return
+
+            self._items[(user_id, conversation_id)] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted.message_map)
+
+    def delete(self, user_id: str, conversation_id: str | None = None) -> None:
+        """Delete the entry of the conversation, or all the entries of the user."""
+        with self._lock:
+            if conversation_id is not None:
+                self._pop((user_id, conversation_id))
+                return
+
+            for key in [key for key in self._items if key[0] == user_id]:
+                self._pop(key)
+
+    def _pop(self, key: tuple[str, str]):
+        entry = self._items.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry.message_map)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._items),
+                "bytes": self._size,
+            }
+
+
+conversation_cache = ConversationCache()
@@ -0,0 +1,171 @@
+"""Storage codec of conversation message maps.
+
+Format versions:
+- 1: The message map is stored as JSON with binary bodies inlined as base64.
+- 2: Binary bodies larger than `BLOB_MIN_SIZE` are replaced with `"$blob:<sha256>"` references
+  and stored as separate content-addressed objects. Message maps stored in S3 are gzip-compressed.
+
+The message map kept in DynamoDB stays JSON text in both versions, because it is also consumed
+by the conversation search pipeline and the usage analysis. References are strings for the same
+reason, and never collide with base64 text since `$` and `:` are not in its alphabet.
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+from collections.abc import Mapping
+from typing import Any
+
+from app.repositories.models.conversation import LazyMessageMap, MessageModel
+from pydantic import BaseModel
+
+MESSAGE_MAP_VERSION = 2
+# Binary bodies smaller than this are kept inline.
+BLOB_MIN_SIZE = 4 * 1024  # 4KB
+BLOB_REFERENCE_PREFIX = "$blob:"
+COMPRESSION_LEVEL = 6
+
+
+class EncodedMessageMap(BaseModel):
+    # Message map with binary bodies replaced by references
+    message_map: dict[str, Any]
+    # Serialized message map
+    text: str
+    # Serialized messages keyed by message id
+    message_texts: dict[str, str]
+    # Size of the serialized message map in bytes
+    size: int
+    # Binary bodies keyed by their digest
+    blobs: dict[str, bytes]
+
+
+# Keys holding arbitrary JSON (tool inputs and JSON tool results), which are not walked into.
+_OPAQUE_KEYS = {"input", "json"}
+
+
+def _binary_field(content: dict) -> str | None:
+    """Name of the binary field of the dumped content, if any."""
+    if content.get("content_type") in ("image", "attachment"):
+        return "body"
+
+    # Contents of tool results
+    elif "format" in content and isinstance(content.get("image"), str):
+        return "image"
+
+    elif "format" in content and isinstance(content.get("document"), str):
+        return "document"
+
+    return None
+
+
+def _walk_contents(value: Any):
+    """Yield all the dumped contents which have a binary field."""
+    if isinstance(value, dict):
+        if _binary_field(value) is not None:
+            yield value
+
+        for key, child in value.items():
+            if key not in _OPAQUE_KEYS and isinstance(child, (dict, list)):
+                yield from _walk_contents(child)
+
+    elif isinstance(value, list):
+        for child in value:
+            if isinstance(child, (dict, list)):
+                yield from _walk_contents(child)
+
+
+def _extract_blobs(message: dict, blobs: dict[str, bytes]):
+    """Replace large binary bodies of the dumped message with references in place."""
+    for content in _walk_contents(message):
+        field = _binary_field(content)
+        if field is None or content[field].startswith(BLOB_REFERENCE_PREFIX):
+            continue
+
+        # Estimated size of the decoded bytes, to avoid decoding small bodies
+        if len(content[field]) * 3 // 4 < BLOB_MIN_SIZE:
+            continue
+
+        data = base64.b64decode(content[field])
+        digest = hashlib.sha256(data).hexdigest()
+        blobs[digest] = data
+        content[field] = BLOB_REFERENCE_PREFIX + digest
+
+
+def encode_message_map(
+    message_map: Mapping[str, MessageModel],
+) -> EncodedMessageMap:
+    """Serialize the message map, extracting large binary bodies as content-addressed blobs.
+    Messages of `LazyMessageMap` which have not been accessed are written back as stored.
+    """
+    dumped: dict[str, Any] = {}
+    message_texts: dict[str, str] = {}
+    blobs: dict[str, bytes] = {}
+    for k in message_map:
+        stored = (
+            message_map.stored_message(k)
+            if isinstance(message_map, LazyMessageMap)
+            else None
+        )
+        if stored is not None:
+            dumped[k] = stored
+        else:
+            dumped[k] = message_map[k].model_dump(by_alias=True)
+            _extract_blobs(dumped[k], blobs)
+        message_texts[k] = json.dumps(dumped[k])
+
+    text = join_message_texts(message_texts)
+    return EncodedMessageMap(
+        message_map=dumped,
+        text=text,
+        message_texts=message_texts,
+        size=len(text.encode("utf-8")),
+        blobs=blobs,
+    )
+
+
+def join_message_texts(message_texts: dict[str, str]) -> str:
+    """Serialize the message map from its serialized messages, same as `json.dumps`."""
+    return (
+        "{"
+        + ", ".join(f"{json.dumps(k)}: {text}" for k, text in message_texts.items())
+        + "}"
+    )
+
+
+def digest_message_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def find_blob_references(message_map: dict[str, Any]) -> set[str]:
+    """Find digests of the blobs referenced from the stored message map."""
+    digests = set()
+    for content in _walk_contents(message_map):
+        field = _binary_field(content)
+        if field is None:
+            continue
+
+        if content[field].startswith(BLOB_REFERENCE_PREFIX):
+            digests.add(content[field][len(BLOB_REFERENCE_PREFIX) :])
+
+    return digests
+
+
+def resolve_blob_references(message_map: dict[str, Any], blobs: dict[str, bytes]):
+    """Replace the blob references in the stored message map with their bytes in place."""
+    for content in _walk_contents(message_map):
+        field = _binary_field(content)
+        if field is None:
+            continue
+
+        if content[field].startswith(BLOB_REFERENCE_PREFIX):
+            # Raw bytes are accepted by `Base64EncodedBytes`, so no need to encode again
+            content[field] = blobs[content[field][len(BLOB_REFERENCE_PREFIX) :]]
+
+
+def compress(text: str) -> bytes:
+    return gzip.compress(text.encode("utf-8"), compresslevel=COMPRESSION_LEVEL)
+
+
+def decompress(data: bytes) -> str:
+    return gzip.decompress(data).decode("utf-8")
@@ -1,137 +1,338 @@
+"""Conversation search over the messages indexed by `app.conversation_indexer`.
+
+The index holds one document per conversation, with its title, and one document per message,
+with the text of the message, both keyed by the conversation id. Title and text are indexed as
+`search_as_you_type`, so that the last term of the query matches as a prefix while typing,
+and the other terms tolerate typos.
+
+Hits are paged with `search_after`, ordered by score and time, and a conversation is returned
+once with its best matching documents. Conversations returned on previous pages are carried
+in the next token and excluded, because `collapse` cannot be combined with `search_after`.
+"""
+
+import base64
+import hashlib
+import json
 import logging
 import os
-from typing import Optional
+from typing import Any
 
 from app.repositories.common import get_opensearch_client
 from app.repositories.models.conversation_search import ConversationSearchModel
 from app.user import User
-from opensearchpy import OpenSearch
+from opensearchpy import ConnectionTimeout, OpenSearch
 
 env_prefix = os.environ.get("ENV_PREFIX", "")
-INDEX_NAME = f"{env_prefix}conversation"
+INDEX_NAME = f"{env_prefix}conversation-message"
+# Language of the analyzer of the indexed text
+CONVERSATION_SEARCH_LANGUAGE = os.environ.get("CONVERSATION_SEARCH_LANGUAGE", "en")
+# Matching documents per conversation to highlight
+HIGHLIGHT_DOCUMENTS_PER_CONVERSATION = 3
+CONVERSATION_SEARCH_MAX_LIMIT = 50
+# Conversations which can be paged through for a query, bounding the size of the next token
+CONVERSATION_SEARCH_MAX_RESULTS = int(
+    os.environ.get("CONVERSATION_SEARCH_MAX_RESULTS", 100)
+)
+# Time budget of the compact (type-ahead) search, returning partial results when exceeded,
+# so that searches superseded by the next keystroke do not hold the cluster
+CONVERSATION_SEARCH_COMPACT_TIMEOUT_MS = int(
+    os.environ.get("CONVERSATION_SEARCH_COMPACT_TIMEOUT_MS", 300)
+)
+# Hits fetched per request relative to the limit, as conversations match with several messages
+SEARCH_FETCH_SIZE_FACTOR = 3
+SEARCH_MAX_FETCHES = 3
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+def compose_conversation_index_body(
+    language: str = CONVERSATION_SEARCH_LANGUAGE,
+) -> dict:
+    """Settings and mappings of the conversation index."""
+    text: dict[str, Any] = {"type": "search_as_you_type"}
+    settings: dict[str, Any] = {}
+    if language == "ja":
+        text["analyzer"] = "ja_analyzer"
+        settings["analysis"] = {
+            "analyzer": {
+                "ja_analyzer": {
+                    "type": "custom",
+                    "char_filter": ["icu_normalizer"],
+                    "tokenizer": "kuromoji_tokenizer",
+                    "filter": [
+                        "kuromoji_baseform",
+                        "kuromoji_part_of_speech",
+                        "ja_stop",
+                        "kuromoji_number",
+                        "kuromoji_stemmer",
+                    ],
+                }
+            }
+        }
+
+    return {
+        "settings": settings,
+        "mappings": {
+            "dynamic": False,
+            "properties": {
+                # "conversation" or "message"
+                "DocType": {"type": "keyword"},
+                "PK": {"type": "keyword"},
+                "ConversationId": {"type": "keyword"},
+                "BotId": {"type": "keyword"},
+                "Title": text,
+                "CreateTime": {"type": "double"},
+                "LastUpdateTime": {"type": "double"},
+                # Empty for the conversation documents
+                "MessageId": {"type": "keyword"},
+                "Role": {"type": "keyword"},
+                "Body": text,
+            },
+        },
+    }
+
+
+def ensure_conversation_index(client: OpenSearch):
+    """Create the conversation index unless it exists."""
+    if client.indices.exists(index=INDEX_NAME):
+        return
+
+    logger.info(f"Creating index: {INDEX_NAME}")
+    client.indices.create(index=INDEX_NAME, body=compose_conversation_index_body())
+
+
+_HIGHLIGHT = {
+    "fields": {
+        "Title": {"fragment_size": 150, "number_of_fragments": 1},
+        "Body": {"fragment_size": 150, "number_of_fragments": 1},
+    },
+    "pre_tags": ["<em>"],
+    "post_tags": ["</em>"],
+    "require_field_match": False,
+    "order": "score",
+}
+
+# Unique per document, so that `search_after` neither skips nor repeats hits
+_SORT = [
+    {"_score": {"order": "desc"}},
+    {"CreateTime": {"order": "desc"}},
+    {"ConversationId": {"order": "asc"}},
+    {"MessageId": {"order": "asc"}},
+]
+
+
+def _digest_query(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+
+
+def _encode_next_token(user_id: str, query: str, after: list, seen: list[str]) -> str:
+    return base64.b64encode(
+        json.dumps(
+            {
+                "user": user_id,
+                "query": _digest_query(query),
+                "after": after,
+                "seen": seen,
+            }
+        ).encode("utf-8")
+    ).decode("utf-8")
+
+
+def _decode_next_token(
+    user_id: str, query: str, next_token: str
+) -> tuple[list, list[str]]:
+    try:
+        token = json.loads(base64.b64decode(next_token).decode("utf-8"))
+    except ValueError:
+        raise ValueError("Invalid next token")
+
+    if (
+        not isinstance(token, dict)
+        or token.get("user") != user_id
+        or token.get("query") != _digest_query(query)
+        or not isinstance(token.get("after"), list)
+        or not isinstance(token.get("seen"), list)
+    ):
+        raise ValueError("Invalid next token")
+    return token["after"], token["seen"]
+
+
+def compose_search_body(
+    query: str,
+    user: User,
+    size: int,
+    compact: bool = False,
+    search_after: list | None = None,
+    excluded_conversation_ids: list[str] | None = None,
+) -> dict[str, Any]:
+    """Search body over the conversation and message documents of the user."""
+    # The last term matches as a prefix, and the others with typos
+    should: list[dict] = [
+        {
+            "multi_match": {
+                "query": query,
+                "type": "bool_prefix",
+                "fields": [
+                    "Title^3",
+                    "Title._2gram^3",
+                    "Title._3gram^3",
+                    "Body^2",
+                    "Body._2gram^2",
+                    "Body._3gram^2",
+                ],
+                "fuzziness": "AUTO",
+            }
+        }
+    ]
+    if not compact:
+        # Exact phrases rank first
+        should.append({"match_phrase": {"Body": {"query": query, "boost": 5.0}}})
+
+    body: dict[str, Any] = {
+        "query": {
+            "bool": {
+                "should": should,
+                "minimum_should_match": 1,
+                # Only search conversations belonging to the user
+                "filter": [{"term": {"PK": user.id}}],
+            }
+        },
+        "_source": ["ConversationId"],
+        "size": size,
+        "sort": _SORT,
+        "track_total_hits": False,
+    }
+    if excluded_conversation_ids:
+        body["query"]["bool"]["must_not"] = [
+            {"terms": {"ConversationId": excluded_conversation_ids}}
+        ]
+    if search_after is not None:
+        body["search_after"] = search_after
+    if compact:
+        body["timeout"] = f"{CONVERSATION_SEARCH_COMPACT_TIMEOUT_MS}ms"
+    else:
+        body["highlight"] = _HIGHLIGHT
+    return body
+
+
 def find_conversations_by_query(
     query: str,
     user: User,
     limit: int = 20,
+    next_token: str | None = None,
+    compact: bool = False,
     client: OpenSearch | None = None,
-) -> list[ConversationSearchModel]:
-    """Search conversations by query string.
-    This method searches through both the conversation title and message content.
+) -> tuple[list[ConversationSearchModel], str | None]:
+    """Search conversations by query string, best match first.
+    This method searches through both the conversation title and message content, matching
+    the last term as a prefix. Pass the returned token to get the next page.
+    The compact mode for type-ahead skips the highlights and the phrase matching,
+    and returns the results found within `CONVERSATION_SEARCH_COMPACT_TIMEOUT_MS`.
     """
+    if not 1 <= limit <= CONVERSATION_SEARCH_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {CONVERSATION_SEARCH_MAX_LIMIT}")
+
     client = client or get_opensearch_client(collection_type="conversation")
 
     logger.info(f"Searching conversations with query: {query} in index: {INDEX_NAME}")
 
-    # Only search conversations belonging to the user
-    # Combining both filtering conditions for more restrictive search
-    filter_must = [
-        {"term": {"PK.keyword": user.id}},
-        {"prefix": {"SK.keyword": f"{user.id}#CONV#"}},
-    ]
+    search_after = None
+    seen: list[str] = []
+    if next_token:
+        search_after, seen = _decode_next_token(user.id, query, next_token)
+    limit = min(limit, CONVERSATION_SEARCH_MAX_RESULTS - len(seen))
+    if limit <= 0:
+        return [], None
 
-    search_body = {
-        "query": {
-            "bool": {
-                "should": [
-                    # Title search
-                    {"match": {"Title": {"query": query, "boost": 3.0}}},
-                    # Message content search (array field search)
-                    {
-                        "match": {
-                            "messages.value.content.body": {
-                                "query": query,
-                                "boost": 2.0,
-                            }
-                        }
-                    },
-                    # Message content phrase search (array field search)
-                    {
-                        "match_phrase": {
-                            "messages.value.content.body": {
-                                "query": query,
-                                "boost": 5.0,
-                            }
-                        }
-                    },
-                    # Exact match search
-                    {
-                        "query_string": {
-                            "query": f'\\"{query}\\"',
-                            "fields": ["Title^3.0"],
-                            "type": "best_fields",
-                            "default_operator": "AND",
-                        }
-                    },
-                ],
-                "minimum_should_match": 1,
-                "filter": {"bool": {"must": filter_must}},
-            }
-        },
-        "size": limit,
-        "sort": [
-            {"_score": {"order": "desc"}},  # 1. Primary sort by relevance score
-            {
-                "messages.value.create_time": {
-                    "order": "desc",
-                    "mode": "max",  # Sort by the most recent message time
-                }
-            },  # 2. Secondary sort by message recency
-        ],
-        "highlight": {
-            "fields": {
-                "Title": {
-                    "pre_tags": ["<em>"],
-                    "post_tags": ["</em>"],
-                    "fragment_size": 150,
-                    "number_of_fragments": 1,
-                },
-                "messages.value.content.body": {
-                    "fragment_size": 150,
-                    "number_of_fragments": 3,
-                    "pre_tags": ["<em>"],
-                    "post_tags": ["</em>"],
-                    "highlight_query": {
-                        "bool": {
-                            "should": [
-                                {"match": {"messages.value.content.body": query}},
-                                {
-                                    "match_phrase": {
-                                        "messages.value.content.body": query
-                                    }
-                                },
-                            ]
+    # Hits of each conversation found, best first
+    found: dict[str, list[dict]] = {}
+    fetch_size = limit * SEARCH_FETCH_SIZE_FACTOR
+    exhausted = False
+    try:
+        for _ in range(SEARCH_MAX_FETCHES):
+            body = compose_search_body(
+                query, user, fetch_size, compact, search_after, seen
+            )
+            logger.debug(f"Search body: {body}")
+            try:
+                response = client.search(
+                    index=INDEX_NAME,
+                    body=body,
+                    **(
+                        {
+                            "request_timeout": CONVERSATION_SEARCH_COMPACT_TIMEOUT_MS
+                            / 1000
+                            * 2
                         }
-                    },
-                },
-            },
-            "require_field_match": False,
-            "order": "score",
-        },
-    }
+                        if compact
+                        else {}
+                    ),
+                )
+            except ConnectionTimeout:
+                if not compact:
+                    raise
+                # Type-ahead returns what has been found, like a search timed out server-side
+                logger.info(f"Compact search timed out with query: {query}")
+                exhausted = True
+                break
+            hits = response["hits"]["hits"]
+            for hit in hits:
+                conversation_id = hit["_source"]["ConversationId"]
+                if conversation_id in found:
+                    if (
+                        len(found[conversation_id])
+                        < HIGHLIGHT_DOCUMENTS_PER_CONVERSATION
+                    ):
+                        found[conversation_id].append(hit)
+                elif len(found) < limit:
+                    found[conversation_id] = [hit]
+                else:
+                    # Read from this hit on the next page
+                    break
+                search_after = hit["sort"]
+            else:
+                exhausted = len(hits) < fetch_size or response.get("timed_out", False)
+                if not exhausted and len(found) < limit:
+                    continue
+            break
 
-    logger.debug(f"Search body: {search_body}")
+        if not found:
+            logger.info(f"Found 0 conversations matching query: {query}")
+            return [], None
 
-    try:
-        response = client.search(index=INDEX_NAME, body=search_body)
-        logger.debug(f"Search response: {response}")
+        # Titles are held by the conversation documents, which may not be among the hits
+        docs = client.mget(
+            index=INDEX_NAME,
+            body={"ids": list(found)},
+            _source_includes=["PK", "Title", "BotId", "CreateTime", "LastUpdateTime"],
+        )["docs"]
+        sources = {
+            doc["_id"]: doc["_source"]
+            for doc in docs
+            if doc.get("found") and doc["_source"].get("PK") == user.id
+        }
 
         conversations = []
-        for hit in response["hits"]["hits"]:
+        for conversation_id, conversation_hits in found.items():
             try:
                 conversation_meta = ConversationSearchModel.from_opensearch_response(
-                    hit
+                    conversation_hits, sources.get(conversation_id)
                 )
                 conversations.append(conversation_meta)
             except Exception as e:
-                logger.error(f"Error processing hit: {e}, hit: {hit}")
+                logger.error(f"Error processing hits: {e}, hits: {conversation_hits}")
                 continue
         logger.info(f"Found {len(conversations)} conversations matching query: {query}")
-        return conversations
     except Exception as e:
         logger.error(f"Error searching conversations: {e}")
         raise
+
+    seen = seen + list(found)
+    if (
+        exhausted
+        or search_after is None
+        or len(seen) >= CONVERSATION_SEARCH_MAX_RESULTS
+    ):
+        return conversations, None
+    return conversations, _encode_next_token(user.id, query, search_after, seen)
@@ -2,19 +2,22 @@ import base64
 import json
 import logging
 import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from decimal import Decimal as decimal
 from typing import Union
 
 import boto3
 from app.config import DEFAULT_GENERATION_CONFIG
+from app.repositories.bot_cache import bot_cache, compose_entry
 from app.repositories.common import (
     TRANSACTION_BATCH_READ_SIZE,
     RecordNotFoundError,
+    compose_access_principals,
     compose_item_type,
     compose_sk,
     get_bot_table_client,
-    get_dynamodb_client,
 )
 from app.repositories.models.custom_bot import (
     ActiveModelsModel,
@@ -34,11 +37,30 @@ from app.repositories.models.custom_bot_kb import BedrockKnowledgeBaseModel
 from app.routes.schemas.bot import type_shared_scope, type_sync_status
 from app.utils import get_current_time
 from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
 logger.setLevel("INFO")
 
+# Pages queried by a bot listing before returning a token to continue from
+BOT_LIST_MAX_PAGES = int(os.environ.get("BOT_LIST_MAX_PAGES", 10))
+# BatchGetItem calls resolving aliases concurrently
+BOT_ALIAS_RESOLUTION_MAX_WORKERS = int(
+    os.environ.get("BOT_ALIAS_RESOLUTION_MAX_WORKERS", 4)
+)
+BATCH_GET_MAX_ATTEMPTS = 8
+BATCH_GET_BACKOFF_SECONDS = 0.05
+
+# Attributes changed without updating `UpdateTime`. Refreshed on revalidation of cached bots.
+_BOT_VOLATILE_ATTRIBUTES = [
+    "UpdateTime",
+    "CreateTime",
+    "LastUsedTime",
+    "IsStarred",
+    "UsageStats",
+]
+
 
 class BotNotFoundException(Exception):
     """Exception raised when a bot is not found."""
@@ -68,6 +90,12 @@ def store_bot(custom_bot: BotModel):
         "SharedStatus": custom_bot.shared_status,
         "AllowedCognitoGroups": custom_bot.allowed_cognito_groups,
         "AllowedCognitoUsers": custom_bot.allowed_cognito_users,
+        "AccessPrincipals": compose_access_principals(
+            custom_bot.owner_user_id,
+            custom_bot.shared_scope,
+            custom_bot.allowed_cognito_users,
+            custom_bot.allowed_cognito_groups,
+        ),
         "GenerationParams": custom_bot.generation_params.model_dump(),
         "AgentData": custom_bot.agent.model_dump(),
         "Knowledge": custom_bot.knowledge.model_dump(),
@@ -84,6 +112,7 @@ def store_bot(custom_bot: BotModel):
         ],
         "ActiveModels": custom_bot.active_models.model_dump(),  # type: ignore[attr-defined]
         "UsageStats": custom_bot.usage_stats.model_dump(),
+        "UpdateTime": decimal(get_current_time()),
     }
 
     if custom_bot.last_used_time:
@@ -100,6 +129,7 @@ def store_bot(custom_bot: BotModel):
         item["GuardrailsParams"] = custom_bot.bedrock_guardrails.model_dump()
 
     response = table.put_item(Item=item)
+    _invalidate_bot_cache(custom_bot.id)
     logger.info(f"Stored bot: {custom_bot.id} successfully")
     return response
 
@@ -140,7 +170,8 @@ def update_bot(
         "GenerationParams = :generation_params, "
         "DisplayRetrievedChunks = :display_retrieved_chunks, "
         "ConversationQuickStarters = :conversation_quick_starters, "
-        "ActiveModels = :active_models"
+        "ActiveModels = :active_models, "
+        "UpdateTime = :update_time"
     )
 
     expression_attribute_values = {
@@ -158,6 +189,7 @@ def update_bot(
             starter.model_dump() for starter in conversation_quick_starters
         ],
         ":active_models": active_models.model_dump(),  # type: ignore[attr-defined]
+        ":update_time": decimal(get_current_time()),
     }
     if bedrock_knowledge_base:
         update_expression += ", BedrockKnowledgeBase = :bedrock_knowledge_base"
@@ -185,6 +217,7 @@ def update_bot(
         else:
             raise e
 
+    _invalidate_bot_cache(bot_id)
     return response
 
 
@@ -224,11 +257,12 @@ def update_bot_last_used_time(user_id: str, bot_id: str):
     """Update last used time for bot."""
     table = get_bot_table_client()
     logger.info(f"Updating last used time for bot: {bot_id}")
+    current_time = get_current_time()
     try:
         response = table.update_item(
             Key={"PK": user_id, "SK": compose_sk(bot_id, "bot")},
             UpdateExpression="SET LastUsedTime = :val",
-            ExpressionAttributeValues={":val": decimal(get_current_time())},
+            ExpressionAttributeValues={":val": decimal(current_time)},
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
         )
     except ClientError as e:
@@ -236,6 +270,9 @@ def update_bot_last_used_time(user_id: str, bot_id: str):
             raise RecordNotFoundError(f"Bot with id {bot_id} not found")
         else:
             raise e
+
+    # Updated on every chat, so the cached bot is patched instead of invalidated
+    bot_cache.patch(bot_id, {"last_used_time": float(current_time)})
     return response
 
 
@@ -273,13 +310,102 @@ def update_bot_stats(owner_user_id: str, bot_id: str, increment: int):
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
             ReturnValues="ALL_NEW",
         )
-        return response
     except ClientError as e:
         if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
             raise RecordNotFoundError(f"Bot with id {bot_id} not found")
         else:
             raise e
 
+    bot_cache.patch(
+        bot_id,
+        {
+            "usage_stats": UsageStatsModel.model_validate(
+                response["Attributes"]["UsageStats"]
+            )
+        },
+    )
+    return response
+
+
+def update_bot_usage(
+    owner_user_id: str, bot_id: str, increment: int, last_used_time: int | None
+):
+    """Apply the aggregated usage of the bot: add the increment to the usage count
+    and set the last used time, which is never moved backward.
+    """
+    table = get_bot_table_client()
+    logger.info(f"Updating usage of bot: {bot_id}")
+
+    key = {"PK": owner_user_id, "SK": compose_sk(bot_id, "bot")}
+    # `ADD` does not support nested attributes, so the usage count is incremented by `SET`
+    update_expression = "SET UsageStats.usage_count = if_not_exists(UsageStats.usage_count, :zero) + :val"
+    expression_attribute_values = {":zero": 0, ":val": increment}
+
+    response = None
+    if last_used_time is not None:
+        try:
+            response = table.update_item(
+                Key=key,
+                UpdateExpression=f"{update_expression}, LastUsedTime = :last_used_time",
+                ExpressionAttributeValues={
+                    **expression_attribute_values,
+                    ":last_used_time": decimal(last_used_time),
+                },
+                ConditionExpression="attribute_exists(PK) AND attribute_not_exists(LastUsedTime) OR attribute_exists(PK) AND LastUsedTime < :last_used_time",
+                ReturnValues="ALL_NEW",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise e
+            # Used more recently by another container, or the bot does not exist
+
+    if response is None:
+        try:
+            response = table.update_item(
+                Key=key,
+                UpdateExpression=update_expression,
+                ExpressionAttributeValues=expression_attribute_values,
+                ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
+                ReturnValues="ALL_NEW",
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise RecordNotFoundError(f"Bot with id {bot_id} not found")
+            else:
+                raise e
+
+    item = response["Attributes"]
+    bot_cache.patch(
+        bot_id,
+        {
+            "usage_stats": UsageStatsModel.model_validate(item["UsageStats"]),
+            "last_used_time": float(item.get("LastUsedTime", item["CreateTime"])),
+        },
+    )
+    return response
+
+
+def update_alias_usage(user_id: str, original_bot_id: str, last_used_time: int):
+    """Set the last used time of the alias, which is never moved backward.
+    Nothing is updated if the alias does not exist.
+    """
+    table = get_bot_table_client()
+    logger.info(f"Updating usage of alias: {original_bot_id}")
+    try:
+        response = table.update_item(
+            Key={"PK": user_id, "SK": compose_sk(original_bot_id, "alias")},
+            UpdateExpression="SET LastUsedTime = :last_used_time",
+            ExpressionAttributeValues={":last_used_time": decimal(last_used_time)},
+            ConditionExpression="attribute_exists(PK) AND attribute_not_exists(LastUsedTime) OR attribute_exists(PK) AND LastUsedTime < :last_used_time",
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            logger.info(f"Alias {original_bot_id} is used more recently or not found")
+            return None
+        else:
+            raise e
+    return response
+
 
 def update_bot_star_status(user_id: str, bot_id: str, starred: bool):
     """Update starred status for bot."""
@@ -304,6 +430,7 @@ def update_bot_star_status(user_id: str, bot_id: str, starred: bool):
             ReturnValues="ALL_NEW",
         )
 
+    bot_cache.patch(bot_id, {"is_starred": starred})
     logger.info(f"Updated starred status for bot: {bot_id} successfully")
     return response
 
@@ -344,10 +471,11 @@ def update_knowledge_base_id(
     try:
         response = table.update_item(
             Key={"PK": user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="SET BedrockKnowledgeBase.knowledge_base_id = :kb_id, BedrockKnowledgeBase.data_source_ids = :ds_ids",
+            UpdateExpression="SET BedrockKnowledgeBase.knowledge_base_id = :kb_id, BedrockKnowledgeBase.data_source_ids = :ds_ids, UpdateTime = :update_time",
             ExpressionAttributeValues={
                 ":kb_id": knowledge_base_id,
                 ":ds_ids": data_source_ids,
+                ":update_time": decimal(get_current_time()),
             },
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
             ReturnValues="ALL_NEW",
@@ -359,6 +487,7 @@ def update_knowledge_base_id(
         else:
             raise e
 
+    _invalidate_bot_cache(bot_id)
     return response
 
 
@@ -371,10 +500,11 @@ def update_guardrails_params(
     try:
         response = table.update_item(
             Key={"PK": user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="SET GuardrailsParams.guardrail_arn = :guardrail_arn, GuardrailsParams.guardrail_version = :guardrail_version",
+            UpdateExpression="SET GuardrailsParams.guardrail_arn = :guardrail_arn, GuardrailsParams.guardrail_version = :guardrail_version, UpdateTime = :update_time",
             ExpressionAttributeValues={
                 ":guardrail_arn": guardrail_arn,
                 ":guardrail_version": guardrail_version,
+                ":update_time": decimal(get_current_time()),
             },
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
             ReturnValues="ALL_NEW",
@@ -386,6 +516,7 @@ def update_guardrails_params(
         else:
             raise e
 
+    _invalidate_bot_cache(bot_id)
     return response
 
 
@@ -401,11 +532,15 @@ def update_bot_shared_status(
     table = get_bot_table_client()
     logger.info(f"Updating shared status for bot: {bot_id}")
 
-    update_expression = "SET SharedStatus = :shared_status, AllowedCognitoUsers = :allowed_user_ids, AllowedCognitoGroups = :allowed_group_ids"
+    update_expression = "SET SharedStatus = :shared_status, AllowedCognitoUsers = :allowed_user_ids, AllowedCognitoGroups = :allowed_group_ids, AccessPrincipals = :access_principals, UpdateTime = :update_time"
     expression_attribute_values = {
         ":shared_status": shared_status,
         ":allowed_user_ids": allowed_user_ids,
         ":allowed_group_ids": allowed_group_ids,
+        ":access_principals": compose_access_principals(
+            owner_user_id, shared_scope, allowed_user_ids, allowed_group_ids
+        ),
+        ":update_time": decimal(get_current_time()),
     }
 
     if shared_scope != "private":
@@ -428,6 +563,8 @@ def update_bot_shared_status(
             raise RecordNotFoundError(f"Bot with id {bot_id} not found")
         else:
             raise e
+
+    _invalidate_bot_cache(bot_id)
     return response
 
 
@@ -456,7 +593,6 @@ def find_owned_bots_by_user_id(user_id: str, limit: int | None = None) -> list[B
     """Find all owned bots by user id.
     The order is descending by `last_used_time`.
     """
-    table = get_bot_table_client()
     logger.info(f"Finding bots for user: {user_id}")
 
     query_params = {
@@ -465,30 +601,7 @@ def find_owned_bots_by_user_id(user_id: str, limit: int | None = None) -> list[B
         # "ScanIndexForward": False,
     }
 
-    bots: list[BotMeta] = []
-    query_count = 0
-    MAX_QUERY_COUNT = 5
-
-    while query_count < MAX_QUERY_COUNT:
-        query_count += 1
-        response = table.query(**query_params)
-
-        bots = [
-            BotMeta.from_dynamo_item(item, owned=True, is_origin_accessible=True)
-            for item in response["Items"]
-        ]
-
-        if limit and len(bots) >= limit:
-            break
-        if "LastEvaluatedKey" not in response:
-            break
-        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
-
-    if query_count == MAX_QUERY_COUNT:
-        logger.warning("There are more bots than the query limit.")
-
-    if limit:
-        bots = bots[:limit]
+    bots = _find_all_bots(user_id, query_params)
 
     # Sort by last used time.
     # NOTE:
@@ -515,111 +628,171 @@ def find_owned_bots_by_user_id(user_id: str, limit: int | None = None) -> list[B
     # - Performance impact is minimal with expected dataset size (hundreds of bots per user)
     # - Simplifies bot creation by not requiring `LastUsedTime` to be set initially
     bots.sort(key=lambda x: x.last_used_time, reverse=True)
+    if limit:
+        bots = bots[:limit]
 
     logger.info(f"Found all owned {len(bots)} bots.")
     return bots
 
 
-def __find_bots_with_condition(
-    query_params: dict,
-    max_query_count: int = 5,
-) -> list[BotMeta]:
-    """Find all bots with the given query parameters.
-    Process summary:
-    1. Query bots with the given query parameters.
-    2. Separate bots and aliases.
-    3. Process direct bot items.
-    4. Process aliases. Batch get their original bots using DynamoDB client.
-    5. If original bot is not found, create a BotMeta object with `is_origin_accessible=False`.
+def _encode_bot_list_token(last_evaluated_key: dict) -> str:
+    # Keys of `LastUsedTimeIndex` contain numbers, so they are encoded with their types
+    serializer = TypeSerializer()
+    return base64.b64encode(
+        json.dumps(
+            {k: serializer.serialize(v) for k, v in last_evaluated_key.items()}
+        ).encode("utf-8")
+    ).decode("utf-8")
+
+
+def _decode_bot_list_token(user_id: str, next_token: str) -> dict:
+    deserializer = TypeDeserializer()
+    try:
+        encoded = json.loads(base64.b64decode(next_token).decode("utf-8"))
+        last_evaluated_key = {
+            k: deserializer.deserialize(v) for k, v in encoded.items()
+        }
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid next token")
+
+    if last_evaluated_key.get("PK") != user_id:
+        raise ValueError("Invalid next token")
+    return last_evaluated_key
+
+
+def _batch_get_bot_items(table, keys: list[dict]) -> list[dict]:
+    """Read up to `TRANSACTION_BATCH_READ_SIZE` bot items with BatchGetItem,
+    retrying the unprocessed keys with exponential backoff. Bots not found are omitted.
     """
-    client = get_dynamodb_client(
-        table_type="bot"
-    )  # Use DynamoDB client for batch_get_item
-    table = get_bot_table_client()
-    bots = []
-    query_count = 0
-
-    while query_count < max_query_count:
-        query_count += 1
-        response = table.query(**query_params)
-
-        # Separate bots and aliases
-        bot_items = []
-        alias_items = []
-        for item in response["Items"]:
-            if "BOT" in item["ItemType"]:  # Direct bot
-                bot_items.append(item)
-            else:  # Alias
-                alias_items.append(item)
-
-        # Process direct bot items
-        for item in bot_items:
-            bots.append(
-                BotMeta.from_dynamo_item(item, owned=True, is_origin_accessible=True)
-            )
+    items: list[dict] = []
+    request_items = {table.name: {"Keys": keys}}
+    for attempt in range(BATCH_GET_MAX_ATTEMPTS):
+        if attempt > 0:
+            time.sleep(min(BATCH_GET_BACKOFF_SECONDS * 2**attempt, 5))
+        response = table.meta.client.batch_get_item(RequestItems=request_items)
+        items.extend(response["Responses"].get(table.name, []))
+        request_items = response.get("UnprocessedKeys")
+        if not request_items:
+            return items
+
+    raise RuntimeError(
+        f"Failed to read {len(request_items[table.name]['Keys'])} bots after {BATCH_GET_MAX_ATTEMPTS} attempts"
+    )
 
-        # Process aliases and batch get original bots
-        if alias_items:
-            original_bot_ids = [item["OriginalBotId"] for item in alias_items]
-
-            for i in range(0, len(original_bot_ids), TRANSACTION_BATCH_READ_SIZE):
-                batch_ids = original_bot_ids[i : i + TRANSACTION_BATCH_READ_SIZE]
-                batch_aliases = alias_items[i : i + TRANSACTION_BATCH_READ_SIZE]
-                request_items = {
-                    table.table_name: {
-                        "Keys": [
-                            {
-                                "PK": alias["OwnerUserId"],
-                                "SK": compose_sk(bot_id, "bot"),
-                            }
-                            for alias, bot_id in zip(batch_aliases, batch_ids)
-                        ]
-                    }
-                }
-                original_bots_response = client.batch_get_item(
-                    RequestItems=request_items
-                )
-
-                # Create a map of original bot details
-                original_bot_map = {
-                    item.get("BotId"): item
-                    for item in original_bots_response.get("Responses", {}).get(
-                        table.table_name, []
-                    )
+
+def _alias_to_bot_meta(alias: dict, original_bot: dict | None) -> BotMeta:
+    if original_bot is None:
+        # If original bot is not found, create a BotMeta object with `is_origin_accessible=False`
+        return BotMeta.from_dynamo_alias_item(
+            alias,
+            owned=False,
+            is_origin_accessible=False,
+            is_starred=alias.get("IsStarred", False),
+        )
+
+    return BotMeta.from_dynamo_item(
+        original_bot,
+        owned=False,
+        is_origin_accessible=alias.get("IsOriginAccessible", False),
+        is_starred=alias.get("IsStarred", False),
+    )
+
+
+def _resolve_aliases(table, aliases: list[dict]) -> list[BotMeta]:
+    original_bots = {
+        item["BotId"]: item
+        for item in _batch_get_bot_items(
+            table,
+            [
+                {
+                    "PK": alias["OwnerUserId"],
+                    "SK": compose_sk(alias["OriginalBotId"], "bot"),
                 }
+                for alias in aliases
+            ],
+        )
+    }
+    return [
+        _alias_to_bot_meta(alias, original_bots.get(alias["OriginalBotId"]))
+        for alias in aliases
+    ]
 
-                # Create BotMeta objects for aliases
-                for alias in alias_items[i : i + TRANSACTION_BATCH_READ_SIZE]:
-                    original_bot = original_bot_map.get(alias["OriginalBotId"])
-                    if original_bot:
-                        bots.append(
-                            BotMeta.from_dynamo_item(
-                                original_bot,
-                                owned=False,
-                                is_origin_accessible=alias.get(
-                                    "IsOriginAccessible", False
-                                ),
-                                is_starred=alias.get("IsStarred", False),
-                            )
-                        )
-                    else:
-                        # If original bot is not found, create a BotMeta object with `is_origin_accessible=False`
-                        bots.append(
-                            BotMeta.from_dynamo_alias_item(
-                                alias,
-                                owned=False,
-                                is_origin_accessible=False,
-                                is_starred=alias.get("IsStarred", False),
-                            )
+
+def find_bots_page_by_condition(
+    user_id: str,
+    query_params: dict,
+    limit: int | None = None,
+    next_token: str | None = None,
+) -> tuple[list[BotMeta], str | None]:
+    """Find the bots and aliases of the user with the query, in the order of the index.
+    Process summary:
+    1. Query the pages one after another, up to `limit` items or `BOT_LIST_MAX_PAGES` pages.
+    2. Convert direct bot items as they are.
+    3. Resolve the aliases of each page to their original bots with BatchGetItem, running
+       concurrently with the query of the next page.
+    4. If original bot is not found, create a BotMeta object with `is_origin_accessible=False`.
+    Pass the returned token to continue, which is None after the last page.
+    """
+    table = get_bot_table_client()
+    query_params = dict(query_params)
+    if next_token is not None:
+        query_params["ExclusiveStartKey"] = _decode_bot_list_token(user_id, next_token)
+
+    # Bot metas, or futures of the aliases resolved in chunks, in the order of the index
+    results: list[BotMeta | Future[list[BotMeta]]] = []
+    count = 0
+    last_evaluated_key = None
+    with ThreadPoolExecutor(max_workers=BOT_ALIAS_RESOLUTION_MAX_WORKERS) as executor:
+        for _ in range(BOT_LIST_MAX_PAGES):
+            if limit is not None:
+                query_params["Limit"] = limit - count
+            response = table.query(**query_params)
+            count += len(response["Items"])
+
+            aliases: list[dict] = []
+            for item in response["Items"]:
+                if "BOT" in item["ItemType"]:  # Direct bot
+                    results.append(
+                        BotMeta.from_dynamo_item(
+                            item, owned=True, is_origin_accessible=True
                         )
+                    )
+                    continue
+
+                aliases.append(item)
+                if len(aliases) == TRANSACTION_BATCH_READ_SIZE:
+                    results.append(executor.submit(_resolve_aliases, table, aliases))
+                    aliases = []
+            if aliases:
+                results.append(executor.submit(_resolve_aliases, table, aliases))
+
+            last_evaluated_key = response.get("LastEvaluatedKey")
+            if last_evaluated_key is None or (limit is not None and count >= limit):
+                break
+            query_params["ExclusiveStartKey"] = last_evaluated_key
+
+        bots: list[BotMeta] = []
+        for result in results:
+            if isinstance(result, Future):
+                bots.extend(result.result())
+            else:
+                bots.append(result)
 
-        if "LastEvaluatedKey" not in response:
-            break
-        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    next_token = None
+    if last_evaluated_key is not None:
+        next_token = _encode_bot_list_token(last_evaluated_key)
+    return bots, next_token
 
-    if query_count == max_query_count:
-        logger.warning("There are more bots than the query limit.")
 
+def _find_all_bots(user_id: str, query_params: dict) -> list[BotMeta]:
+    """Find all the bots with the query, following the tokens to the last page."""
+    bots, next_token = find_bots_page_by_condition(user_id, query_params)
+    while next_token is not None:
+        logger.info(f"Continuing bot listing of user: {user_id}")
+        page, next_token = find_bots_page_by_condition(
+            user_id, query_params, next_token=next_token
+        )
+        bots.extend(page)
     return bots
 
 
@@ -634,7 +807,7 @@ def find_starred_bots_by_user_id(
         "KeyConditionExpression": Key("PK").eq(user_id) & Key("IsStarred").eq("TRUE"),
     }
 
-    bots = __find_bots_with_condition(query_params)
+    bots = _find_all_bots(user_id, query_params)
 
     # Sort bots by last used time
     bots.sort(key=lambda x: x.last_used_time, reverse=True)
@@ -657,18 +830,73 @@ def find_recently_used_bots_by_user_id(
         "ScanIndexForward": False,
     }
 
-    bots = __find_bots_with_condition(query_params)
+    # Ordered by `LastUsedTime` in the index, so only the first `limit` items are read
+    if limit:
+        bots, _ = find_bots_page_by_condition(user_id, query_params, limit=limit)
+    else:
+        bots = _find_all_bots(user_id, query_params)
 
     # Sort bots by last used time
     bots.sort(key=lambda x: x.last_used_time, reverse=True)
-    if limit:
-        bots = bots[:limit]
 
     logger.info(f"Found all recently used {len(bots)} bots.")
     return bots
 
 
+def _invalidate_bot_cache(bot_id: str):
+    bot_cache.delete(bot_id)
+
+
+def _update_time(item: dict) -> int | None:
+    return int(item["UpdateTime"]) if "UpdateTime" in item else None
+
+
+def _revalidate_cached_bot(bot: BotModel, update_time: int | None) -> BotModel | None:
+    """Return the cached bot with the volatile attributes refreshed, if it has not been updated.
+    Only the attributes not covered by `UpdateTime` are read.
+    """
+    table = get_bot_table_client()
+    response = table.get_item(
+        Key={"PK": bot.owner_user_id, "SK": compose_sk(bot.id, "bot")},
+        ProjectionExpression=", ".join(f"#{name}" for name in _BOT_VOLATILE_ATTRIBUTES),
+        ExpressionAttributeNames={
+            f"#{name}": name for name in _BOT_VOLATILE_ATTRIBUTES
+        },
+    )
+    item = response.get("Item")
+    if item is None or _update_time(item) != update_time:
+        return None
+
+    return bot.model_copy(
+        update={
+            "last_used_time": float(item.get("LastUsedTime", item["CreateTime"])),
+            "is_starred": bool(item.get("IsStarred", False)),
+            "usage_stats": (
+                UsageStatsModel.model_validate(item.get("UsageStats"))
+                if item.get("UsageStats")
+                else UsageStatsModel(usage_count=0)
+            ),
+        }
+    )
+
+
 def find_bot_by_id(bot_id: str) -> BotModel:
+    """Find a bot by id, served from the bot cache while the entry is fresh.
+    Expired entries are revalidated against `UpdateTime` and rebuilt only if the bot has been updated.
+    Missing bots are cached as well, for a shorter time.
+    """
+    entry = bot_cache.get(bot_id)
+    if entry is not None and entry.expire_time > time.monotonic():
+        if entry.bot is None:
+            raise RecordNotFoundError(f"Bot with id {bot_id} not found")
+        return entry.bot
+
+    if entry is not None and entry.bot is not None:
+        bot = _revalidate_cached_bot(entry.bot, entry.update_time)
+        if bot is not None:
+            bot_cache.put(bot_id, compose_entry(bot, entry.update_time))
+            return bot
+
     table = get_bot_table_client()
     logger.info(f"Finding bot with id: {bot_id}")
     response = table.query(
@@ -676,11 +904,19 @@ def find_bot_by_id(bot_id: str) -> BotModel:
     )
 
     if len(response["Items"]) == 0:
+        bot_cache.put(bot_id, compose_entry(None))
         raise RecordNotFoundError(f"Bot with id {bot_id} not found")
 
     item = response["Items"][0]
+    bot = _build_bot(item)
+    bot_cache.put(bot_id, compose_entry(bot, _update_time(item)))
+
+    logger.info(f"Found bot: {bot}")
+    return bot
+
 
-    bot = BotModel(
+def _build_bot(item: dict) -> BotModel:
+    return BotModel(
         id=item["BotId"],
         owner_user_id=item["PK"],
         title=item["Title"],
@@ -756,9 +992,6 @@ def find_bot_by_id(bot_id: str) -> BotModel:
         ),
     )
 
-    logger.info(f"Found bot: {bot}")
-    return bot
-
 
 def find_pinned_public_bots() -> list[BotMeta]:
     """Find all pinned bots."""
@@ -806,13 +1039,14 @@ def update_bot_publication(
     try:
         response = table.update_item(
             Key={"PK": owner_user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="SET ApiPublishmentStackName = :val, ApiPublishedDatetime = :time, ApiPublishCodeBuildId = :build_id",
+            UpdateExpression="SET ApiPublishmentStackName = :val, ApiPublishedDatetime = :time, ApiPublishCodeBuildId = :build_id, UpdateTime = :update_time",
             # NOTE: Stack naming rule: ApiPublishmentStack{published_api_id}.
             # See bedrock-chat-stack.ts > `ApiPublishmentStack`
             ExpressionAttributeValues={
                 ":val": f"ApiPublishmentStack{published_api_id}",
                 ":time": current_time,
                 ":build_id": build_id,
+                ":update_time": decimal(current_time),
             },
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
         )
@@ -822,6 +1056,7 @@ def update_bot_publication(
         else:
             raise e
 
+    _invalidate_bot_cache(bot_id)
     return response
 
 
@@ -831,7 +1066,8 @@ def delete_bot_publication(owner_user_id: str, bot_id: str):
     try:
         response = table.update_item(
             Key={"PK": owner_user_id, "SK": compose_sk(bot_id, "bot")},
-            UpdateExpression="REMOVE ApiPublishmentStackName, ApiPublishedDatetime, ApiPublishCodeBuildId",
+            UpdateExpression="SET UpdateTime = :update_time REMOVE ApiPublishmentStackName, ApiPublishedDatetime, ApiPublishCodeBuildId",
+            ExpressionAttributeValues={":update_time": decimal(get_current_time())},
             ConditionExpression="attribute_exists(PK) AND attribute_exists(SK)",
         )
     except ClientError as e:
@@ -840,6 +1076,7 @@ def delete_bot_publication(owner_user_id: str, bot_id: str):
         else:
             raise e
 
+    _invalidate_bot_cache(bot_id)
     return response
 
 
@@ -858,6 +1095,7 @@ def delete_bot_by_id(owner_user_id: str, bot_id: str):
         else:
             raise e
 
+    _invalidate_bot_cache(bot_id)
     return response
 
 
@@ -894,6 +1132,8 @@ def remove_bot_last_used_time(user_id: str, bot_id: str):
             raise RecordNotFoundError(f"Bot with id {bot_id} not found")
         else:
             raise e
+
+    _invalidate_bot_cache(bot_id)
     return response
 
 
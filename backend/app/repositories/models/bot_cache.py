@@ -0,0 +1,11 @@
+from app.repositories.models.custom_bot import BotModel
+from pydantic import BaseModel
+
+
+class BotCacheEntryModel(BaseModel):
+    # None for the bots which do not exist (negative entry)
+    bot: BotModel | None
+    # `UpdateTime` of the stored bot, compared with the stored item on revalidation
+    update_time: int | None = None
+    # Monotonic time after which the entry must be revalidated
+    expire_time: float
@@ -3,6 +3,7 @@ from __future__ import annotations
 import json
 import logging
 import re
+from collections.abc import Callable, Iterator, MutableMapping
 from pathlib import Path
 from typing import TYPE_CHECKING, Annotated, Any, Literal, Self, TypeGuard
 from urllib.parse import urlparse
@@ -38,7 +39,14 @@ from mypy_boto3_bedrock_runtime.type_defs import (
     ToolUseBlockOutputTypeDef,
     ToolUseBlockTypeDef,
 )
-from pydantic import BaseModel, Discriminator, Field, JsonValue, field_validator
+from pydantic import (
+    BaseModel,
+    Discriminator,
+    Field,
+    JsonValue,
+    PrivateAttr,
+    field_validator,
+)
 
 if TYPE_CHECKING:
     from app.agents.tools.agent_tool import ToolRunResult
@@ -692,6 +700,55 @@ class MessageModel(BaseModel):
         )
 
 
+class LazyMessageMap(MutableMapping[str, MessageModel]):
+    """Message map which parses the stored messages on first access.
+    Only the messages reached by the caller, e.g. a leaf-to-root path, are validated.
+    """
+
+    def __init__(
+        self,
+        stored_messages: dict[str, dict],
+        resolve: Callable[[dict], None] | None = None,
+    ) -> None:
+        # Values are either parsed messages or stored messages not accessed yet
+        self._messages: dict[str, MessageModel | dict] = dict(stored_messages)
+        # Called with a stored message before parsing, e.g. to resolve blob references
+        self._resolve = resolve
+
+    def __getitem__(self, key: str) -> MessageModel:
+        message = self._messages[key]
+        if isinstance(message, dict):
+            if self._resolve is not None:
+                self._resolve(message)
+            message = MessageModel.model_validate(message)
+            self._messages[key] = message
+        return message
+
+    def __setitem__(self, key: str, value: MessageModel) -> None:
+        self._messages[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._messages[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._messages)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._messages
+
+    def __repr__(self) -> str:
+        parsed = sum(1 for m in self._messages.values() if isinstance(m, MessageModel))
+        return f"LazyMessageMap(messages={len(self._messages)}, parsed={parsed})"
+
+    def stored_message(self, key: str) -> dict | None:
+        """Stored form of the message if it has not been accessed, thus not modified."""
+        message = self._messages[key]
+        return message if isinstance(message, dict) else None
+
+
 class ConversationModel(BaseModel):
     id: str
     create_time: float
@@ -702,6 +759,20 @@ class ConversationModel(BaseModel):
     bot_id: str | None
     should_continue: bool
 
+    # NOTE: Conversations loaded from the repository have `LazyMessageMap` as `message_map`.
+
+    # Storage state of the conversation, to write only the changes of a turn.
+    # Digests of the stored messages, None if the conversation is not stored yet.
+    _stored_message_digests: dict[str, str] | None = PrivateAttr(default=None)
+    # Sequence number of the last stored delta
+    _delta_seq: int = PrivateAttr(default=0)
+    # Sequence number of the last delta compacted into the snapshot
+    _snapshot_seq: int = PrivateAttr(default=0)
+    # Version of the stored message map, 0 if not stored yet or stored before versioning
+    _version: int = PrivateAttr(default=0)
+    # S3 key of the stored snapshot, if it is stored as a large message
+    _large_message_path: str | None = PrivateAttr(default=None)
+
 
 class ConversationMeta(BaseModel):
     id: str
@@ -711,6 +782,15 @@ class ConversationMeta(BaseModel):
     bot_id: str | None
 
 
+class ConversationDeletionJobModel(BaseModel):
+    id: str
+    status: Literal["RUNNING", "SUCCEEDED", "FAILED"]
+    deleted_items: int
+    deleted_objects: int
+    create_time: float
+    update_time: float
+
+
 class RelatedDocumentModel(BaseModel):
     content: ToolResultModel
     source_id: str
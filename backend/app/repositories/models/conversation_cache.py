@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+class ConversationCacheEntryModel(BaseModel):
+    # Version of the message map, incremented on every write of the messages
+    version: int
+    # Serialized message map in its stored form, i.e. with blob references
+    message_map: str
+    # Digests of the serialized messages, to detect the changed messages on the next write
+    message_digests: dict[str, str]
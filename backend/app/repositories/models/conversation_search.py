@@ -1,10 +1,8 @@
 from __future__ import annotations
 
-import json
 import logging
 from typing import Self
 
-from app.repositories.common import decompose_conv_id
 from pydantic import BaseModel, Field
 
 logger = logging.getLogger(__name__)
@@ -14,7 +12,7 @@ logger.setLevel(logging.INFO)
 class SearchHighlightModel(BaseModel):
     """Model representing highlight information for search results"""
 
-    field_name: str  # "Title" or "MessageMap"
+    field_name: str  # "Title" or "MessageBody"
     fragments: list[str]  # Text fragments containing the search term
 
 
@@ -28,27 +26,19 @@ class ConversationSearchModel(BaseModel):
     highlights: list[SearchHighlightModel] | None = None
 
     @classmethod
-    def from_opensearch_response(cls, hit: dict) -> Self:
-        """Create a ConversationSearchModel instance from OpenSearch response"""
-        source = hit["_source"]
-
-        # Extract conversation ID from SK (e.g. "{user_id}#CONV#{conversation_id}" -> "{conversation_id}")
-        sk = source.get("SK", "")
-        conversation_id = decompose_conv_id(sk)
-
-        # Get last updated time from source with fallback logic
-        last_updated_time = 0.0
-
-        # 1. Try to get from the latest message's create_time
-        if source.get("messages") and isinstance(source.get("messages"), list):
-            messages = source.get("messages", [])
-            message_times = [
-                msg.get("value", {}).get("create_time", 0)
-                for msg in messages
-                if isinstance(msg.get("value"), dict)
-            ]
-            if message_times:
-                last_updated_time = float(max(message_times))
+    def from_opensearch_response(
+        cls, hits: list[dict], conversation_source: dict | None = None
+    ) -> Self:
+        """Create a ConversationSearchModel instance from the matching hits of the conversation,
+        best first, and the source of the conversation document holding its title.
+        """
+        conversation_id = hits[0]["_source"]["ConversationId"]
+        source = conversation_source or {}
+
+        # Latest message time, or the creation time before any message is indexed
+        last_updated_time = float(
+            source.get("LastUpdateTime") or source.get("CreateTime") or 0.0
+        )
 
         # Create conversation meta instance
         conversation = cls(
@@ -58,29 +48,19 @@ class ConversationSearchModel(BaseModel):
             last_updated_time=last_updated_time,
         )
 
-        # Add highlight information if available
-        if "highlight" in hit:
-            highlights = []
-
-            for field, fragments in hit["highlight"].items():
-                if field == "extractedContent":
-                    highlights.append(
-                        SearchHighlightModel(
-                            field_name="MessageBody", fragments=fragments
-                        )
-                    )
-                elif field == "Title":
-                    highlights.append(
-                        SearchHighlightModel(field_name=field, fragments=fragments)
-                    )
-                elif field == "messages.value.content.body":
-                    highlights.append(
-                        SearchHighlightModel(
-                            field_name="MessageBody", fragments=fragments
-                        )
-                    )
-
-            if highlights:
-                conversation.highlights = highlights
+        # Add highlight information of the matching documents, absent in the compact mode
+        highlights: dict[str, list[str]] = {}
+        for hit in hits:
+            for field, fragments in hit.get("highlight", {}).items():
+                if field == "Title":
+                    highlights.setdefault("Title", []).extend(fragments)
+                elif field == "Body":
+                    highlights.setdefault("MessageBody", []).extend(fragments)
+
+        if highlights:
+            conversation.highlights = [
+                SearchHighlightModel(field_name=field_name, fragments=fragments)
+                for field_name, fragments in highlights.items()
+            ]
 
         return conversation
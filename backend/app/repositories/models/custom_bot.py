@@ -356,6 +356,22 @@ class UsageStatsModel(BaseModel):
     )
 
 
+class BotUsageDeltaModel(BaseModel):
+    """Usage of a bot or an alias aggregated in a container, not yet written."""
+
+    item_type: Literal["bot", "alias"]
+    # Owner of the bot, or the user of the alias
+    user_id: str
+    bot_id: str
+    increment: int = 0
+    last_used_time: int | None = None
+
+    def merge(self, other: "BotUsageDeltaModel") -> None:
+        self.increment += other.increment
+        if other.last_used_time is not None:
+            self.last_used_time = max(self.last_used_time or 0, other.last_used_time)
+
+
 class BotModel(BaseModel):
     id: str
     owner_user_id: str
@@ -0,0 +1,12 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class RetrievalCacheEntryModel(BaseModel):
+    # `retrievalResults` of the Retrieve API response
+    results: list[dict[str, Any]]
+    # Latency of the retrieval, used to estimate the saving of a cache hit
+    latency_ms: float
+    # Embedding of the normalized query, set when the similarity tier is enabled
+    embedding: list[float] | None = None
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+
+class SummaryCacheEntryModel(BaseModel):
+    summary: str
+    # Tokens spent to produce the summary, used to estimate the saving of a cache hit
+    input_tokens: int
+    output_tokens: int
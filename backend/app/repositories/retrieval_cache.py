@@ -0,0 +1,129 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.repositories.models.retrieval_cache import RetrievalCacheEntryModel
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Number of retrievals cached in the process
+RETRIEVAL_CACHE_SIZE = int(os.environ.get("RETRIEVAL_CACHE_SIZE", 1024))
+# Bounds the staleness of the knowledge bases not synchronized by the bots (existing ones)
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.environ.get("RETRIEVAL_CACHE_TTL_SECONDS", 600))
+# Most recent entries of a scope compared with the query on a similarity lookup
+RETRIEVAL_CACHE_SIMILARITY_CANDIDATES = int(
+    os.environ.get("RETRIEVAL_CACHE_SIMILARITY_CANDIDATES", 256)
+)
+
+# (knowledge_base_id, sync generation, search_type, max_results)
+RetrievalScope = tuple[str, str, str, int]
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _dot(a: list[float], b: list[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+class RetrievalCache:
+    """LRU of knowledge base retrievals living in the process, keyed by scope and
+    normalized query.
+    """
+
+    def __init__(
+        self,
+        max_size: int = RETRIEVAL_CACHE_SIZE,
+        ttl_seconds: float = RETRIEVAL_CACHE_TTL_SECONDS,
+        similarity_candidates: int = RETRIEVAL_CACHE_SIMILARITY_CANDIDATES,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._items: OrderedDict[
+            tuple[RetrievalScope, str], tuple[RetrievalCacheEntryModel, float]
+        ] = OrderedDict()
+        # Queries of the entries with an embedding per scope, in insertion order
+        self._embedded: dict[RetrievalScope, dict[str, None]] = {}
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_candidates = similarity_candidates
+
+    def _remove(self, key: tuple[RetrievalScope, str]):
+        del self._items[key]
+        scope, query = key
+        queries = self._embedded.get(scope)
+        if queries is not None:
+            queries.pop(query, None)
+            if not queries:
+                del self._embedded[scope]
+
+    def get(self, scope: RetrievalScope, query: str) -> RetrievalCacheEntryModel | None:
+        key = (scope, query)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            entry, expire = item
+            if expire <= time.monotonic():
+                self._remove(key)
+                return None
+            self._items.move_to_end(key)
+            return entry
+
+    def find_similar(
+        self, scope: RetrievalScope, embedding: list[float], threshold: float
+    ) -> RetrievalCacheEntryModel | None:
+        """Most similar entry of the scope whose embedding has a cosine similarity of
+        at least `threshold` with the given one. Embeddings are expected to be normalized.
+        """
+        now = time.monotonic()
+        with self._lock:
+            queries = self._embedded.get(scope)
+            if not queries:
+                return None
+
+            best: tuple[float, str] | None = None
+            expired = []
+            for query in itertools.islice(
+                reversed(queries), self.similarity_candidates
+            ):
+                entry, expire = self._items[(scope, query)]
+                if expire <= now:
+                    expired.append(query)
+                    continue
+                assert entry.embedding is not None
+                similarity = _dot(entry.embedding, embedding)
+                if similarity >= threshold and (best is None or similarity > best[0]):
+                    best = (similarity, query)
+            for query in expired:
+                self._remove((scope, query))
+
+            if best is None:
+                return None
+            self._items.move_to_end((scope, best[1]))
+            return self._items[(scope, best[1])][0]
+
+    def put(
+        self, scope: RetrievalScope, query: str, entry: RetrievalCacheEntryModel
+    ) -> None:
+        key = (scope, query)
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (entry, time.monotonic() + self.ttl_seconds)
+            if entry.embedding is not None:
+                self._embedded.setdefault(scope, {})[query] = None
+            while len(self._items) > self.max_size:
+                self._remove(next(iter(self._items)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._embedded.clear()
+
+
+retrieval_cache = RetrievalCache()
@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal as decimal
+from typing import Protocol, cast
+
+import boto3
+from app.repositories.common import DDB_ENDPOINT_URL, TRANSACTION_BATCH_READ_SIZE
+from app.repositories.models.summary_cache import SummaryCacheEntryModel
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+REGION = os.environ.get("REGION", "us-east-1")
+SEARCH_SUMMARY_CACHE_TABLE_NAME = os.environ.get("SEARCH_SUMMARY_CACHE_TABLE_NAME")
+SEARCH_SUMMARY_CACHE_TTL_SECONDS = int(
+    os.environ.get("SEARCH_SUMMARY_CACHE_TTL_SECONDS", 60 * 60 * 24)
+)
+SEARCH_SUMMARY_CACHE_SIZE = int(os.environ.get("SEARCH_SUMMARY_CACHE_SIZE", 1024))
+
+
+class SummaryCacheStore(Protocol):
+    """Key-value store of web content summaries."""
+
+    def get_many(self, keys: list[str]) -> dict[str, SummaryCacheEntryModel]: ...
+
+    def put(self, key: str, entry: SummaryCacheEntryModel) -> None: ...
+
+
+class InMemorySummaryCacheStore:
+    """LRU store living in the process. Used for tests and when no table is configured."""
+
+    def __init__(
+        self,
+        max_size: int = SEARCH_SUMMARY_CACHE_SIZE,
+        ttl_seconds: int = SEARCH_SUMMARY_CACHE_TTL_SECONDS,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._items: OrderedDict[str, tuple[SummaryCacheEntryModel, float]] = (
+            OrderedDict()
+        )
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+    def get_many(self, keys: list[str]) -> dict[str, SummaryCacheEntryModel]:
+        now = time.monotonic()
+        result: dict[str, SummaryCacheEntryModel] = {}
+        with self._lock:
+            for key in keys:
+                item = self._items.get(key)
+                if item is None:
+                    continue
+                entry, expire = item
+                if expire <= now:
+                    del self._items[key]
+                    continue
+                self._items.move_to_end(key)
+                result[key] = entry
+        return result
+
+    def put(self, key: str, entry: SummaryCacheEntryModel) -> None:
+        with self._lock:
+            self._items[key] = (entry, time.monotonic() + self.ttl_seconds)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+class DynamoDBSummaryCacheStore:
+    """Store shared by all containers. Items expire with the DynamoDB TTL (`expire` attribute)."""
+
+    def __init__(
+        self,
+        table_name: str,
+        ttl_seconds: int = SEARCH_SUMMARY_CACHE_TTL_SECONDS,
+    ) -> None:
+        if DDB_ENDPOINT_URL and "AWS_EXECUTION_ENV" not in os.environ:
+            self._resource = boto3.resource(
+                "dynamodb",
+                endpoint_url=DDB_ENDPOINT_URL,
+                aws_access_key_id="key",
+                aws_secret_access_key="key",
+                region_name=REGION,
+            )
+        else:
+            self._resource = boto3.resource("dynamodb", region_name=REGION)
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+
+    def get_many(self, keys: list[str]) -> dict[str, SummaryCacheEntryModel]:
+        now = int(time.time())
+        result: dict[str, SummaryCacheEntryModel] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for i in range(0, len(unique_keys), TRANSACTION_BATCH_READ_SIZE):
+            batch = unique_keys[i : i + TRANSACTION_BATCH_READ_SIZE]
+            response = self._resource.batch_get_item(
+                RequestItems={
+                    self.table_name: {
+                        "Keys": [{"CacheKey": key} for key in batch],
+                    }
+                }
+            )
+            # NOTE: Unprocessed keys are treated as cache misses
+            for item in response["Responses"].get(self.table_name, []):
+                # TTL deletion is lazy, so expired items may still be returned
+                if int(cast(decimal, item["expire"])) <= now:
+                    continue
+                result[str(item["CacheKey"])] = SummaryCacheEntryModel(
+                    summary=str(item["Summary"]),
+                    input_tokens=int(cast(decimal, item["InputTokens"])),
+                    output_tokens=int(cast(decimal, item["OutputTokens"])),
+                )
+        return result
+
+    def put(self, key: str, entry: SummaryCacheEntryModel) -> None:
+        self._resource.Table(self.table_name).put_item(
+            Item={
+                "CacheKey": key,
+                "Summary": entry.summary,
+                "InputTokens": decimal(entry.input_tokens),
+                "OutputTokens": decimal(entry.output_tokens),
+                "expire": int(time.time()) + self.ttl_seconds,
+            }
+        )
+
+
+_store: SummaryCacheStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_summary_cache_store() -> SummaryCacheStore:
+    """Get the summary cache store.
+    DynamoDB is used when `SEARCH_SUMMARY_CACHE_TABLE_NAME` is set, otherwise an in-memory LRU.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            if SEARCH_SUMMARY_CACHE_TABLE_NAME:
+                _store = DynamoDBSummaryCacheStore(SEARCH_SUMMARY_CACHE_TABLE_NAME)
+            else:
+                _store = InMemorySummaryCacheStore()
+        return _store
+
+
+def set_summary_cache_store(store: SummaryCacheStore | None):
+    """Replace the summary cache store. Pass None to restore the default."""
+    global _store
+    with _store_lock:
+        _store = store
@@ -45,14 +45,16 @@ def get_popular_bots(
 def get_pickup_bots(
     request: Request,
     limit: int = 20,
+    offset: int = 0,
 ):
     """Search bots by query string.
     - This method is used for bot-store functionality (Today's pickup bots).
     - Results do NOT include private bots.
     - Only accessible bots are returned.
-    - Random bots are returned.
+    - Random bots are returned, in the same order for the user through the day.
+    - Pass `offset` to get the next bots.
     """
     current_user: User = request.state.current_user
 
-    bots = fetch_pickup_bots(current_user, limit)
+    bots = fetch_pickup_bots(current_user, limit, offset)
     return bots
@@ -1,8 +1,9 @@
+from app.conversation_remove import request_deletion
 from app.repositories.conversation import (
     change_conversation_title,
     delete_conversation_by_id,
-    delete_conversation_by_user_id,
-    find_conversation_by_user_id,
+    find_conversation_deletion_job,
+    find_conversations_page_by_user_id,
     find_related_document_by_id,
     find_related_documents_by_conversation_id,
     update_feedback,
@@ -12,8 +13,10 @@ from app.routes.schemas.conversation import (
     ChatInput,
     ChatOutput,
     Conversation,
+    ConversationDeletionJobOutput,
     ConversationMetaOutput,
-    ConversationSearchResult,
+    ConversationMetaOutputsWithNextToken,
+    ConversationSearchResultsWithNextToken,
     FeedbackInput,
     FeedbackOutput,
     NewTitleInput,
@@ -101,14 +104,20 @@ def remove_conversation(request: Request, conversation_id: str):
     delete_conversation_by_id(current_user.id, conversation_id)
 
 
-@router.get("/conversations", response_model=list[ConversationMetaOutput])
+@router.get("/conversations", response_model=ConversationMetaOutputsWithNextToken)
 def get_all_conversations(
     request: Request,
+    next_token: str | None = None,
+    limit: int = 100,
 ):
-    """Get all conversation metadata"""
+    """Get conversation metadata, newest first.
+    Pass `next_token` of the response to get the next page.
+    """
     current_user: User = request.state.current_user
 
-    conversations = find_conversation_by_user_id(current_user.id)
+    conversations, next_token = find_conversations_page_by_user_id(
+        current_user.id, limit=limit, next_token=next_token
+    )
     output = [
         ConversationMetaOutput(
             id=conversation.id,
@@ -119,20 +128,45 @@ def get_all_conversations(
         )
         for conversation in conversations
     ]
-    return output
+    return ConversationMetaOutputsWithNextToken(
+        conversations=output, next_token=next_token
+    )
 
 
-@router.delete("/conversations")
+@router.delete("/conversations", response_model=ConversationDeletionJobOutput)
 def remove_all_conversations(request: Request):
-    """Delete all conversations"""
-    delete_conversation_by_user_id(request.state.current_user.id)
+    """Delete all conversations.
+    The deletion may continue in the background. Poll `GET /conversations/deletion` for the progress.
+    """
+    job = request_deletion(request.state.current_user.id)
+    return ConversationDeletionJobOutput(**job.model_dump())
+
+
+@router.get("/conversations/deletion", response_model=ConversationDeletionJobOutput)
+def get_conversations_deletion(request: Request):
+    """Get the progress of the latest deletion of all conversations"""
+    job = find_conversation_deletion_job(request.state.current_user.id)
+    return ConversationDeletionJobOutput(**job.model_dump())
 
 
-@router.get("/conversations/search", response_model=list[ConversationSearchResult])
-def search_conversations(request: Request, query: str):
-    """Search conversations by keyword"""
+@router.get(
+    "/conversations/search", response_model=ConversationSearchResultsWithNextToken
+)
+def search_conversations(
+    request: Request,
+    query: str,
+    limit: int = 20,
+    next_token: str | None = None,
+    compact: bool = False,
+):
+    """Search conversations by keyword, matching the last word as a prefix.
+    Pass `next_token` of the response to get the next page.
+    Set `compact` for type-ahead, which skips the highlights for a faster response.
+    """
     current_user: User = request.state.current_user
-    output = search_conversations_usecase(query, current_user)
+    output = search_conversations_usecase(
+        query, current_user, limit=limit, next_token=next_token, compact=compact
+    )
     return output
 
 
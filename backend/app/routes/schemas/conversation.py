@@ -228,6 +228,20 @@ class ConversationMetaOutput(BaseSchema):
     bot_id: str | None
 
 
+class ConversationMetaOutputsWithNextToken(BaseSchema):
+    conversations: list[ConversationMetaOutput]
+    next_token: str | None
+
+
+class ConversationDeletionJobOutput(BaseSchema):
+    id: str
+    status: Literal["RUNNING", "SUCCEEDED", "FAILED"]
+    deleted_items: int
+    deleted_objects: int
+    create_time: float
+    update_time: float
+
+
 class ConversationSearchResult(BaseSchema):
     id: str
     title: str
@@ -236,6 +250,11 @@ class ConversationSearchResult(BaseSchema):
     highlights: list[SearchHighlight] | None = None
 
 
+class ConversationSearchResultsWithNextToken(BaseSchema):
+    conversations: list[ConversationSearchResult]
+    next_token: str | None
+
+
 class Conversation(BaseSchema):
     id: str
     title: str
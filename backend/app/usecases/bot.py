@@ -4,6 +4,7 @@ from typing import Literal, TypeGuard
 
 from app.agents.tools.agent_tool import AgentTool
 from app.agents.utils import get_available_tools
+from app.bot_stats import get_bot_stats_buffer
 from app.config import DEFAULT_GENERATION_CONFIG
 from app.config import GenerationParams as GenerationParamsDict
 from app.repositories.common import RecordNotFoundError
@@ -35,6 +36,7 @@ from app.repositories.models.custom_bot import (
     AgentModel,
     BotAliasModel,
     BotModel,
+    BotUsageDeltaModel,
     ConversationQuickStarterModel,
     GenerationParamsModel,
     KnowledgeModel,
@@ -598,6 +600,38 @@ def modify_bot_stats(user: User, bot: BotModel, increment: int):
     return update_bot_stats(owner_id, bot.id, increment)
 
 
+def record_bot_usage(user: User, bot: BotModel, increment: int = 1):
+    """Record the usage of the bot by the user.
+    Same as `modify_bot_last_used_time` and `modify_bot_stats`, but written later in batches.
+    """
+    buffer = get_bot_stats_buffer()
+    now = get_current_time()
+    if bot.is_owned_by_user(user):
+        buffer.record(
+            BotUsageDeltaModel(
+                item_type="bot",
+                user_id=user.id,
+                bot_id=bot.id,
+                increment=increment,
+                last_used_time=now,
+            )
+        )
+    else:
+        buffer.record(
+            BotUsageDeltaModel(
+                item_type="bot",
+                user_id=bot.owner_user_id,
+                bot_id=bot.id,
+                increment=increment,
+            )
+        )
+        buffer.record(
+            BotUsageDeltaModel(
+                item_type="alias", user_id=user.id, bot_id=bot.id, last_used_time=now
+            )
+        )
+
+
 def issue_presigned_url(
     user: User, bot_id: str, filename: str, content_type: str
 ) -> str:
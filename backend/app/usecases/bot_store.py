@@ -51,6 +51,7 @@ def fetch_popular_bots(
 def fetch_pickup_bots(
     user: User,
     limit: int = 20,
+    offset: int = 0,
 ) -> list[BotMetaOutput]:
     """Search bots sorted by usage count.
     This method is used for bot-store functionality (Today's pickup bots).
@@ -58,6 +59,7 @@ def fetch_pickup_bots(
     bots = find_random_bots(
         user,
         limit=limit,
+        offset=offset,
     )
     bot_metas = []
     for bot in bots:
@@ -1,7 +1,7 @@
 import logging
 from typing import Callable, Dict
 
-from app.agents.tools.agent_tool import AgentTool, ToolRunResult
+from app.agents.tools.agent_tool import AgentTool, ToolRunResult, run_tools
 from app.agents.tools.knowledge import create_knowledge_tool
 from app.agents.utils import get_tools
 from app.bedrock import (
@@ -13,6 +13,7 @@ from app.prompt import build_rag_prompt, get_prompt_to_cite_tool_results
 from app.repositories.conversation import (
     RecordNotFoundError,
     find_conversation_by_id,
+    find_message_branch,
     store_conversation,
     store_related_documents,
 )
@@ -41,13 +42,14 @@ from app.routes.schemas.conversation import (
     Conversation,
     ConversationMetaOutput,
     ConversationSearchResult,
+    ConversationSearchResultsWithNextToken,
     FeedbackOutput,
     MessageOutput,
     SearchHighlight,
     type_model_name,
 )
 from app.stream import ConverseApiStreamHandler, OnStopInput, OnThinking
-from app.usecases.bot import fetch_bot, modify_bot_last_used_time, modify_bot_stats
+from app.usecases.bot import fetch_bot, record_bot_usage
 from app.user import User
 from app.utils import get_current_time
 from app.vector_search import (
@@ -238,7 +240,7 @@ def chat(
         if "instruction" in message_map
         else []
     )
-    
+
     # Add system instructions for normal chat with tools
     if bot is None and tools:
         normal_chat_instruction = """You are a helpful AI assistant. When responding to user queries:
@@ -261,10 +263,8 @@ Available tools for content creation:
 IMPORTANT: When you use tools to create content (images, videos, documents), you MUST include the s3 download links in your final text response to the user. The tool results will contain a 'source_link' field with the s3 presigned URL - include this URL in your response so users can access their generated content directly. For example: "I've created your image! You can download it here: [s3 presigned url URL]" or "Your Excel file is ready: [s3 presigned URL]".
 
 Remember: Always prioritize giving a direct text answer first, then offer additional content creation if relevant."""
-        
+
         instructions.append(normal_chat_instruction)
-        
-      
 
     related_documents: list[RelatedDocumentModel] = []
     search_results: list[SearchResult] = []
@@ -477,23 +477,24 @@ Remember: Always prioritize giving a direct text answer first, then offer additi
             if isinstance(content, ToolUseContentModel)
         ]
 
-        run_results: list[ToolRunResult] = []
-        for content in tool_use_contents:
-            tool = tools[content.body.name]
-            run_result = tool.run(
-                tool_use_id=content.body.tool_use_id,
-                input=content.body.input,
-                model=chat_input.message.model,
-                bot=bot,
-            )
-            run_results.append(run_result)
-
+        # Run the tools concurrently, keeping results in the requested order
+        run_results = run_tools(
+            tool_calls=[
+                (
+                    tools[content.body.name],
+                    content.body.tool_use_id,
+                    content.body.input,
+                )
+                for content in tool_use_contents
+            ],
+            model=chat_input.message.model,
+            bot=bot,
+            on_tool_result=on_tool_result,
+        )
+        for run_result in run_results:
             if run_result["status"] == "success":
                 related_documents.extend(run_result["related_documents"])
 
-            if on_tool_result:
-                on_tool_result(run_result)
-
         tool_result_message = SimpleMessageModel(
             role="user",
             content=[
@@ -519,13 +520,11 @@ Remember: Always prioritize giving a direct text answer first, then offer additi
     if on_stop:
         on_stop(result)
 
-    # Update bot last used time
+    # Update bot last used time and stats
     if bot:
-        logger.info("Bot is provided. Updating bot last used time.")
-        # Update bot last used time
-        modify_bot_last_used_time(user, bot)
-        # Update bot stats
-        modify_bot_stats(user, bot, increment=1)
+        logger.info("Bot is provided. Recording bot usage.")
+        # Written asynchronously in batches, off the critical path
+        record_bot_usage(user, bot, increment=1)
 
     return conversation, message
 
@@ -580,12 +579,12 @@ def propose_conversation_title(
 - Title must be in the same language as the conversation.
 </rules>
 """
-    # Fetch existing conversation
-    conversation = find_conversation_by_id(user_id, conversation_id)
+    # Fetch the latest branch of the conversation
+    message_map = find_message_branch(user_id, conversation_id)
 
     messages = trace_to_root(
-        node_id=conversation.last_message_id,
-        message_map=conversation.message_map,
+        node_id=next(iter(message_map), None),
+        message_map=message_map,
     )
 
     # Append message to generate title
@@ -687,9 +686,17 @@ def fetch_conversation(user_id: str, conversation_id: str) -> Conversation:
     return output
 
 
-def search_conversations(query: str, user: User) -> list[ConversationSearchResult]:
+def search_conversations(
+    query: str,
+    user: User,
+    limit: int = 20,
+    next_token: str | None = None,
+    compact: bool = False,
+) -> ConversationSearchResultsWithNextToken:
     """Search conversations by keyword"""
-    conversations = find_conversations_by_query(query, user)
+    conversations, next_token = find_conversations_by_query(
+        query, user, limit=limit, next_token=next_token, compact=compact
+    )
     output = []
 
     for conversation in conversations:
@@ -714,4 +721,6 @@ def search_conversations(query: str, user: User) -> list[ConversationSearchResul
             )
         )
 
-    return output
+    return ConversationSearchResultsWithNextToken(
+        conversations=output, next_token=next_token
+    )
@@ -1,7 +1,9 @@
 import json
 import logging
 import os
+import threading
 from datetime import datetime
+from functools import cache
 from typing import Any, Literal
 
 import boto3
@@ -26,6 +28,18 @@ PUBLISH_API_CODEBUILD_PROJECT_NAME = os.environ.get(
 )
 USER_POOL_ID = os.environ.get("USER_POOL_ID", "")
 
+# Clients are shared across the process so that HTTP keep-alive connections are reused.
+CLIENT_MAX_POOL_CONNECTIONS = int(os.environ.get("CLIENT_MAX_POOL_CONNECTIONS", 50))
+CLIENT_MAX_ATTEMPTS = int(os.environ.get("CLIENT_MAX_ATTEMPTS", 3))
+CLIENT_CONFIG = Config(
+    max_pool_connections=CLIENT_MAX_POOL_CONNECTIONS,
+    retries={"max_attempts": CLIENT_MAX_ATTEMPTS, "mode": "standard"},
+)
+
+_client_registry: dict[tuple[str, str | None, str | None], Any] = {}
+_client_registry_lock = threading.Lock()
+_client_build_count = 0
+
 
 def snake_to_camel(snake_str):
     components = snake_str.split("_")
@@ -36,24 +50,75 @@ def is_running_on_lambda():
     return "AWS_EXECUTION_ENV" in os.environ
 
 
-def get_bedrock_client(region=BEDROCK_REGION):
-    client = boto3.client("bedrock", region_name=region)
+def get_client(
+    service_name: str,
+    region_name: str | None = None,
+    endpoint_url: str | None = None,
+) -> Any:
+    """Get a process-wide shared boto3 client, keyed by (service, region, endpoint).
+    boto3 clients are thread-safe, so the same client is returned to every caller.
+    """
+    key = (service_name, region_name, endpoint_url)
+    client = _client_registry.get(key)
+    if client is not None:
+        return client
+
+    global _client_build_count
+    with _client_registry_lock:
+        client = _client_registry.get(key)
+        if client is None:
+            client = boto3.client(
+                service_name,  # type: ignore[call-overload]
+                region_name=region_name,
+                endpoint_url=endpoint_url,
+                config=CLIENT_CONFIG,
+            )
+            _client_registry[key] = client
+            _client_build_count += 1
+            logger.info(
+                f"Built {service_name} client for region {region_name} (total builds: {_client_build_count})"
+            )
+
     return client
 
 
+def get_client_build_count() -> int:
+    """Get the number of clients built by `get_client` in this process."""
+    return _client_build_count
+
+
+def clear_client_registry():
+    """Drop all shared clients."""
+    global _client_build_count
+    with _client_registry_lock:
+        _client_registry.clear()
+        _client_build_count = 0
+
+
+def warm_up_clients():
+    """Build the clients used on the chat path ahead of the first request.
+    Call at Lambda init so that the cost is paid outside of the request.
+    """
+    get_bedrock_runtime_client()
+    get_bedrock_agent_runtime_client()
+    get_client("s3", region_name=BEDROCK_REGION)
+    get_client("sts")
+
+
+def get_bedrock_client(region=BEDROCK_REGION):
+    return get_client("bedrock", region_name=region)
+
+
 def get_bedrock_runtime_client(region=BEDROCK_REGION):
-    client = boto3.client("bedrock-runtime", region_name=region)
-    return client
+    return get_client("bedrock-runtime", region_name=region)
 
 
 def get_bedrock_agent_client(region=BEDROCK_REGION):
-    client = boto3.client("bedrock-agent", region_name=region)
-    return client
+    return get_client("bedrock-agent", region_name=region)
 
 
 def get_bedrock_agent_runtime_client(region=BEDROCK_REGION):
-    client = boto3.client("bedrock-agent-runtime", region_name=region)
-    return client
+    return get_client("bedrock-agent-runtime", region_name=region)
 
 
 def get_current_time():
@@ -61,6 +126,16 @@ def get_current_time():
     return int(datetime.now().timestamp() * 1000)
 
 
+@cache
+def _get_presign_s3_client():
+    # See: https://github.com/boto/boto3/issues/421#issuecomment-1849066655
+    return boto3.client(
+        "s3",
+        region_name=BEDROCK_REGION,
+        config=Config(signature_version="v4", s3={"addressing_style": "path"}),
+    )
+
+
 def generate_presigned_url(
     bucket: str,
     key: str,
@@ -68,12 +143,7 @@ def generate_presigned_url(
     expiration=3600,
     client_method: Literal["put_object", "get_object"] = "put_object",
 ) -> str:
-    # See: https://github.com/boto/boto3/issues/421#issuecomment-1849066655
-    client = boto3.client(
-        "s3",
-        region_name=BEDROCK_REGION,
-        config=Config(signature_version="v4", s3={"addressing_style": "path"}),
-    )
+    client = _get_presign_s3_client()
     params = {"Bucket": bucket, "Key": key}
     if content_type:
         params["ContentType"] = content_type
@@ -107,7 +177,7 @@ def compose_upload_document_s3_path(user_id: str, bot_id: str, filename: str) ->
 
 
 def delete_file_from_s3(bucket: str, key: str, ignore_not_exist: bool = False):
-    client = boto3.client("s3", region_name=BEDROCK_REGION)
+    client = get_client("s3", region_name=BEDROCK_REGION)
 
     # Check if the file exists
     if not ignore_not_exist:
@@ -125,7 +195,7 @@ def delete_file_from_s3(bucket: str, key: str, ignore_not_exist: bool = False):
 
 def delete_files_with_prefix_from_s3(bucket: str, prefix: str):
     """Delete all objects with the given prefix from the given bucket."""
-    client = boto3.client("s3", region_name=BEDROCK_REGION)
+    client = get_client("s3", region_name=BEDROCK_REGION)
     response = client.list_objects_v2(Bucket=bucket, Prefix=prefix)
 
     if "Contents" not in response:
@@ -136,7 +206,7 @@ def delete_files_with_prefix_from_s3(bucket: str, prefix: str):
 
 
 def check_if_file_exists_in_s3(bucket: str, key: str):
-    client = boto3.client("s3", region_name=BEDROCK_REGION)
+    client = get_client("s3", region_name=BEDROCK_REGION)
 
     # Check if the file exists
     try:
@@ -151,7 +221,7 @@ def check_if_file_exists_in_s3(bucket: str, key: str):
 
 
 def move_file_in_s3(bucket: str, key: str, new_key: str):
-    client = boto3.client("s3", region_name=BEDROCK_REGION)
+    client = get_client("s3", region_name=BEDROCK_REGION)
 
     # Check if the file exists
     try:
@@ -173,7 +243,7 @@ def start_codebuild_project(environment_variables: dict) -> str:
     environment_variables_override = [
         {"name": key, "value": value} for key, value in environment_variables.items()
     ]
-    client = boto3.client("codebuild")
+    client = get_client("codebuild")
     response = client.start_build(
         projectName=PUBLISH_API_CODEBUILD_PROJECT_NAME,
         environmentVariablesOverride=environment_variables_override,
@@ -183,7 +253,7 @@ def start_codebuild_project(environment_variables: dict) -> str:
 
 def get_user_cognito_groups(user: User, user_pool_id: str = USER_POOL_ID) -> list[str]:
     """Retrieve the groups that a Cognito user belongs to."""
-    client = boto3.client("cognito-idp")
+    client = get_client("cognito-idp")
 
     try:
         response = client.admin_list_groups_for_user(
@@ -220,7 +290,7 @@ def store_api_key_to_secret_manager(
     secret_value = json.dumps({"api_key": api_key})
 
     try:
-        secrets_client = boto3.client("secretsmanager")
+        secrets_client = get_client("secretsmanager")
         logger.info(f"Attempting to store API key for {secret_name}")
 
         try:
@@ -268,7 +338,7 @@ def get_api_key_from_secret_manager(secret_arn: str) -> str:
         ClientError: If there is an error with Secrets Manager
     """
     try:
-        secrets_client = boto3.client("secretsmanager")
+        secrets_client = get_client("secretsmanager")
         response = secrets_client.get_secret_value(SecretId=secret_arn)
         secret = json.loads(response["SecretString"])
         return secret["api_key"]
@@ -290,7 +360,7 @@ def delete_api_key_from_secret_manager(user_id: str, bot_id: str, prefix: str) -
     secret_name = f"{prefix}/{user_id}/{bot_id}"
 
     try:
-        secrets_client = boto3.client("secretsmanager")
+        secrets_client = get_client("secretsmanager")
         logger.info(f"Attempting to delete API key for {secret_name}")
 
         try:
@@ -1,4 +1,8 @@
+import json
 import logging
+import os
+import threading
+import time
 from typing import TypedDict, Any
 from urllib.parse import urlparse
 
@@ -7,7 +11,13 @@ from app.repositories.models.conversation import (
     TextToolResultModel,
 )
 from app.repositories.models.custom_bot import BotModel
-from app.utils import get_bedrock_agent_runtime_client
+from app.repositories.models.retrieval_cache import RetrievalCacheEntryModel
+from app.repositories.retrieval_cache import (
+    RetrievalScope,
+    normalize_query,
+    retrieval_cache,
+)
+from app.utils import get_bedrock_agent_runtime_client, get_bedrock_runtime_client
 from botocore.exceptions import ClientError
 from mypy_boto3_bedrock_agent_runtime.type_defs import (
     KnowledgeBaseRetrievalResultTypeDef,
@@ -18,6 +28,16 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 agent_client = get_bedrock_agent_runtime_client()
 
+# Minimum cosine similarity of the query embeddings for a cached retrieval to be served
+# for a different query. 0 disables the similarity tier, leaving the exact match only.
+RETRIEVAL_CACHE_SIMILARITY_THRESHOLD = float(
+    os.environ.get("RETRIEVAL_CACHE_SIMILARITY_THRESHOLD", 0)
+)
+RETRIEVAL_CACHE_EMBEDDING_MODEL_ID = os.environ.get(
+    "RETRIEVAL_CACHE_EMBEDDING_MODEL_ID", "amazon.titan-embed-text-v2:0"
+)
+RETRIEVAL_CACHE_EMBEDDING_DIMENSIONS = 256
+
 
 class SearchResult(TypedDict):
     bot_id: str
@@ -60,12 +80,157 @@ def to_guardrails_grounding_source(
     )
 
 
+class _RetrievalCacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        # Retrievals of bots being synchronized, which are not cached
+        self.bypassed = 0
+        self.saved_latency_ms = 0.0
+        # Spent embedding the queries for the similarity tier
+        self.embedding_latency_ms = 0.0
+
+    def record_hit(self, entry: RetrievalCacheEntryModel, similar: bool = False):
+        with self._lock:
+            if similar:
+                self.similar_hits += 1
+            else:
+                self.exact_hits += 1
+            self.saved_latency_ms += entry.latency_ms
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def record_embedding(self, latency_ms: float):
+        with self._lock:
+            self.embedding_latency_ms += latency_ms
+
+    def to_dict(self) -> dict[str, float]:
+        with self._lock:
+            hits = self.exact_hits + self.similar_hits
+            return {
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_ratio": hits / (hits + self.misses) if hits else 0.0,
+                "saved_latency_ms": self.saved_latency_ms,
+                "embedding_latency_ms": self.embedding_latency_ms,
+            }
+
+
+_retrieval_cache_stats = _RetrievalCacheStats()
+
+
+def get_retrieval_cache_stats() -> dict[str, float]:
+    """Get hit / miss counters and retrieval latency saved by the retrieval cache."""
+    return _retrieval_cache_stats.to_dict()
+
+
+def clear_retrieval_cache():
+    """Clear the cached retrievals and the counters."""
+    global _retrieval_cache_stats
+
+    retrieval_cache.clear()
+    _retrieval_cache_stats = _RetrievalCacheStats()
+
+
+def _embed_query(query: str) -> list[float] | None:
+    """Normalized embedding of the query, or None if it cannot be computed."""
+    try:
+        response = get_bedrock_runtime_client().invoke_model(
+            modelId=RETRIEVAL_CACHE_EMBEDDING_MODEL_ID,
+            body=json.dumps(
+                {
+                    "inputText": query,
+                    "dimensions": RETRIEVAL_CACHE_EMBEDDING_DIMENSIONS,
+                    "normalize": True,
+                }
+            ),
+        )
+        return json.loads(response["body"].read())["embedding"]
+    except ClientError as e:
+        logger.warning(f"Error embedding query for the retrieval cache: {e}")
+        return None
+
+
+def _retrieve(
+    knowledge_base_id: str, query: str, search_type: str, limit: int
+) -> list[KnowledgeBaseRetrievalResultTypeDef]:
+    response = agent_client.retrieve(
+        knowledgeBaseId=knowledge_base_id,
+        retrievalQuery={"text": query},
+        retrievalConfiguration={
+            "vectorSearchConfiguration": {
+                "numberOfResults": limit,
+                "overrideSearchType": search_type,
+            }
+        },
+    )
+    return response.get("retrievalResults", [])
+
+
+def _cached_retrieve(
+    bot: BotModel, knowledge_base_id: str, query: str, search_type: str, limit: int
+) -> list[KnowledgeBaseRetrievalResultTypeDef]:
+    """Retrieve from the knowledge base through the retrieval cache.
+    Entries are scoped by the last sync execution of the bot, so that a completed sync
+    stops serving the retrievals cached before it. Bots being synchronized are not cached.
+    """
+    if bot.sync_status != "SUCCEEDED":
+        _retrieval_cache_stats.record_bypass()
+        return _retrieve(knowledge_base_id, query, search_type, limit)
+
+    scope: RetrievalScope = (
+        knowledge_base_id,
+        bot.sync_last_exec_id,
+        search_type,
+        limit,
+    )
+    normalized_query = normalize_query(query)
+    entry = retrieval_cache.get(scope, normalized_query)
+    if entry is not None:
+        _retrieval_cache_stats.record_hit(entry)
+        return entry.results  # type: ignore[return-value]
+
+    embedding = None
+    if RETRIEVAL_CACHE_SIMILARITY_THRESHOLD > 0:
+        start = time.perf_counter()
+        embedding = _embed_query(normalized_query)
+        _retrieval_cache_stats.record_embedding((time.perf_counter() - start) * 1000)
+        if embedding is not None:
+            entry = retrieval_cache.find_similar(
+                scope, embedding, RETRIEVAL_CACHE_SIMILARITY_THRESHOLD
+            )
+            if entry is not None:
+                _retrieval_cache_stats.record_hit(entry, similar=True)
+                return entry.results  # type: ignore[return-value]
+
+    start = time.perf_counter()
+    results = _retrieve(knowledge_base_id, query, search_type, limit)
+    latency_ms = (time.perf_counter() - start) * 1000
+    _retrieval_cache_stats.record_miss()
+    retrieval_cache.put(
+        scope,
+        normalized_query,
+        RetrievalCacheEntryModel(
+            results=results,  # type: ignore[arg-type]
+            latency_ms=latency_ms,
+            embedding=embedding,
+        ),
+    )
+    return results
+
+
 def _bedrock_knowledge_base_search(bot: BotModel, query: str) -> list[SearchResult]:
     assert bot.bedrock_knowledge_base is not None
-    assert (
-        bot.bedrock_knowledge_base.knowledge_base_id is not None
-        or bot.bedrock_knowledge_base.exist_knowledge_base_id is not None
-    ), "Either knowledge_base_id or exist_knowledge_base_id must be set"
 
     if bot.bedrock_knowledge_base.search_params.search_type == "semantic":
         search_type = "SEMANTIC"
@@ -81,18 +246,15 @@ def _bedrock_knowledge_base_search(bot: BotModel, query: str) -> list[SearchResu
         if bot.bedrock_knowledge_base.exist_knowledge_base_id is not None
         else bot.bedrock_knowledge_base.knowledge_base_id
     )
+    assert (
+        knowledge_base_id is not None
+    ), "Either knowledge_base_id or exist_knowledge_base_id must be set"
 
     try:
-        response = agent_client.retrieve(
-            knowledgeBaseId=knowledge_base_id,
-            retrievalQuery={"text": query},
-            retrievalConfiguration={
-                "vectorSearchConfiguration": {
-                    "numberOfResults": limit,
-                    "overrideSearchType": search_type,
-                }
-            },
+        retrieval_results = _cached_retrieve(
+            bot, knowledge_base_id, query, search_type, limit
         )
+        logger.info(f"Retrieval cache stats: {get_retrieval_cache_stats()}")
 
         def extract_source_from_retrieval_result(
             retrieval_result: KnowledgeBaseRetrievalResultTypeDef,
@@ -129,7 +291,7 @@ def _bedrock_knowledge_base_search(bot: BotModel, query: str) -> list[SearchResu
             return None
 
         search_results = []
-        for i, retrieval_result in enumerate(response.get("retrievalResults", [])):
+        for i, retrieval_result in enumerate(retrieval_results):
             content = retrieval_result.get("content", {}).get("text", "")
             source = extract_source_from_retrieval_result(retrieval_result)
 
@@ -140,7 +302,9 @@ def _bedrock_knowledge_base_search(bot: BotModel, query: str) -> list[SearchResu
                 if "x-amz-bedrock-kb-document-page-number" in metadata:
                     try:
                         page_number = int(
-                            metadata["x-amz-bedrock-kb-document-page-number"]
+                            float(
+                                str(metadata["x-amz-bedrock-kb-document-page-number"])
+                            )
                         )
                     except (ValueError, TypeError):
                         pass
@@ -1,12 +1,14 @@
 import json
 import logging
 import os
+import time
 import traceback
 from datetime import datetime
 from decimal import Decimal as decimal
-from queue import SimpleQueue
-from threading import Thread
-from typing import BinaryIO, Literal, TypedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from typing import Any, BinaryIO, Literal, TypedDict, cast
 
 import boto3
 from app.agents.tools.agent_tool import ToolRunResult
@@ -16,9 +18,30 @@ from app.routes.schemas.conversation import ChatInput
 from app.stream import OnStopInput, OnThinking
 from app.usecases.chat import chat
 from app.user import User
-from boto3.dynamodb.conditions import Attr, Key
+from app.utils import get_client, is_running_on_lambda, warm_up_clients
 
 WEBSOCKET_SESSION_TABLE_NAME = os.environ["WEBSOCKET_SESSION_TABLE_NAME"]
+# Consecutive STREAMING / REASONING tokens are merged into one frame for up to this window.
+# Set to 0 to send every token as its own frame.
+STREAM_COALESCE_WINDOW_MS = int(os.environ.get("STREAM_COALESCE_WINDOW_MS", 40))
+# API Gateway (websocket) has hard limit of 32KB per frame, so leave room for the JSON envelope.
+STREAM_MAX_FRAME_BYTES = 28 * 1024
+# Notifications waiting to be sent are bounded. When the queue is full, the producer is blocked
+# for up to NOTIFICATION_QUEUE_PUT_TIMEOUT_SECONDS ("block") or the notification is dropped ("drop").
+NOTIFICATION_QUEUE_MAX_SIZE = int(os.environ.get("NOTIFICATION_QUEUE_MAX_SIZE", 1000))
+NOTIFICATION_QUEUE_FULL_POLICY: Literal["block", "drop"] = (
+    "drop" if os.environ.get("NOTIFICATION_QUEUE_FULL_POLICY") == "drop" else "block"
+)
+NOTIFICATION_QUEUE_PUT_TIMEOUT_SECONDS = 10
+# Interval at which an idle sender checks whether it has been closed without a finish command
+NOTIFICATION_IDLE_POLL_SECONDS = 1
+# Number of frames sent concurrently when their order does not matter.
+NOTIFICATION_SEND_CONCURRENCY = int(os.environ.get("NOTIFICATION_SEND_CONCURRENCY", 4))
+# Each message part is stored as its own item. Every this many parts, the session item records
+# an upper bound of the part ids, so that `END` can fetch all the parts at once.
+MESSAGE_PART_ID_BOUND_INTERVAL = 16
+# Maximum number of keys in a BatchGetItem request.
+BATCH_GET_MAX_KEYS = 100
 
 dynamodb_client = boto3.resource("dynamodb")
 table = dynamodb_client.Table(WEBSOCKET_SESSION_TABLE_NAME)
@@ -26,82 +49,308 @@ table = dynamodb_client.Table(WEBSOCKET_SESSION_TABLE_NAME)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+if is_running_on_lambda():
+    warm_up_clients()
+
 
 class _NotifyCommand(TypedDict):
     type: Literal["notify"]
     payload: bytes | BinaryIO
+    # Unordered payloads may be sent concurrently with each other
+    ordered: bool
+
+
+class _StreamCommand(TypedDict):
+    type: Literal["stream"]
+    status: Literal["STREAMING", "REASONING"]
+    token: str
 
 
 class _FinishCommand(TypedDict):
     type: Literal["finish"]
 
 
-_Command = _NotifyCommand | _FinishCommand
+_Command = _NotifyCommand | _StreamCommand | _FinishCommand
+
+
+class _PendingFrame(TypedDict):
+    status: Literal["STREAMING", "REASONING"]
+    tokens: list[str]
+    size: int
+    deadline: float
+
+
+class NotificationMetrics(TypedDict):
+    frames_sent: int
+    frames_dropped: int
+    max_queue_depth: int
+    send_latency_total_ms: float
+    send_latency_max_ms: float
 
 
 class NotificationSender:
-    def __init__(self, endpoint_url: str, connection_id: str) -> None:
-        self.commands = SimpleQueue[_Command]()
+    def __init__(
+        self,
+        endpoint_url: str,
+        connection_id: str,
+        coalesce_window_ms: int = STREAM_COALESCE_WINDOW_MS,
+        max_frame_bytes: int = STREAM_MAX_FRAME_BYTES,
+        queue_max_size: int = NOTIFICATION_QUEUE_MAX_SIZE,
+        queue_full_policy: Literal["block", "drop"] = NOTIFICATION_QUEUE_FULL_POLICY,
+        send_concurrency: int = NOTIFICATION_SEND_CONCURRENCY,
+    ) -> None:
+        self.commands = Queue[_Command](maxsize=queue_max_size)
         self.endpoint_url = endpoint_url
         self.connection_id = connection_id
+        self.coalesce_window_ms = coalesce_window_ms
+        self.max_frame_bytes = max_frame_bytes
+        self.queue_full_policy = queue_full_policy
+        self.send_concurrency = send_concurrency
+
+        # Set when the sender stopped, after which payloads are dropped instead of queued
+        self.closed = False
+        self.metrics = NotificationMetrics(
+            frames_sent=0,
+            frames_dropped=0,
+            max_queue_depth=0,
+            send_latency_total_ms=0.0,
+            send_latency_max_ms=0.0,
+        )
+        self._metrics_lock = Lock()
+        self._unordered_sends: list[Future[bool]] = []
+
+    def _record_dropped(self, count: int = 1):
+        with self._metrics_lock:
+            self.metrics["frames_dropped"] += count
+
+    def _put(self, command: _Command):
+        """Queue a command, applying back-pressure to the producer when the queue is full."""
+        if self.closed:
+            self._record_dropped()
+            return
+
+        try:
+            if self.queue_full_policy == "block":
+                self.commands.put(
+                    command, timeout=NOTIFICATION_QUEUE_PUT_TIMEOUT_SECONDS
+                )
+            else:
+                self.commands.put_nowait(command)
+        except Full:
+            logger.warning(
+                f"Notification queue is full. Dropping {command['type']} command"
+            )
+            self._record_dropped()
+            return
+
+        depth = self.commands.qsize()
+        with self._metrics_lock:
+            if depth > self.metrics["max_queue_depth"]:
+                self.metrics["max_queue_depth"] = depth
+
+    def _post(self, gatewayapi, payload: bytes | BinaryIO) -> bool:
+        """Send a payload to the client. Returns False if the connection is no longer available."""
+        start = time.monotonic()
+        try:
+            gatewayapi.post_to_connection(
+                ConnectionId=self.connection_id,
+                Data=payload,
+            )
 
-    def run(self):
-        import boto3
+        except (
+            gatewayapi.exceptions.GoneException,
+            gatewayapi.exceptions.ForbiddenException,
+        ) as e:
+            logger.exception(
+                f"Shutdown the notification sender due to an exception: {e}"
+            )
+            self._record_dropped()
+            return False
+
+        except Exception as e:
+            logger.exception(f"Failed to send notification: {e}")
+            self._record_dropped()
+            return True
+
+        latency_ms = (time.monotonic() - start) * 1000
+        with self._metrics_lock:
+            self.metrics["frames_sent"] += 1
+            self.metrics["send_latency_total_ms"] += latency_ms
+            if latency_ms > self.metrics["send_latency_max_ms"]:
+                self.metrics["send_latency_max_ms"] = latency_ms
+
+        return True
+
+    def _wait_unordered_sends(self) -> bool:
+        results = [future.result() for future in self._unordered_sends]
+        self._unordered_sends = []
+        return all(results)
+
+    def _send(
+        self,
+        gatewayapi,
+        executor: ThreadPoolExecutor,
+        payload: bytes | BinaryIO,
+        ordered: bool = True,
+    ) -> bool:
+        """Send a payload, returning False if the connection is no longer available.
+        Unordered payloads are pipelined over the pooled connections, and an ordered payload
+        is sent only after all the unordered payloads before it have been delivered.
+        """
+        if not ordered:
+            self._unordered_sends.append(
+                executor.submit(self._post, gatewayapi, payload)
+            )
+            return True
+
+        if not self._wait_unordered_sends():
+            return False
+        return self._post(gatewayapi, payload)
+
+    def _frame_payload(self, frame: _PendingFrame) -> bytes:
+        return json.dumps(
+            dict(
+                status=frame["status"],
+                completion="".join(frame["tokens"]),
+            )
+        ).encode("utf-8")
 
-        gatewayapi = boto3.client(
+    def run(self):
+        gatewayapi = get_client(
             "apigatewaymanagementapi",
             endpoint_url=self.endpoint_url,
         )
+        executor = ThreadPoolExecutor(
+            max_workers=self.send_concurrency,
+            thread_name_prefix="notification-sender",
+        )
 
+        try:
+            self._run(gatewayapi, executor)
+        finally:
+            self._wait_unordered_sends()
+            executor.shutdown(wait=True)
+            self.closed = True
+
+            # Count the payloads left in the queue as dropped
+            dropped = 0
+            while True:
+                try:
+                    command = self.commands.get_nowait()
+                except Empty:
+                    break
+                if command["type"] != "finish":
+                    dropped += 1
+            self._record_dropped(dropped)
+
+            logger.info(f"Notification sender metrics: {self.metrics}")
+
+    def _run(self, gatewayapi, executor: ThreadPoolExecutor):
+        # Tokens are merged while the sender is busy or within the coalescing window,
+        # and flushed when the window elapses, the frame is full or another event arrives.
+        pending: _PendingFrame | None = None
         while True:
-            command = self.commands.get()
-            if command["type"] == "notify":
+            if pending is not None:
+                timeout = pending["deadline"] - time.monotonic()
                 try:
-                    gatewayapi.post_to_connection(
-                        ConnectionId=self.connection_id,
-                        Data=command["payload"],
+                    command = (
+                        self.commands.get(timeout=timeout)
+                        if timeout > 0
+                        else self.commands.get_nowait()
                     )
+                except Empty:
+                    if not self._send(
+                        gatewayapi, executor, self._frame_payload(pending)
+                    ):
+                        return
+                    pending = None
+                    continue
+            else:
+                try:
+                    command = self.commands.get(timeout=NOTIFICATION_IDLE_POLL_SECONDS)
+                except Empty:
+                    # Closed by `finish` on a full queue, once the queue is drained
+                    if self.closed:
+                        return
+                    continue
+
+            if command["type"] == "stream":
+                # Escaped size of the token, without the surrounding quotes
+                size = len(json.dumps(command["token"]).encode("utf-8")) - 2
+                if (
+                    pending is not None
+                    and pending["status"] == command["status"]
+                    and pending["size"] + size <= self.max_frame_bytes
+                ):
+                    pending["tokens"].append(command["token"])
+                    pending["size"] += size
+                    continue
+
+                if pending is not None and not self._send(
+                    gatewayapi, executor, self._frame_payload(pending)
+                ):
+                    return
+                pending = {
+                    "status": command["status"],
+                    "tokens": [command["token"]],
+                    "size": size,
+                    "deadline": time.monotonic() + self.coalesce_window_ms / 1000,
+                }
+                continue
 
-                except (
-                    gatewayapi.exceptions.GoneException,
-                    gatewayapi.exceptions.ForbiddenException,
-                ) as e:
-                    logger.exception(
-                        f"Shutdown the notification sender due to an exception: {e}"
-                    )
-                    break
+            if pending is not None:
+                if not self._send(gatewayapi, executor, self._frame_payload(pending)):
+                    return
+                pending = None
 
-                except Exception as e:
-                    logger.exception(f"Failed to send notification: {e}")
+            if command["type"] == "notify":
+                if not self._send(
+                    gatewayapi,
+                    executor,
+                    command["payload"],
+                    ordered=command["ordered"],
+                ):
+                    return
 
             elif command["type"] == "finish":
-                break
+                return
 
     def finish(self):
-        self.commands.put(
+        if self.closed:
+            return
+        try:
+            self.commands.put(
+                {
+                    "type": "finish",
+                },
+                timeout=NOTIFICATION_QUEUE_PUT_TIMEOUT_SECONDS,
+            )
+        except Full:
+            # The sender stops once the queue is drained. The caller bounds the wait with `join`.
+            logger.warning("Notification queue is full. Closing the sender")
+            self.closed = True
+
+    def notify(self, payload: bytes | BinaryIO, ordered: bool = True):
+        self._put(
             {
-                "type": "finish",
+                "type": "notify",
+                "payload": payload,
+                "ordered": ordered,
             }
         )
 
-    def notify(self, payload: bytes | BinaryIO):
-        self.commands.put(
+    def stream(self, status: Literal["STREAMING", "REASONING"], token: str):
+        self._put(
             {
-                "type": "notify",
-                "payload": payload,
+                "type": "stream",
+                "status": status,
+                "token": token,
             }
         )
 
     def on_stream(self, token: str):
         # Send completion
-        payload = json.dumps(
-            dict(
-                status="STREAMING",
-                completion=token,
-            )
-        ).encode("utf-8")
-
-        self.notify(payload=payload)
+        self.stream(status="STREAMING", token=token)
 
     def on_stop(self, arg: OnStopInput):
         payload = json.dumps(
@@ -149,29 +398,109 @@ class NotificationSender:
             ).encode("utf-8")
         )
 
-        for related_document in run_result["related_documents"]:
+        # Send related documents in batches which fit in a frame.
+        # The order of related documents does not matter, so the batches are sent concurrently.
+        def notify_batch(related_documents: list[dict]):
             self.notify(
                 payload=json.dumps(
                     dict(
-                        status="AGENT_RELATED_DOCUMENT",
+                        status="AGENT_RELATED_DOCUMENTS",
                         result={
                             "toolUseId": run_result["tool_use_id"],
-                            "relatedDocument": related_document.to_schema().model_dump(
-                                by_alias=True
-                            ),
+                            "relatedDocuments": related_documents,
                         },
                     )
-                ).encode("utf-8")
+                ).encode("utf-8"),
+                ordered=False,
             )
 
+        batch: list[dict] = []
+        batch_size = 0
+        for related_document in run_result["related_documents"]:
+            document = related_document.to_schema().model_dump(by_alias=True)
+            size = len(json.dumps(document).encode("utf-8"))
+            if batch and batch_size + size > self.max_frame_bytes:
+                notify_batch(batch)
+                batch = []
+                batch_size = 0
+
+            batch.append(document)
+            batch_size += size
+
+        if batch:
+            notify_batch(batch)
+
     def on_reasoning(self, token: str):
-        payload = json.dumps(
-            dict(
-                status="REASONING",
-                completion=token,
+        self.stream(status="REASONING", token=token)
+
+
+def store_message_part(connection_id: str, part_index: int, part: str, expire: int):
+    """Store the message part as its own item, billed on the size of the part only."""
+    # Zero is reserved for user id, so start from 1
+    table.put_item(
+        Item={
+            "ConnectionId": connection_id,
+            "MessagePartId": decimal(part_index + 1),
+            "MessagePart": part,
+            "expire": expire,
+        }
+    )
+
+    if part_index % MESSAGE_PART_ID_BOUND_INTERVAL == 0:
+        # Parts may arrive out of order, so only raise the bound.
+        try:
+            table.update_item(
+                Key={
+                    "ConnectionId": connection_id,
+                    "MessagePartId": decimal(0),
+                },
+                UpdateExpression="SET MaxPartId = :max_part_id",
+                ConditionExpression="attribute_not_exists(MaxPartId) OR MaxPartId < :max_part_id",
+                ExpressionAttributeValues={
+                    ":max_part_id": part_index + MESSAGE_PART_ID_BOUND_INTERVAL
+                },
             )
-        ).encode("utf-8")
-        self.notify(payload=payload)
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            pass
+
+
+def load_message(connection_id: str) -> tuple[str, str]:
+    """Load the user id and the concatenated message of the session.
+    Returns a tuple of (user_id, full_message).
+    """
+    session = table.get_item(
+        Key={
+            "ConnectionId": connection_id,
+            "MessagePartId": decimal(0),
+        },
+        ConsistentRead=True,
+    )["Item"]
+    user_id = str(session["UserId"])
+    max_part_id = int(cast(decimal, session.get("MaxPartId", 0)))
+
+    # Ids above the last part are not found, and are simply not returned
+    keys = [
+        {"ConnectionId": connection_id, "MessagePartId": decimal(part_id)}
+        for part_id in range(1, max_part_id + 1)
+    ]
+    items = []
+    for i in range(0, len(keys), BATCH_GET_MAX_KEYS):
+        request_items: dict[str, Any] | None = {
+            WEBSOCKET_SESSION_TABLE_NAME: {
+                "Keys": keys[i : i + BATCH_GET_MAX_KEYS],
+                "ConsistentRead": True,
+            }
+        }
+        # Response size is limited to 16MB, so fetch the unprocessed keys again
+        while request_items:
+            response = dynamodb_client.batch_get_item(RequestItems=request_items)
+            items.extend(response["Responses"].get(WEBSOCKET_SESSION_TABLE_NAME, []))
+            request_items = response.get("UnprocessedKeys")
+
+    logger.info(f"Number of message chunks: {len(items)}")
+    items.sort(key=lambda item: int(cast(decimal, item["MessagePartId"])))
+    full_message = "".join(str(item["MessagePart"]) for item in items)
+    return user_id, full_message
 
 
 def process_chat_input(
@@ -277,9 +606,10 @@ def handler(event, context):
         # 1. Client sends `START` message to the WebSocket API.
         # 2. This handler receives the `Session started` message.
         # 3. Client sends message parts to the WebSocket API.
-        # 4. This handler receives the message parts and appends them to the item in DynamoDB with index.
+        # 4. This handler receives the message parts and stores them to DynamoDB with index.
         # 5. Client sends `END` message to the WebSocket API.
-        # 6. This handler receives the `END` message, concatenates the parts and sends the message to Bedrock.
+        # 6. This handler receives the `END` message, fetches all the parts at once,
+        #    concatenates them and sends the message to Bedrock.
         if step == "START":
             try:
                 # Verify JWT token
@@ -313,41 +643,8 @@ def handler(event, context):
             decoded = verify_token(token)
             user = User.from_decoded_token(decoded)
 
-            # Retrieve user id
-            response = table.query(
-                KeyConditionExpression=Key("ConnectionId").eq(connection_id),
-                FilterExpression=Attr("UserId").exists(),
-            )
-            user_id = response["Items"][0]["UserId"]
-
-            # Concatenate the message parts
-            message_parts = []
-            last_evaluated_key = None
-
-            while True:
-                if last_evaluated_key:
-                    response = table.query(
-                        KeyConditionExpression=Key("ConnectionId").eq(connection_id)
-                        # Zero is reserved for user id, so start from 1
-                        & Key("MessagePartId").gte(1),
-                        ExclusiveStartKey=last_evaluated_key,
-                    )
-                else:
-                    response = table.query(
-                        KeyConditionExpression=Key("ConnectionId").eq(connection_id)
-                        & Key("MessagePartId").gte(1),
-                    )
-
-                message_parts.extend(response["Items"])
-
-                if "LastEvaluatedKey" in response:
-                    last_evaluated_key = response["LastEvaluatedKey"]
-                else:
-                    break
-
-            logger.info(f"Number of message chunks: {len(message_parts)}")
-            message_parts.sort(key=lambda x: x["MessagePartId"])
-            full_message = "".join(item["MessagePart"] for item in message_parts)
+            # Retrieve user id and the concatenated message parts
+            user_id, full_message = load_message(connection_id)
 
             # Process the concatenated full message
             chat_input = ChatInput(**json.loads(full_message))
@@ -359,18 +656,11 @@ def handler(event, context):
 
         else:
             # Store the message part of full message
-            # Zero is reserved for user id, so start from 1
-            part_index = body["index"] + 1
-            message_part = body["part"]
-
-            # Store the message part with its index
-            table.put_item(
-                Item={
-                    "ConnectionId": connection_id,
-                    "MessagePartId": decimal(part_index),
-                    "MessagePart": message_part,
-                    "expire": expire,
-                }
+            store_message_part(
+                connection_id=connection_id,
+                part_index=body["index"],
+                part=body["part"],
+                expire=expire,
             )
             return {"statusCode": 200, "body": "Message part received."}
 
@@ -389,3 +679,7 @@ def handler(event, context):
     finally:
         notificator.finish()
         notification_thread.join(timeout=60)
+        if notification_thread.is_alive():
+            logger.warning(
+                f"Notification sender did not finish in time. {notificator.commands.qsize()} notifications are pending: {notificator.metrics}"
+            )
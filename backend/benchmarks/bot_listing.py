@@ -0,0 +1,281 @@
+"""Benchmark of the sidebar bot listing against DynamoDB Local.
+
+Compares the former sequential listing, which resolved the aliases of each page one batch
+after another, with the listing engine for the recently used bots (with a limit like the
+sidebar) and the starred bots, for increasing numbers of bots per user.
+
+Usage:
+    docker run -p 8000:8000 amazon/dynamodb-local
+    cd backend
+    DDB_ENDPOINT_URL=http://localhost:8000 python -m benchmarks.bot_listing
+"""
+
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal as decimal
+
+from ulid import ULID
+
+if not os.environ.get("DDB_ENDPOINT_URL"):
+    sys.exit("DDB_ENDPOINT_URL is required, e.g. http://localhost:8000")
+
+TABLE_NAME = f"bench-bot-{ULID()}"
+os.environ["BOT_TABLE_NAME"] = TABLE_NAME
+os.environ.pop("AWS_EXECUTION_ENV", None)
+
+from app.repositories.common import (
+    TRANSACTION_BATCH_READ_SIZE,
+    compose_item_type,
+    compose_sk,
+    get_bot_table_client,
+)
+from app.repositories.custom_bot import (
+    find_recently_used_bots_by_user_id,
+    find_starred_bots_by_user_id,
+)
+from app.repositories.models.custom_bot import BotMeta
+from benchmarks.utils import measure, print_report, summarize
+from boto3.dynamodb.conditions import Key
+
+USER_ID = "bench-user"
+OTHER_USER_ID = "bench-owner"
+SIDEBAR_LIMIT = 30
+
+
+def create_table(table):
+    table.meta.client.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[
+            {"AttributeName": "PK", "KeyType": "HASH"},
+            {"AttributeName": "SK", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "PK", "AttributeType": "S"},
+            {"AttributeName": "SK", "AttributeType": "S"},
+            {"AttributeName": "ItemType", "AttributeType": "S"},
+            {"AttributeName": "IsStarred", "AttributeType": "S"},
+            {"AttributeName": "LastUsedTime", "AttributeType": "N"},
+        ],
+        LocalSecondaryIndexes=[
+            {
+                "IndexName": "StarredIndex",
+                "KeySchema": [
+                    {"AttributeName": "PK", "KeyType": "HASH"},
+                    {"AttributeName": "IsStarred", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            },
+            {
+                "IndexName": "LastUsedTimeIndex",
+                "KeySchema": [
+                    {"AttributeName": "PK", "KeyType": "HASH"},
+                    {"AttributeName": "LastUsedTime", "KeyType": "RANGE"},
+                ],
+                "Projection": {"ProjectionType": "ALL"},
+            },
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "ItemTypeIndex",
+                "KeySchema": [{"AttributeName": "ItemType", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    table.meta.client.get_waiter("table_exists").wait(TableName=TABLE_NAME)
+
+
+def bot_item(owner_user_id: str, bot_id: str, instruction_size: int) -> dict:
+    now = decimal(time.time())
+    return {
+        "PK": owner_user_id,
+        "SK": compose_sk(bot_id, "bot"),
+        "ItemType": compose_item_type(owner_user_id, "bot"),
+        "BotId": bot_id,
+        "Title": "Benchmark",
+        "Description": "Benchmark",
+        "Instruction": "x" * instruction_size,
+        "CreateTime": now,
+        "LastUsedTime": now,
+        "SyncStatus": "SUCCEEDED",
+        "SharedScope": "all",
+        "SharedStatus": "shared",
+    }
+
+
+def seed(num_bots: int, instruction_size: int):
+    """Store the owned bots of the user, and as many aliases of the bots of another user.
+    A third of both are starred.
+    """
+    table = get_bot_table_client()
+    with table.batch_writer() as batch:
+        for i in range(num_bots):
+            item = bot_item(USER_ID, str(ULID()), instruction_size)
+            if i % 3 == 0:
+                item["IsStarred"] = "TRUE"
+            batch.put_item(Item=item)
+
+            original = bot_item(OTHER_USER_ID, str(ULID()), instruction_size)
+            batch.put_item(Item=original)
+            alias = {
+                "PK": USER_ID,
+                "SK": compose_sk(original["BotId"], "alias"),
+                "ItemType": compose_item_type(USER_ID, "alias"),
+                "OriginalBotId": original["BotId"],
+                "OwnerUserId": OTHER_USER_ID,
+                "IsOriginAccessible": True,
+                "Title": original["Title"],
+                "Description": original["Description"],
+                "CreateTime": original["CreateTime"],
+                "LastUsedTime": original["LastUsedTime"],
+                "SyncStatus": original["SyncStatus"],
+            }
+            if i % 3 == 0:
+                alias["IsStarred"] = "TRUE"
+            batch.put_item(Item=alias)
+
+
+def clear():
+    table = get_bot_table_client()
+    with table.batch_writer() as batch:
+        for user_id in [USER_ID, OTHER_USER_ID]:
+            params: dict = {
+                "KeyConditionExpression": Key("PK").eq(user_id),
+                "ProjectionExpression": "PK, SK",
+            }
+            while True:
+                response = table.query(**params)
+                for item in response["Items"]:
+                    batch.delete_item(Key=item)
+                if "LastEvaluatedKey" not in response:
+                    break
+                params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def legacy_find_bots(query_params: dict, max_query_count: int = 5) -> list[BotMeta]:
+    """The former listing: pages and alias batches are read one after another."""
+    table = get_bot_table_client()
+    query_params = dict(query_params)
+    bots = []
+    for _ in range(max_query_count):
+        response = table.query(**query_params)
+        aliases = []
+        for item in response["Items"]:
+            if "BOT" in item["ItemType"]:
+                bots.append(
+                    BotMeta.from_dynamo_item(
+                        item, owned=True, is_origin_accessible=True
+                    )
+                )
+            else:
+                aliases.append(item)
+
+        for i in range(0, len(aliases), TRANSACTION_BATCH_READ_SIZE):
+            batch = aliases[i : i + TRANSACTION_BATCH_READ_SIZE]
+            original_bots = {
+                item["BotId"]: item
+                for item in table.meta.client.batch_get_item(
+                    RequestItems={
+                        TABLE_NAME: {
+                            "Keys": [
+                                {
+                                    "PK": alias["OwnerUserId"],
+                                    "SK": compose_sk(alias["OriginalBotId"], "bot"),
+                                }
+                                for alias in batch
+                            ]
+                        }
+                    }
+                )["Responses"][TABLE_NAME]
+            }
+            for alias in batch:
+                bots.append(
+                    BotMeta.from_dynamo_item(
+                        original_bots[alias["OriginalBotId"]],
+                        owned=False,
+                        is_origin_accessible=True,
+                        is_starred=alias.get("IsStarred", False),
+                    )
+                )
+
+        if "LastEvaluatedKey" not in response:
+            break
+        query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    return bots
+
+
+def legacy_recently_used(limit: int) -> list[BotMeta]:
+    bots = legacy_find_bots(
+        {
+            "IndexName": "LastUsedTimeIndex",
+            "KeyConditionExpression": Key("PK").eq(USER_ID),
+            "ScanIndexForward": False,
+        }
+    )
+    bots.sort(key=lambda x: x.last_used_time, reverse=True)
+    return bots[:limit]
+
+
+def legacy_starred() -> list[BotMeta]:
+    bots = legacy_find_bots(
+        {
+            "IndexName": "StarredIndex",
+            "KeyConditionExpression": Key("PK").eq(USER_ID)
+            & Key("IsStarred").eq("TRUE"),
+        }
+    )
+    bots.sort(key=lambda x: x.last_used_time, reverse=True)
+    return bots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--bots",
+        type=int,
+        nargs="+",
+        default=[10, 50, 200, 500],
+        help="Owned bots per run. The user has as many aliases.",
+    )
+    parser.add_argument("--instruction-size", type=int, default=4096)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    table = get_bot_table_client()
+    create_table(table)
+    try:
+        rows = []
+        for num_bots in args.bots:
+            seed(num_bots, args.instruction_size)
+            paths = [
+                ("legacy_recent", lambda: legacy_recently_used(SIDEBAR_LIMIT)),
+                (
+                    "recent",
+                    lambda: find_recently_used_bots_by_user_id(
+                        USER_ID, limit=SIDEBAR_LIMIT
+                    ),
+                ),
+                ("legacy_starred", legacy_starred),
+                ("starred", lambda: find_starred_bots_by_user_id(USER_ID)),
+            ]
+            for name, fn in paths:
+                found = len(fn())
+                rows.append(
+                    summarize(
+                        f"{name}({num_bots * 2})",
+                        measure(fn, args.iterations),
+                        found=found,
+                    )
+                )
+            clear()
+
+        print_report(rows)
+    finally:
+        table.meta.client.delete_table(TableName=TABLE_NAME)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Load test of the bot store pickup feed against a local OpenSearch.
+
+Compares the former pickup query, shuffled by a new seed for each request, with
+`find_random_bots`, seeded per user per day, with and without the response cache.
+Requests of random users are sent concurrently. `distinct_bots` is the number of different
+bots returned to one user by repeated requests, which is bounded by the page for the seeded
+feed, and `window` is the number of bots the user can page through.
+
+Usage:
+    docker run -p 9200:9200 -e discovery.type=single-node \\
+        -e DISABLE_SECURITY_PLUGIN=true opensearchproject/opensearch:2
+    cd backend
+    OPENSEARCH_URL=http://localhost:9200 python -m benchmarks.bot_pickup
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+if not os.environ.get("OPENSEARCH_URL"):
+    sys.exit("OPENSEARCH_URL is required, e.g. http://localhost:9200")
+
+import app.repositories.bot_store as bot_store
+from app.repositories.bot_store import (
+    _compose_access_filter,
+    _compose_user_principals,
+    clear_bot_store_cache,
+    find_random_bots,
+)
+from app.user import User
+from benchmarks.bot_store_filter import INDEX_NAME, seed
+from benchmarks.utils import print_report, summarize
+from opensearchpy import OpenSearch
+
+
+def legacy_random_bots(client: OpenSearch, user: User, limit: int) -> list[str]:
+    """The former pickup query, with a new seed for each request."""
+    response = client.search(
+        index=INDEX_NAME,
+        body={
+            "query": {
+                "function_score": {
+                    "query": {
+                        "bool": {
+                            "filter": _compose_access_filter(
+                                _compose_user_principals(user)
+                            )
+                        }
+                    },
+                    "random_score": {
+                        "seed": int(time.time()) + random.randint(0, 10000)
+                    },
+                }
+            },
+            "size": limit,
+        },
+    )
+    return [hit["_source"]["BotId"] for hit in response["hits"]["hits"]]
+
+
+def run_load(
+    name: str,
+    fn: Callable[[User], list[str]],
+    users: list[User],
+    requests: int,
+    concurrency: int,
+    window: int | str,
+) -> dict:
+    rng = random.Random(2)
+    targets = [rng.choice(users) for _ in range(requests)]
+
+    def call(user: User) -> float:
+        start = time.perf_counter()
+        fn(user)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(call, targets))
+    elapsed = time.perf_counter() - start
+
+    distinct_bots = set()
+    for _ in range(10):
+        distinct_bots.update(fn(users[0]))
+
+    return summarize(
+        name,
+        latencies,
+        rps=requests / elapsed,
+        distinct_bots=len(distinct_bots),
+        window=window,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--bots", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    client = OpenSearch(
+        hosts=[os.environ["OPENSEARCH_URL"]], timeout=60, pool_maxsize=args.concurrency
+    )
+    rng = random.Random(1)
+    groups = [f"group{i}" for i in range(args.groups)]
+    users = [
+        User(
+            id=f"user{i}",
+            name=f"user{i}",
+            email=f"user{i}@example.com",
+            groups=rng.sample(groups, 3),
+        )
+        for i in range(args.users)
+    ]
+
+    bot_store.INDEX_NAME = INDEX_NAME
+    client.indices.create(index=INDEX_NAME)
+    try:
+        seed(client, args.bots, users, groups)
+        accessible = client.count(
+            index=INDEX_NAME,
+            body={"query": _compose_access_filter(_compose_user_principals(users[0]))},
+        )["count"]
+        print(f"Bots accessible by a user: {accessible}")
+
+        def seeded(user: User) -> list[str]:
+            return [bot.id for bot in find_random_bots(user, args.limit, client=client)]
+
+        rows = [
+            run_load(
+                "legacy",
+                lambda user: legacy_random_bots(client, user, args.limit),
+                users,
+                args.requests,
+                args.concurrency,
+                window="-",
+            )
+        ]
+        original_ttl = bot_store.BOT_STORE_PICKUP_CACHE_TTL_SECONDS
+        bot_store.BOT_STORE_PICKUP_CACHE_TTL_SECONDS = 0
+        clear_bot_store_cache()
+        rows.append(
+            run_load(
+                "seeded",
+                seeded,
+                users,
+                args.requests,
+                args.concurrency,
+                window=bot_store.BOT_STORE_PICKUP_WINDOW,
+            )
+        )
+        bot_store.BOT_STORE_PICKUP_CACHE_TTL_SECONDS = original_ttl
+        rows.append(
+            run_load(
+                "seeded_cached",
+                seeded,
+                users,
+                args.requests,
+                args.concurrency,
+                window=bot_store.BOT_STORE_PICKUP_WINDOW,
+            )
+        )
+
+        print_report(rows)
+        print(f"Cache stats: {bot_store.get_bot_store_cache_stats()}")
+    finally:
+        client.indices.delete(index=INDEX_NAME)
+        clear_bot_store_cache()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Benchmark of the bot store access filter against a local OpenSearch.
+
+Compares the former painless script filter over `AllowedCognitoGroups` with the `terms`
+filter over `AccessPrincipals` on a synthetic corpus of bots, for the usage count ranking
+and the text search. The number of hits of both filters is compared for each user.
+
+Usage:
+    docker run -p 9200:9200 -e discovery.type=single-node \\
+        -e DISABLE_SECURITY_PLUGIN=true opensearchproject/opensearch:2
+    cd backend
+    OPENSEARCH_URL=http://localhost:9200 python -m benchmarks.bot_store_filter
+"""
+
+import argparse
+import os
+import random
+import sys
+
+from ulid import ULID
+
+if not os.environ.get("OPENSEARCH_URL"):
+    sys.exit("OPENSEARCH_URL is required, e.g. http://localhost:9200")
+
+from app.repositories.bot_store import _compose_access_filter, _compose_user_principals
+from app.repositories.common import compose_access_principals
+from app.user import User
+from benchmarks.utils import measure, print_report, summarize
+from opensearchpy import OpenSearch, helpers
+
+INDEX_NAME = f"bench-bot-{str(ULID()).lower()}"
+WORDS = ["assistant", "code", "review", "travel", "support", "legal", "sales", "hr"]
+
+
+def legacy_access_filter(user: User) -> dict:
+    """The former filter, running a painless script for each partial shared bot."""
+    filter_should = [
+        {"term": {"SharedScope.keyword": "all"}},
+        {
+            "bool": {
+                "must": [
+                    {"term": {"PK.keyword": user.id}},
+                    {
+                        "bool": {
+                            "should": [
+                                {
+                                    "bool": {
+                                        "must_not": {"exists": {"field": "SharedScope"}}
+                                    }
+                                },
+                                {"term": {"SharedScope.keyword": "partial"}},
+                            ],
+                            "minimum_should_match": 1,
+                        }
+                    },
+                ]
+            }
+        },
+        {
+            "bool": {
+                "must": [
+                    {"term": {"SharedScope.keyword": "partial"}},
+                    {
+                        "bool": {
+                            "should": [
+                                {"term": {"AllowedCognitoUsers.keyword": user.id}},
+                                {
+                                    "script": {
+                                        "script": {
+                                            "source": (
+                                                "for (group in doc['AllowedCognitoGroups.keyword']) { "
+                                                "if (params.user_groups.contains(group)) { return true; } } "
+                                                "return false;"
+                                            ),
+                                            "params": {"user_groups": user.groups},
+                                            "lang": "painless",
+                                        }
+                                    }
+                                },
+                            ],
+                            "minimum_should_match": 1,
+                        }
+                    },
+                ]
+            }
+        },
+    ]
+    return {
+        "bool": {
+            "must": [{"prefix": {"SK.keyword": "BOT"}}],
+            "should": filter_should,
+            "minimum_should_match": 1,
+        }
+    }
+
+
+def seed(client: OpenSearch, num_bots: int, users: list[User], groups: list[str]):
+    """Index bots like the ingestion pipeline: 60% private, 25% partial, 15% public."""
+    rng = random.Random(0)
+    actions = []
+    for i in range(num_bots):
+        owner = rng.choice(users)
+        roll = rng.random()
+        shared_scope = "private" if roll < 0.6 else "partial" if roll < 0.85 else "all"
+        allowed_users = []
+        allowed_groups = []
+        if shared_scope == "partial":
+            allowed_users = [user.id for user in rng.sample(users, 3)]
+            allowed_groups = rng.sample(groups, 2)
+
+        document = {
+            "PK": owner.id,
+            "SK": f"BOT#{i}",
+            "BotId": str(i),
+            "Title": " ".join(rng.sample(WORDS, 2)),
+            "Description": " ".join(rng.sample(WORDS, 4)),
+            "Instruction": " ".join(rng.choices(WORDS, k=50)),
+            "CreateTime": i,
+            "LastUsedTime": i,
+            "SharedStatus": "unshared" if shared_scope == "private" else "shared",
+            "SyncStatus": "SUCCEEDED",
+            "AllowedCognitoUsers": allowed_users,
+            "AllowedCognitoGroups": allowed_groups,
+            "AccessPrincipals": compose_access_principals(
+                owner.id, shared_scope, allowed_users, allowed_groups
+            ),
+            "UsageStats": {"usage_count": rng.randint(0, 10000)},
+        }
+        if shared_scope != "private":
+            document["SharedScope"] = shared_scope
+        actions.append({"_index": INDEX_NAME, "_id": str(i), "_source": document})
+
+    helpers.bulk(client, actions, chunk_size=1000)
+    client.indices.refresh(index=INDEX_NAME)
+
+
+def sorted_by_usage_count(access_filter: dict) -> dict:
+    return {
+        "query": {"bool": {"filter": access_filter}},
+        "sort": [{"UsageStats.usage_count": {"order": "desc"}}],
+        "size": 20,
+        "track_total_hits": True,
+    }
+
+
+def search_by_query(access_filter: dict) -> dict:
+    return {
+        "query": {
+            "bool": {
+                "must": [
+                    {
+                        "multi_match": {
+                            "query": "code review",
+                            "fields": ["Description", "Title", "Instruction"],
+                            "type": "best_fields",
+                            "operator": "or",
+                            "minimum_should_match": "30%",
+                            "fuzziness": "AUTO",
+                        }
+                    }
+                ],
+                "filter": access_filter,
+            }
+        },
+        "size": 20,
+        "track_total_hits": True,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--bots", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    client = OpenSearch(hosts=[os.environ["OPENSEARCH_URL"]], timeout=60)
+    rng = random.Random(1)
+    groups = [f"group{i}" for i in range(args.groups)]
+    users = [
+        User(
+            id=f"user{i}",
+            name=f"user{i}",
+            email=f"user{i}@example.com",
+            groups=rng.sample(groups, 3),
+        )
+        for i in range(args.users)
+    ]
+
+    client.indices.create(index=INDEX_NAME)
+    try:
+        seed(client, args.bots, users, groups)
+
+        # Same hits for both filters
+        for user in users[:20]:
+            counts = [
+                client.search(
+                    index=INDEX_NAME, body=sorted_by_usage_count(access_filter)
+                )["hits"]["total"]["value"]
+                for access_filter in [
+                    legacy_access_filter(user),
+                    _compose_access_filter(_compose_user_principals(user)),
+                ]
+            ]
+            assert counts[0] == counts[1], f"Hits differ for {user.id}: {counts}"
+
+        rows = []
+        for body_name, compose_body in [
+            ("usage_count", sorted_by_usage_count),
+            ("query", search_by_query),
+        ]:
+            for filter_name, compose_filter in [
+                ("script", legacy_access_filter),
+                (
+                    "terms",
+                    lambda user: _compose_access_filter(_compose_user_principals(user)),
+                ),
+            ]:
+                index = 0
+
+                def search():
+                    nonlocal index
+                    user = users[index % len(users)]
+                    index += 1
+                    return client.search(
+                        index=INDEX_NAME, body=compose_body(compose_filter(user))
+                    )
+
+                rows.append(
+                    summarize(
+                        f"{body_name}_{filter_name}",
+                        measure(search, args.iterations),
+                        took_ms=float(search()["took"]),
+                    )
+                )
+
+        print_report(rows)
+    finally:
+        client.indices.delete(index=INDEX_NAME)
+
+
+if __name__ == "__main__":
+    main()
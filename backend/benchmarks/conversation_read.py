@@ -0,0 +1,240 @@
+"""Benchmark of the conversation read paths against DynamoDB Local.
+
+Compares the former `SKIndex` GSI query with the strongly consistent GetItem (full and projected),
+BatchGetItem, and `find_conversation_by_id` with a cold and a warm conversation cache.
+
+Usage:
+    docker run -p 8000:8000 amazon/dynamodb-local
+    cd backend
+    DDB_ENDPOINT_URL=http://localhost:8000 python -m benchmarks.conversation_read
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from ulid import ULID
+
+if not os.environ.get("DDB_ENDPOINT_URL"):
+    sys.exit("DDB_ENDPOINT_URL is required, e.g. http://localhost:8000")
+
+TABLE_NAME = f"bench-conversation-{ULID()}"
+os.environ["CONVERSATION_TABLE_NAME"] = TABLE_NAME
+os.environ.pop("AWS_EXECUTION_ENV", None)
+
+from app.repositories.common import compose_conv_id, get_conversation_table_client
+from app.repositories.conversation import (
+    _CONVERSATION_META_ATTRIBUTES,
+    find_conversation_by_id,
+    find_conversations_by_ids,
+    store_conversation,
+)
+from app.repositories.conversation_cache import (
+    CONVERSATION_CACHE_MAX_BYTES,
+    conversation_cache,
+)
+from app.repositories.models.conversation import (
+    ConversationModel,
+    MessageModel,
+    TextContentModel,
+)
+from benchmarks.utils import measure, print_report, summarize
+from boto3.dynamodb.conditions import Key
+
+USER_ID = "bench-user"
+
+
+def create_table(table):
+    table.meta.client.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[
+            {"AttributeName": "PK", "KeyType": "HASH"},
+            {"AttributeName": "SK", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "PK", "AttributeType": "S"},
+            {"AttributeName": "SK", "AttributeType": "S"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": "SKIndex",
+                "KeySchema": [{"AttributeName": "SK", "KeyType": "HASH"}],
+                "Projection": {"ProjectionType": "ALL"},
+            }
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    table.meta.client.get_waiter("table_exists").wait(TableName=TABLE_NAME)
+
+
+def seed(num_conversations: int, num_messages: int, message_size: int) -> list[str]:
+    conversation_ids = []
+    for _ in range(num_conversations):
+        message_map = {}
+        parent = None
+        for i in range(num_messages):
+            message_id = "system" if i == 0 else f"m{i}"
+            message_map[message_id] = MessageModel(
+                role="system" if i == 0 else ("user" if i % 2 else "assistant"),
+                content=[
+                    TextContentModel(content_type="text", body="x" * message_size)
+                ],
+                model="claude-v3-haiku",
+                children=[],
+                parent=parent,
+                create_time=time.time(),
+            )
+            if parent is not None:
+                message_map[parent].children.append(message_id)
+            parent = message_id
+
+        conversation = ConversationModel(
+            id=str(ULID()),
+            create_time=time.time(),
+            title="Benchmark",
+            total_price=0,
+            message_map=message_map,
+            last_message_id=parent or "system",
+            bot_id=None,
+            should_continue=False,
+        )
+        store_conversation(USER_ID, conversation)
+        conversation_ids.append(conversation.id)
+    return conversation_ids
+
+
+def run_path(name: str, conversation_ids: list[str], read, iterations: int):
+    """Read each conversation in turn, summing the consumed capacity if returned."""
+    capacity: float | None = None
+    index = 0
+
+    def call():
+        nonlocal capacity, index
+        response = read(conversation_ids[index % len(conversation_ids)])
+        index += 1
+        if response is not None and "ConsumedCapacity" in response:
+            capacity = (capacity or 0) + response["ConsumedCapacity"]["CapacityUnits"]
+
+    latencies = measure(call, iterations)
+    return summarize(
+        name,
+        latencies,
+        rcu_per_read=capacity / iterations if capacity is not None else "-",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--message-size", type=int, default=1024)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    table = get_conversation_table_client(USER_ID)
+    create_table(table)
+    try:
+        conversation_cache.max_bytes = 0
+        conversation_ids = seed(args.conversations, args.messages, args.message_size)
+
+        def gsi_query(conversation_id: str):
+            return table.query(
+                IndexName="SKIndex",
+                KeyConditionExpression=Key("SK").eq(
+                    compose_conv_id(USER_ID, conversation_id)
+                ),
+                ReturnConsumedCapacity="TOTAL",
+            )
+
+        def get_item(conversation_id: str, projected: bool = False):
+            params = {}
+            if projected:
+                params = {
+                    "ProjectionExpression": ", ".join(
+                        f"#{name}" for name in _CONVERSATION_META_ATTRIBUTES
+                    ),
+                    "ExpressionAttributeNames": {
+                        f"#{name}": name for name in _CONVERSATION_META_ATTRIBUTES
+                    },
+                }
+            return table.get_item(
+                Key={"PK": USER_ID, "SK": compose_conv_id(USER_ID, conversation_id)},
+                ConsistentRead=True,
+                ReturnConsumedCapacity="TOTAL",
+                **params,
+            )
+
+        rows = [
+            run_path("gsi_query", conversation_ids, gsi_query, args.iterations),
+            run_path("get_item", conversation_ids, get_item, args.iterations),
+            run_path(
+                "get_item_projected",
+                conversation_ids,
+                lambda conversation_id: get_item(conversation_id, projected=True),
+                args.iterations,
+            ),
+        ]
+
+        def batch_get_item():
+            response = table.meta.client.batch_get_item(
+                RequestItems={
+                    TABLE_NAME: {
+                        "Keys": [
+                            {
+                                "PK": USER_ID,
+                                "SK": compose_conv_id(USER_ID, conversation_id),
+                            }
+                            for conversation_id in conversation_ids[:100]
+                        ],
+                        "ConsistentRead": True,
+                    }
+                },
+                ReturnConsumedCapacity="TOTAL",
+            )
+            return sum(c["CapacityUnits"] for c in response.get("ConsumedCapacity", []))
+
+        capacity = batch_get_item()
+        num_keys = min(len(conversation_ids), 100)
+        latencies = measure(batch_get_item, max(1, args.iterations // num_keys))
+        rows.append(
+            summarize(
+                f"batch_get_item({num_keys})",
+                latencies,
+                rcu_per_read=capacity / num_keys,
+            )
+        )
+
+        # End to end, including the validation of the loaded messages
+        def find(conversation_id: str):
+            conversation = find_conversation_by_id(USER_ID, conversation_id)
+            list(conversation.message_map.values())
+
+        rows.append(
+            run_path("find_cold_cache", conversation_ids, find, args.iterations)
+        )
+        conversation_cache.max_bytes = CONVERSATION_CACHE_MAX_BYTES
+        for conversation_id in conversation_ids:
+            find(conversation_id)
+        rows.append(
+            run_path("find_warm_cache", conversation_ids, find, args.iterations)
+        )
+        latencies = measure(
+            lambda: find_conversations_by_ids(USER_ID, conversation_ids[:100]),
+            max(1, args.iterations // num_keys),
+        )
+        rows.append(
+            summarize(
+                f"find_by_ids_warm_cache({num_keys})", latencies, rcu_per_read="-"
+            )
+        )
+
+        print_report(rows)
+    finally:
+        table.meta.client.delete_table(TableName=TABLE_NAME)
+        conversation_cache.max_bytes = CONVERSATION_CACHE_MAX_BYTES
+        conversation_cache.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Benchmark of the conversation search against a local OpenSearch.
+
+A synthetic corpus of conversations is indexed through `app.conversation_indexer`, and
+the former search, collapsing the hits with their highlights as inner hits, is compared with
+`find_conversations_by_query` for full words, for the prefixes typed in the type-ahead
+(compact mode), for misspelled words, and for the following pages. `found` is the number of
+conversations returned by the last search of the path, and `target` tells whether its p95
+latency is within the target of the path.
+
+Usage:
+    docker run -p 9200:9200 -e discovery.type=single-node \\
+        -e DISABLE_SECURITY_PLUGIN=true opensearchproject/opensearch:2
+    cd backend
+    OPENSEARCH_URL=http://localhost:9200 python -m benchmarks.conversation_search
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+from ulid import ULID
+
+if not os.environ.get("OPENSEARCH_URL"):
+    sys.exit("OPENSEARCH_URL is required, e.g. http://localhost:9200")
+
+os.environ["ENV_PREFIX"] = f"bench-{str(ULID()).lower()}-"
+
+from app.conversation_indexer import index_records
+from app.repositories.conversation_search import (
+    INDEX_NAME,
+    ensure_conversation_index,
+    find_conversations_by_query,
+)
+from app.user import User
+from benchmarks.utils import measure, percentile, print_report, summarize
+from boto3.dynamodb.types import TypeSerializer
+from opensearchpy import OpenSearch
+
+WORDS = [
+    "kyoto",
+    "itinerary",
+    "budget",
+    "deployment",
+    "kubernetes",
+    "invoice",
+    "contract",
+    "recipe",
+    "python",
+    "migration",
+    "database",
+    "marketing",
+    "quarterly",
+    "onboarding",
+    "translation",
+    "summary",
+]
+FILLER = ["the", "a", "of", "to", "and", "for", "with", "please", "could", "you"]
+# p95 latency targets in milliseconds
+TYPEAHEAD_TARGET_MS = 100
+SEARCH_TARGET_MS = 300
+
+_serializer = TypeSerializer()
+
+
+def compose_record(
+    user_id: str, conversation_id: str, rng: random.Random, messages: int
+):
+    message_map = {}
+    for i in range(messages):
+        words = rng.choices(FILLER, k=30) + rng.sample(WORDS, 3)
+        rng.shuffle(words)
+        message_map[f"m{i}"] = {
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": [{"content_type": "text", "body": " ".join(words)}],
+            "model": "claude-v3-haiku",
+            "children": [],
+            "parent": None,
+            "create_time": i,
+        }
+    item = {
+        "PK": user_id,
+        "SK": f"{user_id}#CONV#{conversation_id}",
+        "Title": " ".join(rng.sample(WORDS, 2)),
+        "CreateTime": rng.randint(0, 10**6),
+        "MessageMap": json.dumps(message_map),
+        "IsLargeMessage": False,
+    }
+    return {
+        "eventName": "INSERT",
+        "dynamodb": {
+            "Keys": {k: _serializer.serialize(item[k]) for k in ["PK", "SK"]},
+            "NewImage": {k: _serializer.serialize(v) for k, v in item.items()},
+        },
+    }
+
+
+def seed(client: OpenSearch, users: list[User], conversations: int, messages: int):
+    rng = random.Random(0)
+    records = []
+    for user in users:
+        for _ in range(conversations):
+            records.append(compose_record(user.id, str(ULID()), rng, messages))
+            if len(records) == 100:
+                index_records(records, client)
+                records = []
+    if records:
+        index_records(records, client)
+    client.indices.refresh(index=INDEX_NAME)
+
+
+def legacy_search(client: OpenSearch, query: str, user: User) -> int:
+    """The former search, collapsing the hits with inner hits for the highlights."""
+    highlight = {
+        "fields": {
+            "Title": {"fragment_size": 150, "number_of_fragments": 1},
+            "Body": {"fragment_size": 150, "number_of_fragments": 1},
+        },
+        "pre_tags": ["<em>"],
+        "post_tags": ["</em>"],
+        "order": "score",
+    }
+    response = client.search(
+        index=INDEX_NAME,
+        body={
+            "query": {
+                "bool": {
+                    "should": [
+                        {"match": {"Title": {"query": query, "boost": 3.0}}},
+                        {"match_phrase": {"Title": {"query": query, "boost": 3.0}}},
+                        {"match": {"Body": {"query": query, "boost": 2.0}}},
+                        {"match_phrase": {"Body": {"query": query, "boost": 5.0}}},
+                    ],
+                    "minimum_should_match": 1,
+                    "filter": [{"term": {"PK": user.id}}],
+                }
+            },
+            "collapse": {
+                "field": "ConversationId",
+                "inner_hits": {
+                    "name": "matches",
+                    "size": 3,
+                    "_source": False,
+                    "highlight": highlight,
+                },
+            },
+            "_source": ["ConversationId"],
+            "size": 20,
+            "sort": [{"_score": {"order": "desc"}}, {"CreateTime": {"order": "desc"}}],
+        },
+    )
+    return len(response["hits"]["hits"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    client = OpenSearch(hosts=[os.environ["OPENSEARCH_URL"]], timeout=60)
+    users = [
+        User(id=f"user{i}", name=f"user{i}", email=f"user{i}@example.com", groups=[])
+        for i in range(args.users)
+    ]
+
+    ensure_conversation_index(client)
+    try:
+        seed(client, users, args.conversations, args.messages)
+        user = users[0]
+
+        def run(queries: list[str], search) -> tuple[list[float], int]:
+            index = 0
+            found = 0
+
+            def call():
+                nonlocal index, found
+                found = search(queries[index % len(queries)])
+                index += 1
+
+            return measure(call, args.iterations), found
+
+        def full(query: str) -> int:
+            return len(find_conversations_by_query(query, user, client=client)[0])
+
+        def compact(query: str) -> int:
+            return len(
+                find_conversations_by_query(
+                    query, user, limit=10, compact=True, client=client
+                )[0]
+            )
+
+        def next_pages(query: str) -> int:
+            # Found on the second and third pages
+            _, next_token = find_conversations_by_query(query, user, client=client)
+            found = 0
+            for _ in range(2):
+                if next_token is None:
+                    break
+                conversations, next_token = find_conversations_by_query(
+                    query, user, next_token=next_token, client=client
+                )
+                found += len(conversations)
+            return found
+
+        paths = [
+            ("legacy", ["kyoto", "invoice"], lambda q: legacy_search(client, q, user)),
+            (
+                "legacy_prefix",
+                ["kyo", "invo"],
+                lambda q: legacy_search(client, q, user),
+            ),
+            ("full", ["kyoto", "invoice"], full, SEARCH_TARGET_MS),
+            ("full_typo", ["kyotp", "invoise"], full, SEARCH_TARGET_MS),
+            (
+                "compact_prefix",
+                ["k", "ky", "kyo", "kyot"],
+                compact,
+                TYPEAHEAD_TARGET_MS,
+            ),
+            ("pages_1_3", ["kyoto"], next_pages, SEARCH_TARGET_MS * 3),
+        ]
+        rows = []
+        for name, queries, search, *target in paths:
+            latencies, found = run(queries, search)
+            rows.append(
+                summarize(
+                    name,
+                    latencies,
+                    found=found,
+                    target=(
+                        ("ok" if percentile(latencies, 95) <= target[0] else "missed")
+                        if target
+                        else "-"
+                    ),
+                )
+            )
+
+        print_report(rows)
+    finally:
+        client.indices.delete(index=INDEX_NAME)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import statistics
+import time
+from typing import Any, Callable
+
+
+def measure(fn: Callable[[], Any], iterations: int) -> list[float]:
+    """Call the function repeatedly and return the latencies in milliseconds."""
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def print_report(rows: list[dict[str, Any]]):
+    """Print the rows as an aligned table. Floats are rounded to 2 decimals."""
+    if not rows:
+        return
+
+    columns = list(rows[0].keys())
+    cells = [
+        [f"{row[c]:.2f}" if isinstance(row[c], float) else str(row[c]) for c in columns]
+        for row in rows
+    ]
+    widths = [
+        max(len(column), *(len(line[i]) for line in cells))
+        for i, column in enumerate(columns)
+    ]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for line in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+
+def summarize(name: str, latencies: list[float], **extra: Any) -> dict[str, Any]:
+    return {
+        "path": name,
+        "n": len(latencies),
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        **extra,
+    }
@@ -6,6 +6,7 @@ from typing import Literal
 import boto3
 from app.repositories.common import compose_sk, decompose_sk, get_bot_table_client
 from app.routes.schemas.bot import type_sync_status
+from app.utils import get_current_time
 from reretry import retry
 
 logger = logging.getLogger()
@@ -28,11 +29,14 @@ def update_sync_status(
     table = get_bot_table_client()
     table.update_item(
         Key={"PK": user_id, "SK": compose_sk(bot_id, "bot")},
-        UpdateExpression="SET SyncStatus = :sync_status, SyncStatusReason = :sync_status_reason, LastExecId = :last_exec_id",
+        # `UpdateTime` is checked by the bot caches of the API to detect the update,
+        # and `LastExecId` of a succeeded sync scopes the retrieval cache of the knowledge base
+        UpdateExpression="SET SyncStatus = :sync_status, SyncStatusReason = :sync_status_reason, LastExecId = :last_exec_id, UpdateTime = :update_time",
         ExpressionAttributeValues={
             ":sync_status": sync_status,
             ":sync_status_reason": sync_status_reason,
             ":last_exec_id": last_exec_id,
+            ":update_time": get_current_time(),
         },
     )
 
@@ -1,10 +1,12 @@
 import sys
 
 sys.path.append(".")
+import threading
+import time
 import unittest
 from pprint import pprint
 
-from app.agents.tools.agent_tool import AgentTool
+from app.agents.tools.agent_tool import AgentTool, ToolRunResult, run_tools
 from app.repositories.models.conversation import (
     RelatedDocumentModel,
     TextToolResultModel,
@@ -54,5 +56,86 @@ class TestAgentTool(unittest.TestCase):
         self.assertEqual(result["status"], "success")
 
 
+class SleepArg(BaseModel):
+    seconds: float = Field(..., description="seconds to sleep")
+
+
+def sleep_function(
+    arg: SleepArg,
+    bot: BotModel | None,
+    model: type_model_name | None,
+) -> str:
+    time.sleep(arg.seconds)
+    return f"slept {arg.seconds}"
+
+
+def failing_function(
+    arg: SleepArg,
+    bot: BotModel | None,
+    model: type_model_name | None,
+) -> str:
+    raise RuntimeError("failed")
+
+
+class TestRunTools(unittest.TestCase):
+    def setUp(self) -> None:
+        self.sleep_tool = AgentTool(
+            name="sleep",
+            description="sleep",
+            args_schema=SleepArg,
+            function=sleep_function,
+        )
+        self.failing_tool = AgentTool(
+            name="failing",
+            description="failing",
+            args_schema=SleepArg,
+            function=failing_function,
+        )
+
+    def test_run_tools_concurrently_in_order(self):
+        finished: list[str] = []
+        callback_threads: set[int] = set()
+
+        def on_tool_result(run_result: ToolRunResult):
+            finished.append(run_result["tool_use_id"])
+            callback_threads.add(threading.get_ident())
+
+        start = time.monotonic()
+        results = run_tools(
+            tool_calls=[
+                (self.sleep_tool, "slow", {"seconds": 0.4}),
+                (self.failing_tool, "failing", {"seconds": 0}),
+                (self.sleep_tool, "fast", {"seconds": 0.1}),
+            ],
+            model="claude-v3.5-sonnet-v2",
+            on_tool_result=on_tool_result,
+        )
+        elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 0.5 + 0.1)
+        self.assertEqual(
+            [r["tool_use_id"] for r in results], ["slow", "failing", "fast"]
+        )
+        self.assertEqual(
+            [r["status"] for r in results], ["success", "error", "success"]
+        )
+        # Callbacks fire on completion, in the caller thread
+        self.assertEqual(finished, ["failing", "fast", "slow"])
+        self.assertEqual(callback_threads, {threading.get_ident()})
+
+    def test_run_tools_timeout(self):
+        results = run_tools(
+            tool_calls=[
+                (self.sleep_tool, "slow", {"seconds": 1}),
+                (self.sleep_tool, "fast", {"seconds": 0}),
+            ],
+            model="claude-v3.5-sonnet-v2",
+            timeout=0.2,
+        )
+        self.assertEqual(results[0]["status"], "error")
+        self.assertIn("timed out", results[0]["related_documents"][0].content.text)  # type: ignore
+        self.assertEqual(results[1]["status"], "success")
+
+
 if __name__ == "__main__":
     unittest.main()
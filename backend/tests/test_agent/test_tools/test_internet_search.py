@@ -1,12 +1,21 @@
 import sys
 
 sys.path.append(".")
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 
 from app.agents.tools.internet_search import (
     InternetSearchInput,
     internet_search_tool,
-    _summarize_content,
+    _summarize_results,
+    get_summary_cache_stats,
+)
+from app.repositories.models.summary_cache import SummaryCacheEntryModel
+from app.repositories.summary_cache import (
+    InMemorySummaryCacheStore,
+    set_summary_cache_store,
 )
 
 
@@ -38,7 +47,7 @@ class TestInternetSearchTool(unittest.TestCase):
         print(response)
 
     def test_summarization(self):
-        """Test that the summarization function works correctly"""
+        """Test that the search results are summarized by the model"""
         test_content = (
             "This is a long test content that should be summarized by Claude 3 Haiku. "
             * 50
@@ -46,7 +55,10 @@ class TestInternetSearchTool(unittest.TestCase):
         test_title = "Test Title"
         test_url = "https://example.com"
 
-        summary = _summarize_content(test_content, test_title, test_url)
+        (summary,) = _summarize_results(
+            [{"title": test_title, "url": test_url, "content": test_content}],
+            "test content",
+        )
 
         # Verify the summary is shorter than the original content
         self.assertLess(len(summary), len(test_content))
@@ -61,5 +73,115 @@ class TestInternetSearchTool(unittest.TestCase):
         print(f"Summary: {summary[:200]}...")
 
 
+class TestSummarizeResults(unittest.TestCase):
+    def setUp(self):
+        self.contents = [
+            {"title": f"title{i}", "url": f"https://example.com/{i}", "content": c}
+            for i, c in enumerate(["long" * 500, "short1", "short2", "long" * 400])
+        ]
+        set_summary_cache_store(InMemorySummaryCacheStore())
+
+    def tearDown(self):
+        set_summary_cache_store(None)
+
+    def _request_summary(self, content, title, url, query):
+        time.sleep(0.2)
+        return SummaryCacheEntryModel(
+            summary=f"summary of {title}", input_tokens=100, output_tokens=10
+        )
+
+    def _request_batch_summaries(self, contents, query):
+        return [
+            SummaryCacheEntryModel(
+                summary=f"batch summary of {item['title']}",
+                input_tokens=50,
+                output_tokens=5,
+            )
+            for item in contents
+        ]
+
+    def _patch_requests(self):
+        return (
+            patch(
+                "app.agents.tools.internet_search._request_summary",
+                side_effect=self._request_summary,
+            ),
+            patch(
+                "app.agents.tools.internet_search._request_batch_summaries",
+                side_effect=self._request_batch_summaries,
+            ),
+        )
+
+    def test_summarize_results(self):
+        patch_summary, patch_batch = self._patch_requests()
+        with patch_summary as request_summary, patch_batch as request_batch_summaries:
+            start = time.monotonic()
+            summaries = _summarize_results(self.contents, "query")
+            elapsed = time.monotonic() - start
+
+        self.assertEqual(
+            summaries,
+            [
+                "summary of title0",
+                "batch summary of title1",
+                "batch summary of title2",
+                "summary of title3",
+            ],
+        )
+        # Long contents are summarized concurrently, short ones in a single batch
+        self.assertLess(elapsed, 0.4)
+        self.assertEqual(request_summary.call_count, 2)
+        self.assertEqual(request_batch_summaries.call_count, 1)
+
+    def test_summarize_only_top_n(self):
+        patch_summary, patch_batch = self._patch_requests()
+        with patch_summary as request_summary, patch_batch:
+            summaries = _summarize_results(self.contents, "query", top_n=1)
+
+        self.assertEqual(request_summary.call_count, 1)
+        self.assertEqual(summaries[0], "summary of title0")
+        self.assertEqual(summaries[1], "short1")
+        self.assertTrue(summaries[3].endswith("..."))
+
+    def test_fallback_to_truncation_on_timeout(self):
+        patch_summary, patch_batch = self._patch_requests()
+        with patch_summary, patch_batch:
+            summaries = _summarize_results(self.contents[:1], "query", timeout=0.05)
+            # Wait for the background job to finish
+            time.sleep(0.3)
+
+        self.assertEqual(summaries[0], self.contents[0]["content"][:1000] + "...")
+
+    def test_summaries_are_cached_by_query_intent(self):
+        patch_summary, patch_batch = self._patch_requests()
+        with patch_summary as request_summary, patch_batch as request_batch_summaries:
+            _summarize_results(self.contents, "Tokyo weather")
+            before = get_summary_cache_stats()
+            summaries = _summarize_results(self.contents, "weather, tokyo?")
+            after = get_summary_cache_stats()
+
+        self.assertEqual(summaries[0], "summary of title0")
+        self.assertEqual(request_summary.call_count, 2)
+        self.assertEqual(request_batch_summaries.call_count, 1)
+        self.assertEqual(after["hits"] - before["hits"], 4)
+        self.assertEqual(
+            after["input_tokens_saved"] - before["input_tokens_saved"], 300
+        )
+
+    def test_concurrent_identical_requests_are_deduplicated(self):
+        patch_summary, patch_batch = self._patch_requests()
+        with patch_summary as request_summary, patch_batch:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                results = list(
+                    executor.map(
+                        lambda _: _summarize_results(self.contents[:1], "query"),
+                        range(2),
+                    )
+                )
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(request_summary.call_count, 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,120 @@
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.append(".")
+
+import rsa
+from app import auth
+from app.auth import clear_auth_cache, verify_token
+from jose import jwt
+from jose.exceptions import JWTError
+
+CLIENT_ID = "test-client"
+
+
+def _b64url_uint(value: int) -> str:
+    data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _generate_key(kid: str) -> tuple[str, dict]:
+    public_key, private_key = rsa.newkeys(1024)
+    jwk = {
+        "kty": "RSA",
+        "alg": "RS256",
+        "use": "sig",
+        "kid": kid,
+        "n": _b64url_uint(public_key.n),
+        "e": _b64url_uint(public_key.e),
+    }
+    return private_key.save_pkcs1().decode("ascii"), jwk
+
+
+def _issue_token(private_pem: str, kid: str, exp: int | None = None) -> str:
+    claims = {
+        "sub": "user-1",
+        "aud": CLIENT_ID,
+        "exp": exp if exp is not None else int(time.time()) + 3600,
+    }
+    return jwt.encode(claims, private_pem, algorithm="RS256", headers={"kid": kid})
+
+
+class TestVerifyToken(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.private_pem_1, cls.jwk_1 = _generate_key("kid-1")
+        cls.private_pem_2, cls.jwk_2 = _generate_key("kid-2")
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.jwks_path = os.path.join(self.tmp_dir.name, "jwks.json")
+        self._write_jwks([self.jwk_1])
+
+        self.patchers = [
+            patch.object(auth, "JWKS_FILE_PATH", self.jwks_path),
+            patch.object(auth, "CLIENT_ID", CLIENT_ID),
+            patch.object(auth, "JWKS_MIN_REFRESH_INTERVAL_SECONDS", 0),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        clear_auth_cache()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        clear_auth_cache()
+        self.tmp_dir.cleanup()
+
+    def _write_jwks(self, keys: list[dict]):
+        with open(self.jwks_path, "w") as f:
+            json.dump({"keys": keys}, f)
+
+    def test_verify_token_with_offline_jwks(self):
+        token = _issue_token(self.private_pem_1, "kid-1")
+        decoded = verify_token(token)
+        self.assertEqual(decoded["sub"], "user-1")
+
+    def test_keys_are_fetched_once(self):
+        with patch.object(
+            auth._jwks_cache, "_load_keys", wraps=auth._jwks_cache._load_keys
+        ) as load_keys:
+            verify_token(_issue_token(self.private_pem_1, "kid-1"))
+            verify_token(
+                _issue_token(self.private_pem_1, "kid-1", exp=int(time.time()) + 60)
+            )
+            self.assertEqual(load_keys.call_count, 1)
+
+    def test_verified_token_is_cached(self):
+        token = _issue_token(self.private_pem_1, "kid-1")
+        verify_token(token)
+        with patch.object(auth.jwt, "decode") as decode:
+            verify_token(token)
+            decode.assert_not_called()
+
+    def test_unknown_kid_triggers_refresh(self):
+        verify_token(_issue_token(self.private_pem_1, "kid-1"))
+
+        # Simulate key rotation
+        self._write_jwks([self.jwk_1, self.jwk_2])
+        decoded = verify_token(_issue_token(self.private_pem_2, "kid-2"))
+        self.assertEqual(decoded["sub"], "user-1")
+
+    def test_unknown_kid_is_rejected(self):
+        private_pem, _ = _generate_key("kid-unknown")
+        with self.assertRaises(JWTError):
+            verify_token(_issue_token(private_pem, "kid-unknown"))
+
+    def test_expired_token_is_rejected(self):
+        token = _issue_token(self.private_pem_1, "kid-1", exp=int(time.time()) - 10)
+        with self.assertRaises(JWTError):
+            verify_token(token)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+import json
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+
+from app.bot_stats import BotStatsBuffer, handler, set_bot_stats_buffer
+import app.repositories.custom_bot as custom_bot
+from app.repositories.bot_cache import bot_cache
+from app.repositories.custom_bot import (
+    find_bot_by_id,
+    store_alias,
+    store_bot,
+)
+from app.repositories.models.custom_bot import BotAliasModel, BotUsageDeltaModel
+from app.usecases.bot import record_bot_usage
+from app.user import User
+from tests.test_repositories.utils.bot_factory import (
+    create_test_private_bot,
+    create_test_public_bot,
+)
+from tests.test_repositories.utils.fake_table import FakeTable
+
+
+def _user(id: str) -> User:
+    return User(id=id, name=id, email=f"{id}@example.com", groups=[])
+
+
+class TestBotStatsBuffer(unittest.TestCase):
+    def setUp(self):
+        bot_cache.clear()
+        self.table = FakeTable()
+        self.patcher = patch(
+            "app.repositories.custom_bot.get_bot_table_client",
+            return_value=self.table,
+        )
+        self.patcher.start()
+        self.buffer = BotStatsBuffer(flush_interval_seconds=3600, queue_url=None)
+        set_bot_stats_buffer(self.buffer)
+
+        store_bot(create_test_private_bot("private", False, "owner", usage_count=2))
+        public_bot = create_test_public_bot("public", False, "owner")
+        store_bot(public_bot)
+        store_alias("user1", BotAliasModel.from_bot_for_initial_alias(public_bot))
+        for item in self.table.items.values():
+            item["LastUsedTime"] = 0
+
+    def tearDown(self):
+        self.patcher.stop()
+        set_bot_stats_buffer(None)
+        bot_cache.clear()
+
+    def _bot_item(self, bot_id: str) -> dict:
+        return self.table.items[("owner", f"BOT#{bot_id}")]
+
+    def test_aggregate_usages(self):
+        owner = _user("owner")
+        bot = find_bot_by_id("private")
+        with patch.object(
+            self.table, "update_item", wraps=self.table.update_item
+        ) as update_item:
+            with patch(
+                "app.usecases.bot.get_current_time", side_effect=[100, 300, 200]
+            ):
+                for _ in range(3):
+                    record_bot_usage(owner, bot)
+            self.assertEqual(update_item.call_count, 0)
+
+            self.buffer.flush()
+            self.assertEqual(update_item.call_count, 1)
+
+        item = self._bot_item("private")
+        self.assertEqual(item["UsageStats"]["usage_count"], 5)
+        self.assertEqual(item["LastUsedTime"], 300)
+        # Cached bot is patched
+        self.assertEqual(find_bot_by_id("private").usage_stats.usage_count, 5)
+        self.assertEqual(self.buffer.stats()["recorded"], 3)
+        self.assertEqual(self.buffer.stats()["flushed"], 1)
+        self.assertEqual(self.buffer.stats()["pending"], 0)
+
+    def test_shared_bot_usage(self):
+        bot = find_bot_by_id("public")
+        with patch("app.usecases.bot.get_current_time", return_value=500):
+            record_bot_usage(_user("user1"), bot)
+            record_bot_usage(_user("user2"), bot)
+        self.buffer.flush()
+
+        item = self._bot_item("public")
+        self.assertEqual(item["UsageStats"]["usage_count"], 2)
+        # Last used time of the bot is updated by the owner only
+        self.assertEqual(item["LastUsedTime"], 0)
+        self.assertEqual(
+            self.table.items[("user1", "ALIAS#public")]["LastUsedTime"], 500
+        )
+
+    def test_last_used_time_is_not_moved_backward(self):
+        self._bot_item("private")["LastUsedTime"] = 1000
+        self.buffer.record(
+            BotUsageDeltaModel(
+                item_type="bot",
+                user_id="owner",
+                bot_id="private",
+                increment=1,
+                last_used_time=900,
+            )
+        )
+        self.buffer.flush()
+
+        item = self._bot_item("private")
+        self.assertEqual(item["LastUsedTime"], 1000)
+        self.assertEqual(item["UsageStats"]["usage_count"], 3)
+
+    def test_skip_deleted_bot(self):
+        self.buffer.record(
+            BotUsageDeltaModel(
+                item_type="bot", user_id="owner", bot_id="deleted", increment=1
+            )
+        )
+        self.buffer.flush()
+        self.assertNotIn(("owner", "BOT#deleted"), self.table.items)
+
+    def test_keep_usages_on_failure(self):
+        usage = BotUsageDeltaModel(
+            item_type="bot", user_id="owner", bot_id="private", increment=1
+        )
+        self.buffer.record(usage)
+        with patch("app.bot_stats.apply_usages", side_effect=RuntimeError("error")):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        self.buffer.record(usage)
+        self.assertEqual(self.buffer.stats()["failures"], 1)
+
+        self.buffer.flush()
+        self.assertEqual(self._bot_item("private")["UsageStats"]["usage_count"], 4)
+
+    def test_send_to_queue_and_consume(self):
+        sqs_client = MagicMock()
+        sqs_client.send_message_batch.return_value = {"Successful": []}
+        buffer = BotStatsBuffer(flush_interval_seconds=3600, queue_url="queue")
+        for user_id in ["user1", "user2"]:
+            buffer.record(
+                BotUsageDeltaModel(
+                    item_type="bot", user_id="owner", bot_id="public", increment=1
+                )
+            )
+            buffer.record(
+                BotUsageDeltaModel(
+                    item_type="alias",
+                    user_id=user_id,
+                    bot_id="public",
+                    last_used_time=700,
+                )
+            )
+        with patch("app.bot_stats.get_client", return_value=sqs_client):
+            buffer.flush()
+
+        # Messages from two containers are aggregated by the consumer
+        ((_, kwargs),) = sqs_client.send_message_batch.call_args_list
+        body = kwargs["Entries"][0]["MessageBody"]
+        with patch.object(
+            self.table, "update_item", wraps=self.table.update_item
+        ) as update_item:
+            response = handler(
+                {
+                    "Records": [
+                        {"messageId": "1", "body": body},
+                        {"messageId": "2", "body": body},
+                    ]
+                },
+                None,
+            )
+            self.assertEqual(update_item.call_count, 3)
+        self.assertEqual(response, {"batchItemFailures": []})
+
+        self.assertEqual(self._bot_item("public")["UsageStats"]["usage_count"], 4)
+        self.assertEqual(
+            self.table.items[("user1", "ALIAS#public")]["LastUsedTime"], 700
+        )
+        self.assertNotIn(("user2", "ALIAS#public"), self.table.items)
+        self.assertEqual(len(json.loads(body)), 3)
+
+    def test_retry_failed_writes_only(self):
+        def body(bot_id: str) -> str:
+            return json.dumps(
+                [
+                    BotUsageDeltaModel(
+                        item_type="bot", user_id="owner", bot_id=bot_id, increment=1
+                    ).model_dump()
+                ]
+            )
+
+        event = {
+            "Records": [
+                {"messageId": "1", "body": body("private")},
+                {"messageId": "2", "body": body("public")},
+            ]
+        }
+        update_bot_usage = custom_bot.update_bot_usage
+
+        def fail_public(owner_user_id, bot_id, *args):
+            if bot_id == "public":
+                raise RuntimeError("error")
+            return update_bot_usage(owner_user_id, bot_id, *args)
+
+        sqs_client = MagicMock()
+        sqs_client.send_message_batch.return_value = {"Successful": []}
+        with patch("app.bot_stats.update_bot_usage", side_effect=fail_public), patch(
+            "app.bot_stats.BOT_STATS_QUEUE_URL", "queue"
+        ), patch("app.bot_stats.get_client", return_value=sqs_client):
+            self.assertEqual(handler(event, None), {"batchItemFailures": []})
+
+            # Only the failed usage is sent again
+            ((_, kwargs),) = sqs_client.send_message_batch.call_args_list
+            (entry,) = kwargs["Entries"]
+            self.assertEqual(json.loads(entry["MessageBody"])[0]["bot_id"], "public")
+            self.assertEqual(self._bot_item("private")["UsageStats"]["usage_count"], 3)
+
+            # Messages of the failed usages are delivered again if it cannot be sent
+            sqs_client.send_message_batch.side_effect = RuntimeError("error")
+            self.assertEqual(
+                handler(event, None), {"batchItemFailures": [{"itemIdentifier": "2"}]}
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,368 @@
+import json
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+
+from app.conversation_indexer import index_records
+from app.repositories.conversation_codec import compress
+from app.repositories.conversation_search import find_conversations_by_query
+from app.user import User
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+from opensearchpy import ConnectionTimeout
+
+_serializer = TypeSerializer()
+
+
+def _message(role: str, body: str, create_time: float = 1.0, **kwargs) -> dict:
+    return {
+        "role": role,
+        "content": [{"content_type": "text", "body": body}],
+        "model": "claude-v3-haiku",
+        "children": [],
+        "parent": None,
+        "create_time": create_time,
+        **kwargs,
+    }
+
+
+def _image_message() -> dict:
+    return {
+        **_message("user", ""),
+        "content": [
+            {"content_type": "image", "media_type": "image/png", "body": "$blob:abc"}
+        ],
+    }
+
+
+def _serialize(item: dict) -> dict:
+    return {k: _serializer.serialize(v) for k, v in item.items()}
+
+
+def _record(
+    event_name: str, sk: str, new: dict | None = None, old: dict | None = None
+) -> dict:
+    dynamodb: dict = {"Keys": _serialize({"PK": "user", "SK": sk})}
+    if new is not None:
+        dynamodb["NewImage"] = _serialize({"PK": "user", "SK": sk, **new})
+    if old is not None:
+        dynamodb["OldImage"] = _serialize({"PK": "user", "SK": sk, **old})
+    return {"eventName": event_name, "dynamodb": dynamodb}
+
+
+def _conversation_item(message_map: dict, **kwargs) -> dict:
+    return {
+        "Title": "Travel plan",
+        "CreateTime": 1,
+        "MessageMap": json.dumps(message_map),
+        "IsLargeMessage": False,
+        **kwargs,
+    }
+
+
+class TestConversationIndexer(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.actions: list[dict] = []
+
+        def bulk(client, actions, **kwargs):
+            actions = list(actions)
+            self.actions.extend(actions)
+            return len(actions), []
+
+        self.patcher = patch("app.conversation_indexer.helpers.bulk", side_effect=bulk)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def _ops(self) -> dict[str, str]:
+        return {action["_id"]: action["_op_type"] for action in self.actions}
+
+    def test_new_conversation_is_indexed_per_message(self):
+        message_map = {
+            "system": _message("system", "You are a travel agent"),
+            "m1": _message("user", "Plan a trip to Kyoto", create_time=2),
+            "m2": _image_message(),
+        }
+        index_records(
+            [_record("INSERT", "user#CONV#c1", new=_conversation_item(message_map))],
+            self.client,
+        )
+
+        # System messages and binary contents are not indexed
+        self.assertEqual(
+            self._ops(),
+            {
+                "c1#system": "delete",
+                "c1#m1": "index",
+                "c1#m2": "delete",
+                "c1": "update",
+            },
+        )
+        message = next(a for a in self.actions if a["_id"] == "c1#m1")["_source"]
+        self.assertEqual(message["ConversationId"], "c1")
+        self.assertEqual(message["PK"], "user")
+        self.assertEqual(message["Body"], "Plan a trip to Kyoto")
+        conversation = next(a for a in self.actions if a["_id"] == "c1")["doc"]
+        self.assertEqual(conversation["Title"], "Travel plan")
+        self.assertEqual(conversation["LastUpdateTime"], 2)
+
+    def test_delta_indexes_only_its_messages(self):
+        index_records(
+            [
+                _record(
+                    "INSERT",
+                    "user#CONV_DELTA#c1#0000000002",
+                    new={
+                        "MessageMap": json.dumps(
+                            {"m3": _message("assistant", "Kyoto is", create_time=3)}
+                        ),
+                        "DeletedMessageIds": ["m2"],
+                    },
+                ),
+                # Metadata written with the delta
+                _record(
+                    "MODIFY",
+                    "user#CONV#c1",
+                    new=_conversation_item({}, Version=3, DeltaSeq=2, SnapshotSeq=0),
+                    old=_conversation_item({}, Version=2, DeltaSeq=1, SnapshotSeq=0),
+                ),
+            ],
+            self.client,
+        )
+        self.assertEqual(
+            self._ops(), {"c1#m3": "index", "c1#m2": "delete", "c1": "update"}
+        )
+
+    def test_snapshot_indexes_changed_messages(self):
+        old_map = {
+            "m1": _message("user", "Plan a trip"),
+            "m2": _message("assistant", "Where to?"),
+        }
+        new_map = {
+            "m1": _message("user", "Plan a trip"),
+            "m3": _message("assistant", "Kyoto is"),
+        }
+        index_records(
+            [
+                _record(
+                    "MODIFY",
+                    "user#CONV#c1",
+                    new=_conversation_item(new_map, Version=3),
+                    old=_conversation_item(old_map, Version=2),
+                ),
+                # Deltas compacted into the snapshot
+                _record("REMOVE", "user#CONV_DELTA#c1#0000000001"),
+            ],
+            self.client,
+        )
+        self.assertEqual(
+            self._ops(), {"c1#m3": "index", "c1#m2": "delete", "c1": "update"}
+        )
+        self.client.delete_by_query.assert_not_called()
+
+    def test_large_snapshot_is_loaded(self):
+        message_map = {"m1": _message("user", "Plan a trip")}
+        s3 = MagicMock()
+        s3.get_object.return_value = {
+            "Body": MagicMock(read=lambda: compress(json.dumps(message_map)))
+        }
+        item = _conversation_item(
+            {},
+            IsLargeMessage=True,
+            LargeMessagePath="user/c1/message_map.json.gz",
+            Version=2,
+            DeltaSeq=1,
+            SnapshotSeq=1,
+        )
+        with patch("app.conversation_indexer.get_client", return_value=s3):
+            index_records(
+                [
+                    _record(
+                        "MODIFY", "user#CONV#c1", new=item, old={**item, "Version": 1}
+                    )
+                ],
+                self.client,
+            )
+        self.assertEqual(self._ops(), {"c1#m1": "index", "c1": "update"})
+
+    def test_replaced_large_snapshot_is_skipped(self):
+        s3 = MagicMock()
+        s3.get_object.side_effect = ClientError(
+            {"Error": {"Code": "NoSuchKey", "Message": ""}}, "GetObject"
+        )
+        item = _conversation_item(
+            {},
+            IsLargeMessage=True,
+            LargeMessagePath="user/c1/message_map/1.json.gz",
+            Version=2,
+        )
+        with patch("app.conversation_indexer.get_client", return_value=s3):
+            index_records(
+                [
+                    _record(
+                        "MODIFY", "user#CONV#c1", new=item, old={**item, "Version": 1}
+                    )
+                ],
+                self.client,
+            )
+        self.assertEqual(self._ops(), {"c1": "update"})
+
+    def test_removed_conversation_is_deleted(self):
+        index_records(
+            [
+                _record("REMOVE", "user#CONV#c1"),
+                _record("REMOVE", "user#CONV#c2"),
+                _record("REMOVE", "user#CONV_DELTA#c1#0000000001"),
+            ],
+            self.client,
+        )
+        self.assertEqual(self.actions, [])
+        self.client.delete_by_query.assert_called_once()
+        body = self.client.delete_by_query.call_args.kwargs["body"]
+        self.assertEqual(body["query"]["terms"]["ConversationId"], ["c1", "c2"])
+
+
+def _hit(score: float, conversation_id: str, message_id: str = "", **kwargs) -> dict:
+    return {
+        "_source": {"ConversationId": conversation_id},
+        "sort": [score, 1.0, conversation_id, message_id],
+        **kwargs,
+    }
+
+
+def _sort_key(sort: list) -> tuple:
+    return (-sort[0], -sort[1], sort[2], sort[3])
+
+
+class TestConversationSearch(unittest.TestCase):
+    def setUp(self):
+        self.user = User(id="user", name="user", email="user@example.com", groups=[])
+        self.hits = [
+            _hit(9, "c1", "m1", highlight={"Body": ["<em>Kyoto</em> is"]}),
+            _hit(8, "c1", highlight={"Title": ["<em>Kyoto</em>"]}),
+            _hit(7, "c2", "m1"),
+            _hit(6, "c1", "m2"),
+            _hit(5, "c3", "m1"),
+            _hit(4, "c2", "m2"),
+            _hit(3, "c4", "m1"),
+        ]
+        self.client = MagicMock()
+
+        def search(index, body, **kwargs):
+            excluded = set()
+            for clause in body["query"]["bool"].get("must_not", []):
+                excluded.update(clause["terms"]["ConversationId"])
+            hits = [
+                hit
+                for hit in self.hits
+                if hit["_source"]["ConversationId"] not in excluded
+                and (
+                    "search_after" not in body
+                    or _sort_key(hit["sort"]) > _sort_key(body["search_after"])
+                )
+            ]
+            return {"hits": {"hits": hits[: body["size"]]}}
+
+        self.client.search.side_effect = search
+        self.client.mget.side_effect = lambda index, body, **kwargs: {
+            "docs": [
+                (
+                    {
+                        "_id": id,
+                        "found": True,
+                        "_source": {"PK": "user", "Title": f"Title {id}"},
+                    }
+                    if id != "c3"
+                    else {"_id": id, "found": False}
+                )
+                for id in body["ids"]
+            ]
+        }
+
+    def test_hits_are_grouped_by_conversation(self):
+        conversations, next_token = find_conversations_by_query(
+            "kyo", self.user, client=self.client
+        )
+        body = self.client.search.call_args.kwargs["body"]
+        self.assertEqual(body["query"]["bool"]["filter"], [{"term": {"PK": "user"}}])
+        self.assertEqual(
+            body["query"]["bool"]["should"][0]["multi_match"]["type"], "bool_prefix"
+        )
+        self.assertIn("highlight", body)
+
+        self.assertEqual([c.id for c in conversations], ["c1", "c2", "c3", "c4"])
+        self.assertIsNone(next_token)
+        self.assertEqual(conversations[0].title, "Title c1")
+        self.assertEqual(
+            {h.field_name: h.fragments for h in conversations[0].highlights or []},
+            {"MessageBody": ["<em>Kyoto</em> is"], "Title": ["<em>Kyoto</em>"]},
+        )
+        # Not indexed yet
+        self.assertEqual(conversations[2].title, "Untitled conversation")
+
+    def test_pages_do_not_repeat_conversations(self):
+        pages = []
+        next_token = None
+        while True:
+            conversations, next_token = find_conversations_by_query(
+                "kyo", self.user, limit=1, next_token=next_token, client=self.client
+            )
+            pages.append([c.id for c in conversations])
+            if next_token is None:
+                break
+
+        self.assertEqual(
+            [id for page in pages for id in page], ["c1", "c2", "c3", "c4"]
+        )
+
+        # The token is bound to the user and the query
+        _, next_token = find_conversations_by_query(
+            "kyo", self.user, limit=1, client=self.client
+        )
+        with self.assertRaises(ValueError):
+            find_conversations_by_query(
+                "kyoto", self.user, limit=1, next_token=next_token, client=self.client
+            )
+        with self.assertRaises(ValueError):
+            find_conversations_by_query(
+                "kyo", self.user, next_token="invalid", client=self.client
+            )
+
+    def test_compact_mode(self):
+        conversations, _ = find_conversations_by_query(
+            "kyo", self.user, compact=True, client=self.client
+        )
+        body = self.client.search.call_args.kwargs["body"]
+        self.assertNotIn("highlight", body)
+        self.assertIn("timeout", body)
+        self.assertEqual(len(body["query"]["bool"]["should"]), 1)
+        self.assertEqual(len(conversations), 4)
+
+    @patch("app.repositories.conversation_search.SEARCH_FETCH_SIZE_FACTOR", 1)
+    def test_compact_mode_returns_hits_found_before_timeout(self):
+        # The next page times out
+        self.client.search.side_effect = [
+            {"hits": {"hits": self.hits[:3]}},
+            ConnectionTimeout("TIMEOUT", "timed out", None),
+        ]
+        conversations, next_token = find_conversations_by_query(
+            "kyo", self.user, limit=3, compact=True, client=self.client
+        )
+        self.assertEqual([c.id for c in conversations], ["c1", "c2"])
+        self.assertIsNone(next_token)
+
+        self.client.search.side_effect = ConnectionTimeout("TIMEOUT", "", None)
+        with self.assertRaises(ConnectionTimeout):
+            find_conversations_by_query("kyo", self.user, client=self.client)
+
+    def test_limit_is_bounded(self):
+        with self.assertRaises(ValueError):
+            find_conversations_by_query("kyo", self.user, limit=0, client=self.client)
+
+
+if __name__ == "__main__":
+    unittest.main()
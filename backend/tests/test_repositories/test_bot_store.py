@@ -6,13 +6,20 @@ sys.path.insert(0, ".")
 
 import logging
 import time
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock, patch
 
+import app.repositories.bot_store as bot_store
 from app.repositories.bot_store import (
+    clear_bot_store_cache,
+    compose_pickup_seed,
     find_bots_by_query,
     find_bots_sorted_by_usage_count,
     find_random_bots,
+    get_bot_store_cache_stats,
     get_opensearch_client,
 )
+from app.repositories.common import compose_access_principals
 from app.repositories.models.custom_bot import BotMeta
 from app.user import User
 from opensearchpy import NotFoundError, OpenSearch
@@ -120,6 +127,12 @@ class TestFindBotsWithOpenSearch(unittest.TestCase):
                 "SK": f"BOT#{bot.id}",
                 "AllowedCognitoUsers": bot.allowed_cognito_users,
                 "AllowedCognitoGroups": bot.allowed_cognito_groups,
+                "AccessPrincipals": compose_access_principals(
+                    bot.owner_user_id,
+                    bot.shared_scope,
+                    bot.allowed_cognito_users,
+                    bot.allowed_cognito_groups,
+                ),
                 "SyncStatus": bot.sync_status,
                 "BedrockKnowledgeBase": bot.bedrock_knowledge_base,
                 "UsageStats": bot.usage_stats.model_dump(),
@@ -254,5 +267,141 @@ class TestFindBotsWithOpenSearch(unittest.TestCase):
         self.assertEqual(len(result), 5)
 
 
+def _hit(bot_id: str, owner_user_id: str, usage_count: int = 0) -> dict:
+    return {
+        "_id": f"{owner_user_id}#{bot_id}",
+        "_score": usage_count,
+        "sort": [usage_count],
+        "_source": {
+            "BotId": bot_id,
+            "Title": bot_id,
+            "Description": bot_id,
+            "CreateTime": 0,
+            "SyncStatus": "SUCCEEDED",
+            "PK": owner_user_id,
+            "SharedScope": "all",
+            "SharedStatus": "shared",
+        },
+    }
+
+
+class TestBotStoreCache(unittest.TestCase):
+    def setUp(self):
+        clear_bot_store_cache()
+        self.client = MagicMock()
+        self.client.search_template.return_value = {
+            "hits": {"hits": [_hit("bot1", "user1", 2), _hit("bot2", "user2", 1)]}
+        }
+        self.user1 = User(id="user1", name="user1", groups=["group1"], email="")
+        self.user2 = User(id="user2", name="user2", groups=["group1"], email="")
+
+    def tearDown(self):
+        clear_bot_store_cache()
+
+    def test_cache_by_principals(self):
+        # Bots shared with the user and bots of the user alone
+        bots = find_bots_sorted_by_usage_count(self.user1, client=self.client)
+        self.assertEqual([bot.owned for bot in bots], [True, False])
+        find_bots_sorted_by_usage_count(self.user1, client=self.client)
+        self.assertEqual(self.client.search_template.call_count, 2)
+        principals = [
+            kwargs["body"]["params"]["principals"]
+            for _, kwargs in self.client.search_template.call_args_list
+        ]
+        self.assertEqual(principals, [["all", "group:group1"], ["user:user1"]])
+
+        # Shared bots are served from the cache to the users with the same groups
+        bots = find_bots_sorted_by_usage_count(self.user2, client=self.client)
+        self.assertEqual([bot.owned for bot in bots], [False, True])
+        self.assertEqual(self.client.search_template.call_count, 3)
+        (_, kwargs) = self.client.search_template.call_args
+        self.assertEqual(kwargs["body"]["params"]["principals"], ["user:user2"])
+
+        stats = get_bot_store_cache_stats()
+        self.assertEqual(stats["popular"]["hits"], 3)
+        self.assertEqual(stats["popular"]["misses"], 3)
+        self.assertAlmostEqual(stats["popular"]["hit_rate"], 1 / 2)
+
+    def test_merge_bots_of_user(self):
+        shared = {
+            "hits": {"hits": [_hit("bot1", "user2", 5), _hit("bot2", "user2", 1)]}
+        }
+        own = {"hits": {"hits": [_hit("bot3", "user1", 3), _hit("bot1", "user2", 5)]}}
+        self.client.search_template.side_effect = [shared, own]
+        bots = find_bots_sorted_by_usage_count(self.user1, limit=2, client=self.client)
+        self.assertEqual([bot.id for bot in bots], ["bot1", "bot3"])
+
+    def test_normalize_query(self):
+        find_bots_by_query("Code  Review", self.user1, client=self.client)
+        find_bots_by_query(" code review ", self.user1, client=self.client)
+        find_bots_by_query("code review", self.user1, limit=5, client=self.client)
+        self.assertEqual(self.client.search_template.call_count, 4)
+
+        (_, kwargs) = self.client.search_template.call_args
+        self.assertEqual(
+            kwargs["body"]["params"],
+            {"query": "code review", "limit": 5, "principals": ["user:user1"]},
+        )
+
+    def test_pickup_seed_per_user_per_day(self):
+        find_random_bots(self.user1, client=self.client)
+        find_random_bots(self.user1, client=self.client)
+        self.assertEqual(self.client.search_template.call_count, 1)
+        (_, kwargs) = self.client.search_template.call_args
+        params = kwargs["body"]["params"]
+        self.assertEqual(
+            params["seed"],
+            compose_pickup_seed("user1", datetime.now(timezone.utc).date()),
+        )
+        self.assertEqual(params["offset"], 0)
+
+        # Next page of the same feed
+        find_random_bots(self.user1, offset=20, client=self.client)
+        (_, kwargs) = self.client.search_template.call_args
+        self.assertEqual(kwargs["body"]["params"]["seed"], params["seed"])
+        self.assertEqual(kwargs["body"]["params"]["offset"], 20)
+
+        self.assertNotEqual(
+            compose_pickup_seed("user1", date(2025, 1, 1)),
+            compose_pickup_seed("user1", date(2025, 1, 2)),
+        )
+        self.assertNotEqual(
+            compose_pickup_seed("user1", date(2025, 1, 1)),
+            compose_pickup_seed("user2", date(2025, 1, 1)),
+        )
+
+    def test_pickup_window(self):
+        with self.assertRaises(ValueError):
+            find_random_bots(self.user1, limit=20, offset=90, client=self.client)
+        with self.assertRaises(ValueError):
+            find_random_bots(self.user1, offset=-1, client=self.client)
+        self.client.search_template.assert_not_called()
+
+    @patch.object(bot_store, "BOT_STORE_POPULAR_CACHE_TTL_SECONDS", 0)
+    def test_disable_cache(self):
+        for _ in range(2):
+            find_bots_sorted_by_usage_count(self.user1, client=self.client)
+        self.assertEqual(self.client.search_template.call_count, 4)
+
+    def test_store_templates_once(self):
+        find_bots_sorted_by_usage_count(self.user1, client=self.client)
+        find_bots_sorted_by_usage_count(self.user1, limit=5, client=self.client)
+        find_bots_by_query("bot", self.user1, client=self.client)
+        self.assertEqual(self.client.put_script.call_count, 2)
+
+        (_, kwargs) = self.client.search_template.call_args
+        self.assertTrue(kwargs["body"]["id"].startswith("bot-store-search-"))
+        self.assertNotIn("source", kwargs["body"])
+
+    def test_inline_templates(self):
+        self.client.put_script.side_effect = Exception("Not supported")
+        find_bots_sorted_by_usage_count(self.user1, client=self.client)
+        find_bots_by_query("bot", self.user1, client=self.client)
+        self.assertEqual(self.client.put_script.call_count, 1)
+
+        (_, kwargs) = self.client.search_template.call_args
+        self.assertIn("multi_match", kwargs["body"]["source"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, ".")
+from app.repositories import common
+from app.repositories.common import (
+    get_assumed_resource_cache_stats,
+    get_conversation_table_client,
+)
+
+
+class TestAssumedResourceCache(unittest.TestCase):
+    def setUp(self):
+        self.env_patcher = patch.dict(os.environ, {"AWS_EXECUTION_ENV": "test"})
+        self.client_patcher = patch("app.repositories.common.get_client")
+        self.session_patcher = patch("boto3.Session")
+        self.env_patcher.start()
+        self.mock_client = self.client_patcher.start()
+        self.mock_session = self.session_patcher.start()
+
+        self.expiration = datetime.now(timezone.utc) + timedelta(hours=1)
+        self.mock_client.return_value.assume_role.side_effect = lambda **_: {
+            "Credentials": {
+                "AccessKeyId": "key",
+                "SecretAccessKey": "secret",
+                "SessionToken": "token",
+                "Expiration": self.expiration,
+            }
+        }
+        self.mock_session.return_value.resource.side_effect = lambda *_, **__: (
+            MagicMock()
+        )
+        common._assumed_resource_cache.clear()
+
+    def tearDown(self):
+        self.env_patcher.stop()
+        self.client_patcher.stop()
+        self.session_patcher.stop()
+        common._assumed_resource_cache.clear()
+
+    def test_resource_is_reused_per_user(self):
+        table1 = get_conversation_table_client("user1")
+        table2 = get_conversation_table_client("user1")
+        get_conversation_table_client("user2")
+
+        self.assertIs(table1, table2)
+        self.assertEqual(self.mock_client.return_value.assume_role.call_count, 2)
+        stats = get_assumed_resource_cache_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+
+    def test_resource_is_refreshed_before_expiration(self):
+        self.expiration = datetime.now(timezone.utc) + timedelta(minutes=1)
+        get_conversation_table_client("user1")
+        get_conversation_table_client("user1")
+
+        self.assertEqual(self.mock_client.return_value.assume_role.call_count, 2)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        with patch.object(common._assumed_resource_cache, "max_size", 2):
+            get_conversation_table_client("user1")
+            get_conversation_table_client("user2")
+            get_conversation_table_client("user1")
+            get_conversation_table_client("user3")
+            get_conversation_table_client("user1")
+            get_conversation_table_client("user2")
+
+        # user2 was evicted by user3
+        self.assertEqual(self.mock_client.return_value.assume_role.call_count, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
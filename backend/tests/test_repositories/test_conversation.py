@@ -10,14 +10,23 @@ from app.repositories.conversation import (
     ConversationModel,
     MessageModel,
     RecordNotFoundError,
+    ResourceConflictError,
     change_conversation_title,
     delete_conversation_by_id,
     delete_conversation_by_user_id,
     find_conversation_by_id,
+    find_conversation_deletion_job,
+    find_conversations_by_ids,
+    find_message_branch,
     find_conversation_by_user_id,
+    find_conversations_page_by_user_id,
+    start_conversation_deletion_job,
     store_conversation,
+    update_conversation_deletion_job,
     update_feedback,
 )
+from app.repositories import conversation as conversation_repository
+from app.repositories.models.conversation_cache import ConversationCacheEntryModel
 from app.repositories.models.conversation import (
     ChunkModel,
     FeedbackModel,
@@ -27,16 +36,20 @@ from app.repositories.models.conversation import (
     ToolUseContentModel,
     ToolUseContentModelBody,
 )
+from app.repositories.conversation_cache import conversation_cache
+from tests.test_repositories.utils.fake_table import FakeTable
 
 
 class TestConversationRepository(unittest.TestCase):
     def setUp(self):
+        conversation_cache.clear()
         self.patcher1 = patch("boto3.resource")
         self.patcher2 = patch("app.repositories.conversation.s3_client")
         self.mock_boto3_resource = self.patcher1.start()
         self.mock_s3_client = self.patcher2.start()
 
         self.mock_table = MagicMock()
+        self.mock_table.meta.client.batch_write_item.return_value = {}
         self.mock_boto3_resource.return_value.Table.return_value = self.mock_table
 
         # Set up environment variables
@@ -169,6 +182,7 @@ class TestConversationRepository(unittest.TestCase):
                             "MessageMap": json.dumps(
                                 conversation.model_dump()["message_map"]
                             ),
+                            "Model": "claude-v3-haiku",
                             "IsLargeMessage": False,
                             "ShouldContinue": False,
                         }
@@ -177,6 +191,10 @@ class TestConversationRepository(unittest.TestCase):
             }
 
         self.mock_table.query.side_effect = mock_query_side_effect
+        self.mock_table.get_item.side_effect = lambda **kwargs: {
+            "Item": item
+            for item in mock_query_side_effect(IndexName="SKIndex")["Items"]
+        }
 
         # Test storing conversation
         response = store_conversation("user", conversation)
@@ -364,6 +382,10 @@ class TestConversationRepository(unittest.TestCase):
             return {"Items": []}
 
         self.mock_table.query.side_effect = mock_query_side_effect
+        self.mock_table.get_item.side_effect = lambda **kwargs: {
+            "Item": item
+            for item in mock_query_side_effect(IndexName="SKIndex")["Items"]
+        }
 
         message_map_json = json.dumps(
             {
@@ -425,6 +447,709 @@ class TestConversationRepository(unittest.TestCase):
         conversations = find_conversation_by_user_id(user_id="user")
         self.assertEqual(len(conversations), 0)
 
+    def test_store_and_find_conversation_with_blobs(self):
+        image = os.urandom(64 * 1024)
+        conversation = ConversationModel(
+            id="3",
+            create_time=1627984879.9,
+            title="Conversation with image",
+            total_price=100,
+            message_map={
+                "a": MessageModel(
+                    role="user",
+                    content=[
+                        TextContentModel(content_type="text", body="Hello"),
+                        ImageContentModel(
+                            content_type="image",
+                            body=image,
+                            media_type="image/png",
+                        ),
+                    ],
+                    model="claude-v3-haiku",
+                    children=[],
+                    parent=None,
+                    create_time=1627984879.9,
+                )
+            },
+            last_message_id="a",
+            bot_id=None,
+            should_continue=False,
+        )
+
+        s3_objects: dict[str, bytes] = {}
+
+        def mock_put_object(Bucket, Key, Body, **kwargs):
+            s3_objects[Key] = Body
+
+        self.mock_s3_client.put_object.side_effect = mock_put_object
+        self.mock_s3_client.get_object.side_effect = lambda Bucket, Key: {
+            "Body": MagicMock(read=lambda: s3_objects[Key])
+        }
+
+        # Store as a large message to check the compressed format as well
+        store_conversation("user", conversation, threshold=1)
+        item = self.mock_table.put_item.call_args.kwargs["Item"]
+        # Nothing is written again except the metadata
+        store_conversation("user", conversation, threshold=1)
+        self.assertEqual(self.mock_table.put_item.call_count, 1)
+
+        self.assertEqual(item["MessageMapVersion"], 2)
+        self.assertTrue(item["LargeMessagePath"].endswith(".gz"))
+        blob_keys = [key for key in s3_objects if "/blobs/" in key]
+        self.assertEqual(len(blob_keys), 1)
+        self.assertEqual(s3_objects[blob_keys[0]], image)
+        self.assertEqual(self.mock_s3_client.put_object.call_count, 2)
+        # The image is not inlined
+        self.assertLess(len(s3_objects[item["LargeMessagePath"]]), len(image))
+
+        self.mock_table.get_item.return_value = {"Item": item}
+        found_conversation = find_conversation_by_id(
+            user_id="user", conversation_id="3"
+        )
+        self.assertEqual(found_conversation.message_map, conversation.message_map)
+
+
+def _text_message(body: str, parent: str | None, children: list[str]) -> MessageModel:
+    return MessageModel(
+        role="user",
+        content=[TextContentModel(content_type="text", body=body)],
+        model="claude-v3-haiku",
+        children=children,
+        parent=parent,
+        create_time=1627984879.9,
+    )
+
+
+class TestIncrementalConversationStorage(unittest.TestCase):
+    def setUp(self):
+        conversation_cache.clear()
+        self.table = FakeTable()
+        self.patchers = [
+            patch(
+                "app.repositories.conversation.get_conversation_table_client",
+                return_value=self.table,
+            ),
+            patch("app.repositories.conversation.s3_client"),
+            patch.object(
+                conversation_repository, "CONVERSATION_COMPACTION_INTERVAL", 3
+            ),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def _deltas(self) -> list[dict]:
+        return [
+            item for (_, sk), item in self.table.items.items() if "#CONV_DELTA#" in sk
+        ]
+
+    def _add_turn(self, conversation: ConversationModel, index: int):
+        parent_id = conversation.last_message_id
+        message_id = f"m{index}"
+        conversation.message_map[message_id] = _text_message(
+            f"Message {index}", parent_id, []
+        )
+        conversation.message_map[parent_id].children.append(message_id)
+        conversation.last_message_id = message_id
+        conversation.total_price += 1
+
+    def test_only_changed_messages_are_written(self):
+        conversation = ConversationModel(
+            id="1",
+            create_time=1627984879.9,
+            title="Conversation",
+            total_price=0,
+            message_map={"system": _text_message("", None, [])},
+            last_message_id="system",
+            bot_id=None,
+            should_continue=False,
+        )
+        store_conversation("user", conversation)
+        self.assertEqual(self._deltas(), [])
+
+        found = find_conversation_by_id("user", "1")
+        self._add_turn(found, 1)
+        store_conversation("user", found)
+
+        # The new message and its parent with the new child are written
+        deltas = self._deltas()
+        self.assertEqual(len(deltas), 1)
+        self.assertEqual(set(json.loads(deltas[0]["MessageMap"])), {"system", "m1"})
+
+        # Rebuild from the snapshot and the delta
+        found = find_conversation_by_id("user", "1")
+        self.assertEqual(found.message_map["system"].children, ["m1"])
+        self.assertEqual(found.message_map["m1"].content[0].body, "Message 1")
+        self.assertEqual(found.last_message_id, "m1")
+        self.assertEqual(found.total_price, 1)
+
+        # Deleted messages are recorded in the delta
+        del found.message_map["m1"]
+        found.message_map["system"].children = []
+        found.last_message_id = "system"
+        store_conversation("user", found)
+        found = find_conversation_by_id("user", "1")
+        self.assertNotIn("m1", found.message_map)
+
+    def test_deltas_are_compacted(self):
+        conversation = ConversationModel(
+            id="1",
+            create_time=1627984879.9,
+            title="Conversation",
+            total_price=0,
+            message_map={"system": _text_message("", None, [])},
+            last_message_id="system",
+            bot_id=None,
+            should_continue=False,
+        )
+        store_conversation("user", conversation)
+
+        for i in range(1, 8):
+            found = find_conversation_by_id("user", "1")
+            self._add_turn(found, i)
+            store_conversation("user", found)
+            self.assertLessEqual(len(self._deltas()), 3)
+
+        found = find_conversation_by_id("user", "1")
+        self.assertEqual(len(found.message_map), 8)
+        self.assertEqual(found.last_message_id, "m7")
+        self.assertEqual(found.total_price, 7)
+
+        delete_conversation_by_id("user", "1")
+        self.assertEqual(self.table.items, {})
+
+    def test_deltas_compacted_while_loading_are_read_again(self):
+        conversation = ConversationModel(
+            id="1",
+            create_time=1627984879.9,
+            title="Conversation",
+            total_price=0,
+            message_map={"system": _text_message("", None, [])},
+            last_message_id="system",
+            bot_id=None,
+            should_continue=False,
+        )
+        store_conversation("user", conversation)
+        for i in range(1, 4):
+            found = find_conversation_by_id("user", "1")
+            self._add_turn(found, i)
+            store_conversation("user", found)
+        self.assertEqual(len(self._deltas()), 3)
+
+        find_deltas = conversation_repository._find_deltas
+        compacted = False
+
+        def compact_then_find_deltas(*args):
+            nonlocal compacted
+            if not compacted:
+                compacted = True
+                # Another writer compacts the deltas after the item was read
+                other = find_conversation_by_id("user", "1")
+                self._add_turn(other, 4)
+                store_conversation("user", other)
+                self.assertEqual(self._deltas(), [])
+                conversation_cache.delete("user", "1")
+            return find_deltas(*args)
+
+        conversation_cache.delete("user", "1")
+        with patch.object(
+            conversation_repository,
+            "_find_deltas",
+            side_effect=compact_then_find_deltas,
+        ):
+            found = find_conversation_by_id("user", "1")
+
+        self.assertEqual(len(found.message_map), 5)
+        self.assertEqual(found.last_message_id, "m4")
+
+    def test_large_snapshot_of_losing_writer_is_discarded(self):
+        s3_objects: dict[str, bytes] = {}
+        mock_s3_client = conversation_repository.s3_client
+        mock_s3_client.put_object.side_effect = (
+            lambda Bucket, Key, Body, **kwargs: s3_objects.__setitem__(Key, Body)
+        )
+        mock_s3_client.get_object.side_effect = lambda Bucket, Key: {
+            "Body": MagicMock(read=lambda: s3_objects[Key])
+        }
+        mock_s3_client.delete_object.side_effect = lambda Bucket, Key: s3_objects.pop(
+            Key
+        )
+
+        conversation = ConversationModel(
+            id="1",
+            create_time=1627984879.9,
+            title="Conversation",
+            total_price=0,
+            message_map={"system": _text_message("", None, [])},
+            last_message_id="system",
+            bot_id=None,
+            should_continue=False,
+        )
+        store_conversation("user", conversation, threshold=1)
+        (first_path,) = s3_objects
+
+        # Both writers store a snapshot, as the changes exceed the threshold
+        winner = find_conversation_by_id("user", "1")
+        loser = find_conversation_by_id("user", "1")
+        self._add_turn(winner, 1)
+        store_conversation("user", winner, threshold=1)
+        self._add_turn(loser, 2)
+        with self.assertRaises(ResourceConflictError):
+            store_conversation("user", loser, threshold=1)
+
+        # Only the snapshot of the winner remains
+        (path,) = s3_objects
+        self.assertNotEqual(path, first_path)
+        self.assertEqual(
+            self.table.items[("user", "user#CONV#1")]["LargeMessagePath"], path
+        )
+        found = find_conversation_by_id("user", "1")
+        self.assertEqual(found.last_message_id, "m1")
+
+    def test_feedback_is_written_as_delta(self):
+        conversation = ConversationModel(
+            id="1",
+            create_time=1627984879.9,
+            title="Conversation",
+            total_price=0,
+            message_map={
+                "system": _text_message("", None, ["a"]),
+                "a": _text_message("Hello", "system", []),
+            },
+            last_message_id="a",
+            bot_id=None,
+            should_continue=False,
+        )
+        store_conversation("user", conversation)
+
+        update_feedback(
+            user_id="user",
+            conversation_id="1",
+            message_id="a",
+            feedback=FeedbackModel(thumbs_up=True, category="Good", comment="Nice"),
+        )
+        deltas = self._deltas()
+        self.assertEqual(len(deltas), 1)
+        self.assertEqual(set(json.loads(deltas[0]["MessageMap"])), {"a"})
+
+        found = find_conversation_by_id("user", "1")
+        self.assertEqual(found.message_map["a"].feedback.comment, "Nice")  # type: ignore
+
+
+class TestLazyConversationLoading(unittest.TestCase):
+    def setUp(self):
+        conversation_cache.clear()
+        self.table = FakeTable()
+        self.patchers = [
+            patch(
+                "app.repositories.conversation.get_conversation_table_client",
+                return_value=self.table,
+            ),
+            patch("app.repositories.conversation.s3_client"),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.mock_s3_client = conversation_repository.s3_client
+
+        self.s3_objects: dict[str, bytes] = {}
+
+        def mock_put_object(Bucket, Key, Body, **kwargs):
+            self.s3_objects[Key] = Body
+
+        self.mock_s3_client.put_object.side_effect = mock_put_object
+        self.mock_s3_client.get_object.side_effect = lambda Bucket, Key: {
+            "Body": MagicMock(read=lambda: self.s3_objects[Key])
+        }
+
+        # Two branches from the system message, each with its own image
+        self.images = {"a": os.urandom(8 * 1024), "b": os.urandom(8 * 1024)}
+        message_map = {"system": _text_message("", None, ["a", "b"])}
+        for branch, image in self.images.items():
+            message_map[branch] = MessageModel(
+                role="user",
+                content=[
+                    ImageContentModel(
+                        content_type="image", body=image, media_type="image/png"
+                    )
+                ],
+                model="claude-v3-haiku",
+                children=[f"{branch}-reply"],
+                parent="system",
+                create_time=1627984879.9,
+            )
+            message_map[f"{branch}-reply"] = _text_message(
+                f"Reply {branch}", branch, []
+            )
+        store_conversation(
+            "user",
+            ConversationModel(
+                id="lazy",
+                create_time=1627984879.9,
+                title="Conversation",
+                total_price=0,
+                message_map=message_map,
+                last_message_id="b-reply",
+                bot_id=None,
+                should_continue=False,
+            ),
+        )
+        self.mock_s3_client.get_object.reset_mock()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_messages_are_parsed_on_access(self):
+        found = find_conversation_by_id("user", "lazy")
+        self.assertEqual(len(found.message_map), 5)
+        self.assertIn("a", found.message_map)
+        self.mock_s3_client.get_object.assert_not_called()
+
+        self.assertEqual(found.message_map["a"].content[0].body, self.images["a"])  # type: ignore
+        self.assertEqual(self.mock_s3_client.get_object.call_count, 1)
+
+    def test_find_message_branch(self):
+        branch = find_message_branch("user", "lazy")
+        self.assertEqual(list(branch), ["b-reply", "b", "system"])
+        self.assertEqual(branch["b"].content[0].body, self.images["b"])  # type: ignore
+        # Blob of the other branch is not fetched
+        self.assertEqual(self.mock_s3_client.get_object.call_count, 1)
+
+        branch = find_message_branch("user", "lazy", "a")
+        self.assertEqual(list(branch), ["a", "system"])
+
+    def test_unaccessed_messages_are_stored_as_is(self):
+        found = find_conversation_by_id("user", "lazy")
+        found.message_map["c"] = _text_message("New branch", "system", [])
+        found.message_map["system"].children.append("c")
+        found.last_message_id = "c"
+        store_conversation("user", found)
+
+        deltas = [
+            item for (_, sk), item in self.table.items.items() if "#CONV_DELTA#" in sk
+        ]
+        self.assertEqual(len(deltas), 1)
+        self.assertEqual(set(json.loads(deltas[0]["MessageMap"])), {"system", "c"})
+        self.mock_s3_client.get_object.assert_not_called()
+
+        found = find_conversation_by_id("user", "lazy")
+        self.assertEqual(found.message_map["system"].children, ["a", "b", "c"])
+        self.assertEqual(found.message_map["a"].content[0].body, self.images["a"])  # type: ignore
+
+
+class TestConversationCache(unittest.TestCase):
+    def setUp(self):
+        conversation_cache.clear()
+        self.table = FakeTable()
+        self.patchers = [
+            patch(
+                "app.repositories.conversation.get_conversation_table_client",
+                return_value=self.table,
+            ),
+            patch("app.repositories.conversation.s3_client"),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+        store_conversation(
+            "user",
+            ConversationModel(
+                id="1",
+                create_time=1627984879.9,
+                title="Conversation",
+                total_price=0,
+                message_map={
+                    "system": _text_message("", None, ["a"]),
+                    "a": _text_message("Hello", "system", []),
+                },
+                last_message_id="a",
+                bot_id=None,
+                should_continue=False,
+            ),
+        )
+        # Make the snapshot with a delta, to check that no delta is read on a hit
+        found = find_conversation_by_id("user", "1")
+        found.message_map["a"].content[0].body = "Hello again"  # type: ignore
+        store_conversation("user", found)
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_message_map_is_served_from_cache(self):
+        with patch.object(self.table, "query", wraps=self.table.query) as query:
+            found = find_conversation_by_id("user", "1")
+            query.assert_not_called()
+
+        self.assertEqual(found.message_map["a"].content[0].body, "Hello again")  # type: ignore
+        self.assertGreater(conversation_cache.hits, 0)
+
+        # Title is always read from the table
+        change_conversation_title("user", "1", "New title")
+        self.assertEqual(find_conversation_by_id("user", "1").title, "New title")
+
+    def test_stale_entry_is_reloaded(self):
+        # Written by another process, bypassing this cache
+        found = find_conversation_by_id("user", "1")
+        found.message_map["a"].content[0].body = "Updated elsewhere"  # type: ignore
+        store_conversation("user", found)
+        conversation_cache.put(
+            "user",
+            "1",
+            ConversationCacheEntryModel(
+                version=1, message_map="{}", message_digests={}
+            ),
+        )
+
+        found = find_conversation_by_id("user", "1")
+        self.assertEqual(found.message_map["a"].content[0].body, "Updated elsewhere")  # type: ignore
+
+    def test_concurrent_update_is_rejected(self):
+        first = find_conversation_by_id("user", "1")
+        second = find_conversation_by_id("user", "1")
+        first.message_map["a"].content[0].body = "First"  # type: ignore
+        store_conversation("user", first)
+
+        second.message_map["a"].content[0].body = "Second"  # type: ignore
+        with self.assertRaises(ResourceConflictError):
+            store_conversation("user", second)
+
+        found = find_conversation_by_id("user", "1")
+        self.assertEqual(found.message_map["a"].content[0].body, "First")  # type: ignore
+
+    def test_find_conversations_by_ids(self):
+        for conversation_id in ["2", "3"]:
+            store_conversation(
+                "user",
+                ConversationModel(
+                    id=conversation_id,
+                    create_time=1627984879.9,
+                    title=f"Conversation {conversation_id}",
+                    total_price=0,
+                    message_map={"system": _text_message("", None, [])},
+                    last_message_id="system",
+                    bot_id=None,
+                    should_continue=False,
+                ),
+            )
+        # Not cached, e.g. on another container
+        conversation_cache.delete("user", "3")
+
+        with patch.object(
+            self.table, "get_item", wraps=self.table.get_item
+        ) as get_item:
+            found = find_conversations_by_ids("user", ["3", "missing", "1", "2"])
+            get_item.assert_not_called()
+
+        self.assertEqual([conversation.id for conversation in found], ["3", "1", "2"])
+        self.assertEqual(found[0].title, "Conversation 3")
+        self.assertEqual(found[1].message_map["a"].content[0].body, "Hello again")  # type: ignore
+        # Only the metadata of the cached conversations is read
+        requests = [
+            call.kwargs["RequestItems"]["test-table"]
+            for call in self.table.meta.client.batch_get_item.call_args_list
+        ]
+        self.assertEqual(len(requests), 2)
+        self.assertIn("ProjectionExpression", requests[0])
+        self.assertEqual(len(requests[0]["Keys"]), 2)
+        self.assertNotIn("ProjectionExpression", requests[1])
+        self.assertEqual(len(requests[1]["Keys"]), 2)
+
+    def test_entries_are_invalidated_on_delete(self):
+        self.assertIsNotNone(conversation_cache.get("user", "1"))
+
+        delete_conversation_by_id("user", "1")
+        self.assertIsNone(conversation_cache.get("user", "1"))
+        with self.assertRaises(RecordNotFoundError):
+            find_conversation_by_id("user", "1")
+
+
+class TestConversationListing(unittest.TestCase):
+    def setUp(self):
+        conversation_cache.clear()
+        self.table = FakeTable()
+        self.patchers = [
+            patch(
+                "app.repositories.conversation.get_conversation_table_client",
+                return_value=self.table,
+            ),
+            patch("app.repositories.conversation.s3_client"),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+        for i in range(5):
+            store_conversation(
+                "user",
+                ConversationModel(
+                    id=f"{i}",
+                    create_time=1627984879.9 + i,
+                    title=f"Conversation {i}",
+                    total_price=0,
+                    message_map={"system": _text_message("", None, [])},
+                    last_message_id="system",
+                    bot_id=None,
+                    should_continue=False,
+                ),
+            )
+        # Stored before `Model` was added
+        del self.table.items[("user", "user#CONV#0")]["Model"]
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_conversations_are_paginated(self):
+        conversations = []
+        next_token = None
+        with patch.object(self.table, "query", wraps=self.table.query) as query:
+            while True:
+                page, next_token = find_conversations_page_by_user_id(
+                    "user", limit=2, next_token=next_token
+                )
+                conversations.extend(page)
+                if next_token is None:
+                    break
+
+            # The message map is not read for listing
+            for call in query.call_args_list:
+                self.assertNotIn("MessageMap", call.kwargs["ProjectionExpression"])
+
+        self.assertEqual([c.id for c in conversations], ["4", "3", "2", "1", "0"])
+        self.assertEqual({c.model for c in conversations}, {"claude-v3-haiku"})
+        self.assertEqual(
+            [c.id for c in find_conversation_by_user_id("user")],
+            ["4", "3", "2", "1", "0"],
+        )
+
+    def test_next_token_of_other_user_is_rejected(self):
+        _, next_token = find_conversations_page_by_user_id("user", limit=2)
+        with self.assertRaises(ValueError):
+            find_conversations_page_by_user_id("other", next_token=next_token)
+        with self.assertRaises(ValueError):
+            find_conversations_page_by_user_id("user", next_token="invalid")
+
+
+class TestBulkConversationDeletion(unittest.TestCase):
+    def setUp(self):
+        conversation_cache.clear()
+        self.table = FakeTable()
+        self.patchers = [
+            patch(
+                "app.repositories.conversation.get_conversation_table_client",
+                return_value=self.table,
+            ),
+            patch("app.repositories.conversation.s3_client"),
+            patch.object(conversation_repository, "BATCH_WRITE_BACKOFF_SECONDS", 0),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.mock_s3_client = conversation_repository.s3_client
+
+        for i in range(30):
+            conversation = ConversationModel(
+                id=f"{i:02d}",
+                create_time=1627984879.9,
+                title=f"Conversation {i}",
+                total_price=0,
+                message_map={"system": _text_message("", None, [])},
+                last_message_id="system",
+                bot_id=None,
+                should_continue=False,
+            )
+            store_conversation("user", conversation)
+            found = find_conversation_by_id("user", conversation.id)
+            found.message_map["system"].content[0].body = "Updated"  # type: ignore
+            store_conversation("user", found)
+            self.table.put_item(
+                Item={
+                    "PK": "user",
+                    "SK": f"user#RELATED_DOCUMENT#{conversation.id}#m#source",
+                }
+            )
+        self.table.put_item(Item={"PK": "other", "SK": "other#CONV#00"})
+
+        self.object_keys = [f"user/{i:02d}/message_map.json.gz" for i in range(2500)]
+        self.mock_s3_client.get_paginator.return_value.paginate.return_value = [
+            {"Contents": [{"Key": key} for key in self.object_keys[i : i + 1000]]}
+            for i in range(0, len(self.object_keys), 1000)
+        ]
+        self.mock_s3_client.delete_objects.return_value = {}
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_all_conversation_data_is_deleted(self):
+        # Some items are unprocessed on the first call
+        batch_write_item = self.table._batch_write_item
+        throttled = []
+
+        def throttle_once(RequestItems):
+            ((table_name, requests),) = RequestItems.items()
+            if not throttled:
+                throttled.append(requests[:5])
+                batch_write_item({table_name: requests[5:]})
+                return {"UnprocessedItems": {table_name: requests[:5]}}
+            return batch_write_item(RequestItems)
+
+        self.table.meta.client.batch_write_item.side_effect = throttle_once
+
+        progress = {"items": 0, "objects": 0}
+
+        def on_progress(deleted_items: int, deleted_objects: int):
+            progress["items"] += deleted_items
+            progress["objects"] += deleted_objects
+
+        delete_conversation_by_user_id("user", on_progress=on_progress)
+
+        self.assertEqual(list(self.table.items), [("other", "other#CONV#00")])
+        self.assertEqual(progress, {"items": 90, "objects": 2500})
+        self.assertTrue(throttled)
+
+        deleted_keys = []
+        for call in self.mock_s3_client.delete_objects.call_args_list:
+            objects = call.kwargs["Delete"]["Objects"]
+            self.assertLessEqual(len(objects), 1000)
+            deleted_keys.extend(o["Key"] for o in objects)
+        self.assertEqual(sorted(deleted_keys), sorted(self.object_keys))
+        self.mock_s3_client.get_paginator.return_value.paginate.assert_called_once_with(
+            Bucket=conversation_repository.LARGE_MESSAGE_BUCKET,
+            Prefix="user/",
+            PaginationConfig={"PageSize": 1000},
+        )
+
+    def test_objects_are_kept_when_items_are_not_deleted(self):
+        self.table.meta.client.batch_write_item.side_effect = lambda RequestItems: {
+            "UnprocessedItems": RequestItems
+        }
+        with self.assertRaises(RuntimeError):
+            delete_conversation_by_user_id("user")
+        self.mock_s3_client.delete_objects.assert_not_called()
+
+    def test_deletion_job(self):
+        job = start_conversation_deletion_job("user")
+        self.assertEqual(job.status, "RUNNING")
+        # Only one job runs at a time
+        with self.assertRaises(ResourceConflictError):
+            start_conversation_deletion_job("user")
+
+        job.deleted_items = 10
+        job.status = "SUCCEEDED"
+        update_conversation_deletion_job("user", job)
+        found = find_conversation_deletion_job("user")
+        self.assertEqual(found.id, job.id)
+        self.assertEqual(found.status, "SUCCEEDED")
+        self.assertEqual(found.deleted_items, 10)
+
+        # The job item is not deleted as conversation data
+        delete_conversation_by_user_id("user")
+        self.assertEqual(find_conversation_deletion_job("user").id, job.id)
+        self.assertNotEqual(start_conversation_deletion_job("user").id, job.id)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,110 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, ".")
+from app.repositories.conversation_codec import (
+    BLOB_MIN_SIZE,
+    compress,
+    decompress,
+    encode_message_map,
+    find_blob_references,
+    resolve_blob_references,
+)
+from app.repositories.models.conversation import (
+    AttachmentContentModel,
+    ImageContentModel,
+    MessageModel,
+    TextContentModel,
+    ToolUseContentModel,
+    ToolUseContentModelBody,
+)
+
+
+def _message(content: list) -> MessageModel:
+    return MessageModel(
+        role="user",
+        content=content,
+        model="claude-v3-haiku",
+        children=[],
+        parent=None,
+        create_time=1627984879.9,
+    )
+
+
+class TestConversationCodec(unittest.TestCase):
+    def test_large_binary_bodies_are_extracted(self):
+        image = os.urandom(BLOB_MIN_SIZE * 2)
+        attachment = os.urandom(BLOB_MIN_SIZE * 3)
+        small_image = os.urandom(16)
+        message_map = {
+            "a": _message(
+                [
+                    TextContentModel(content_type="text", body="Hello"),
+                    ImageContentModel(
+                        content_type="image", media_type="image/png", body=image
+                    ),
+                    ImageContentModel(
+                        content_type="image", media_type="image/png", body=small_image
+                    ),
+                ]
+            ),
+            "b": _message(
+                [
+                    # Same image in another message is stored once
+                    ImageContentModel(
+                        content_type="image", media_type="image/png", body=image
+                    ),
+                    AttachmentContentModel(
+                        content_type="attachment",
+                        file_name="document.pdf",
+                        body=attachment,
+                    ),
+                ]
+            ),
+        }
+
+        encoded = encode_message_map(message_map)
+        self.assertEqual(len(encoded.blobs), 2)
+        self.assertEqual(sorted(encoded.blobs.values()), sorted([image, attachment]))
+        self.assertEqual(encoded.size, len(encoded.text.encode("utf-8")))
+        self.assertLess(encoded.size, len(image) + len(attachment))
+
+        # Read back
+        stored = json.loads(encoded.text)
+        self.assertEqual(find_blob_references(stored), set(encoded.blobs.keys()))
+        resolve_blob_references(stored, encoded.blobs)
+        decoded = {k: MessageModel.model_validate(v) for k, v in stored.items()}
+        self.assertEqual(decoded, message_map)
+
+    def test_tool_input_is_not_modified(self):
+        tool_input = {"format": "png", "image": "A" * (BLOB_MIN_SIZE * 2)}
+        message_map = {
+            "a": _message(
+                [
+                    ToolUseContentModel(
+                        content_type="toolUse",
+                        body=ToolUseContentModelBody(
+                            tool_use_id="xyz1234", name="tool", input=tool_input
+                        ),
+                    )
+                ]
+            )
+        }
+
+        encoded = encode_message_map(message_map)
+        self.assertEqual(encoded.blobs, {})
+        self.assertEqual(
+            encoded.message_map["a"]["content"][0]["body"]["input"], tool_input
+        )
+
+    def test_compress(self):
+        text = json.dumps({"body": "This is a large message." * 1000})
+        data = compress(text)
+        self.assertLess(len(data), len(text))
+        self.assertEqual(decompress(data), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
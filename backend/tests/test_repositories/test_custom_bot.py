@@ -1,8 +1,18 @@
 import sys
 import unittest
+from unittest.mock import patch
 
 sys.path.insert(0, ".")
 
+import app.repositories.custom_bot as custom_bot
+from app.repositories.bot_cache import (
+    BOT_CACHE_NEGATIVE_TTL_SECONDS,
+    BOT_CACHE_SHARED_TTL_SECONDS,
+    BOT_CACHE_SYNCING_TTL_SECONDS,
+    BOT_CACHE_TTL_SECONDS,
+    bot_cache,
+    ttl_seconds,
+)
 from app.repositories.common import RecordNotFoundError
 from app.repositories.custom_bot import (
     alias_exists,
@@ -12,6 +22,7 @@ from app.repositories.custom_bot import (
     find_alias_by_bot_id,
     find_all_published_bots,
     find_bot_by_id,
+    find_bots_page_by_condition,
     find_owned_bots_by_user_id,
     find_pinned_public_bots,
     find_recently_used_bots_by_user_id,
@@ -53,6 +64,7 @@ from app.repositories.models.custom_bot_kb import (
 )
 from app.usecases.bot import fetch_all_bots
 from app.utils import get_current_time
+from boto3.dynamodb.conditions import Key
 from tests.test_repositories.utils.bot_factory import (
     _create_test_bot_model,
     create_test_partial_shared_bot,
@@ -61,6 +73,7 @@ from tests.test_repositories.utils.bot_factory import (
     create_test_public_bot,
     create_test_published_bot,
 )
+from tests.test_repositories.utils.fake_table import FakeTable
 
 
 class TestCustomBotRepository(unittest.TestCase):
@@ -579,6 +592,136 @@ class TestFindAllBots(unittest.TestCase):
         self.assertIsNone(next_token)
 
 
+class TestBotListing(unittest.TestCase):
+    def setUp(self) -> None:
+        bot_cache.clear()
+        self.table = FakeTable()
+        self.patcher = patch(
+            "app.repositories.custom_bot.get_bot_table_client",
+            return_value=self.table,
+        )
+        self.patcher.start()
+
+        for i in range(5):
+            store_bot(
+                create_test_private_bot(
+                    f"owned{i}", False, "user1", last_used_time=100 + i
+                )
+            )
+        for i in range(3):
+            bot = create_test_public_bot(
+                f"shared{i}", False, "user2", last_used_time=200 + i
+            )
+            store_bot(bot)
+            store_alias("user1", BotAliasModel.from_bot_for_initial_alias(bot))
+
+        # Split the results into pages of 2 items like a large table
+        query = self.table.query
+        self.query_patcher = patch.object(
+            self.table,
+            "query",
+            side_effect=lambda **kwargs: query(
+                **{**kwargs, "Limit": min(kwargs.get("Limit", 2), 2)}
+            ),
+        )
+        self.query_patcher.start()
+
+    def tearDown(self) -> None:
+        self.query_patcher.stop()
+        self.patcher.stop()
+        bot_cache.clear()
+
+    def _query_params(self) -> dict:
+        return {"KeyConditionExpression": Key("PK").eq("user1")}
+
+    def test_find_all_owned_bots(self):
+        bots = find_owned_bots_by_user_id("user1")
+        self.assertEqual(
+            [bot.id for bot in bots], [f"owned{i}" for i in range(4, -1, -1)]
+        )
+
+    def test_resolve_aliases(self):
+        # Original bot deleted by the owner
+        del self.table.items[("user2", "BOT#shared1")]
+
+        bots = find_recently_used_bots_by_user_id("user1")
+        self.assertEqual(len(bots), 8)
+        aliases = {bot.id: bot for bot in bots if not bot.owned}
+        self.assertEqual(set(aliases), {"shared0", "shared1", "shared2"})
+        self.assertTrue(aliases["shared0"].is_origin_accessible)
+        self.assertFalse(aliases["shared1"].is_origin_accessible)
+
+    @patch.object(custom_bot, "BATCH_GET_BACKOFF_SECONDS", 0)
+    def test_retry_unprocessed_keys(self):
+        batch_get_item = self.table._batch_get_item
+
+        def throttled(RequestItems: dict):
+            ((table_name, request),) = RequestItems.items()
+            response = batch_get_item({table_name: {"Keys": request["Keys"][:1]}})
+            response["UnprocessedKeys"] = (
+                {table_name: {"Keys": request["Keys"][1:]}}
+                if len(request["Keys"]) > 1
+                else {}
+            )
+            return response
+
+        self.table.meta.client.batch_get_item.side_effect = throttled
+        bots, _ = find_bots_page_by_condition("user1", self._query_params(), limit=8)
+        self.assertTrue(all(bot.is_origin_accessible for bot in bots))
+        self.assertGreater(self.table.meta.client.batch_get_item.call_count, 1)
+
+    @patch.object(custom_bot, "BATCH_GET_MAX_ATTEMPTS", 2)
+    @patch.object(custom_bot, "BATCH_GET_BACKOFF_SECONDS", 0)
+    def test_unprocessed_keys_exhausted(self):
+        self.table.meta.client.batch_get_item.side_effect = lambda RequestItems: {
+            "Responses": {},
+            "UnprocessedKeys": RequestItems,
+        }
+        with self.assertRaises(RuntimeError):
+            find_bots_page_by_condition("user1", self._query_params())
+
+    @patch.object(custom_bot, "BOT_LIST_MAX_PAGES", 2)
+    def test_continue_with_next_token(self):
+        bots, next_token = find_bots_page_by_condition("user1", self._query_params())
+        self.assertEqual(len(bots), 4)
+        self.assertIsNotNone(next_token)
+
+        pages = [bots]
+        while next_token is not None:
+            bots, next_token = find_bots_page_by_condition(
+                "user1", self._query_params(), next_token=next_token
+            )
+            pages.append(bots)
+        self.assertEqual([len(page) for page in pages], [4, 4])
+        ids = [bot.id for page in pages for bot in page]
+        self.assertEqual(len(set(ids)), 8)
+
+    def test_limit(self):
+        bots, next_token = find_bots_page_by_condition(
+            "user1", self._query_params(), limit=3
+        )
+        self.assertEqual(len(bots), 3)
+        self.assertIsNotNone(next_token)
+
+        bots = find_recently_used_bots_by_user_id("user1", limit=3)
+        self.assertEqual(len(bots), 3)
+
+    def test_invalid_next_token(self):
+        _, next_token = find_bots_page_by_condition(
+            "user1", self._query_params(), limit=1
+        )
+        with self.assertRaises(ValueError):
+            find_bots_page_by_condition(
+                "user2",
+                {"KeyConditionExpression": Key("PK").eq("user2")},
+                next_token=next_token,
+            )
+        with self.assertRaises(ValueError):
+            find_bots_page_by_condition(
+                "user1", self._query_params(), next_token="invalid"
+            )
+
+
 class TestUpdateBotSharedStatus(unittest.TestCase):
     def setUp(self) -> None:
         bot1 = create_test_private_bot("1", is_starred=True, owner_user_id="user1")
@@ -617,6 +760,62 @@ class TestUpdateBotSharedStatus(unittest.TestCase):
         self.assertEqual(bot.allowed_cognito_users, ["user2"])
 
 
+class TestAccessPrincipals(unittest.TestCase):
+    def setUp(self) -> None:
+        bot_cache.clear()
+        self.table = FakeTable()
+        self.patcher = patch(
+            "app.repositories.custom_bot.get_bot_table_client",
+            return_value=self.table,
+        )
+        self.patcher.start()
+        store_bot(create_test_private_bot("1", is_starred=False, owner_user_id="user1"))
+
+    def tearDown(self) -> None:
+        self.patcher.stop()
+        bot_cache.clear()
+
+    def _access_principals(self) -> list[str]:
+        return self.table.items[("user1", "BOT#1")]["AccessPrincipals"]
+
+    def test_maintain_access_principals(self):
+        self.assertEqual(self._access_principals(), ["user:user1"])
+
+        update_bot_shared_status(
+            owner_user_id="user1",
+            bot_id="1",
+            shared_scope="partial",
+            shared_status="shared",
+            allowed_group_ids=["group1"],
+            allowed_user_ids=["user2"],
+        )
+        self.assertEqual(
+            self._access_principals(),
+            ["group:Admin", "group:group1", "user:user1", "user:user2"],
+        )
+
+        update_bot_shared_status(
+            owner_user_id="user1",
+            bot_id="1",
+            shared_scope="all",
+            shared_status="shared",
+            allowed_group_ids=[],
+            allowed_user_ids=[],
+        )
+        self.assertEqual(self._access_principals(), ["all", "user:user1"])
+
+        # Allowed users and groups of private bots are ignored
+        update_bot_shared_status(
+            owner_user_id="user1",
+            bot_id="1",
+            shared_scope="private",
+            shared_status="unshared",
+            allowed_group_ids=["group1"],
+            allowed_user_ids=["user2"],
+        )
+        self.assertEqual(self._access_principals(), ["user:user1"])
+
+
 class TestRemoveFromRecentlyUsed(unittest.TestCase):
     def setUp(self) -> None:
         # Create a bot owned by user1
@@ -671,5 +870,109 @@ class TestRemoveFromRecentlyUsed(unittest.TestCase):
         self.assertNotIn("shared_bot", bot_ids_after)
 
 
+class TestBotCache(unittest.TestCase):
+    def setUp(self):
+        bot_cache.clear()
+        self.table = FakeTable()
+        self.patcher = patch(
+            "app.repositories.custom_bot.get_bot_table_client",
+            return_value=self.table,
+        )
+        self.patcher.start()
+        store_bot(
+            create_test_private_bot(
+                "1", False, "user1", sync_status="SUCCEEDED", usage_count=1
+            )
+        )
+
+    def tearDown(self):
+        self.patcher.stop()
+        bot_cache.clear()
+
+    def test_find_cached_bot(self):
+        with patch.object(self.table, "query", wraps=self.table.query) as query:
+            bot = find_bot_by_id("1")
+            self.assertIs(find_bot_by_id("1"), bot)
+        self.assertEqual(query.call_count, 1)
+        self.assertEqual(bot_cache.stats()["hits"], 1)
+        self.assertEqual(bot_cache.stats()["misses"], 1)
+
+    def test_invalidate_on_update(self):
+        find_bot_by_id("1")
+        update_bot_shared_status(
+            owner_user_id="user1",
+            bot_id="1",
+            shared_scope="all",
+            shared_status="shared",
+            allowed_group_ids=[],
+            allowed_user_ids=[],
+        )
+        self.assertEqual(bot_cache.stats()["invalidations"], 1)
+        self.assertEqual(find_bot_by_id("1").shared_scope, "all")
+
+        delete_bot_by_id("user1", "1")
+        with self.assertRaises(RecordNotFoundError):
+            find_bot_by_id("1")
+
+    def test_patch_volatile_attributes(self):
+        bot = find_bot_by_id("1")
+        update_bot_last_used_time("user1", "1")
+        update_bot_star_status("user1", "1", True)
+        cached = find_bot_by_id("1")
+        self.assertTrue(cached.is_starred)
+        self.assertGreater(cached.last_used_time, bot.last_used_time)
+        self.assertEqual(cached.title, bot.title)
+        self.assertEqual(bot_cache.stats()["invalidations"], 0)
+
+    def test_negative_cache(self):
+        with patch.object(self.table, "query", wraps=self.table.query) as query:
+            for _ in range(2):
+                with self.assertRaises(RecordNotFoundError):
+                    find_bot_by_id("2")
+            self.assertEqual(query.call_count, 1)
+            self.assertEqual(bot_cache.stats()["negative_hits"], 1)
+
+            store_bot(create_test_private_bot("2", False, "user1"))
+            self.assertEqual(find_bot_by_id("2").id, "2")
+            self.assertEqual(query.call_count, 2)
+
+    @patch("app.repositories.bot_cache.BOT_CACHE_TTL_SECONDS", 0)
+    def test_revalidate_expired_bot(self):
+        bot = find_bot_by_id("1")
+
+        # Unchanged bot is reused, refreshing the volatile attributes only
+        self.table.items[("user1", "BOT#1")]["IsStarred"] = "TRUE"
+        with patch.object(self.table, "query", wraps=self.table.query) as query:
+            revalidated = find_bot_by_id("1")
+            self.assertEqual(query.call_count, 0)
+        self.assertTrue(revalidated.is_starred)
+        self.assertIs(revalidated.knowledge, bot.knowledge)
+        self.assertEqual(bot_cache.stats()["stale_hits"], 1)
+
+        # Updated by another process
+        item = self.table.items[("user1", "BOT#1")]
+        item["SyncStatus"] = "FAILED"
+        item["UpdateTime"] += 1
+        with patch.object(self.table, "query", wraps=self.table.query) as query:
+            self.assertEqual(find_bot_by_id("1").sync_status, "FAILED")
+            self.assertEqual(query.call_count, 1)
+
+    def test_ttl_per_bot(self):
+        syncing = create_test_private_bot("2", False, "user1", sync_status="RUNNING")
+        self.assertEqual(ttl_seconds(syncing), BOT_CACHE_SYNCING_TTL_SECONDS)
+        self.assertEqual(ttl_seconds(find_bot_by_id("1")), BOT_CACHE_TTL_SECONDS)
+        self.assertEqual(ttl_seconds(None), BOT_CACHE_NEGATIVE_TTL_SECONDS)
+        shared = create_test_public_bot("3", False, "user1")
+        self.assertEqual(ttl_seconds(shared), BOT_CACHE_SHARED_TTL_SECONDS)
+
+    def test_evict_least_recently_used(self):
+        store_bot(create_test_private_bot("2", False, "user1"))
+        with patch.object(bot_cache, "max_size", 1):
+            find_bot_by_id("1")
+            find_bot_by_id("2")
+        self.assertEqual(bot_cache.stats()["evictions"], 1)
+        self.assertEqual(bot_cache.stats()["size"], 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,290 @@
+import re
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+
+from boto3.dynamodb.conditions import ConditionBase
+from botocore.exceptions import ClientError
+
+
+class ConditionalCheckFailedException(ClientError):
+    def __init__(self):
+        super().__init__(
+            {"Error": {"Code": "ConditionalCheckFailedException", "Message": ""}},
+            "ConditionalCheck",
+        )
+
+
+class TransactionCanceledException(ClientError):
+    def __init__(self):
+        super().__init__(
+            {"Error": {"Code": "TransactionCanceledException", "Message": ""}},
+            "TransactWriteItems",
+        )
+
+
+_COMPARISONS = {
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+}
+
+
+def _check(
+    condition: str | None,
+    item: dict | None,
+    names: dict | None = None,
+    values: dict | None = None,
+) -> bool:
+    """Evaluate the condition expression, supporting `OR` of `AND` of attribute_exists,
+    attribute_not_exists and comparisons.
+    """
+    if condition is None:
+        return True
+
+    item = item or {}
+    names = names or {}
+    values = values or {}
+
+    def check_clause(clause: str) -> bool:
+        clause = clause.strip()
+        if match := re.fullmatch(r"attribute_(not_)?exists\((#?\w+)\)", clause):
+            exists = names.get(match[2], match[2]) in item
+            return exists != bool(match[1])
+        elif match := re.fullmatch(r"(#?\w+)\s*(=|<>|<)\s*(:\w+)", clause):
+            name = names.get(match[1], match[1])
+            return name in item and _COMPARISONS[match[2]](item[name], values[match[3]])
+        raise NotImplementedError(clause)
+
+    return any(
+        all(check_clause(clause) for clause in conjunction.split(" AND "))
+        for conjunction in condition.split(" OR ")
+    )
+
+
+def _match(condition: ConditionBase, item: dict) -> bool:
+    expression = condition.get_expression()
+    operator = expression["operator"]
+    values = expression["values"]
+    if operator == "AND":
+        return all(_match(value, item) for value in values)
+
+    name = values[0].name
+    if name not in item:
+        return False
+    elif operator == "=":
+        return item[name] == values[1]
+    elif operator == "BETWEEN":
+        return values[1] <= item[name] <= values[2]
+    elif operator == "begins_with":
+        return item[name].startswith(values[1])
+    else:
+        raise NotImplementedError(operator)
+
+
+class FakeTable:
+    """In-memory stand-in of a DynamoDB table keyed by PK and SK.
+    Supports the subset of the API used by the repositories.
+    """
+
+    def __init__(self, name: str = "test-table"):
+        self.name = name
+        self.items: dict[tuple[str, str], dict] = {}
+        self.meta = MagicMock()
+        self.meta.client.exceptions.ConditionalCheckFailedException = (
+            ConditionalCheckFailedException
+        )
+        self.meta.client.exceptions.TransactionCanceledException = (
+            TransactionCanceledException
+        )
+        self.meta.client.transact_write_items.side_effect = self._transact_write_items
+        self.meta.client.batch_get_item.side_effect = self._batch_get_item
+        self.meta.client.batch_write_item.side_effect = self._batch_write_item
+
+    def _key(self, key: dict) -> tuple[str, str]:
+        return key["PK"], key["SK"]
+
+    def put_item(
+        self,
+        Item: dict,
+        ConditionExpression: str | None = None,
+        ExpressionAttributeNames: dict | None = None,
+        ExpressionAttributeValues: dict | None = None,
+    ):
+        if not _check(
+            ConditionExpression,
+            self.items.get(self._key(Item)),
+            ExpressionAttributeNames,
+            ExpressionAttributeValues,
+        ):
+            raise ConditionalCheckFailedException()
+        self.items[self._key(Item)] = dict(Item)
+        return {}
+
+    def _project(
+        self,
+        item: dict,
+        ProjectionExpression: str | None = None,
+        ExpressionAttributeNames: dict | None = None,
+    ) -> dict:
+        if ProjectionExpression is None:
+            return dict(item)
+
+        names = ExpressionAttributeNames or {}
+        projection = [
+            names.get(name.strip(), name.strip())
+            for name in ProjectionExpression.split(",")
+        ]
+        return {k: v for k, v in item.items() if k in projection}
+
+    def get_item(
+        self,
+        Key: dict,
+        ProjectionExpression: str | None = None,
+        ExpressionAttributeNames: dict | None = None,
+        **kwargs,
+    ):
+        item = self.items.get(self._key(Key))
+        if item is None:
+            return {}
+        return {
+            "Item": self._project(item, ProjectionExpression, ExpressionAttributeNames)
+        }
+
+    def update_item(
+        self,
+        Key: dict,
+        UpdateExpression: str,
+        ExpressionAttributeValues: dict | None = None,
+        ExpressionAttributeNames: dict | None = None,
+        ConditionExpression: str | None = None,
+        **kwargs,
+    ):
+        names = ExpressionAttributeNames or {}
+        if not _check(
+            ConditionExpression,
+            self.items.get(self._key(Key)),
+            names,
+            ExpressionAttributeValues,
+        ):
+            raise ConditionalCheckFailedException()
+
+        item = self.items.setdefault(self._key(Key), dict(Key))
+        set_expression, _, remove_expression = UpdateExpression.partition(" REMOVE ")
+        values = ExpressionAttributeValues or {}
+        for path, counter, default, increment, placeholder in re.findall(
+            r"([#\w.]+)\s*=\s*(?:if_not_exists\(([#\w.]+),\s*(:\w+)\)\s*\+\s*(:\w+)|(:\w+))",
+            set_expression,
+        ):
+            *parents, name = [names.get(n, n) for n in path.split(".")]
+            target = item
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            if placeholder:
+                target[name] = values[placeholder]
+            else:
+                target[name] = target.get(name, values[default]) + values[increment]
+        for name in re.findall(r"#?\w+", remove_expression):
+            item.pop(names.get(name, name), None)
+        return {"Attributes": dict(item)}
+
+    # Like the client of a resource, `meta.client` takes and returns plain Python values.
+    def _batch_get_item(self, RequestItems: dict):
+        ((table_name, request),) = RequestItems.items()
+        items = [
+            self._project(
+                self.items[self._key(key)],
+                request.get("ProjectionExpression"),
+                request.get("ExpressionAttributeNames"),
+            )
+            for key in request["Keys"]
+            if self._key(key) in self.items
+        ]
+        return {"Responses": {table_name: items}, "UnprocessedKeys": {}}
+
+    def _batch_write_item(self, RequestItems: dict):
+        ((table_name, requests),) = RequestItems.items()
+        if len(requests) > 25:
+            raise ValueError("Too many items requested for the BatchWriteItem call")
+        for request in requests:
+            ((operation, params),) = request.items()
+            if operation == "PutRequest":
+                self.put_item(Item=params["Item"])
+            elif operation == "DeleteRequest":
+                self.delete_item(Key=params["Key"])
+            else:
+                raise NotImplementedError(operation)
+        return {"UnprocessedItems": {}}
+
+    def _transact_write_items(self, TransactItems: list[dict]):
+        # Check all the conditions before applying any write
+        for request in TransactItems:
+            ((operation, params),) = request.items()
+            key = params.get("Key") or params["Item"]
+            if not _check(
+                params.get("ConditionExpression"),
+                self.items.get(self._key(key)),
+                params.get("ExpressionAttributeNames"),
+                params.get("ExpressionAttributeValues", {}),
+            ):
+                raise TransactionCanceledException()
+
+        for request in TransactItems:
+            ((operation, params),) = request.items()
+            if operation == "Put":
+                self.put_item(Item=params["Item"])
+            elif operation == "Update":
+                self.update_item(
+                    Key=params["Key"],
+                    UpdateExpression=params["UpdateExpression"],
+                    ExpressionAttributeNames=params.get("ExpressionAttributeNames"),
+                    ExpressionAttributeValues=params["ExpressionAttributeValues"],
+                )
+            else:
+                raise NotImplementedError(operation)
+        return {}
+
+    def delete_item(self, Key: dict, ConditionExpression: str | None = None, **kwargs):
+        if not _check(ConditionExpression, self.items.get(self._key(Key))):
+            raise ConditionalCheckFailedException()
+        self.items.pop(self._key(Key), None)
+        return {}
+
+    def query(
+        self,
+        KeyConditionExpression: ConditionBase,
+        ScanIndexForward: bool = True,
+        Limit: int | None = None,
+        ExclusiveStartKey: dict | None = None,
+        ProjectionExpression: str | None = None,
+        ExpressionAttributeNames: dict | None = None,
+        **kwargs,
+    ):
+        items = sorted(
+            (
+                item
+                for item in self.items.values()
+                if _match(KeyConditionExpression, item)
+            ),
+            key=lambda item: item["SK"],
+            reverse=not ScanIndexForward,
+        )
+        if ExclusiveStartKey is not None:
+            keys = [self._key(item) for item in items]
+            items = items[keys.index(self._key(ExclusiveStartKey)) + 1 :]
+
+        response: dict = {}
+        if Limit is not None and len(items) > Limit:
+            items = items[:Limit]
+            response["LastEvaluatedKey"] = {
+                "PK": items[-1]["PK"],
+                "SK": items[-1]["SK"],
+            }
+        response["Items"] = [
+            self._project(item, ProjectionExpression, ExpressionAttributeNames)
+            for item in items
+        ]
+        return response
+
+    @contextmanager
+    def batch_writer(self):
+        yield self
@@ -39,6 +39,26 @@ class TestUtils(unittest.TestCase):
 
         assert reg == "us-west-2"
 
+    def test_get_client_is_shared(self):
+        from app.utils import (
+            clear_client_registry,
+            get_bedrock_runtime_client,
+            get_client_build_count,
+        )
+
+        clear_client_registry()
+        client1 = get_bedrock_runtime_client("us-east-1")
+        client2 = get_bedrock_runtime_client("us-east-1")
+        client3 = get_bedrock_runtime_client("us-west-2")
+
+        assert client1 is client2
+        assert client1 is not client3
+        assert get_client_build_count() == 2
+
+        max_pool = client1.__dict__["_client_config"].max_pool_connections
+        logger.debug(f"Max pool connections: {max_pool}")
+        assert max_pool > 10
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,173 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, ".")
+
+from app.repositories.models.custom_bot_kb import (
+    BedrockKnowledgeBaseModel,
+    OpenSearchParamsModel,
+    SearchParamsModel,
+)
+from app.repositories.models.retrieval_cache import RetrievalCacheEntryModel
+from app.repositories.retrieval_cache import RetrievalCache
+from app.vector_search import (
+    clear_retrieval_cache,
+    get_retrieval_cache_stats,
+    search_related_docs,
+)
+from tests.test_repositories.utils.bot_factory import create_test_private_bot
+
+
+def _knowledge_base(
+    knowledge_base_id: str = "kb1", max_results: int = 2
+) -> BedrockKnowledgeBaseModel:
+    return BedrockKnowledgeBaseModel(
+        embeddings_model="titan_v2",
+        open_search=OpenSearchParamsModel(analyzer=None),
+        chunking_configuration=None,
+        search_params=SearchParamsModel(max_results=max_results, search_type="hybrid"),
+        knowledge_base_id=knowledge_base_id,
+    )
+
+
+def _bot(id: str = "bot1", sync_last_exec_id: str = "exec1", **kwargs):
+    bot = create_test_private_bot(
+        id,
+        False,
+        "user1",
+        sync_status="SUCCEEDED",
+        bedrock_knowledge_base=_knowledge_base(**kwargs),
+    )
+    bot.sync_last_exec_id = sync_last_exec_id
+    return bot
+
+
+def _retrieve_response(text: str) -> dict:
+    return {
+        "retrievalResults": [
+            {
+                "content": {"text": text},
+                "location": {
+                    "type": "S3",
+                    "s3Location": {"uri": "s3://bucket/doc.pdf"},
+                },
+                "metadata": {"x-amz-bedrock-kb-document-page-number": 3.0},
+            }
+        ]
+    }
+
+
+class TestRetrievalCache(unittest.TestCase):
+    def setUp(self):
+        clear_retrieval_cache()
+        self.patcher = patch("app.vector_search.agent_client")
+        self.agent_client = self.patcher.start()
+        self.agent_client.retrieve.side_effect = lambda **kwargs: _retrieve_response(
+            kwargs["retrievalQuery"]["text"]
+        )
+
+    def tearDown(self):
+        self.patcher.stop()
+        clear_retrieval_cache()
+
+    def test_exact_match(self):
+        first = search_related_docs(_bot(), "What is Bedrock?")
+        # Normalized query
+        second = search_related_docs(_bot(), "  what is   BEDROCK? ")
+        self.assertEqual(self.agent_client.retrieve.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(second[0]["source_name"], "doc.pdf")
+        self.assertEqual(second[0]["page_number"], 3)
+
+        stats = get_retrieval_cache_stats()
+        self.assertEqual(stats["exact_hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_ratio"], 0.5)
+        self.assertGreaterEqual(stats["saved_latency_ms"], 0)
+
+    def test_shared_knowledge_base_results_are_attributed_to_the_bot(self):
+        search_related_docs(_bot("bot1"), "query")
+        results = search_related_docs(_bot("bot2"), "query")
+        self.assertEqual(self.agent_client.retrieve.call_count, 1)
+        self.assertEqual(results[0]["bot_id"], "bot2")
+
+    def test_key_includes_search_params(self):
+        search_related_docs(_bot(), "query")
+        search_related_docs(_bot(max_results=5), "query")
+        search_related_docs(_bot(knowledge_base_id="kb2"), "query")
+        self.assertEqual(self.agent_client.retrieve.call_count, 3)
+
+    def test_completed_sync_invalidates(self):
+        search_related_docs(_bot(sync_last_exec_id="exec1"), "query")
+        search_related_docs(_bot(sync_last_exec_id="exec2"), "query")
+        self.assertEqual(self.agent_client.retrieve.call_count, 2)
+
+    def test_syncing_bot_is_not_cached(self):
+        bot = _bot()
+        bot.sync_status = "RUNNING"
+        search_related_docs(bot, "query")
+        search_related_docs(bot, "query")
+        self.assertEqual(self.agent_client.retrieve.call_count, 2)
+        self.assertEqual(get_retrieval_cache_stats()["bypassed"], 2)
+
+    def test_similarity_tier(self):
+        embeddings = {
+            "what is bedrock?": [1.0, 0.0],
+            "what's bedrock?": [0.99, 0.141],
+            "pricing": [0.0, 1.0],
+        }
+        with patch(
+            "app.vector_search.RETRIEVAL_CACHE_SIMILARITY_THRESHOLD", 0.95
+        ), patch("app.vector_search._embed_query", side_effect=embeddings.get):
+            search_related_docs(_bot(), "What is Bedrock?")
+            results = search_related_docs(_bot(), "What's Bedrock?")
+            search_related_docs(_bot(), "Pricing")
+
+        self.assertEqual(self.agent_client.retrieve.call_count, 2)
+        self.assertEqual(results[0]["content"], "What is Bedrock?")
+        stats = get_retrieval_cache_stats()
+        self.assertEqual(stats["similar_hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+
+
+class TestRetrievalCacheLru(unittest.TestCase):
+    scope = ("kb1", "exec1", "HYBRID", 2)
+
+    def _entry(self, embedding: list[float] | None = None):
+        return RetrievalCacheEntryModel(
+            results=[], latency_ms=100.0, embedding=embedding
+        )
+
+    def test_lru_eviction(self):
+        cache = RetrievalCache(max_size=2)
+        cache.put(self.scope, "a", self._entry([1.0, 0.0]))
+        cache.put(self.scope, "b", self._entry())
+        cache.get(self.scope, "a")
+        cache.put(self.scope, "c", self._entry())
+        self.assertIsNotNone(cache.get(self.scope, "a"))
+        self.assertIsNone(cache.get(self.scope, "b"))
+
+        cache.put(self.scope, "d", self._entry())
+        cache.put(self.scope, "e", self._entry())
+        # Evicted entries are not found by similarity either
+        self.assertIsNone(cache.find_similar(self.scope, [1.0, 0.0], 0.9))
+
+    def test_expiration(self):
+        cache = RetrievalCache(ttl_seconds=0)
+        cache.put(self.scope, "a", self._entry([1.0, 0.0]))
+        self.assertIsNone(cache.get(self.scope, "a"))
+        cache.put(self.scope, "b", self._entry([1.0, 0.0]))
+        self.assertIsNone(cache.find_similar(self.scope, [1.0, 0.0], 0.9))
+
+    def test_similarity_is_scoped(self):
+        cache = RetrievalCache()
+        cache.put(self.scope, "a", self._entry([1.0, 0.0]))
+        self.assertIsNotNone(cache.find_similar(self.scope, [1.0, 0.0], 0.9))
+        self.assertIsNone(
+            cache.find_similar(("kb1", "exec2", "HYBRID", 2), [1.0, 0.0], 0.9)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,289 @@
+import json
+import os
+import sys
+import time
+import unittest
+from threading import Thread
+from unittest.mock import MagicMock, patch
+
+os.environ["WEBSOCKET_SESSION_TABLE_NAME"] = "test-websocket-session-table"
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+sys.path.append(".")
+
+from app import websocket
+from app.websocket import NotificationSender, load_message, store_message_part
+
+
+class TestNotificationSender(unittest.TestCase):
+    def setUp(self):
+        self.patcher = patch("app.websocket.get_client")
+        self.mock_get_client = self.patcher.start()
+        self.gatewayapi = MagicMock()
+        self.mock_get_client.return_value = self.gatewayapi
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def _run(self, sender: NotificationSender, send):
+        thread = Thread(target=sender.run, daemon=True)
+        thread.start()
+        send()
+        sender.finish()
+        thread.join(timeout=5)
+        return [
+            json.loads(call.kwargs["Data"])
+            for call in self.gatewayapi.post_to_connection.call_args_list
+        ]
+
+    def test_tokens_are_coalesced(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev",
+            connection_id="connection",
+            coalesce_window_ms=1000,
+        )
+
+        def send():
+            sender.on_reasoning("think")
+            sender.on_reasoning("ing")
+            for token in ["Hello", ", ", "world"]:
+                sender.on_stream(token)
+            sender.notify(json.dumps({"status": "STREAMING_END"}).encode("utf-8"))
+
+        frames = self._run(sender, send)
+        self.assertEqual(
+            frames,
+            [
+                {"status": "REASONING", "completion": "thinking"},
+                {"status": "STREAMING", "completion": "Hello, world"},
+                {"status": "STREAMING_END"},
+            ],
+        )
+
+    def test_tokens_are_flushed_after_window(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev",
+            connection_id="connection",
+            coalesce_window_ms=10,
+        )
+
+        def send():
+            sender.on_stream("a")
+            time.sleep(0.1)
+            sender.on_stream("b")
+
+        frames = self._run(sender, send)
+        self.assertEqual(
+            [frame["completion"] for frame in frames],
+            ["a", "b"],
+        )
+
+    def test_frame_size_is_bounded(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev",
+            connection_id="connection",
+            coalesce_window_ms=1000,
+            max_frame_bytes=10,
+        )
+
+        def send():
+            for token in ["abcd", "efgh", "ijkl"]:
+                sender.on_stream(token)
+
+        frames = self._run(sender, send)
+        self.assertEqual(
+            [frame["completion"] for frame in frames],
+            ["abcdefgh", "ijkl"],
+        )
+
+    def test_unordered_frames_are_delivered_before_ordered_frame(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev",
+            connection_id="connection",
+        )
+        self.gatewayapi.post_to_connection.side_effect = lambda **kwargs: (
+            time.sleep(0.05)
+            if json.loads(kwargs["Data"])["status"] == "AGENT_RELATED_DOCUMENTS"
+            else None
+        )
+
+        def send():
+            for i in range(4):
+                sender.notify(
+                    json.dumps(
+                        {"status": "AGENT_RELATED_DOCUMENTS", "index": i}
+                    ).encode("utf-8"),
+                    ordered=False,
+                )
+            sender.notify(json.dumps({"status": "STREAMING_END"}).encode("utf-8"))
+
+        frames = self._run(sender, send)
+        self.assertEqual(len(frames), 5)
+        self.assertEqual(frames[-1], {"status": "STREAMING_END"})
+        self.assertEqual(sender.metrics["frames_sent"], 5)
+
+    def test_full_queue_drops_notifications(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev",
+            connection_id="connection",
+            queue_max_size=2,
+            queue_full_policy="drop",
+        )
+
+        # The sender is not running, so the queue is never drained
+        for token in ["a", "b", "c"]:
+            sender.on_stream(token)
+
+        self.assertEqual(sender.metrics["frames_dropped"], 1)
+        self.assertEqual(sender.metrics["max_queue_depth"], 2)
+
+    def test_finish_does_not_block_on_full_queue(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev",
+            connection_id="connection",
+            queue_max_size=1,
+        )
+        sender.notify(json.dumps({"status": "STREAMING_END"}).encode("utf-8"))
+
+        with (
+            patch("app.websocket.NOTIFICATION_QUEUE_PUT_TIMEOUT_SECONDS", 0.01),
+            patch("app.websocket.NOTIFICATION_IDLE_POLL_SECONDS", 0.01),
+        ):
+            start = time.monotonic()
+            sender.finish()
+            self.assertLess(time.monotonic() - start, 1)
+            self.assertTrue(sender.closed)
+
+            # The queued notifications are still sent, then the sender stops
+            thread = Thread(target=sender.run, daemon=True)
+            thread.start()
+            thread.join(timeout=5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(sender.metrics["frames_sent"], 1)
+
+    def test_pending_notifications_are_dropped_when_connection_is_gone(self):
+        sender = NotificationSender(
+            endpoint_url="https://example.com/dev",
+            connection_id="connection",
+        )
+        self.gatewayapi.exceptions.GoneException = type(
+            "GoneException", (Exception,), {}
+        )
+        self.gatewayapi.exceptions.ForbiddenException = type(
+            "ForbiddenException", (Exception,), {}
+        )
+        self.gatewayapi.post_to_connection.side_effect = (
+            self.gatewayapi.exceptions.GoneException()
+        )
+
+        for status in ["AGENT_THINKING", "AGENT_TOOL_RESULT", "STREAMING_END"]:
+            sender.notify(json.dumps({"status": status}).encode("utf-8"))
+        sender.run()
+
+        self.assertTrue(sender.closed)
+        self.assertEqual(sender.metrics["frames_sent"], 0)
+        self.assertEqual(sender.metrics["frames_dropped"], 3)
+
+        # Notifications after the sender stopped are dropped immediately
+        sender.on_stream("late")
+        self.assertEqual(sender.metrics["frames_dropped"], 4)
+        self.assertTrue(sender.commands.empty())
+
+
+class _FakeSessionTable:
+    """In-memory stand-in of the websocket session table."""
+
+    def __init__(self):
+        self.items: dict[tuple[str, int], dict] = {}
+        self.meta = MagicMock()
+        self.meta.client.exceptions.ConditionalCheckFailedException = type(
+            "ConditionalCheckFailedException", (Exception,), {}
+        )
+
+    def put_item(self, Item):
+        self.items[(Item["ConnectionId"], int(Item["MessagePartId"]))] = dict(Item)
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, **kwargs):
+        item = self.items[(Key["ConnectionId"], int(Key["MessagePartId"]))]
+        max_part_id = ExpressionAttributeValues[":max_part_id"]
+        if item.get("MaxPartId", 0) >= max_part_id:
+            raise self.meta.client.exceptions.ConditionalCheckFailedException()
+        item["MaxPartId"] = max_part_id
+
+    def get_item(self, Key, **kwargs):
+        return {"Item": self.items[(Key["ConnectionId"], int(Key["MessagePartId"]))]}
+
+    def batch_get_item(self, RequestItems):
+        ((table_name, request),) = RequestItems.items()
+        return {
+            "Responses": {
+                table_name: [
+                    self.items[(key["ConnectionId"], int(key["MessagePartId"]))]
+                    for key in request["Keys"]
+                    if (key["ConnectionId"], int(key["MessagePartId"])) in self.items
+                ]
+            },
+            "UnprocessedKeys": {},
+        }
+
+
+class TestMessageParts(unittest.TestCase):
+    def setUp(self):
+        self.table = _FakeSessionTable()
+        self.patchers = [
+            patch.object(websocket, "table", self.table),
+            patch.object(websocket, "dynamodb_client", self.table),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.table.put_item(
+            Item={"ConnectionId": "connection", "MessagePartId": 0, "UserId": "user"}
+        )
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_parts_are_assembled_in_order(self):
+        parts = [f"part{i}," for i in range(10)]
+        # Parts may arrive out of order
+        with (
+            patch.object(self.table, "put_item", wraps=self.table.put_item) as put_item,
+            patch.object(
+                self.table, "update_item", wraps=self.table.update_item
+            ) as update_item,
+        ):
+            for index in [3, 0, 9, 1, 2, 8, 4, 5, 7, 6]:
+                store_message_part("connection", index, parts[index], expire=0)
+
+        # Each part is written once, and the bound is raised only every interval
+        self.assertEqual(put_item.call_count, 10)
+        self.assertEqual(update_item.call_count, 1)
+
+        with patch.object(
+            self.table, "batch_get_item", wraps=self.table.batch_get_item
+        ) as batch_get_item:
+            user_id, full_message = load_message("connection")
+            self.assertEqual(batch_get_item.call_count, 1)
+
+        self.assertEqual(user_id, "user")
+        self.assertEqual(full_message, "".join(parts))
+
+    def test_parts_beyond_interval(self):
+        count = websocket.MESSAGE_PART_ID_BOUND_INTERVAL * 2 + 1
+        parts = [f"part{i}," for i in range(count)]
+        for index in reversed(range(count)):
+            store_message_part("connection", index, parts[index], expire=0)
+
+        _, full_message = load_message("connection")
+        self.assertEqual(full_message, "".join(parts))
+
+    def test_single_part(self):
+        store_message_part("connection", 0, '{"message": "hello"}', expire=0)
+        _, full_message = load_message("connection")
+        self.assertEqual(full_message, '{"message": "hello"}')
+
+
+if __name__ == "__main__":
+    unittest.main()
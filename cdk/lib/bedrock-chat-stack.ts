@@ -177,6 +177,7 @@ export class BedrockChatStack extends cdk.Stack {
         envPrefix: props.envPrefix,
         botTable: database.botTable,
         conversationTable: database.conversationTable,
+        largeMessageBucket,
         language: props.botStoreLanguage,
         enableBotStoreReplicas: props.enableBotStoreReplicas,
       });
@@ -251,6 +252,7 @@ export class BedrockChatStack extends cdk.Stack {
       enableBedrockCrossRegionInference:
         props.enableBedrockCrossRegionInference,
       enableLambdaSnapStart: props.enableLambdaSnapStart,
+      botStatsQueue: backendApi.botStatsQueue,
     });
     frontend.buildViteApp({
       backendApiEndpoint: backendApi.api.apiEndpoint,
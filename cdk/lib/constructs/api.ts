@@ -22,6 +22,8 @@ import * as logs from "aws-cdk-lib/aws-logs";
 import * as path from "path";
 import { IBucket } from "aws-cdk-lib/aws-s3";
 import * as codebuild from "aws-cdk-lib/aws-codebuild";
+import * as sqs from "aws-cdk-lib/aws-sqs";
+import * as lambdaEventSources from "aws-cdk-lib/aws-lambda-event-sources";
 import { UsageAnalysis } from "./usage-analysis";
 import { excludeDockerImage } from "../constants/docker";
 import { PythonFunction } from "@aws-cdk/aws-lambda-python-alpha";
@@ -47,6 +49,7 @@ export interface ApiProps {
 export class Api extends Construct {
   readonly api: HttpApi;
   readonly handler: IFunction;
+  readonly botStatsQueue: sqs.IQueue;
   constructor(scope: Construct, id: string, props: ApiProps) {
     super(scope, id);
 
@@ -227,6 +230,114 @@ export class Api extends Construct {
     props.usageAnalysis?.ddbBucket.grantRead(handlerRole);
     props.largeMessageBucket.grantReadWrite(handlerRole);
 
+    // Deletes all the conversations of a user asynchronously, invoked by the handler.
+    const conversationDeletionRole = new iam.Role(
+      this,
+      "ConversationDeletionRole",
+      {
+        assumedBy: new iam.ServicePrincipal("lambda.amazonaws.com"),
+      }
+    );
+    conversationDeletionRole.addManagedPolicy(
+      iam.ManagedPolicy.fromAwsManagedPolicyName(
+        "service-role/AWSLambdaBasicExecutionRole"
+      )
+    );
+    conversationDeletionRole.addToPolicy(
+      new iam.PolicyStatement({
+        actions: ["sts:AssumeRole"],
+        resources: [tableAccessRole.roleArn],
+      })
+    );
+    props.largeMessageBucket.grantReadWrite(conversationDeletionRole);
+
+    const conversationDeletionHandler = new PythonFunction(
+      this,
+      "ConversationDeletionHandler",
+      {
+        entry: path.join(__dirname, "../../../backend"),
+        index: "app/conversation_remove.py",
+        handler: "handler",
+        bundling: {
+          assetExcludes: [...excludeDockerImage],
+          buildArgs: { POETRY_VERSION: "1.8.3" },
+        },
+        runtime: Runtime.PYTHON_3_13,
+        architecture: Architecture.X86_64,
+        memorySize: 512,
+        timeout: Duration.minutes(15),
+        environment: {
+          CONVERSATION_TABLE_NAME: database.conversationTable.tableName,
+          BOT_TABLE_NAME: database.botTable.tableName,
+          ACCOUNT: Stack.of(this).account,
+          REGION: Stack.of(this).region,
+          BEDROCK_REGION: props.bedrockRegion,
+          TABLE_ACCESS_ROLE_ARN: tableAccessRole.roleArn,
+          LARGE_MESSAGE_BUCKET: props.largeMessageBucket.bucketName,
+        },
+        role: conversationDeletionRole,
+        logRetention: logs.RetentionDays.THREE_MONTHS,
+      }
+    );
+    conversationDeletionHandler.grantInvoke(handlerRole);
+
+    // Aggregates the bot usages flushed by the chat handlers, so that the writes
+    // per bot are bounded by the batching window.
+    const botStatsQueue = new sqs.Queue(this, "BotStatsQueue", {
+      visibilityTimeout: Duration.minutes(5),
+      enforceSSL: true,
+    });
+    const botStatsRole = new iam.Role(this, "BotStatsRole", {
+      assumedBy: new iam.ServicePrincipal("lambda.amazonaws.com"),
+    });
+    botStatsRole.addManagedPolicy(
+      iam.ManagedPolicy.fromAwsManagedPolicyName(
+        "service-role/AWSLambdaBasicExecutionRole"
+      )
+    );
+    botStatsRole.addToPolicy(
+      // Assume the table access role for row-level access control.
+      new iam.PolicyStatement({
+        actions: ["sts:AssumeRole"],
+        resources: [tableAccessRole.roleArn],
+      })
+    );
+    const botStatsHandler = new PythonFunction(this, "BotStatsHandler", {
+      entry: path.join(__dirname, "../../../backend"),
+      index: "app/bot_stats.py",
+      handler: "handler",
+      bundling: {
+        assetExcludes: [...excludeDockerImage],
+        buildArgs: { POETRY_VERSION: "1.8.3" },
+      },
+      runtime: Runtime.PYTHON_3_13,
+      architecture: Architecture.X86_64,
+      memorySize: 256,
+      timeout: Duration.minutes(1),
+      environment: {
+        BOT_TABLE_NAME: database.botTable.tableName,
+        ACCOUNT: Stack.of(this).account,
+        REGION: Stack.of(this).region,
+        BEDROCK_REGION: props.bedrockRegion,
+        TABLE_ACCESS_ROLE_ARN: tableAccessRole.roleArn,
+        // Usages whose write failed are sent to the queue again
+        BOT_STATS_QUEUE_URL: botStatsQueue.queueUrl,
+      },
+      role: botStatsRole,
+      logRetention: logs.RetentionDays.THREE_MONTHS,
+    });
+    botStatsHandler.addEventSource(
+      new lambdaEventSources.SqsEventSource(botStatsQueue, {
+        batchSize: 100,
+        maxBatchingWindow: Duration.seconds(10),
+        reportBatchItemFailures: true,
+      })
+    );
+    database.botTable.grantReadWriteData(botStatsHandler);
+    botStatsQueue.grantSendMessages(handlerRole);
+    botStatsQueue.grantSendMessages(botStatsRole);
+    this.botStatsQueue = botStatsQueue;
+
     const handler = new PythonFunction(this, "HandlerV2", {
       entry: path.join(__dirname, "../../../backend"),
       index: "app/main.py",
@@ -264,6 +375,9 @@ export class Api extends Construct {
         ENABLE_BEDROCK_CROSS_REGION_INFERENCE:
           props.enableBedrockCrossRegionInference.toString(),
         OPENSEARCH_DOMAIN_ENDPOINT: props.openSearchEndpoint || "",
+        CONVERSATION_DELETION_FUNCTION_NAME:
+          conversationDeletionHandler.functionName,
+        BOT_STATS_QUEUE_URL: botStatsQueue.queueUrl,
         AWS_LAMBDA_EXEC_WRAPPER: "/opt/bootstrap",
         PORT: "8000",
       },
@@ -8,9 +8,24 @@ import {
   BlockPublicAccess,
   Bucket,
   BucketEncryption,
+  IBucket,
   ObjectOwnership,
 } from "aws-cdk-lib/aws-s3";
-import { CfnOutput, RemovalPolicy, Stack } from "aws-cdk-lib";
+import { CfnOutput, Duration, RemovalPolicy, Stack } from "aws-cdk-lib";
+import * as path from "path";
+import { PythonFunction } from "@aws-cdk/aws-lambda-python-alpha";
+import {
+  Architecture,
+  Runtime,
+  StartingPosition,
+} from "aws-cdk-lib/aws-lambda";
+import {
+  DynamoEventSource,
+  SqsDlq,
+} from "aws-cdk-lib/aws-lambda-event-sources";
+import * as sqs from "aws-cdk-lib/aws-sqs";
+import * as cloudwatch from "aws-cdk-lib/aws-cloudwatch";
+import { excludeDockerImage } from "../constants/docker";
 import {
   Effect,
   IRole,
@@ -26,7 +41,6 @@ export type Language = z.infer<typeof BotStoreLanguageSchema>;
 
 export interface OsisPipelineConfigProps {
   botTable: dynamodb.ITable;
-  conversationTable: dynamodb.ITable;
   osisRole: IRole;
   bucketName: string;
   endpoint: string;
@@ -39,6 +53,7 @@ export interface BotStoreProps {
   envPrefix: string;
   readonly botTable: dynamodb.ITable;
   readonly conversationTable: dynamodb.ITable;
+  readonly largeMessageBucket: IBucket;
   readonly language: Language;
   readonly enableBotStoreReplicas: boolean;
 }
@@ -130,13 +145,6 @@ export class BotStore extends Construct {
       retention: logs.RetentionDays.ONE_WEEK,
     });
 
-    let conversationIngestionLogGroup = new logs.LogGroup(this, "ConversationIngensionLogGroup", {
-      logGroupName:
-        `/aws/vendedlogs/OpenSearchIngestion/${props.envPrefix}conversation-table-osis-pipeline/${id}`.toLowerCase(),
-      removalPolicy: RemovalPolicy.DESTROY,
-      retention: logs.RetentionDays.ONE_WEEK,
-    });
-
     const osisRole = new Role(this, "OsisRole", {
       assumedBy: new ServicePrincipal("osis-pipelines.amazonaws.com"),
     });
@@ -150,19 +158,13 @@ export class BotStore extends Construct {
             "dynamodb:DescribeContinuousBackups",
             "dynamodb:ExportTableToPointInTime",
           ],
-          resources: [
-            props.botTable.tableArn,
-            props.conversationTable.tableArn
-          ] 
+          resources: [props.botTable.tableArn],
         }),
         new PolicyStatement({
           sid: "allowCheckExportjob",
           effect: Effect.ALLOW,
           actions: ["dynamodb:DescribeExport"],
-          resources: [
-            `${props.botTable.tableArn}/export/*`,
-            `${props.conversationTable.tableArn}/export/*`
-          ]
+          resources: [`${props.botTable.tableArn}/export/*`],
         }),
         new PolicyStatement({
           sid: "allowReadFromStream",
@@ -172,10 +174,7 @@ export class BotStore extends Construct {
             "dynamodb:GetRecords",
             "dynamodb:GetShardIterator",
           ],
-          resources: [
-            `${props.botTable.tableArn}/stream/*`,
-            `${props.conversationTable.tableArn}/stream/*`
-          ]
+          resources: [`${props.botTable.tableArn}/stream/*`],
         }),
         new PolicyStatement({
           sid: "allowReadAndWriteToS3ForExport",
@@ -270,7 +269,6 @@ export class BotStore extends Construct {
     const region = Stack.of(this).region;
     const botOsisPipelineConfig = this._createBotOsisPipelineConfig({
       botTable: props.botTable,
-      conversationTable: props.conversationTable,
       osisRole,
       bucketName: bucket.bucketName,
       endpoint,
@@ -300,35 +298,92 @@ export class BotStore extends Construct {
       pipelineConfigurationBody: JSON.stringify(botOsisPipelineConfig),
     });
 
-    const conversationOsisPipelineConfig = this._createConversationOsisPipelineConfig({
-      botTable: props.botTable,
-      conversationTable: props.conversationTable,
-      osisRole,
-      bucketName: bucket.bucketName,
-      endpoint,
-      envPrefix: props.envPrefix,
-      language: props.language,
-      region,
+    // Indexes the messages of the conversations for search, one document per message.
+    const conversationIndexer = new PythonFunction(
+      this,
+      "ConversationIndexer",
+      {
+        entry: path.join(__dirname, "../../../backend"),
+        index: "app/conversation_indexer.py",
+        handler: "handler",
+        bundling: {
+          assetExcludes: [...excludeDockerImage],
+          buildArgs: { POETRY_VERSION: "1.8.3" },
+        },
+        runtime: Runtime.PYTHON_3_13,
+        architecture: Architecture.X86_64,
+        memorySize: 512,
+        timeout: Duration.minutes(5),
+        environment: {
+          ENV_PREFIX: props.envPrefix,
+          ACCOUNT: Stack.of(this).account,
+          REGION: Stack.of(this).region,
+          OPENSEARCH_DOMAIN_ENDPOINT: endpoint,
+          LARGE_MESSAGE_BUCKET: props.largeMessageBucket.bucketName,
+          CONVERSATION_SEARCH_LANGUAGE: props.language,
+        },
+        logRetention: logs.RetentionDays.THREE_MONTHS,
+      }
+    );
+    // Records of the batches still failing after the retries, to be indexed again
+    const conversationIndexerDlq = new sqs.Queue(
+      this,
+      "ConversationIndexerDlq",
+      {
+        retentionPeriod: Duration.days(14),
+        enforceSSL: true,
+      }
+    );
+    conversationIndexer.addEventSource(
+      new DynamoEventSource(props.conversationTable, {
+        startingPosition: StartingPosition.LATEST,
+        batchSize: 100,
+        maxBatchingWindow: Duration.seconds(5),
+        // Records are indexed idempotently, so that failed batches are retried as a whole
+        bisectBatchOnError: true,
+        retryAttempts: 5,
+        onFailure: new SqsDlq(conversationIndexerDlq),
+      })
+    );
+    new cloudwatch.Alarm(this, "ConversationIndexerDlqAlarm", {
+      alarmDescription:
+        "Conversations failed to be indexed for search. See the ConversationIndexerDlq queue.",
+      metric:
+        conversationIndexerDlq.metricApproximateNumberOfMessagesVisible({
+          period: Duration.minutes(5),
+        }),
+      threshold: 1,
+      evaluationPeriods: 1,
+      comparisonOperator:
+        cloudwatch.ComparisonOperator.GREATER_THAN_OR_EQUAL_TO_THRESHOLD,
+      treatMissingData: cloudwatch.TreatMissingData.NOT_BREACHING,
     });
+    props.largeMessageBucket.grantRead(conversationIndexer);
+    conversationIndexer.addToRolePolicy(
+      new PolicyStatement({
+        effect: Effect.ALLOW,
+        actions: ["aoss:APIAccessAll"],
+        resources: [this.collection.attrArn],
+      })
+    );
+    this.addDataAccessPolicy(
+      props.envPrefix,
+      "DAPolicyConversationIndexer",
+      conversationIndexer.role!,
+      ["aoss:DescribeCollectionItems"],
+      [
+        "aoss:CreateIndex",
+        "aoss:DescribeIndex",
+        "aoss:ReadDocument",
+        "aoss:WriteDocument",
+      ]
+    );
 
-    new osis.CfnPipeline(this, "ConversationOsisPipeline", {
-      pipelineName: generatePhysicalName(
-        this,
-        `${props.envPrefix}ConversationPipeline`,
-        {
-          maxLength: 25,
-          lower: true,
-        }
-      ),
-      minUnits: 1,
-      maxUnits: 4,
-      logPublishingOptions: {
-        isLoggingEnabled: true,
-        cloudWatchLogDestination: {
-          logGroup: conversationIngestionLogGroup.logGroupName,
-        },
-      },
-      pipelineConfigurationBody: JSON.stringify(conversationOsisPipelineConfig),
+    new CfnOutput(this, "ConversationIndexerFunctionName", {
+      value: conversationIndexer.functionName,
+    });
+    new CfnOutput(this, "ConversationIndexerDlqName", {
+      value: conversationIndexerDlq.queueName,
     });
 
     new CfnOutput(this, "OpenSearchEndpoint", {
@@ -470,356 +525,4 @@ export class BotStore extends Construct {
       },
     };
   }
-
-  /**
-   * Generate template content for conversation tables
-   */
-  private _genConversationTemplateContent(language: Language): string {
-    switch (language) {
-      case "ja":
-        return JSON.stringify({
-          template: {
-            settings: {
-              analysis: {
-                analyzer: {
-                  ja_analyzer: {
-                    type: "custom",
-                    char_filter: ["icu_normalizer"],
-                    tokenizer: "kuromoji_tokenizer",
-                    filter: [
-                      "kuromoji_baseform",
-                      "kuromoji_part_of_speech",
-                      "ja_stop",
-                      "kuromoji_number",
-                      "kuromoji_stemmer",
-                    ],
-                  },
-                },
-              },
-            },
-            mappings: {
-              dynamic: false,
-              properties: {
-                PK: {
-                  type: "text",
-                  fields: {
-                    keyword: {
-                      type: "keyword",
-                      ignore_above: 256
-                    }
-                  }
-                },
-                SK: {
-                  type: "text",
-                  fields: {
-                    keyword: {
-                      type: "keyword",
-                      ignore_above: 256
-                    }
-                  }
-                },
-                CreateTime: { type: "double" },
-                LastUpdateTime: { type: "double" },
-                Title: {
-                  type: "text",
-                  fields: {
-                    keyword: {
-                      type: "keyword",
-                      ignore_above: 256
-                    }
-                  },
-                  analyzer: "ja_analyzer"
-                },
-                messages: {
-                  properties: {
-                    id: {
-                      type: "text",
-                      fields: {
-                        keyword: {
-                          type: "keyword",
-                          ignore_above: 256
-                        }
-                      }
-                    },
-                    value: {
-                      properties: {
-                        role: {
-                          type: "text",
-                          fields: {
-                            keyword: {
-                              type: "keyword",
-                              ignore_above: 256
-                            }
-                          }
-                        },
-                        content: {
-                          properties: {
-                            content_type: {
-                              type: "text",
-                              fields: {
-                                keyword: {
-                                  type: "keyword",
-                                  ignore_above: 256
-                                }
-                              }
-                            },
-                            body: {
-                              type: "text",
-                              fields: {
-                                keyword: {
-                                  type: "keyword",
-                                  ignore_above: 256
-                                }
-                              },
-                              analyzer: "ja_analyzer"
-                            }
-                          }
-                        },
-                        model: {
-                          type: "text",
-                          fields: {
-                            keyword: {
-                              type: "keyword",
-                              ignore_above: 256
-                            }
-                          }
-                        },
-                        children: {
-                          type: "text",
-                          fields: {
-                            keyword: {
-                              type: "keyword",
-                              ignore_above: 256
-                            }
-                          }
-                        },
-                        parent: {
-                          type: "text",
-                          fields: {
-                            keyword: {
-                              type: "keyword",
-                              ignore_above: 256
-                            }
-                          }
-                        },
-                        create_time: { type: "double" }
-                      }
-                    }
-                  }
-                }
-              }
-            }
-          }
-        });
-      default:
-        return JSON.stringify({
-          template: {
-            mappings: {
-              dynamic: false,
-              properties: {
-                PK: {
-                  type: "text",
-                  fields: {
-                    keyword: {
-                      type: "keyword",
-                      ignore_above: 256
-                    }
-                  }
-                },
-                SK: {
-                  type: "text",
-                  fields: {
-                    keyword: {
-                      type: "keyword",
-                      ignore_above: 256
-                    }
-                  }
-                },
-                CreateTime: { type: "double" },
-                LastUpdateTime: { type: "double" },
-                Title: {
-                  type: "text",
-                  fields: {
-                    keyword: {
-                      type: "keyword",
-                      ignore_above: 256
-                    }
-                  }
-                },
-                messages: {
-                  properties: {
-                    id: {
-                      type: "text",
-                      fields: {
-                        keyword: {
-                          type: "keyword",
-                          ignore_above: 256
-                        }
-                      }
-                    },
-                    value: {
-                      properties: {
-                        role: {
-                          type: "text",
-                          fields: {
-                            keyword: {
-                              type: "keyword",
-                              ignore_above: 256
-                            }
-                          }
-                        },
-                        content: {
-                          properties: {
-                            content_type: {
-                              type: "text",
-                              fields: {
-                                keyword: {
-                                  type: "keyword",
-                                  ignore_above: 256
-                                }
-                              }
-                            },
-                            body: {
-                              type: "text",
-                              fields: {
-                                keyword: {
-                                  type: "keyword",
-                                  ignore_above: 256
-                                }
-                              }
-                            }
-                          }
-                        },
-                        model: {
-                          type: "text",
-                          fields: {
-                            keyword: {
-                              type: "keyword",
-                              ignore_above: 256
-                            }
-                          }
-                        },
-                        children: {
-                          type: "text",
-                          fields: {
-                            keyword: {
-                              type: "keyword",
-                              ignore_above: 256
-                            }
-                          }
-                        },
-                        parent: {
-                          type: "text",
-                          fields: {
-                            keyword: {
-                              type: "keyword",
-                              ignore_above: 256
-                            }
-                          }
-                        },
-                        create_time: { type: "double" }
-                      }
-                    }
-                  }
-                }
-              }
-            }
-          }
-        });
-    }
-  }
-
-  /**
-   * Generate OSIS pipeline settings for conversation tables
-   */
-  private _createConversationOsisPipelineConfig(props: OsisPipelineConfigProps): any {
-    return {
-      version: "2",
-      "dynamodb-pipeline": {
-        source: {
-          dynamodb: {
-            acknowledgments: true,
-            tables: [
-              {
-                table_arn: props.conversationTable.tableArn,
-                stream: {
-                  start_position: "LATEST",
-                },
-                export: {
-                  s3_bucket: props.bucketName,
-                  s3_region: props.region,
-                },
-              },
-            ],
-            aws: {
-              sts_role_arn: props.osisRole.roleArn,
-              region: props.region,
-            },
-          },
-        },
-        processor: [
-          // Step 1: Parse message data as JSON
-          {
-            parse_json: {
-              source: "MessageMap",
-              destination: "parsed_message_map"
-            }
-          },
-          // Step 2: Initialize conversation data
-          {
-            add_entries: {
-              entries: [
-                {
-                  key: "messages",
-                  value: []
-                }
-              ]
-            }
-          },
-          // Step 3: List all messages except system
-          {
-            map_to_list: {
-              source: "parsed_message_map",
-              target: "messages",
-              exclude_keys: [],
-              key_name: "id"
-            }
-          },
-          // Step 4: Remove unnecessary data
-          {
-            delete_entries: {
-              with_keys: [
-                "IsLargeMessage",
-                "TotalPrice",
-                "ShouldContinue",
-                "LastMessageId",
-                "MessageMap",
-                "parsed_message_map",
-              ]
-            }
-          }
-        ],
-        sink: [
-          {
-            opensearch: {
-              hosts: [props.endpoint],
-              index: `${props.envPrefix}conversation`,
-              index_type: "custom",
-              template_type: "index-template", 
-              template_content: this._genConversationTemplateContent(props.language),
-              document_id: '${getMetadata("primary_key")}',
-              action: '${getMetadata("opensearch_action")}',
-              document_version: '${getMetadata("document_version")}',
-              document_version_type: "external",
-              aws: {
-                sts_role_arn: props.osisRole.roleArn,
-                region: props.region,
-                serverless: true,
-              },
-            },
-          },
-        ],
-      },
-    };
-  }
 }
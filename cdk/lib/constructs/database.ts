@@ -18,6 +18,7 @@ export class Database extends Construct {
   readonly botTable: Table;
   readonly tableAccessRole: Role;
   readonly websocketSessionTable: Table;
+  readonly searchSummaryCacheTable: Table;
 
   constructor(scope: Construct, id: string, props?: DatabaseProps) {
     super(scope, id);
@@ -30,7 +31,8 @@ export class Database extends Construct {
       sortKey: { name: "SK", type: AttributeType.STRING },
       billingMode: BillingMode.PAY_PER_REQUEST,
       removalPolicy: RemovalPolicy.DESTROY,
-      stream: StreamViewType.NEW_IMAGE,
+      // Old images are read to index only the changed messages
+      stream: StreamViewType.NEW_AND_OLD_IMAGES,
       pointInTimeRecovery: props?.pointInTimeRecovery,
       encryption: TableEncryption.AWS_MANAGED,
     });
@@ -96,10 +98,25 @@ export class Database extends Construct {
       timeToLiveAttribute: "expire",
     });
 
+    // Cache of web search result summaries shared by all users.
+    // Items expire with TTL so that stale web content is summarized again.
+    const searchSummaryCacheTable = new Table(
+      this,
+      "SearchSummaryCacheTable",
+      {
+        partitionKey: { name: "CacheKey", type: AttributeType.STRING },
+        billingMode: BillingMode.PAY_PER_REQUEST,
+        removalPolicy: RemovalPolicy.DESTROY,
+        timeToLiveAttribute: "expire",
+        encryption: TableEncryption.AWS_MANAGED,
+      }
+    );
+
     this.conversationTable = conversationTable;
     this.botTable = botTable;
     this.tableAccessRole = tableAccessRole;
     this.websocketSessionTable = websocketSessionTable;
+    this.searchSummaryCacheTable = searchSummaryCacheTable;
 
     new CfnOutput(this, "ConversationTableName", {
       value: conversationTable.tableName,
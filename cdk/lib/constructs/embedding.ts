@@ -271,7 +271,9 @@ export class Embedding extends Construct {
     const updateSyncStatusSucceeded = this.createUpdateSyncStatusTask(
       "UpdateSyncStatusSuccess",
       "SUCCEEDED",
-      "Knowledge base sync succeeded"
+      "Knowledge base sync succeeded",
+      // Changes on every completed sync, scoping the retrieval cache of the API
+      "$$.Execution.Id"
     );
 
     const updateSyncStatusFailed = new tasks.LambdaInvoke(
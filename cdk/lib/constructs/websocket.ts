@@ -14,6 +14,7 @@ import * as s3 from "aws-cdk-lib/aws-s3";
 import { excludeDockerImage } from "../constants/docker";
 import { PythonFunction } from "@aws-cdk/aws-lambda-python-alpha";
 import { Database } from "./database";
+import * as sqs from "aws-cdk-lib/aws-sqs";
 
 export interface WebSocketProps {
   readonly database: Database;
@@ -25,6 +26,7 @@ export interface WebSocketProps {
   readonly accessLogBucket?: s3.Bucket;
   readonly enableBedrockCrossRegionInference: boolean;
   readonly enableLambdaSnapStart: boolean;
+  readonly botStatsQueue?: sqs.IQueue;
 }
 
 export class WebSocket extends Construct {
@@ -101,8 +103,10 @@ export class WebSocket extends Construct {
 
     largePayloadSupportBucket.grantRead(handlerRole);
     props.websocketSessionTable.grantReadWriteData(handlerRole);
+    database.searchSummaryCacheTable.grantReadWriteData(handlerRole);
     props.largeMessageBucket.grantReadWrite(handlerRole);
     props.documentBucket.grantRead(handlerRole);
+    props.botStatsQueue?.grantSendMessages(handlerRole);
 
     const handler = new PythonFunction(this, "HandlerV2", {
       entry: path.join(__dirname, "../../../backend"),
@@ -126,8 +130,11 @@ export class WebSocket extends Construct {
         LARGE_MESSAGE_BUCKET: props.largeMessageBucket.bucketName,
         LARGE_PAYLOAD_SUPPORT_BUCKET: largePayloadSupportBucket.bucketName,
         WEBSOCKET_SESSION_TABLE_NAME: props.websocketSessionTable.tableName,
+        SEARCH_SUMMARY_CACHE_TABLE_NAME:
+          database.searchSummaryCacheTable.tableName,
         ENABLE_BEDROCK_CROSS_REGION_INFERENCE:
           props.enableBedrockCrossRegionInference.toString(),
+        BOT_STATS_QUEUE_URL: props.botStatsQueue?.queueUrl || "",
       },
       role: handlerRole,
       snapStart: props.enableLambdaSnapStart
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Add `AccessPrincipals` to the bots stored before it was introduced.
+
+The bot store filters bots by `AccessPrincipals`, so bots without it are not found
+in the bot store until this script is run. Updated items are re-indexed to OpenSearch
+by the ingestion pipeline.
+
+Usage:
+    python add_access_principals.py [--dry-run]
+"""
+
+import argparse
+import logging
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("migration")
+
+
+################################
+# Configuration
+################################
+
+# Region where dynamodb is located
+REGION = "ap-northeast-1"
+
+BOT_TABLE = "BedrockChatStack-DatabaseBotTableV3XXXXX"
+
+################################
+# End Configuration
+################################
+
+
+def compose_access_principals(item: dict) -> list[str]:
+    """Same as `app.repositories.common.compose_access_principals`."""
+    shared_scope = item.get("SharedScope", "private")
+    principals = [f"user:{item['PK']}"]
+    if shared_scope == "all":
+        principals.append("all")
+    elif shared_scope == "partial":
+        principals.extend(f"user:{user_id}" for user_id in item["AllowedCognitoUsers"])
+        principals.extend(
+            f"group:{group_id}" for group_id in item["AllowedCognitoGroups"]
+        )
+        principals.append("group:Admin")
+    return sorted(set(principals))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the bots to update without updating them",
+    )
+    args = parser.parse_args()
+
+    table = boto3.resource("dynamodb", region_name=REGION).Table(BOT_TABLE)
+    scan_kwargs = {
+        "FilterExpression": Attr("SK").begins_with("BOT#")
+        & Attr("AccessPrincipals").not_exists(),
+    }
+    updated = 0
+    while True:
+        response = table.scan(**scan_kwargs)
+        for item in response["Items"]:
+            principals = compose_access_principals(item)
+            logger.info(f"Bot {item['BotId']}: {principals}")
+            if not args.dry_run:
+                # Skip the bots deleted or shared again since the scan
+                try:
+                    table.update_item(
+                        Key={"PK": item["PK"], "SK": item["SK"]},
+                        UpdateExpression="SET AccessPrincipals = :principals",
+                        ConditionExpression=(
+                            "attribute_exists(PK) AND attribute_not_exists(AccessPrincipals)"
+                        ),
+                        ExpressionAttributeValues={":principals": principals},
+                    )
+                except table.meta.client.exceptions.ConditionalCheckFailedException:
+                    continue
+            updated += 1
+
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    logger.info(f"{'Found' if args.dry_run else 'Updated'} {updated} bots")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Index the conversations stored before the conversation indexer was introduced.
+
+Conversation search reads one document per message, written by the conversation indexer
+function from the DynamoDB stream. Conversations not written since the indexer was deployed
+are not found until this script is run. The conversation and delta items are scanned and sent
+to the indexer function as stream records, which indexes them idempotently.
+
+The former `conversation` index written by the ingestion pipeline is no longer read,
+and can be deleted after running this script.
+
+Usage:
+    python index_conversation_messages.py [--dry-run]
+"""
+
+import argparse
+import json
+import logging
+
+import boto3
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("migration")
+
+
+################################
+# Configuration
+################################
+
+# Region where dynamodb is located
+REGION = "ap-northeast-1"
+
+CONVERSATION_TABLE = "BedrockChatStack-DatabaseConversationTableV3XXXXX"
+
+# Output `ConversationIndexerFunctionName` of the stack
+INDEXER_FUNCTION = "BedrockChatStack-BotStoreConversationIndexerXXXXX"
+
+################################
+# End Configuration
+################################
+
+# Stay well within the payload limit of synchronous invocations (6MB)
+MAX_PAYLOAD_SIZE = 4 * 1024 * 1024
+
+
+def invoke(lambda_client, records: list[dict]):
+    response = lambda_client.invoke(
+        FunctionName=INDEXER_FUNCTION,
+        InvocationType="RequestResponse",
+        Payload=json.dumps({"Records": records}),
+    )
+    if "FunctionError" in response:
+        raise RuntimeError(f"Indexing failed: {response['Payload'].read()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Count the items to index without indexing them",
+    )
+    args = parser.parse_args()
+
+    # Low-level client, which returns the items in the format of the stream records
+    dynamodb_client = boto3.client("dynamodb", region_name=REGION)
+    lambda_client = boto3.client("lambda", region_name=REGION)
+    paginator = dynamodb_client.get_paginator("scan")
+
+    records: list[dict] = []
+    payload_size = 0
+    indexed = 0
+    for page in paginator.paginate(
+        TableName=CONVERSATION_TABLE,
+        FilterExpression="contains(SK, :conv) OR contains(SK, :delta)",
+        ExpressionAttributeValues={
+            ":conv": {"S": "#CONV#"},
+            ":delta": {"S": "#CONV_DELTA#"},
+        },
+    ):
+        for item in page["Items"]:
+            record = {
+                "eventName": "INSERT",
+                "dynamodb": {
+                    "Keys": {"PK": item["PK"], "SK": item["SK"]},
+                    "NewImage": item,
+                },
+            }
+            size = len(json.dumps(record))
+            if records and payload_size + size > MAX_PAYLOAD_SIZE:
+                if not args.dry_run:
+                    invoke(lambda_client, records)
+                indexed += len(records)
+                logger.info(f"Indexed {indexed} items")
+                records = []
+                payload_size = 0
+
+            records.append(record)
+            payload_size += size
+
+    if records:
+        if not args.dry_run:
+            invoke(lambda_client, records)
+        indexed += len(records)
+
+    logger.info(f"{'Found' if args.dry_run else 'Indexed'} {indexed} items")
+
+
+if __name__ == "__main__":
+    main()
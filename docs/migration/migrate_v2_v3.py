@@ -271,6 +271,11 @@ def convert_bot_item(item: Dict) -> Dict:
     new_item["AllowedCognitoUsers"] = []
     new_item["AllowedCognitoGroups"] = []
 
+    # ボットストアの検索フィルタ用のアクセス可能なプリンシパル
+    new_item["AccessPrincipals"] = [f"user:{user_id}"]
+    if new_item.get("SharedScope") == "all":
+        new_item["AccessPrincipals"].insert(0, "all")
+
     # スター状態の変換（ピン留めからスターへ）
     if item.get("IsPinned", False):
         new_item["IsStarred"] = "TRUE"
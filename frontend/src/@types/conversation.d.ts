@@ -140,6 +140,11 @@ export type ConversationMeta = {
   botId?: string;
 };
 
+export type ListConversationsResponse = {
+  conversations: ConversationMeta[];
+  nextToken: string | null;
+};
+
 export type ConversationSearchMeta = {
   id: string;
   title: string;
@@ -149,6 +154,19 @@ export type ConversationSearchMeta = {
   highlights?: SearchHighlightModel[]; // Optional highlights information
 };
 
+export type SearchConversationsRequest = {
+  query: string;
+  limit?: number;
+  nextToken?: string;
+  // Skips the highlights for type-ahead
+  compact?: boolean;
+};
+
+export type SearchConversationsResponse = {
+  conversations: ConversationSearchMeta[];
+  nextToken: string | null;
+};
+
 export type MessageMap = {
   [messageId: string]: MessageContent & {
     children: string[];
@@ -121,6 +121,9 @@ type ConversationSearchResultsProps = {
   isSearching: boolean;
   hasSearched: boolean;
   searchQuery: string;
+  hasMore?: boolean;
+  isLoadingMore?: boolean;
+  onLoadMore?: () => void;
   onbackToConversationHistory: () => void;
   onSelectConversation: (id: string) => void;
 };
@@ -130,6 +133,9 @@ const ConversationSearchResults: React.FC<ConversationSearchResultsProps> = ({
   isSearching,
   hasSearched,
   searchQuery,
+  hasMore,
+  isLoadingMore,
+  onLoadMore,
   onbackToConversationHistory,
   onSelectConversation,
 }) => {
@@ -210,6 +216,15 @@ const ConversationSearchResults: React.FC<ConversationSearchResultsProps> = ({
           />
         ))}
       </div>
+      {hasMore && (
+        <Button
+          className="mt-4 w-full"
+          outlined
+          loading={isLoadingMore}
+          onClick={() => onLoadMore?.()}>
+          {t('conversationHistory.searchConversation.loadMore')}
+        </Button>
+      )}
       <Button
         className="mt-4"
         outlined
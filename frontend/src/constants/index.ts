@@ -64,6 +64,7 @@ export const PostStreamingStatus = {
   AGENT_THINKING: 'AGENT_THINKING',
   AGENT_TOOL_RESULT: 'AGENT_TOOL_RESULT',
   AGENT_RELATED_DOCUMENT: 'AGENT_RELATED_DOCUMENT',
+  AGENT_RELATED_DOCUMENTS: 'AGENT_RELATED_DOCUMENTS',
   REASONING: 'REASONING',
   ERROR: 'ERROR',
   END: 'END',
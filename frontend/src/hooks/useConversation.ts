@@ -48,10 +48,14 @@ const useConversation = () => {
         });
     },
     clearConversations: () => {
-      return mutate(async () => {
-        await conversationApi.clearConversations();
-        return [];
-      });
+      // The deletion may continue in the background, so the list is not fetched again
+      return mutate(
+        async () => {
+          await conversationApi.clearConversations();
+          return [];
+        },
+        { revalidate: false }
+      );
     },
     updateTitle: (conversationId: string, title: string) => {
       // Optimistic update
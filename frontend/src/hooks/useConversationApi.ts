@@ -1,7 +1,8 @@
-import { MutatorCallback, useSWRConfig } from 'swr';
+import useSWR, { MutatorCallback, useSWRConfig } from 'swr';
 import {
   Conversation,
   ConversationMeta,
+  ListConversationsResponse,
   PostMessageRequest,
   PostMessageResponse,
   RelatedDocument,
@@ -20,9 +21,27 @@ const useConversationApi = () => {
 
   return {
     getConversations: () => {
-      return http.get<ConversationMeta[]>('conversations', {
-        keepPreviousData: true,
-      });
+      // All the pages are fetched under the same key, so that the optimistic updates apply to the whole list
+      // eslint-disable-next-line react-hooks/rules-of-hooks
+      return useSWR<ConversationMeta[]>(
+        'conversations',
+        async () => {
+          const conversations: ConversationMeta[] = [];
+          let nextToken: string | undefined;
+          do {
+            const res = await http.getOnce<ListConversationsResponse>(
+              'conversations',
+              nextToken ? { next_token: nextToken } : undefined
+            );
+            conversations.push(...res.data.conversations);
+            nextToken = res.data.nextToken ?? undefined;
+          } while (nextToken);
+          return conversations;
+        },
+        {
+          keepPreviousData: true,
+        }
+      );
     },
     getConversation: (conversationId?: string) => {
       return http.get<Conversation>(
@@ -1,40 +1,94 @@
 import { useState, useCallback } from 'react';
 import { useDebounce } from 'use-debounce';
+import { SearchConversationsResponse } from '../@types/conversation';
 import useConversationSearchApi from './useConversationSearchApi';
 
-// Debounce delay in milliseconds
-const DEBOUNCE_DELAY = 300;
+// Debounce delay in milliseconds of the type-ahead search, which skips the highlights
+const TYPE_AHEAD_DEBOUNCE_DELAY = 300;
+// Debounce delay in milliseconds of the full search, once the query is settled
+const SEARCH_DEBOUNCE_DELAY = 1000;
+// Number of conversations per page
+const SEARCH_LIMIT = 20;
 
 export function useConversationSearch() {
   const conversationSearchApi = useConversationSearchApi();
   const [searchQuery, setSearchQuery] = useState('');
   const [displayQuery, setDisplayQuery] = useState('');
   const [hasSearched, setHasSearched] = useState(false);
-  const [debouncedQuery] = useDebounce(searchQuery, DEBOUNCE_DELAY);
+  const [typeAheadQuery] = useDebounce(searchQuery, TYPE_AHEAD_DEBOUNCE_DELAY);
+  const [settledQuery] = useDebounce(searchQuery, SEARCH_DEBOUNCE_DELAY);
+  // Pages loaded after the first one of the full search
+  const [nextPages, setNextPages] = useState<{
+    query: string;
+    responses: SearchConversationsResponse[];
+  }>({ query: '', responses: [] });
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
-  const {
-    data: searchResults,
-    isLoading: isSearching,
-    mutate: mutateSearchResults,
-  } = conversationSearchApi.searchConversations(hasSearched && debouncedQuery ? debouncedQuery : null);
+  const { data: typeAheadResults } = conversationSearchApi.searchConversations(
+    hasSearched && typeAheadQuery
+      ? { query: typeAheadQuery, limit: SEARCH_LIMIT, compact: true }
+      : null
+  );
+  const { data: fullResults } = conversationSearchApi.searchConversations(
+    hasSearched && settledQuery
+      ? { query: settledQuery, limit: SEARCH_LIMIT }
+      : null
+  );
+
+  // The full results replace the type-ahead ones once the query is settled
+  const isSettled = fullResults !== undefined && settledQuery === searchQuery;
+  const responses = isSettled
+    ? [
+        fullResults,
+        ...(nextPages.query === settledQuery ? nextPages.responses : []),
+      ]
+    : typeAheadResults
+      ? [typeAheadResults]
+      : [];
+  const nextToken = isSettled
+    ? responses[responses.length - 1].nextToken
+    : null;
 
   // Execute search when debouncedQuery changes
-  const handleSearch = useCallback(
-    (query: string) => {
-      setSearchQuery(query);
-
-      if (!query.trim()) {
-        setHasSearched(false);
-        setDisplayQuery('');
-        return;
-      }
-
-      setHasSearched(true);
-      setDisplayQuery(query);
-      mutateSearchResults();
-    },
-    [mutateSearchResults]
-  );
+  const handleSearch = useCallback((query: string) => {
+    setSearchQuery(query);
+
+    if (!query.trim()) {
+      setHasSearched(false);
+      setDisplayQuery('');
+      return;
+    }
+
+    setHasSearched(true);
+    setDisplayQuery(query);
+  }, []);
+
+  // Load the next page of the full search
+  const loadMore = useCallback(() => {
+    if (!nextToken || isLoadingMore) {
+      return;
+    }
+    setIsLoadingMore(true);
+    conversationSearchApi
+      .searchConversationsNextPage({
+        query: settledQuery,
+        limit: SEARCH_LIMIT,
+        nextToken,
+      })
+      .then((res) => {
+        setNextPages((pages) => ({
+          query: settledQuery,
+          responses: [
+            ...(pages.query === settledQuery ? pages.responses : []),
+            res.data,
+          ],
+        }));
+      })
+      .finally(() => {
+        setIsLoadingMore(false);
+      });
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [nextToken, isLoadingMore, settledQuery]);
 
   // Clear search
   const clearSearch = useCallback(() => {
@@ -44,12 +98,15 @@ export function useConversationSearch() {
   }, []);
 
   return {
-    searchResults: searchResults ?? [],
-    isSearching,
+    searchResults: responses.flatMap((response) => response.conversations),
+    isSearching: hasSearched && responses.length === 0,
     hasSearched,
     displayQuery,
     handleSearch,
-    clearSearch
+    clearSearch,
+    hasMore: nextToken !== null,
+    isLoadingMore,
+    loadMore,
   };
 }
 
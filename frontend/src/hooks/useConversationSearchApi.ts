@@ -1,15 +1,32 @@
-import { ConversationSearchMeta } from '../@types/conversation';
+import {
+  SearchConversationsRequest,
+  SearchConversationsResponse,
+} from '../@types/conversation';
 import useHttp from './useHttp';
 
+const toParams = ({ nextToken, ...params }: SearchConversationsRequest) => ({
+  ...params,
+  next_token: nextToken,
+});
+
 const useConversationSearchApi = () => {
   const http = useHttp();
 
   return {
-    searchConversations: (query: string | null) => {
-      return http.get<ConversationSearchMeta[]>(
-        query ? `conversations/search?query=${encodeURIComponent(query)}` : null
+    searchConversations: (request: SearchConversationsRequest | null) => {
+      return http.get<SearchConversationsResponse>(
+        request ? ['conversations/search', toParams(request)] : null,
+        {
+          keepPreviousData: true,
+        }
+      );
+    },
+    searchConversationsNextPage: (request: SearchConversationsRequest) => {
+      return http.getOnce<SearchConversationsResponse>(
+        'conversations/search',
+        toParams(request)
       );
-    }
+    },
   };
 };
 
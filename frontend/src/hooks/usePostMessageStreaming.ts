@@ -126,6 +126,16 @@ const usePostMessageStreaming = create<{
                     relatedDocument: data.result.relatedDocument,
                   });
                   break;
+                case PostStreamingStatus.AGENT_RELATED_DOCUMENTS:
+                  // eslint-disable-next-line @typescript-eslint/no-explicit-any
+                  data.result.relatedDocuments.forEach((relatedDocument: any) => {
+                    thinkingDispatch({
+                      type: 'related-document',
+                      toolUseId: data.result.toolUseId,
+                      relatedDocument: relatedDocument,
+                    });
+                  });
+                  break;
                 case PostStreamingStatus.REASONING:
                   reasoningDispatch({
                     type: 'write',
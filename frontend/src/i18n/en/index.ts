@@ -628,6 +628,7 @@ How would you categorize this email?`,
         noResults: 'No chats matching for "{{query}}"',
         tryDifferentKeywords: 'Try different keywords',
         resultsCount: '{{count}} results found',
+        loadMore: 'Load more',
       },
     },
     deleteDialog: {
@@ -49,6 +49,9 @@ const ConversationHistoryPage: React.FC = () => {
     displayQuery,
     handleSearch,
     clearSearch,
+    hasMore,
+    isLoadingMore,
+    loadMore,
   } = useConversationSearch();
 
   // Input change handler
@@ -203,6 +206,9 @@ const ConversationHistoryPage: React.FC = () => {
           isSearching={isSearching}
           hasSearched={hasSearched}
           searchQuery={displayQuery}
+          hasMore={hasMore}
+          isLoadingMore={isLoadingMore}
+          onLoadMore={loadMore}
           onbackToConversationHistory={handleClearSearch}
           onSelectConversation={onClickConversation}
         />